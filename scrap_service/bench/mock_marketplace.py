@@ -0,0 +1,535 @@
+"""
+Marketplace tiruan lokal untuk load test scraper dan tracker.
+
+Menyajikan halaman hasil pencarian dan detail dengan bentuk HTML carlist.my dan mudah.my
+(selector yang sama dengan parser di service), plus endpoint IP. Perilaku jaringan diatur
+per profil: latency, rasio error 503, challenge "Just a moment..." (Cloudflare tiruan),
+dan listing sold (carlist: h2 "already been sold", mudah: redirect ke /malaysia/cars-for-sale).
+
+Dua cara mengarahkan browser ke sini:
+  - langsung: host www.carlist.my.localhost:<port> / www.mudah.my.localhost:<port>
+    (Chromium me-resolve *.localhost ke 127.0.0.1 tanpa DNS)
+  - sebagai proxy HTTP: CUSTOM_PROXIES=127.0.0.1:<port>:bench:bench dan URL http://www.carlist.my/...
+    Setiap port listener dianggap satu proxy dengan IP keluar sendiri.
+
+    python -m scrap_service.bench.mock_marketplace --profile flaky --port 8800 --listeners 3
+"""
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+PROFILES = {
+    "clean": {"latency": 0.0, "jitter": 0.0, "error_rate": 0.0, "challenge_rate": 0.0, "sold_rate": 0.1},
+    "slow": {"latency": 1.5, "jitter": 1.0, "error_rate": 0.0, "challenge_rate": 0.0, "sold_rate": 0.1},
+    "flaky": {"latency": 0.3, "jitter": 0.3, "error_rate": 0.15, "challenge_rate": 0.0, "sold_rate": 0.1},
+    "challenge": {"latency": 0.3, "jitter": 0.2, "error_rate": 0.0, "challenge_rate": 0.3, "sold_rate": 0.1},
+    "hostile": {
+        "latency": 0.8, "jitter": 0.8, "error_rate": 0.1, "challenge_rate": 0.3,
+        "challenge_solvable": False, "sold_rate": 0.2,
+    },
+}
+
+DEFAULTS = {
+    "latency": 0.0,             # detik, rata-rata latency tambahan per halaman
+    "jitter": 0.0,              # detik, +/- acak di sekitar latency
+    "error_rate": 0.0,          # peluang halaman dijawab 503
+    "challenge_rate": 0.0,      # peluang request tanpa cookie cf_clearance kena challenge
+    "challenge_delay": 2.0,     # detik sebelum challenge tiruan memasang cookie dan reload
+    "challenge_solvable": True, # False: challenge tidak pernah selesai (memaksa ganti proxy)
+    "sold_rate": 0.1,           # porsi listing yang sudah sold (stabil per listing id)
+    "pages": 2,                 # halaman hasil per brand/model sebelum halaman kosong
+    "per_page": 10,             # listing per halaman hasil
+    "seed": 42,
+}
+
+# Katalog tiruan: nama tanpa tanda hubung supaya slug URL bisa dipecah lagi
+CATALOG = [
+    ("toyota", "vios"), ("honda", "city"), ("perodua", "myvi"), ("proton", "saga"),
+    ("nissan", "almera"), ("mazda", "cx5"), ("mitsubishi", "triton"), ("hyundai", "elantra"),
+]
+VARIANTS = ["1.5 E", "1.5 G", "1.5 V", "1.3 X", "2.0 SE", "1.8 S"]
+LOCATIONS = [
+    ("Kuala Lumpur", "Cheras"), ("Selangor", "Petaling Jaya"), ("Selangor", "Shah Alam"),
+    ("Johor", "Johor Bahru"), ("Penang", "Bayan Lepas"), ("Perak", "Ipoh"),
+]
+
+SOLD_TEXT = "This car has already been sold."
+CHALLENGE_TITLE = "Just a moment..."
+
+
+def stable_fraction(*parts):
+    """Angka 0..1 yang selalu sama untuk input yang sama (tidak tergantung urutan request)."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return int(digest[:8], 16) / 0xFFFFFFFF
+
+
+def listing_id(site, brand, model, page, index):
+    return 10000000 + int(stable_fraction(site, brand, model, page, index) * 89999999)
+
+
+def make_car(listing, brand, model, year=None):
+    rng = random.Random(listing)
+    state, area = rng.choice(LOCATIONS)
+    mileage_k = rng.randrange(10, 200, 5)
+    return {
+        "id": listing,
+        "brand": brand.title(),
+        "model": model.title(),
+        "variant": rng.choice(VARIANTS),
+        "year": int(year) if year else rng.randint(2010, 2023),
+        "price": rng.randrange(25000, 180000, 100),
+        "mileage_k": mileage_k,
+        "transmission": rng.choice(["Automatic", "Automatic", "Manual"]),
+        "seats": rng.choice(["5", "5", "7"]),
+        "state": state,
+        "area": area,
+        "updated_days": rng.randint(1, 30),
+        "images": 3 + rng.randint(0, 5),
+    }
+
+
+def page_shell(title, body, status_text=""):
+    return (
+        "<!DOCTYPE html>\n<html lang=\"en\">\n<head><meta charset=\"utf-8\">"
+        f"<title>{title}</title></head>\n<body>{status_text}\n{body}\n</body>\n</html>\n"
+    )
+
+
+# ================== carlist.my
+
+def carlist_detail_url(base, car):
+    return f"{base}/used-cars/{car['year']}-{car['brand'].lower()}-{car['model'].lower()}/{car['id']}"
+
+
+def carlist_results_html(urls, total=None):
+    cards = "\n".join(
+        f'<article class="listing listing--card"><h2 class="listing__title">'
+        f'<a class="ellipsize js-ellipsize-text" href="{url}">Listing {url.rsplit("/", 1)[-1]}</a></h2></article>'
+        for url in urls
+    )
+    masthead = ""
+    if total is not None:
+        masthead = (f'<div class="masthead push--bottom"><div><h1>{total:,} vehicles for sale in Malaysia</h1>'
+                    f'</div></div>')
+    return page_shell(
+        "Used Cars for Sale in Malaysia | Carlist.my",
+        f'<div id="classified-listings-result">{masthead}<section class="c-listings">{cards}</section></div>',
+    )
+
+
+def carlist_detail_html(car, sold=False):
+    price = f"RM {car['price']:,}"
+    mileage = f"{car['mileage_k'] - 5} - {car['mileage_k']}K km"
+    items = [
+        ("Condition", "Used"), ("Year", car["year"]), ("Mileage", mileage), ("Engine", "1496 cc"),
+        ("Colour", "Silver"), ("Transmission", car["transmission"]), ("Seats", car["seats"]),
+    ]
+    owl = "".join(
+        f'<div class="owl-item"><div><div><div><span class="u-text-muted">{label}</span>'
+        f'<span class="u-text-bold u-block">{value}</span></div></div></div></div>'
+        for label, value in items
+    )
+    images = "".join(
+        f'<img src="https://img1.icarcdn.com/{car["id"]}/thumb-m_{n}.jpg">' for n in range(1, car["images"])
+    )
+    crumbs = "".join(
+        f'<li><a href="#"><span>{text}</span></a></li>'
+        for text in ("Home", "Used Cars", car["brand"], car["model"], car["variant"])
+    )
+    sold_banner = f'<h2 class="u-text-4">{SOLD_TEXT}</h2>' if sold else ""
+    body = f'''
+<section id="details-gallery"><div><div>
+  <div class="c-gallery--hero-img u-relative"><div class="c-gallery__item">
+    <img src="https://img1.icarcdn.com/{car["id"]}/main-l_0.jpg">
+    <div class="c-gallery__item-details u-padding-lg u-padding-md@mobile u-absolute u-bottom-right u-bottom-left u-zindex-1">
+      <div><div class="listing__item-price"><h3>{price}</h3></div></div>
+    </div>
+  </div></div>
+  {images}
+</div></div></section>
+{sold_banner}
+<div id="listing-detail">
+  <section class="c-section--content u-bg-white u-padding-top-md u-padding-bottom-xs u-flex@mobile u-flex--column@mobile">
+    <section class="c-section c-section--breadcrumb u-margin-top-xs u-hide@mobile js-part-breadcrumb"><div><ul>{crumbs}</ul></div></section>
+    <section class="c-section c-section--masthead u-margin-ends-lg u-margin-ends-sm@mobile u-order-2@mobile"><div><div>
+      <div><span class="u-color-muted u-text-7 u-hide@mobile">Updated {car["updated_days"]} days ago</span></div>
+      <div><h1>{car["year"]} {car["brand"]} {car["model"]} {car["variant"]}</h1></div>
+    </div></div></section>
+    <section class="c-section c-section--key-details u-margin-ends-lg u-margin-ends-sm@mobile u-order-3@mobile">
+      <div><div><div><div><div class="owl-stage-outer"><div class="owl-stage">{owl}</div></div></div></div></div></div>
+    </section>
+  </section>
+  <section><div><div class="u-flex">
+    <div class="c-sidebar c-sidebar--top u-width-2/6 u-width-1@mobile u-padding-right-sm u-padding-left-md u-padding-top-md u-padding-top-none@mobile u-flex u-flex--column u-flex--column@mobile u-order-first@mobile">
+      <div class="c-card c-card--ctr u-margin-ends-sm u-order-last@mobile"><div class="c-card__body">
+        <div class="u-flex u-align-items-center"><div><div>
+          <span></span><span>{car["state"]}</span><span>{car["area"]}</span>
+        </div></div></div>
+      </div></div>
+    </div>
+  </div></div></section>
+</div>'''
+    return page_shell(f"{car['year']} {car['brand']} {car['model']} for Sale | Carlist.my", body)
+
+
+# ================== mudah.my
+
+def mudah_detail_url(base, car):
+    return f"{base}/{car['brand'].lower()}-{car['model'].lower()}-{car['year']}-{car['id']}.htm"
+
+
+def mudah_results_html(urls, total=None):
+    cards = "\n".join(
+        f'<div class="flex flex-col flex-1 gap-2 self-center"><div class="flex flex-col">'
+        f'<a href="{url}">Listing {url}</a></div></div>'
+        for url in urls
+    )
+    summary = f'<div class="results-summary">1 - {len(urls)} of {total:,} results</div>' if total is not None else ""
+    return page_shell("Cars for sale in Malaysia | Mudah.my", f'<div id="__next">{summary}{cards}</div>')
+
+
+def mudah_detail_html(car):
+    def row(label, value):
+        return f'<div><div class="icon"></div><div>{label}</div><div>{value}</div></div>'
+
+    mileage = f"{(car['mileage_k'] - 5) * 1000:,} - {car['mileage_k'] * 1000 - 1:,} km"
+    images = "".join(
+        f'<img src="https://img.rnudah.com/images/thumbs/{car["id"]}-{n}.jpg">' for n in range(car["images"])
+    )
+    body = f'''
+<div id="__next">
+  <div id="ad_view_gallery">{images}</div>
+  <div class="flex gap-1 md:items-end"><div>RM {car["price"]:,}</div></div>
+  <div id="ad_view_ad_highlights"><div><div>
+    <div><div><div><div>Posted {car["updated_days"]} days ago</div></div></div></div>
+    <div class="flex flex-wrap lg:flex-nowrap gap-3.5">
+      <div><div>Used</div></div><div><div>{car["transmission"]}</div></div>
+      <div><div>{mileage}</div></div><div><div>{car["state"]} - {car["area"]}</div></div>
+    </div>
+  </div><h1>{car["brand"]} {car["model"]} {car["variant"]} {car["year"]}</h1></div></div>
+  <div id="ad_view_car_specifications"><div><div><div><div><div>
+    <div><section>
+      {row("Brand", car["brand"])}{row("Model", car["model"])}{row("Manufactured Year", car["year"])}{row("Variant", car["variant"])}
+    </section></div>
+    <div>{row("Engine Capacity", "1496 cc")}{row("Body Type", "Sedan")}{row("Seat Capacity", car["seats"])}</div>
+  </div></div></div></div></div></div>
+</div>'''
+    return page_shell(f"{car['brand']} {car['model']} {car['year']} | Mudah.my", body)
+
+
+def mudah_sold_landing_html():
+    return page_shell("Cars for sale in Malaysia | Mudah.my", "<h1>Cars for sale in Malaysia</h1>")
+
+
+def challenge_html(delay, solvable):
+    script = ""
+    if solvable:
+        script = (
+            "<script>setTimeout(function(){document.cookie='cf_clearance=mock" + str(int(time.time())) +
+            "; path=/; max-age=1800'; location.reload();}, " + str(int(delay * 1000)) + ");</script>"
+        )
+    body = (
+        '<div id="cf-browser-verification"><h1>Checking your browser before accessing</h1>'
+        f"<p>Please wait...</p></div>{script}"
+    )
+    return page_shell(CHALLENGE_TITLE, body)
+
+
+class MockMarketplace:
+    """
+    State bersama semua listener: profil, RNG dan statistik request.
+    Listener tambahan (listeners > 1) berperan sebagai proxy dengan IP keluar berbeda.
+    """
+
+    def __init__(self, profile="clean", host="127.0.0.1", port=0, listeners=1, **overrides):
+        settings = dict(DEFAULTS)
+        settings.update(PROFILES[profile] if isinstance(profile, str) else profile)
+        settings.update({k: v for k, v in overrides.items() if v is not None})
+        self.profile = profile if isinstance(profile, str) else "custom"
+        self.settings = settings
+        self.host = host
+        self._rng = random.Random(settings["seed"])
+        self._lock = threading.Lock()
+        self._servers = []
+        self._threads = []
+        self.stats = {
+            "requests": 0, "by_kind": {}, "by_status": {},
+            "injected_errors": 0, "challenges": 0, "challenge_passes": 0, "sold": 0,
+        }
+
+        handler = self._handler_class()
+        for n in range(listeners):
+            server = ThreadingHTTPServer((host, port + n if port else 0), handler)
+            server.daemon_threads = True
+            server.market = self
+            self._servers.append(server)
+
+    # ---------- lifecycle
+
+    @property
+    def ports(self):
+        return [server.server_address[1] for server in self._servers]
+
+    @property
+    def port(self):
+        return self.ports[0]
+
+    def start(self):
+        for server in self._servers:
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------- alamat untuk konfigurasi service
+
+    def base_url(self, site, via_proxy=False):
+        domain = "www.carlist.my" if site == "carlistmy" else "www.mudah.my"
+        return f"http://{domain}" if via_proxy else f"http://{domain}.localhost:{self.port}"
+
+    def ip_check_url(self, via_proxy=False):
+        return "http://ip.oxylabs.io/" if via_proxy else f"http://127.0.0.1:{self.port}/ip"
+
+    def test_page_url(self, via_proxy=False):
+        return "http://example.com/" if via_proxy else f"http://127.0.0.1:{self.port}/"
+
+    def proxy_list(self):
+        """String CUSTOM_PROXIES yang menunjuk ke semua listener."""
+        return ",".join(f"{self.host}:{port}:bench:bench" for port in self.ports)
+
+    def input_rows(self, site, via_proxy=False, brands=None):
+        """Baris CSV INPUT_FILE (carlist: brand,url; mudah: brand,model,url)."""
+        base = self.base_url(site, via_proxy)
+        rows = []
+        for brand, model in CATALOG[:brands or len(CATALOG)]:
+            if site == "carlistmy":
+                rows.append({"brand": brand, "url": f"{base}/used-cars-for-sale/{brand}/malaysia?page_size=25&page_number=1"})
+            else:
+                rows.append({"brand": brand, "model": model, "url": f"{base}/malaysia/cars-for-sale/{brand}/{model}"})
+        return rows
+
+    def listing_urls(self, site, count, via_proxy=False):
+        """URL detail untuk input tracker, diambil berurutan dari katalog."""
+        base = self.base_url(site, via_proxy)
+        urls = []
+        page = 1
+        while len(urls) < count:
+            for brand, model in CATALOG:
+                for index in range(self.settings["per_page"]):
+                    car = make_car(listing_id(site, brand, model, page, index), brand, model)
+                    urls.append(carlist_detail_url(base, car) if site == "carlistmy" else mudah_detail_url(base, car))
+            page += 1
+        return urls[:count]
+
+    def is_sold(self, listing):
+        return stable_fraction("sold", listing) < self.settings["sold_rate"]
+
+    # ---------- statistik
+
+    def record(self, kind, status):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["by_kind"][kind] = self.stats["by_kind"].get(kind, 0) + 1
+            self.stats["by_status"][str(status)] = self.stats["by_status"].get(str(status), 0) + 1
+
+    def bump(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def roll(self):
+        with self._lock:
+            return self._rng.random()
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self.stats))
+
+    def delay(self):
+        latency = self.settings["latency"]
+        jitter = self.settings["jitter"]
+        if latency or jitter:
+            with self._lock:
+                seconds = self._rng.uniform(latency - jitter, latency + jitter)
+            if seconds > 0:
+                time.sleep(seconds)
+
+    # ---------- routing
+
+    def route(self, host, path, query, cookies, listener_index):
+        """Return (status, headers, body, kind)."""
+        host = host.split(":")[0].lower()
+
+        if path == "/__stats":
+            return 200, {"Content-Type": "application/json"}, json.dumps(self.snapshot()), "stats"
+        if host.startswith("ip.") or path == "/ip":
+            return 200, {"Content-Type": "text/plain"}, f"10.99.0.{listener_index + 1}", "ip"
+        if "carlist.my" in host:
+            site = "carlistmy"
+        elif "mudah.my" in host:
+            site = "mudahmy"
+        else:
+            return 200, {}, page_shell("Example Domain", "<h1>Example Domain</h1>"), "test_page"
+
+        self.delay()
+        if self.roll() < self.settings["error_rate"]:
+            self.bump("injected_errors")
+            return 503, {}, page_shell("503 Service Unavailable", "<h1>Service Unavailable</h1>"), "error"
+
+        if self.settings["challenge_rate"]:
+            if "cf_clearance" in cookies:
+                self.bump("challenge_passes")
+            elif self.roll() < self.settings["challenge_rate"]:
+                self.bump("challenges")
+                body = challenge_html(self.settings["challenge_delay"], self.settings["challenge_solvable"])
+                return 403, {}, body, "challenge"
+
+        # Link di halaman mengikuti cara request datang (host .localhost langsung, atau domain asli lewat proxy)
+        base = f"http://{host}:{self.port}" if host.endswith(".localhost") else f"http://{host}"
+        if site == "carlistmy":
+            return self.route_carlist(base, path, query)
+        return self.route_mudah(base, path, query)
+
+    def route_carlist(self, base, path, query):
+        parts = [p for p in path.split("/") if p]
+        if len(parts) == 3 and parts[0] == "used-cars-for-sale":
+            brand = parts[1]
+            model = dict(CATALOG).get(brand, "sedan")
+            page = int(query.get("page_number", ["1"])[0] or 1)
+            urls = []
+            if page <= self.settings["pages"]:
+                for index in range(self.settings["per_page"]):
+                    car = make_car(listing_id("carlistmy", brand, model, page, index), brand, model)
+                    urls.append(carlist_detail_url(base, car))
+            total = self.settings["pages"] * self.settings["per_page"]
+            return 200, {}, carlist_results_html(urls, total), "results"
+
+        if len(parts) == 3 and parts[0] == "used-cars" and parts[2].isdigit():
+            year, brand, model = (parts[1].split("-", 2) + ["", ""])[:3]
+            listing = int(parts[2])
+            sold = self.is_sold(listing)
+            if sold:
+                self.bump("sold")
+            return 200, {}, carlist_detail_html(make_car(listing, brand, model, year), sold), "detail"
+
+        return 404, {}, page_shell("Not Found", "<h1>404</h1>"), "not_found"
+
+    def route_mudah(self, base, path, query):
+        parts = [p for p in path.split("/") if p]
+        if parts == ["malaysia", "cars-for-sale"]:
+            return 200, {}, mudah_sold_landing_html(), "sold_landing"
+
+        if len(parts) == 4 and parts[:2] == ["malaysia", "cars-for-sale"]:
+            brand, model = parts[2], parts[3]
+            page = int(query.get("o", ["1"])[0] or 1)
+            urls = []
+            if page <= self.settings["pages"]:
+                for index in range(self.settings["per_page"]):
+                    car = make_car(listing_id("mudahmy", brand, model, page, index), brand, model)
+                    urls.append(mudah_detail_url(base, car))
+            total = self.settings["pages"] * self.settings["per_page"]
+            return 200, {}, mudah_results_html(urls, total), "results"
+
+        if len(parts) == 1 and parts[0].endswith(".htm"):
+            slug = parts[0][:-len(".htm")].split("-")
+            if len(slug) >= 4 and slug[-1].isdigit():
+                brand, model, year, listing = slug[0], slug[1], slug[2], int(slug[-1])
+                if self.is_sold(listing):
+                    self.bump("sold")
+                    return 302, {"Location": f"{base}/malaysia/cars-for-sale"}, "", "sold_redirect"
+                return 200, {}, mudah_detail_html(make_car(listing, brand, model, year)), "detail"
+
+        return 404, {}, page_shell("Not Found", "<h1>404</h1>"), "not_found"
+
+    def _handler_class(self):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                market = self.server.market
+                # Request lewat proxy memakai absolute-form: GET http://host/path
+                if self.path.startswith("http://"):
+                    split = urlsplit(self.path)
+                    host = split.netloc
+                else:
+                    split = urlsplit(self.path)
+                    host = self.headers.get("Host", "")
+                cookies = self.headers.get("Cookie", "")
+                listener_index = market._servers.index(self.server)
+
+                try:
+                    status, headers, body, kind = market.route(
+                        host, split.path or "/", parse_qs(split.query), cookies, listener_index
+                    )
+                except Exception as e:
+                    status, headers, body, kind = 500, {}, page_shell("500", f"<pre>{e}</pre>"), "server_error"
+
+                market.record(kind, status)
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", headers.pop("Content-Type", "text/html; charset=utf-8"))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_CONNECT(self):
+                # HTTPS lewat proxy tidak didukung; service harus memakai URL http:// ke mock
+                self.server.market.record("connect", 405)
+                self.send_response(405)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Marketplace tiruan carlist.my / mudah.my untuk load test")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="clean")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--listeners", type=int, default=1, help="Jumlah port (masing-masing satu proxy tiruan)")
+    parser.add_argument("--pages", type=int, help="Halaman hasil per brand/model")
+    parser.add_argument("--per-page", type=int, help="Listing per halaman hasil")
+    args = parser.parse_args(argv)
+
+    market = MockMarketplace(
+        args.profile, host=args.host, port=args.port, listeners=args.listeners,
+        pages=args.pages, per_page=args.per_page
+    ).start()
+    print(f"🛒 Mock marketplace profil '{market.profile}' di port {market.ports}")
+    print(f"   carlist : {market.base_url('carlistmy')}/used-cars-for-sale/toyota/malaysia?page_number=1")
+    print(f"   mudah   : {market.base_url('mudahmy')}/malaysia/cars-for-sale/toyota/vios")
+    print(f"   IP_CHECK_URL={market.ip_check_url()}")
+    print(f"   CUSTOM_PROXIES={market.proxy_list()}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        market.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Benchmark parser dan cek akurasi field terhadap korpus HTML offline di bench/fixtures.
+
+Setiap fixture adalah pasangan <nama>.html + <nama>.json berisi url asli, jenis halaman
+(detail / results) dan nilai field yang diharapkan per extractor. Parser carlist murni HTML
+(BeautifulSoup) diukur langsung; extractor yang butuh `page` Playwright (mudah, postcode,
+dan carlist end-to-end) dijalankan di Chromium dengan page.route yang menyajikan fixture
+dan memblokir semua request lain, jadi tidak ada traffic ke situs asli.
+
+    python -m scrap_service.bench.parser_bench
+    python -m scrap_service.bench.parser_bench --repeat 200 --only carlistmy carlistmy_null
+    python -m scrap_service.bench.parser_bench --no-browser --json
+"""
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+DEFAULT_REPEAT = 50
+DEFAULT_BROWSER_REPEAT = 5
+
+
+def load_fixtures(site):
+    fixtures = []
+    for meta_file in sorted((FIXTURES_DIR / site).glob("*.json")):
+        meta = json.loads(meta_file.read_text(encoding="utf-8"))
+        meta["name"] = f"{site}/{meta_file.stem}"
+        meta["html"] = meta_file.with_suffix(".html").read_text(encoding="utf-8")
+        fixtures.append(meta)
+    return fixtures
+
+
+def _urls(urls):
+    return {"urls": sorted(urls)}
+
+
+def _carlist_detail():
+    from scrap_service.sites.carlistmy import parse_detail_html
+    return parse_detail_html
+
+
+def _carlist_results():
+    from scrap_service.sites.carlistmy import parse_listing_urls
+    return lambda html, url: _urls(parse_listing_urls(html))
+
+
+def _carlist_null_detail():
+    from scrap_service.carlistmy_service_null_scrap.carlist_null_service import parse_detail_html
+    return parse_detail_html
+
+
+def _carlist_page_detail():
+    parse = _carlist_detail()
+    return lambda page, url: parse(page.content(), url)
+
+
+def _mudah_detail():
+    from scrap_service.sites.mudahmy import extract_listing_detail
+    return extract_listing_detail
+
+
+def _mudah_results():
+    from scrap_service.sites.mudahmy import extract_listing_urls
+    return lambda page, url: _urls(extract_listing_urls(page, url))
+
+
+def _postcode_detail():
+    from scrap_service.location_service_playwirght.postcode_crawler import extract_detail
+    fields = ["location", "post_office", "state", "post_code", "latitude", "longitude"]
+
+    def extract(page, url):
+        values = extract_detail(page)
+        return dict(zip(fields, values)) if values else {}
+    return extract
+
+
+# name -> (folder fixture, jenis halaman, mode, loader, key expected di fixture)
+EXTRACTORS = {
+    "carlistmy": ("carlistmy", "detail", "html", _carlist_detail, "carlistmy"),
+    "carlistmy_results": ("carlistmy", "results", "html", _carlist_results, "carlistmy_results"),
+    "carlistmy_null": ("carlistmy", "detail", "html", _carlist_null_detail, "carlistmy_null"),
+    "carlistmy_browser": ("carlistmy", "detail", "browser", _carlist_page_detail, "carlistmy"),
+    "mudahmy": ("mudahmy", "detail", "browser", _mudah_detail, "mudahmy"),
+    "mudahmy_results": ("mudahmy", "results", "browser", _mudah_results, "mudahmy_results"),
+    "postcode": ("postcode", "detail", "browser", _postcode_detail, "postcode"),
+}
+
+
+def compare(expected, actual):
+    """Bandingkan field per field; kembalikan (jumlah cocok, total, daftar mismatch)."""
+    mismatches = []
+    for field, want in expected.items():
+        got = actual.get(field) if isinstance(actual, dict) else None
+        if got != want:
+            mismatches.append({"field": field, "expected": want, "actual": got})
+    return len(expected) - len(mismatches), len(expected), mismatches
+
+
+def new_report(name, mode):
+    return {
+        "extractor": name, "mode": mode, "pages": 0, "seconds": 0.0,
+        "pages_per_sec": None, "peak_kb": None, "fields_ok": 0, "fields_total": 0,
+        "mismatches": [], "error": None,
+    }
+
+
+def finish_report(report):
+    if report["seconds"]:
+        report["pages_per_sec"] = round(report["pages"] / report["seconds"], 1)
+    report["seconds"] = round(report["seconds"], 3)
+    return report
+
+
+def check_accuracy(report, fixture, key, actual):
+    ok, total, mismatches = compare(fixture["expected"][key], actual)
+    report["fields_ok"] += ok
+    report["fields_total"] += total
+    for mismatch in mismatches:
+        report["mismatches"].append(dict(mismatch, fixture=fixture["name"]))
+
+
+def run_html(name, fixtures, key, parse, repeat):
+    report = new_report(name, "html")
+
+    # Pemanasan: import malas (bs4, lxml) jangan sampai ikut terhitung sebagai memori parse
+    if fixtures:
+        parse(fixtures[0]["html"], fixtures[0]["url"])
+
+    # Pass akurasi + memori: satu kali per fixture dengan tracemalloc aktif
+    peaks = []
+    tracemalloc.start()
+    for fixture in fixtures:
+        tracemalloc.reset_peak()
+        actual = parse(fixture["html"], fixture["url"])
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        check_accuracy(report, fixture, key, actual)
+    tracemalloc.stop()
+    report["peak_kb"] = round(max(peaks) / 1024, 1) if peaks else None
+
+    # Pass throughput tanpa tracemalloc supaya angkanya tidak terdistorsi
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for fixture in fixtures:
+            parse(fixture["html"], fixture["url"])
+    report["seconds"] = time.perf_counter() - started
+    report["pages"] = repeat * len(fixtures)
+    return finish_report(report)
+
+
+def run_browser(jobs, repeat):
+    """Jalankan semua extractor mode browser dalam satu Chromium headless."""
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError as e:
+        return [dict(new_report(name, "browser"), error=f"playwright tidak tersedia: {e}") for name, *_ in jobs]
+
+    routes = {}
+    for _, fixtures, _, _ in jobs:
+        for fixture in fixtures:
+            routes[fixture["url"]] = fixture["html"]
+
+    def handle(route):
+        body = routes.get(route.request.url)
+        if body is None:
+            route.abort()
+        else:
+            route.fulfill(status=200, content_type="text/html; charset=utf-8", body=body)
+
+    reports = []
+    with sync_playwright() as p:
+        try:
+            browser = p.chromium.launch(headless=True)
+        except Exception as e:
+            message = str(e).strip().splitlines()[0]
+            return [dict(new_report(name, "browser"), error=f"chromium gagal dijalankan: {message}") for name, *_ in jobs]
+
+        context = browser.new_context()
+        context.route("**/*", handle)
+        page = context.new_page()
+        try:
+            for name, fixtures, key, extract in jobs:
+                report = new_report(name, "browser")
+                try:
+                    for fixture in fixtures:
+                        page.goto(fixture["url"], wait_until="domcontentloaded")
+                        check_accuracy(report, fixture, key, extract(page, fixture["url"]))
+
+                    # Waktu per halaman termasuk navigasi (end-to-end dari route ke dict)
+                    started = time.perf_counter()
+                    for _ in range(repeat):
+                        for fixture in fixtures:
+                            page.goto(fixture["url"], wait_until="domcontentloaded")
+                            extract(page, fixture["url"])
+                    report["seconds"] = time.perf_counter() - started
+                    report["pages"] = repeat * len(fixtures)
+                except Exception as e:
+                    report["error"] = f"{type(e).__name__}: {e}"
+                reports.append(finish_report(report))
+        finally:
+            browser.close()
+    return reports
+
+
+def print_report(reports):
+    print(f"{'extractor':<20}{'mode':<9}{'pages':>7}{'pages/s':>10}{'peak KB':>10}{'akurasi':>12}")
+    for r in reports:
+        if r["error"]:
+            print(f"{r['extractor']:<20}{r['mode']:<9}  ⚠️ dilewati: {r['error']}")
+            continue
+        accuracy = f"{r['fields_ok']}/{r['fields_total']}"
+        print(
+            f"{r['extractor']:<20}{r['mode']:<9}{r['pages']:>7}"
+            f"{r['pages_per_sec'] if r['pages_per_sec'] is not None else '-':>10}"
+            f"{r['peak_kb'] if r['peak_kb'] is not None else '-':>10}{accuracy:>12}"
+        )
+    for r in reports:
+        for m in r["mismatches"]:
+            print(f"❌ {r['extractor']} {m['fixture']} {m['field']}: expected {m['expected']!r}, dapat {m['actual']!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark parser terhadap korpus HTML offline")
+    parser.add_argument("--only", nargs="+", choices=sorted(EXTRACTORS), help="Hanya jalankan extractor tertentu")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Jumlah pengulangan untuk parser HTML")
+    parser.add_argument("--browser-repeat", type=int, default=DEFAULT_BROWSER_REPEAT,
+                        help="Jumlah pengulangan untuk extractor mode browser")
+    parser.add_argument("--no-browser", action="store_true", help="Lewati extractor yang butuh Chromium")
+    parser.add_argument("--json", action="store_true", help="Cetak hasil mentah dalam JSON")
+    args = parser.parse_args(argv)
+
+    names = args.only or list(EXTRACTORS)
+    reports = []
+    browser_jobs = []
+    for name in names:
+        site, kind, mode, loader, key = EXTRACTORS[name]
+        fixtures = [f for f in load_fixtures(site) if f["kind"] == kind and key in f["expected"]]
+        if mode == "html":
+            reports.append(run_html(name, fixtures, key, loader(), args.repeat))
+        elif not args.no_browser:
+            browser_jobs.append((name, fixtures, key, loader()))
+
+    if browser_jobs:
+        reports.extend(run_browser(browser_jobs, args.browser_repeat))
+
+    if args.json:
+        print(json.dumps(reports, indent=2, ensure_ascii=False, default=str))
+    else:
+        print_report(reports)
+
+    return 1 if any(r["mismatches"] for r in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
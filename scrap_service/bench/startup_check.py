@@ -0,0 +1,133 @@
+"""
+Cek regresi waktu start dan memori app Flask.
+
+Setiap app di-import di proses Python terpisah dengan DB sengaja tidak bisa dihubungi,
+lalu diukur waktu import, peak RSS dan modul berat yang ikut termuat.
+Hasilnya dibandingkan dengan batas di startup_baseline.json.
+
+    python -m scrap_service.bench.startup_check
+    python -m scrap_service.bench.startup_check --update   # tulis ulang baseline
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+BASELINE_FILE = Path(__file__).resolve().parent / "startup_baseline.json"
+
+APPS = [
+    "scrap_service.carlistmy_service_playwright.app",
+    "scrap_service.mudahmy_service_playwright.app",
+    "scrap_service.listing_tracker_service_carlistmy_playwright.app",
+    "scrap_service.listing_tracker_service_mudahmy_playwright.app",
+    "scrap_service.imagedownload_service.app",
+]
+
+# Modul yang tidak boleh termuat hanya karena app di-import
+HEAVY_MODULES = ["pandas", "playwright", "playwright_stealth", "bs4", "camoufox", "numpy"]
+
+# Kelonggaran saat --update supaya noise mesin tidak langsung dianggap regresi
+HEADROOM_SECONDS = 1.0
+HEADROOM_RSS = 1.5
+
+RESULT_MARKER = "STARTUP_RESULT "
+
+CHILD_SCRIPT = f"""
+import sys, json, time, resource, importlib
+started = time.perf_counter()
+error = None
+try:
+    importlib.import_module(sys.argv[1])
+except Exception as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+elapsed = time.perf_counter() - started
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss = rss / 1024
+print({RESULT_MARKER!r} + json.dumps({{
+    "seconds": round(elapsed, 3),
+    "rss_mb": round(rss / 1024, 1),
+    "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+    "error": error,
+}}))
+"""
+
+
+def measure(module):
+    env = dict(os.environ)
+    # Simulasikan DB mati: app harus tetap bisa di-import
+    env.update({"DB_HOST": "127.0.0.1", "DB_PORT": "1", "PYTHONPATH": str(BASE_DIR)})
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT, module],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, timeout=120
+    )
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    return {"seconds": None, "rss_mb": None, "heavy": [], "error": proc.stderr.strip()[-500:] or "tidak ada output"}
+
+
+def load_baseline():
+    if not BASELINE_FILE.exists():
+        return {}
+    return json.loads(BASELINE_FILE.read_text(encoding="utf-8"))
+
+
+def check(result, budget):
+    problems = []
+    if result["error"]:
+        problems.append(f"gagal import: {result['error']}")
+    if result["heavy"]:
+        problems.append(f"modul berat termuat: {', '.join(result['heavy'])}")
+    if budget:
+        if result["seconds"] is not None and result["seconds"] > budget["max_seconds"]:
+            problems.append(f"waktu import {result['seconds']}s > {budget['max_seconds']}s")
+        if result["rss_mb"] is not None and result["rss_mb"] > budget["max_rss_mb"]:
+            problems.append(f"RSS {result['rss_mb']}MB > {budget['max_rss_mb']}MB")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cek regresi waktu start dan memori app Flask")
+    parser.add_argument("--update", action="store_true", help="Tulis ulang startup_baseline.json dari hasil sekarang")
+    parser.add_argument("--json", action="store_true", help="Cetak hasil mentah dalam JSON")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline()
+    results = {module: measure(module) for module in APPS}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    failed = False
+    for module, result in results.items():
+        problems = check(result, None if args.update else baseline.get(module))
+        status = "❌" if problems else "✅"
+        print(f"{status} {module}: {result['seconds']}s, {result['rss_mb']}MB")
+        for problem in problems:
+            print(f"    - {problem}")
+        failed = failed or bool(problems)
+
+    if args.update:
+        if failed:
+            print("Baseline tidak ditulis karena masih ada app yang gagal.")
+            return 1
+        new_baseline = {
+            module: {
+                "max_seconds": round(result["seconds"] + HEADROOM_SECONDS, 2),
+                "max_rss_mb": round(result["rss_mb"] * HEADROOM_RSS),
+            }
+            for module, result in results.items()
+        }
+        BASELINE_FILE.write_text(json.dumps(new_baseline, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline ditulis ke {BASELINE_FILE}")
+        return 0
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Laporan throughput dan latency scraper/tracker terhadap mock marketplace lokal.
+
+Untuk setiap kombinasi target x profil, mock_marketplace dijalankan dengan profil tersebut
+lalu service asli (CarlistMyService, MudahMyService, kedua tracker) dijalankan di proses
+terpisah dengan env yang mengarahkan input CSV, cek IP dan (opsional) proxy ke mock,
+jeda anti-bot diskalakan lewat SLEEP_SCALE dan browser headless.
+
+Scraper menulis hasil ke DB seperti biasa, jadi arahkan DB_* ke database scratch dan
+tambahkan --allow-db-writes. Tracker memakai listing dengan id negatif sehingga UPDATE
+status tidak pernah mengenai baris asli.
+
+    python -m scrap_service.bench.throughput --target tracker_mudahmy --profile clean flaky
+    python -m scrap_service.bench.throughput --target carlistmy --allow-db-writes --via-proxy --listeners 3
+"""
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+from scrap_service.bench.mock_marketplace import MockMarketplace, PROFILES
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+RESULT_MARKER = "THROUGHPUT_RESULT "
+
+# name -> (site mock, modul, class, METRICS_SITE, jenis)
+TARGETS = {
+    "carlistmy": (
+        "carlistmy", "scrap_service.carlistmy_service_playwright.carlistmy_service",
+        "CarlistMyService", "carlistmy", "scrape",
+    ),
+    "mudahmy": (
+        "mudahmy", "scrap_service.mudahmy_service_playwright.mudahmy_service",
+        "MudahMyService", "mudahmy", "scrape",
+    ),
+    "tracker_carlistmy": (
+        "carlistmy", "scrap_service.listing_tracker_service_carlistmy_playwright.listing_tracker_carlistmy_playwright",
+        "ListingTrackerCarlistmyPlaywright", "carlistmy_tracker", "track",
+    ),
+    "tracker_mudahmy": (
+        "mudahmy", "scrap_service.listing_tracker_service_mudahmy_playwright.listing_tracker_mudahmy_playwright",
+        "ListingTrackerMudahmyPlaywright", "mudahmy_tracker", "track",
+    ),
+}
+
+
+def run_child(spec_file):
+    """Dijalankan di proses anak: jalankan satu service dan cetak ringkasan metrics."""
+    import importlib
+    from scrap_service.common import metrics
+
+    spec = json.loads(Path(spec_file).read_text(encoding="utf-8"))
+    _, module_name, class_name, metrics_site, kind = TARGETS[spec["target"]]
+
+    service = None
+    error = None
+    started = time.perf_counter()
+    try:
+        service_class = getattr(importlib.import_module(module_name), class_name)
+        service = service_class()
+        if kind == "scrape":
+            service.scrape_all_brands()
+        else:
+            service.track_listings(listings=[tuple(row) for row in spec["listings"]])
+    except Exception as e:
+        lines = str(e).strip().splitlines()
+        error = f"{type(e).__name__}: {lines[0] if lines else ''}"
+    elapsed = time.perf_counter() - started
+
+    progress = dict(getattr(service, "progress", None) or {})
+    close = getattr(service, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception:
+            pass
+
+    def q(stage, value):
+        result = metrics.registry.quantile(metrics.STAGE_METRIC, value, site=metrics_site, stage=stage)
+        return round(result, 3) if result is not None else None
+
+    summary = metrics.registry.summarize(site=metrics_site)
+    print(RESULT_MARKER + json.dumps({
+        "seconds": round(elapsed, 2),
+        "error": error,
+        "progress": progress,
+        "counters": summary["counters"],
+        "stages": {k: {"count": v["count"], "seconds": round(v["seconds"], 2)} for k, v in summary["stages"].items()},
+        "navigation_p50": q("navigation", 0.5),
+        "navigation_p95": q("navigation", 0.95),
+    }, default=str), flush=True)
+
+
+def write_input_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_case(target, profile, args):
+    site, _, _, _, kind = TARGETS[target]
+    market = MockMarketplace(
+        profile, listeners=args.listeners, pages=args.pages, per_page=args.per_page,
+        challenge_delay=args.challenge_delay
+    ).start()
+
+    with tempfile.TemporaryDirectory(prefix="bench_throughput_") as tmp:
+        spec = {"target": target, "listings": []}
+        env = dict(os.environ)
+        env.update({
+            "PYTHONPATH": str(BASE_DIR),
+            "SLEEP_SCALE": str(args.sleep_scale),
+            "BROWSER_HEADLESS": "true",
+            "IP_CHECK_URL": market.ip_check_url(args.via_proxy),
+            "BROWSER_TEST_URL": market.test_page_url(args.via_proxy),
+            "CLEARANCE_CACHE_DIR": str(Path(tmp) / "clearance"),
+            "CLEARANCE_WAIT": str(args.clearance_wait),
+            "USE_PROXY": "false",
+            "PROXY_MODE": "custom" if args.via_proxy else "none",
+            "CUSTOM_PROXIES": market.proxy_list() if args.via_proxy else "",
+        })
+
+        if kind == "scrape":
+            input_file = Path(tmp) / f"{site}_input.csv"
+            write_input_csv(input_file, market.input_rows(site, args.via_proxy, brands=args.brands))
+            env["INPUT_FILE"] = str(input_file)
+        else:
+            # Id negatif: UPDATE status di tracker tidak akan mengenai baris asli di DB
+            urls = market.listing_urls(site, args.listings, args.via_proxy)
+            spec["listings"] = [(-(index + 1), url, "active") for index, url in enumerate(urls)]
+
+        spec_file = Path(tmp) / "spec.json"
+        spec_file.write_text(json.dumps(spec), encoding="utf-8")
+
+        try:
+            proc = subprocess.run(
+                [sys.executable, "-m", "scrap_service.bench.throughput", "--child", str(spec_file)],
+                cwd=BASE_DIR, env=env, capture_output=True, text=True, timeout=args.timeout
+            )
+            output, stderr = proc.stdout, proc.stderr
+        except subprocess.TimeoutExpired as e:
+            output = e.stdout.decode() if isinstance(e.stdout, bytes) else (e.stdout or "")
+            stderr = f"timeout setelah {args.timeout} detik"
+
+    mock_stats = market.snapshot()
+    market.stop()
+
+    result = None
+    for line in reversed(output.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            result = json.loads(line[len(RESULT_MARKER):])
+            break
+    if result is None:
+        result = {"seconds": None, "error": (stderr or "").strip()[-500:] or "tidak ada output", "counters": {}}
+
+    counters = result.get("counters", {})
+    listings = sum(v for k, v in counters.items() if k.startswith("scrape_listings_total"))
+    pages = counters.get("scrape_pages_total", 0)
+    seconds = result.get("seconds")
+    return {
+        "target": target,
+        "profile": profile,
+        "via_proxy": args.via_proxy,
+        "seconds": seconds,
+        "listings": listings,
+        "listings_per_min": round(listings / seconds * 60, 1) if seconds else None,
+        "pages": pages,
+        "navigation_p50": result.get("navigation_p50"),
+        "navigation_p95": result.get("navigation_p95"),
+        "retries": counters.get("scrape_retries_total", 0),
+        "antibot": sum(v for k, v in counters.items() if k.startswith("scrape_antibot_total")),
+        "proxy_swaps": counters.get("scrape_proxy_swaps_total", 0),
+        "results": {k.split("result=")[-1].rstrip("}"): v for k, v in counters.items() if "result=" in k},
+        "mock": mock_stats,
+        "stages": result.get("stages", {}),
+        "error": result.get("error"),
+    }
+
+
+def print_report(rows):
+    header = (
+        f"{'target':<19}{'profil':<11}{'detik':>8}{'listing':>9}{'/menit':>9}"
+        f"{'nav p50':>9}{'nav p95':>9}{'retry':>7}{'antibot':>9}{'swap':>6}{'req':>6}{'503':>5}{'chal':>6}"
+    )
+    print(header)
+    for r in rows:
+        mock = r["mock"]
+        print(
+            f"{r['target']:<19}{r['profile']:<11}{r['seconds'] if r['seconds'] is not None else '-':>8}"
+            f"{r['listings']:>9}{r['listings_per_min'] if r['listings_per_min'] is not None else '-':>9}"
+            f"{r['navigation_p50'] if r['navigation_p50'] is not None else '-':>9}"
+            f"{r['navigation_p95'] if r['navigation_p95'] is not None else '-':>9}"
+            f"{r['retries']:>7}{r['antibot']:>9}{r['proxy_swaps']:>6}"
+            f"{mock['requests']:>6}{mock['injected_errors']:>5}{mock['challenges']:>6}"
+        )
+    for r in rows:
+        if r["results"]:
+            print(f"   {r['target']} / {r['profile']}: hasil {r['results']}")
+        if r["error"]:
+            print(f"❌ {r['target']} / {r['profile']}: {r['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput scraper/tracker terhadap mock marketplace")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--target", nargs="+", choices=sorted(TARGETS), default=["tracker_carlistmy", "tracker_mudahmy"])
+    parser.add_argument("--profile", nargs="+", choices=sorted(PROFILES), default=sorted(PROFILES))
+    parser.add_argument("--via-proxy", action="store_true", help="Akses mock lewat proxy HTTP tiruan (PROXY_MODE=custom)")
+    parser.add_argument("--listeners", type=int, default=1, help="Jumlah port mock (= jumlah proxy tiruan)")
+    parser.add_argument("--brands", type=int, default=2, help="Jumlah baris brand/model di input CSV scraper")
+    parser.add_argument("--pages", type=int, default=2, help="Halaman hasil per brand/model")
+    parser.add_argument("--per-page", type=int, default=10, help="Listing per halaman hasil")
+    parser.add_argument("--listings", type=int, default=30, help="Jumlah listing untuk target tracker")
+    parser.add_argument("--sleep-scale", type=float, default=0.0, help="Pengali jeda anti-bot (0 = secepatnya)")
+    parser.add_argument("--challenge-delay", type=float, default=2.0, help="Detik sampai challenge tiruan selesai")
+    parser.add_argument("--clearance-wait", type=int, default=5, help="CLEARANCE_WAIT untuk service")
+    parser.add_argument("--timeout", type=int, default=1800, help="Batas waktu per kasus (detik)")
+    parser.add_argument("--allow-db-writes", action="store_true",
+                        help="Izinkan target scraper (menulis listing tiruan ke DB_* yang aktif)")
+    parser.add_argument("--json", action="store_true", help="Cetak hasil mentah dalam JSON")
+    parser.add_argument("--output", help="Simpan hasil JSON ke file")
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.child)
+        return 0
+
+    scrapers = [t for t in args.target if TARGETS[t][4] == "scrape"]
+    if scrapers and not args.allow_db_writes:
+        parser.error(
+            f"target {', '.join(scrapers)} menulis ke DB; arahkan DB_* ke database scratch "
+            "lalu jalankan ulang dengan --allow-db-writes"
+        )
+
+    rows = []
+    for target in args.target:
+        for profile in args.profile:
+            print(f"▶️ {target} / {profile} ...", flush=True)
+            rows.append(run_case(target, profile, args))
+
+    if args.json:
+        print(json.dumps(rows, indent=2, ensure_ascii=False))
+    else:
+        print_report(rows)
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"Hasil disimpan ke {args.output}")
+
+    return 1 if any(r["error"] for r in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,6 +16,7 @@ from bs4 import BeautifulSoup
 from webdriver_manager.chrome import ChromeDriverManager
 
 from scrap_service.carlistmy_service.database import get_connection
+from scrap_service.common.diagnostics import capture
 
 log_folder = "logs"
 os.makedirs(log_folder, exist_ok=True)
@@ -52,21 +53,9 @@ else:
 
 def take_screenshot(driver, name: str):
     """
-    Simpan screenshot ke dalam folder logs/<YYYYMMDD>_error/
+    Simpan screenshot ke dalam folder logs/<YYYYMMDD>_error_carlistmy/ (sesuai kebijakan diagnostik)
     """
-    try:
-        error_folder_name = time.strftime('%Y%m%d') + "_error_carlistmy"
-        screenshot_dir = os.path.join("logs", error_folder_name)
-        if not os.path.exists(screenshot_dir):
-            os.makedirs(screenshot_dir)
-
-        timestamp = time.strftime('%H%M%S')
-        screenshot_path = os.path.join(screenshot_dir, f"{name}_{timestamp}.png")
-
-        driver.save_screenshot(screenshot_path)
-        logging.info(f"📸 Screenshot disimpan: {screenshot_path}")
-    except Exception as e:
-        logging.warning(f"❌ Gagal menyimpan screenshot: {e}")
+    capture(driver, name, "carlistmy")
 
 
 class CarlistMyService:
@@ -240,23 +229,8 @@ class CarlistMyService:
 
     def debug_dump(self, prefix):
         """Simpan screenshot dan page_source untuk keperluan debugging."""
-        timestamp = int(time.time())
-        screenshot_name = f"{prefix}_{timestamp}.png"
-        html_name = f"{prefix}_{timestamp}.html"
-
-        try:
-            self.driver.save_screenshot(screenshot_name)
-            logging.info(f"Screenshot disimpan: {screenshot_name}")
-        except Exception as e:
-            logging.error(f"Gagal mengambil screenshot: {e}")
-
-        try:
-            page_source = self.driver.page_source
-            with open(html_name, "w", encoding="utf-8") as f:
-                f.write(page_source)
-            logging.info(f"HTML page source disimpan: {html_name}")
-        except Exception as e:
-            logging.error(f"Gagal menyimpan HTML page source: {e}")
+        capture(self.driver, prefix, "carlistmy")
+        capture(self.driver, prefix, "carlistmy", category=f"{prefix}_dom", mode="dom")
 
     def get_listing_urls(self, listing_page_url):
         logging.info(f"📄 Mengambil listing dari: {listing_page_url}")
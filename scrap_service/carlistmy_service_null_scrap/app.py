@@ -1,19 +1,40 @@
 from flask import Flask, jsonify, request
-from carlistmy_null_service import CarlistMyNullService
+from scrap_service.common.jobs import JobManager, JobConflict, accepted_response, conflict_response, register_job_routes
 
 app = Flask(__name__)
-null_scraper = CarlistMyNullService()
+job_manager = JobManager()
+register_job_routes(app, job_manager)
+
+
+def create_null_scraper():
+    """Import dan bangun service saat job dijalankan, bukan saat app start."""
+    from scrap_service.carlistmy_service_null_scrap.carlist_null_service import CarlistMyNullService
+    return CarlistMyNullService()
+
 
 @app.route('/scrape_null', methods=['POST'])
 def scrape_null_entries():
-    null_scraper.stop_flag = False
-    null_scraper.scrape_null_entries()
-    return jsonify({"message": "Scraping data null selesai."}), 200
+    data = request.get_json(silent=True) or {}
+    workers = data.get("workers")
+    try:
+        job = job_manager.submit(
+            "scrape_null",
+            create_null_scraper,
+            lambda service: service.scrape_null_entries(workers=workers),
+            params={"workers": workers},
+            lock_key="null"
+        )
+    except JobConflict as e:
+        return conflict_response(e)
+    return accepted_response(job)
 
 @app.route('/stop_null', methods=['POST'])
 def stop_scraping():
-    null_scraper.stop_flag = True
-    return jsonify({"message": "Scraping data null dihentikan."}), 200
+    jobs = job_manager.cancel_all("scrape_null")
+    return jsonify({
+        "message": "Scraping data null dihentikan.",
+        "cancelled_jobs": [job.id for job in jobs]
+    }), 200
 
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=5003, debug=True)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=5003, debug=True)
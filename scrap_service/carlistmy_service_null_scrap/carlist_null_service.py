@@ -1,17 +1,19 @@
 import os
 import time
+import queue
 import logging
 import random
-import re
+import threading
 from datetime import datetime
 from bs4 import BeautifulSoup
-from seleniumwire import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
 
 from scrap_service.carlistmy_service_null_scrap.database import get_connection
+from scrap_service.common.normalize import normalize_car, normalize_mileage, ensure_normalized_columns
+from scrap_service.common.price_history import ensure_history_partitions
+from scrap_service.common.proxy_pool import ProxyPool, parse_proxy_list
+from scrap_service.common.engine import take_screenshot as _take_screenshot
+from scrap_service.common.logsetup import setup_logging
 
 DB_TABLE_SCRAP = os.getenv("DB_TABLE_SCRAP", "cars_scrap")
 DB_TABLE_HISTORY_PRICE = os.getenv("DB_TABLE_HISTORY_PRICE", "price_history")
@@ -19,65 +21,149 @@ DB_TABLE_HISTORY_PRICE = os.getenv("DB_TABLE_HISTORY_PRICE", "price_history")
 PROXY_MODE = os.getenv("PROXY_MODE", "none")
 CUSTOM_PROXIES = os.getenv("CUSTOM_PROXIES", "")
 
-log_folder = "logs"
-os.makedirs(log_folder, exist_ok=True)
-log_start_date = datetime.now().strftime("%Y%m%d")
-log_file_path = os.path.join(log_folder, f"scrape_carlistmy_null_{log_start_date}.log")
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(log_file_path, encoding="utf-8"),
-        logging.StreamHandler()
-    ]
-)
+# ===== Konfigurasi rescan NULL
+DB_TABLE_NULL_ATTEMPTS = os.getenv("DB_TABLE_NULL_ATTEMPTS", "null_rescan_attempts")
+# Jumlah worker (masing-masing satu Chrome + proxy) yang mengambil URL dari antrian bersama
+NULL_RESCAN_WORKERS = int(os.getenv("NULL_RESCAN_WORKERS", "3"))
+# Update field ditulis ke DB per sekian listing
+NULL_RESCAN_BATCH_SIZE = int(os.getenv("NULL_RESCAN_BATCH_SIZE", "20"))
+# Listing yang tetap gagal/kosong setelah sekian percobaan tidak diambil lagi
+NULL_RESCAN_MAX_ATTEMPTS = int(os.getenv("NULL_RESCAN_MAX_ATTEMPTS", "3"))
+# Jeda minimum (jam) sebelum listing yang gagal dicoba lagi
+NULL_RESCAN_RETRY_HOURS = float(os.getenv("NULL_RESCAN_RETRY_HOURS", "24"))
+NULL_RESCAN_RESTART_EVERY = int(os.getenv("NULL_RESCAN_RESTART_EVERY", "25"))
+NULL_RESCAN_DELAY_MIN = float(os.getenv("NULL_RESCAN_DELAY_MIN", "15"))
+NULL_RESCAN_DELAY_MAX = float(os.getenv("NULL_RESCAN_DELAY_MAX", "20"))
+
+# Field yang dicari ulang; hanya yang NULL di DB yang ditulis
+NULL_FIELDS = ["brand", "model", "variant", "price"]
+
+setup_logging("scrape_carlistmy_null")
 
 def take_screenshot(driver, name: str):
-    try:
-        error_folder_name = time.strftime('%Y%m%d') + "_error_carlistmy_null"
-        screenshot_dir = os.path.join("logs", error_folder_name)
-        if not os.path.exists(screenshot_dir):
-            os.makedirs(screenshot_dir)
-
-        timestamp = time.strftime('%H%M%S')
-        screenshot_path = os.path.join(screenshot_dir, f"{name}_{timestamp}.png")
-        driver.save_screenshot(screenshot_path)
-        logging.info(f"📸 Screenshot disimpan: {screenshot_path}")
-    except Exception as e:
-        logging.warning(f"❌ Gagal menyimpan screenshot: {e}")
+    _take_screenshot(driver, name, "carlistmy_null")
 
 def convert_millage(millage_str):
-    if isinstance(millage_str, int):
-        return millage_str
-    if isinstance(millage_str, str):
-        numbers = re.findall(r'\d+', millage_str)
-        if numbers:
-            millage_value = int(numbers[-1])
-            if millage_value >= 1000:
-                return millage_value
-            else:
-                return millage_value * 1000
-    return None
+    return normalize_mileage(millage_str)
+
+def convert_price_to_integer(price_str):
+    """
+    Mengubah harga dalam bentuk string seperti 'RM 83,000' atau 'RM83K' ke integer 83000.
+    """
+    try:
+        price_str = price_str.replace("RM", "").replace(",", "").strip().upper()
+        if "K" in price_str:
+            return int(float(price_str.replace("K", "")) * 1000)
+        return int(float(price_str))
+    except:
+        return None
+
+def parse_detail_html(html, url):
+    """Parse HTML halaman detail carlist.my (versi selector lengkap) menjadi dict data mobil."""
+    soup = BeautifulSoup(html, "html.parser")
+
+    def extract(selector):
+        element = soup.select_one(selector)
+        return element.text.strip() if element else None
+
+    brand = extract(
+        "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--breadcrumb.u-margin-top-xs.u-hide\\@mobile.js-part-breadcrumb > div > ul > li:nth-child(3) > a > span")
+    model = extract(
+        "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--breadcrumb.u-margin-top-xs.u-hide\\@mobile.js-part-breadcrumb > div > ul > li:nth-child(4) > a > span")
+    variant = extract(
+        "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--breadcrumb.u-margin-top-xs.u-hide\\@mobile.js-part-breadcrumb > div > ul > li:nth-child(5) > a > span")
+
+    if not variant:
+        variant = "NO VARIANT"
+
+    informasi_iklan = extract(
+        "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--masthead.u-margin-ends-lg.u-margin-ends-sm\\@mobile.u-order-2\\@mobile > div > div > div:nth-child(1) > span.u-color-muted.u-text-7.u-hide\\@mobile")
+
+    lokasi_part1 = extract(
+        "#listing-detail > section:nth-child(2) > div > div > div.c-sidebar.c-sidebar--top.u-width-2\\/6.u-width-1\\@mobile.u-padding-right-sm.u-padding-left-md.u-padding-top-md.u-padding-top-none\\@mobile.u-flex.u-flex--column.u-flex--column\\@mobile.u-order-first\\@mobile > div.c-card.c-card--ctr.u-margin-ends-sm.u-order-last\\@mobile > div.c-card__body > div.u-flex.u-align-items-center > div > div > span:nth-child(2)")
+    lokasi_part2 = extract(
+        "#listing-detail > section:nth-child(2) > div > div > div.c-sidebar.c-sidebar--top.u-width-2\\/6.u-width-1\\@mobile.u-padding-right-sm.u-padding-left-md.u-padding-top-md.u-padding-top-none\\@mobile.u-flex.u-flex--column.u-flex--column\\@mobile.u-order-first\\@mobile > div.c-card.c-card--ctr.u-margin-ends-sm.u-order-last\\@mobile > div.c-card__body > div.u-flex.u-align-items-center > div > div > span:nth-child(3)")
+    lokasi = " ".join(filter(None, [lokasi_part1, lokasi_part2]))
+
+    gambar_container = soup.select_one("#details-gallery > div > div")
+    gambar = []
+    if gambar_container:
+        img_tags = gambar_container.find_all("img")
+        for img in img_tags:
+            src = img.get("src")
+            if src:
+                gambar.append(src)
+
+    price_string = extract(
+        "#details-gallery > div > div > div.c-gallery--hero-img.u-relative > div.c-gallery__item > div.c-gallery__item-details.u-padding-lg.u-padding-md\\@mobile.u-absolute.u-bottom-right.u-bottom-left.u-zindex-1 > div > div.listing__item-price > h3")
+    price = convert_price_to_integer(price_string)
+
+    year = extract(
+        "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--key-details.u-margin-ends-lg.u-margin-ends-sm\\@mobile.u-order-3\\@mobile > div > div > div > div > div.owl-stage-outer > div > div:nth-child(2) > div > div > div > span.u-text-bold.u-block")
+    millage = extract(
+        "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--key-details.u-margin-ends-lg.u-margin-ends-sm\\@mobile.u-order-3\\@mobile > div > div > div > div > div.owl-stage-outer > div > div:nth-child(3) > div > div > div > span.u-text-bold.u-block")
+    transmission = extract(
+        "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--key-details.u-margin-ends-lg.u-margin-ends-sm\\@mobile.u-order-3\\@mobile > div > div > div > div > div.owl-stage-outer > div > div:nth-child(6) > div > div > div > span.u-text-bold.u-block")
+    seat_capacity = extract(
+        "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--key-details.u-margin-ends-lg.u-margin-ends-sm\\@mobile.u-order-3\\@mobile > div > div > div > div > div.owl-stage-outer > div > div:nth-child(7) > div > div > div > span.u-text-bold.u-block")
+
+    status = "sold" if "this car has already been sold" in soup.get_text().lower() else "active"
+    sold_at = datetime.now() if status == "sold" else None
+
+    detail = {
+        "listing_url": url,
+        "brand": brand.upper() if brand else None,
+        "model": model.upper() if model else None,
+        "variant": variant.upper() if variant else None,
+        "informasi_iklan": informasi_iklan,
+        "lokasi": lokasi,
+        "price": price,
+        "year": year,
+        "millage": convert_millage(millage),
+        "transmission": transmission,
+        "seat_capacity": seat_capacity,
+        "gambar": gambar,
+        "status": status,
+        "sold_at": sold_at  # <--- ini penting!
+    }
+    return detail
 
 class CarlistMyNullService:
-    def __init__(self):
+    def __init__(self, workers=NULL_RESCAN_WORKERS):
         self.driver = None
         self.stop_flag = False
+        self.workers = max(1, workers)
+        self.progress = {}
         self.conn = get_connection()
         self.cursor = self.conn.cursor()
+        self.db_lock = threading.Lock()
+        ensure_normalized_columns(self.conn, DB_TABLE_SCRAP)
+        ensure_history_partitions(self.conn, DB_TABLE_HISTORY_PRICE)
+        ensure_attempts_table(self.conn)
         self.load_proxies()
 
     def load_proxies(self):
-        self.proxies = [proxy.split(":") for proxy in CUSTOM_PROXIES.split(",") if proxy]
+        self.proxies = parse_proxy_list(CUSTOM_PROXIES)
+        self.proxy_pool = ProxyPool(self.proxies)
 
     def init_driver(self, proxy=None):
+        """
+        Buat Chrome baru (proxy = dict dari ProxyPool) dan kembalikan. Tidak disimpan di self.driver:
+        setiap worker rescan memegang driver-nya sendiri.
+        """
+        # Import di sini supaya parser (parse_detail_html) bisa dipakai tanpa selenium-wire
+        from seleniumwire import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+        from webdriver_manager.chrome import ChromeDriverManager
+
         logging.info("Menginisialisasi ChromeDriver dengan Selenium Wire...")
         options = Options()
         seleniumwire_options = {}
 
         if proxy:
-            proxy_address, proxy_port, proxy_user, proxy_pass = proxy
+            proxy_address, proxy_port = proxy["server"].split(":")
+            proxy_user, proxy_pass = proxy["username"], proxy["password"]
             seleniumwire_options = {
                 'proxy': {
                     'http': f'http://{proxy_user}:{proxy_pass}@{proxy_address}:{proxy_port}',
@@ -96,168 +182,177 @@ class CarlistMyNullService:
         options.add_argument("user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36")
 
         service = Service(ChromeDriverManager().install())
-        self.driver = webdriver.Chrome(service=service, options=options, seleniumwire_options=seleniumwire_options)
-        self.driver.set_page_load_timeout(120)
-        self.check_ip()
+        driver = webdriver.Chrome(service=service, options=options, seleniumwire_options=seleniumwire_options)
+        driver.set_page_load_timeout(120)
+        self.check_ip(driver)
+        return driver
 
-    def check_ip(self):
+    def check_ip(self, driver=None):
+        driver = driver or self.driver
         try:
-            self.driver.get("https://ip.oxylabs.io/")
+            driver.get("https://ip.oxylabs.io/")
             time.sleep(2)
-            ip = self.driver.find_element(By.TAG_NAME, 'body').text.strip()
+            ip = driver.find_element(By.TAG_NAME, 'body').text.strip()
             logging.info(f"🌐 IP yang digunakan oleh proxy: {ip}")
             return ip
         except Exception as e:
             logging.warning(f"❌ Gagal memverifikasi IP: {e}")
-            take_screenshot(self.driver, "ip_check_error")
+            take_screenshot(driver, "ip_check_error")
             return None
 
-    def quit_driver(self):
-        if self.driver:
-            logging.info("Menutup ChromeDriver...")
-            try:
-                self.driver.quit()
-            except Exception as e:
-                logging.error(f"Gagal menutup ChromeDriver: {e}")
+    def quit_driver(self, driver):
+        """Tutup driver milik pemanggil; None = belum ada driver, tidak ada yang ditutup."""
+        if driver is None:
+            return
+        logging.info("Menutup ChromeDriver...")
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.error(f"Gagal menutup ChromeDriver: {e}")
+        if driver is self.driver:
             self.driver = None
 
-    def scrape_null_entries(self):
-        logging.info("🔍 Memulai scraping ulang data NULL...")
+    # ================== Rescan NULL (streaming + worker pool)
 
-        count_query = f"""
-            SELECT COUNT(*) FROM {DB_TABLE_SCRAP}
-            WHERE brand IS NULL OR model IS NULL OR variant IS NULL OR price IS NULL
+    def stream_null_rows(self, queue_out, max_attempts=NULL_RESCAN_MAX_ATTEMPTS):
         """
-        self.cursor.execute(count_query)
-        total_count = self.cursor.fetchone()[0]
-        logging.info(f"📊 Total listing dengan data NULL yang akan diproses: {total_count}")
-
-        query = f"""
-            SELECT listing_url FROM {DB_TABLE_SCRAP}
-            WHERE brand IS NULL OR model IS NULL OR variant IS NULL OR price IS NULL
+        Alirkan listing yang field utamanya NULL lewat server-side cursor (koneksi baca terpisah)
+        ke antrian worker. Listing yang sudah mencapai batas percobaan atau baru saja dicoba dilewati.
         """
-        self.cursor.execute(query)
-        rows = self.cursor.fetchall()
-        urls = [row[0] for row in rows if row[0]]
-
-        processed = 0
-        batch_size = 25
-
-        for i, url in enumerate(urls):
-            if self.stop_flag:
-                break
-
-            if processed % batch_size == 0:
-                self.quit_driver()
-                time.sleep(random.uniform(2, 5))
-                if self.proxies:
-                    proxy = random.choice(self.proxies)
-                    self.init_driver(proxy)
-                else:
-                    self.init_driver()
-
+        read_conn = get_connection()
+        read_conn.set_session(readonly=True)
+        streamed = 0
+        try:
+            with read_conn.cursor(name="null_rescan") as cursor:
+                cursor.itersize = 500
+                cursor.execute(f"""
+                    SELECT s.id, s.listing_url,
+                           s.brand IS NULL, s.model IS NULL, s.variant IS NULL, s.price IS NULL
+                    FROM {DB_TABLE_SCRAP} s
+                    LEFT JOIN {DB_TABLE_NULL_ATTEMPTS} a ON a.listing_url = s.listing_url
+                    WHERE (s.brand IS NULL OR s.model IS NULL OR s.variant IS NULL OR s.price IS NULL)
+                      AND s.listing_url IS NOT NULL
+                      AND (a.listing_url IS NULL OR (
+                          a.attempts < %s AND a.last_attempt_at < NOW() - make_interval(secs => %s)
+                      ))
+                    ORDER BY s.id
+                """, (max_attempts, NULL_RESCAN_RETRY_HOURS * 3600))
+                for car_id, url, *nulls in cursor:
+                    if self.stop_flag:
+                        break
+                    missing = [field for field, is_null in zip(NULL_FIELDS, nulls) if is_null]
+                    if not self._put(queue_out, {"id": car_id, "listing_url": url, "missing": missing}):
+                        break
+                    streamed += 1
+                    self.progress["queued"] = streamed
+        finally:
+            read_conn.close()
+            for _ in range(self.workers):
+                self._put(queue_out, None, force=True)
+        return streamed
+
+    def _put(self, queue_out, item, force=False):
+        """put ke antrian yang tidak macet selamanya kalau worker sudah berhenti (stop_flag)."""
+        while force or not self.stop_flag:
             try:
-                self.driver.get(url)
-                time.sleep(5)
-                detail = self.scrape_detail(url)
-                if detail:
-                    self.save_to_db(detail)
-            except Exception as e:
-                logging.error(f"Gagal scraping URL {url}: {e}")
-                take_screenshot(self.driver, "scrape_detail_error")
-
-            processed += 1
-            logging.info(f"✅ Progress: {processed}/{total_count}")
-            time.sleep(random.randint(15, 20))
-
-        self.quit_driver()
+                queue_out.put(item, timeout=1)
+                return True
+            except queue.Full:
+                if force and self.stop_flag:
+                    return False
+        return False
+
+    def _rescan_worker(self, index, tasks, writer):
+        driver = None
+        proxy = None
+        fetched = 0
+        session_key = f"null-{index}"
+        try:
+            while True:
+                task = tasks.get()
+                if task is None or self.stop_flag:
+                    break
+                url = task["listing_url"]
+                started = time.monotonic()
+                try:
+                    if driver is None or fetched % NULL_RESCAN_RESTART_EVERY == 0:
+                        self.quit_driver(driver)
+                        driver = None
+                        time.sleep(random.uniform(2, 5))
+                        proxy = self.proxy_pool.acquire(session_key=session_key) if self.proxy_pool else None
+                        driver = self.init_driver(proxy)
+                    driver.get(url)
+                    time.sleep(5)
+                    detail = parse_detail_html(driver.page_source, url)
+                    if proxy:
+                        self.proxy_pool.report_success(proxy, time.monotonic() - started)
+                    writer.add(task, detail)
+                except Exception as e:
+                    logging.error(f"Gagal scraping URL {url}: {e}")
+                    if driver:
+                        take_screenshot(driver, "scrape_detail_error")
+                    if proxy:
+                        self.proxy_pool.report_failure(proxy)
+                    writer.add(task, None, error=str(e))
+                    # Driver yang error diganti dengan proxy lain di URL berikutnya
+                    self.quit_driver(driver)
+                    driver = None
+                    fetched = 0
+                    continue
+
+                fetched += 1
+                time.sleep(random.uniform(NULL_RESCAN_DELAY_MIN, NULL_RESCAN_DELAY_MAX))
+        finally:
+            self.quit_driver(driver)
+
+    def scrape_null_entries(self, workers=None):
+        logging.info("🔍 Memulai scraping ulang data NULL...")
+        workers = max(1, workers or self.workers)
+        self.workers = workers
+        self.progress = {"queued": 0, "processed": 0, "repaired": 0, "partial": 0, "failed": 0}
+        started = time.monotonic()
+
+        tasks = queue.Queue(maxsize=workers * 4)
+        writer = NullRepairWriter(self)
+        threads = [
+            threading.Thread(target=self._rescan_worker, args=(i, tasks, writer), name=f"null-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            streamed = self.stream_null_rows(tasks)
+        except Exception:
+            # Worker tetap dihentikan walau query baca gagal
+            self.stop_flag = True
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+            writer.flush()
+
+        elapsed = time.monotonic() - started
+        logging.info(
+            f"🏁 Rescan NULL selesai: {streamed} listing diantrikan, {self.progress['processed']} diproses "
+            f"({self.progress['repaired']} lengkap, {self.progress['partial']} sebagian, "
+            f"{self.progress['failed']} gagal) dalam {elapsed:.1f} detik dengan {workers} worker"
+        )
+        if self.proxy_pool:
+            self.proxy_pool.log_stats()
+        return dict(self.progress)
 
     def convert_price_to_integer(self, price_str):
-        """
-        Mengubah harga dalam bentuk string seperti 'RM 83,000' atau 'RM83K' ke integer 83000.
-        """
-        try:
-            price_str = price_str.replace("RM", "").replace(",", "").strip().upper()
-            if "K" in price_str:
-                return int(float(price_str.replace("K", "")) * 1000)
-            return int(float(price_str))
-        except:
-            return None
+        return convert_price_to_integer(price_str)
 
     def scrape_detail(self, url):
-        soup = BeautifulSoup(self.driver.page_source, "html.parser")
-
-        def extract(selector):
-            element = soup.select_one(selector)
-            return element.text.strip() if element else None
-
-        brand = extract(
-            "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--breadcrumb.u-margin-top-xs.u-hide\\@mobile.js-part-breadcrumb > div > ul > li:nth-child(3) > a > span")
-        model = extract(
-            "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--breadcrumb.u-margin-top-xs.u-hide\\@mobile.js-part-breadcrumb > div > ul > li:nth-child(4) > a > span")
-        variant = extract(
-            "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--breadcrumb.u-margin-top-xs.u-hide\\@mobile.js-part-breadcrumb > div > ul > li:nth-child(5) > a > span")
-
-        if not variant:
-            variant = "NO VARIANT"
-
-        informasi_iklan = extract(
-            "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--masthead.u-margin-ends-lg.u-margin-ends-sm\\@mobile.u-order-2\\@mobile > div > div > div:nth-child(1) > span.u-color-muted.u-text-7.u-hide\\@mobile")
-
-        lokasi_part1 = extract(
-            "#listing-detail > section:nth-child(2) > div > div > div.c-sidebar.c-sidebar--top.u-width-2\\/6.u-width-1\\@mobile.u-padding-right-sm.u-padding-left-md.u-padding-top-md.u-padding-top-none\\@mobile.u-flex.u-flex--column.u-flex--column\\@mobile.u-order-first\\@mobile > div.c-card.c-card--ctr.u-margin-ends-sm.u-order-last\\@mobile > div.c-card__body > div.u-flex.u-align-items-center > div > div > span:nth-child(2)")
-        lokasi_part2 = extract(
-            "#listing-detail > section:nth-child(2) > div > div > div.c-sidebar.c-sidebar--top.u-width-2\\/6.u-width-1\\@mobile.u-padding-right-sm.u-padding-left-md.u-padding-top-md.u-padding-top-none\\@mobile.u-flex.u-flex--column.u-flex--column\\@mobile.u-order-first\\@mobile > div.c-card.c-card--ctr.u-margin-ends-sm.u-order-last\\@mobile > div.c-card__body > div.u-flex.u-align-items-center > div > div > span:nth-child(3)")
-        lokasi = " ".join(filter(None, [lokasi_part1, lokasi_part2]))
-
-        gambar_container = soup.select_one("#details-gallery > div > div")
-        gambar = []
-        if gambar_container:
-            img_tags = gambar_container.find_all("img")
-            for img in img_tags:
-                src = img.get("src")
-                if src:
-                    gambar.append(src)
-
-        price_string = extract(
-            "#details-gallery > div > div > div.c-gallery--hero-img.u-relative > div.c-gallery__item > div.c-gallery__item-details.u-padding-lg.u-padding-md\\@mobile.u-absolute.u-bottom-right.u-bottom-left.u-zindex-1 > div > div.listing__item-price > h3")
-        price = self.convert_price_to_integer(price_string)
-
-        year = extract(
-            "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--key-details.u-margin-ends-lg.u-margin-ends-sm\\@mobile.u-order-3\\@mobile > div > div > div > div > div.owl-stage-outer > div > div:nth-child(2) > div > div > div > span.u-text-bold.u-block")
-        millage = extract(
-            "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--key-details.u-margin-ends-lg.u-margin-ends-sm\\@mobile.u-order-3\\@mobile > div > div > div > div > div.owl-stage-outer > div > div:nth-child(3) > div > div > div > span.u-text-bold.u-block")
-        transmission = extract(
-            "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--key-details.u-margin-ends-lg.u-margin-ends-sm\\@mobile.u-order-3\\@mobile > div > div > div > div > div.owl-stage-outer > div > div:nth-child(6) > div > div > div > span.u-text-bold.u-block")
-        seat_capacity = extract(
-            "#listing-detail > section.c-section--content.u-bg-white.u-padding-top-md.u-padding-bottom-xs.u-flex\\@mobile.u-flex--column\\@mobile > section.c-section.c-section--key-details.u-margin-ends-lg.u-margin-ends-sm\\@mobile.u-order-3\\@mobile > div > div > div > div > div.owl-stage-outer > div > div:nth-child(7) > div > div > div > span.u-text-bold.u-block")
-
-        status = "sold" if "this car has already been sold" in soup.get_text().lower() else "active"
-        sold_at = datetime.now() if status == "sold" else None
-
-        detail = {
-            "listing_url": url,
-            "brand": brand.upper() if brand else None,
-            "model": model.upper() if model else None,
-            "variant": variant.upper() if variant else None,
-            "informasi_iklan": informasi_iklan,
-            "lokasi": lokasi,
-            "price": price,
-            "year": year,
-            "millage": convert_millage(millage),
-            "transmission": transmission,
-            "seat_capacity": seat_capacity,
-            "gambar": gambar,
-            "status": status,
-            "sold_at": sold_at  # <--- ini penting!
-        }
-        return detail
+        return parse_detail_html(self.driver.page_source, url)
 
     def save_to_db(self, car_data):
         try:
             select_query = f"SELECT id, price FROM {DB_TABLE_SCRAP} WHERE listing_url = %s"
             self.cursor.execute(select_query, (car_data['listing_url'],))
             result = self.cursor.fetchone()
+            norm = normalize_car(car_data, datetime.now())
 
             if result:
                 car_id, current_price = result
@@ -276,6 +371,10 @@ class CarlistMyNullService:
                         transmission = %s,
                         seat_capacity = %s,
                         gambar = %s,
+                        mileage_km = %s,
+                        seats = %s,
+                        transmission_type = %s,
+                        posted_at = %s,
                         status = %s,
                         sold_at = %s,
                         last_scraped_at = CURRENT_TIMESTAMP
@@ -286,6 +385,7 @@ class CarlistMyNullService:
                     car_data['price'], car_data['informasi_iklan'], car_data['lokasi'],
                     car_data['year'], car_data['millage'], car_data['transmission'],
                     car_data['seat_capacity'], car_data['gambar'],
+                    norm['mileage_km'], norm['seats'], norm['transmission_type'], norm['posted_at'],
                     car_data['status'], car_data['sold_at'],
                     car_data['listing_url']
                 ))
@@ -301,14 +401,16 @@ class CarlistMyNullService:
                 insert_query = f"""
                     INSERT INTO {DB_TABLE_SCRAP}
                     (listing_url, brand, model, variant, informasi_iklan, lokasi, price,
-                     year, millage, transmission, seat_capacity, gambar, status, sold_at, last_scraped_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                     year, millage, transmission, seat_capacity, gambar,
+                     mileage_km, seats, transmission_type, posted_at, status, sold_at, last_scraped_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
                 """
                 self.cursor.execute(insert_query, (
                     car_data['listing_url'], car_data['brand'], car_data['model'], car_data['variant'],
                     car_data['informasi_iklan'], car_data['lokasi'], car_data['price'],
                     car_data['year'], car_data['millage'], car_data['transmission'],
                     car_data['seat_capacity'], car_data['gambar'],
+                    norm['mileage_km'], norm['seats'], norm['transmission_type'], norm['posted_at'],
                     car_data['status'], car_data['sold_at']
                 ))
 
@@ -321,3 +423,118 @@ class CarlistMyNullService:
     def stop_scraping(self):
         self.stop_flag = True
         logging.info("🛑 Scraping dihentikan oleh user.")
+
+    def close(self):
+        try:
+            self.cursor.close()
+            self.conn.close()
+        except Exception as e:
+            logging.error(f"❌ Gagal menutup koneksi database: {e}")
+
+
+def ensure_attempts_table(conn, table=DB_TABLE_NULL_ATTEMPTS):
+    """Tabel jumlah percobaan rescan per listing_url, supaya listing yang rusak permanen tidak diambil terus."""
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                listing_url TEXT PRIMARY KEY,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                missing TEXT[],
+                last_error TEXT,
+                last_attempt_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+        """)
+    conn.commit()
+
+
+class NullRepairWriter:
+    """
+    Kumpulkan hasil worker dan tulis per batch: hanya field yang NULL yang diisi (COALESCE),
+    listing yang masih belum lengkap atau gagal dicatat di tabel percobaan.
+    """
+
+    def __init__(self, service, batch_size=NULL_RESCAN_BATCH_SIZE):
+        self.service = service
+        self.batch_size = max(1, batch_size)
+        self._lock = threading.Lock()
+        self._updates = []
+        self._attempts = []
+
+    def add(self, task, detail, error=None):
+        progress = self.service.progress
+        filled = {}
+        if detail:
+            filled = {field: detail.get(field) for field in task["missing"] if detail.get(field) is not None}
+        still_missing = [field for field in task["missing"] if field not in filled]
+
+        with self._lock:
+            progress["processed"] = progress.get("processed", 0) + 1
+            if filled:
+                self._updates.append((task["id"], *(filled.get(field) for field in NULL_FIELDS)))
+            if error:
+                progress["failed"] = progress.get("failed", 0) + 1
+            elif still_missing:
+                progress["partial"] = progress.get("partial", 0) + 1
+            else:
+                progress["repaired"] = progress.get("repaired", 0) + 1
+            self._attempts.append((task["listing_url"], still_missing, error, not still_missing and not error))
+            if len(self._attempts) >= self.batch_size:
+                self._flush_locked()
+            processed = progress["processed"]
+        if processed % 50 == 0:
+            logging.info(f"✅ Progress: {processed} diproses, {progress.get('queued', 0)} diantrikan")
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        from psycopg2.extras import execute_values
+
+        updates, attempts = self._updates, self._attempts
+        self._updates, self._attempts = [], []
+        if not updates and not attempts:
+            return
+        service = self.service
+        with service.db_lock:
+            cursor = service.conn.cursor()
+            try:
+                if updates:
+                    # RETURNING harga lama (sebelum update) untuk riwayat harga listing yang price-nya baru terisi
+                    changed = execute_values(cursor, f"""
+                        UPDATE {DB_TABLE_SCRAP} AS t
+                        SET brand = COALESCE(t.brand, v.brand),
+                            model = COALESCE(t.model, v.model),
+                            variant = COALESCE(t.variant, v.variant),
+                            price = COALESCE(t.price, v.price),
+                            last_scraped_at = CURRENT_TIMESTAMP
+                        FROM (VALUES %s) AS v (id, brand, model, variant, price)
+                        WHERE t.id = v.id
+                        RETURNING t.id, t.price, v.price IS NOT NULL
+                    """, updates, template="(%s, %s, %s, %s, %s::integer)", fetch=True)
+                    history = [(car_id, None, price) for car_id, price, price_filled in changed if price_filled]
+                    if history:
+                        execute_values(cursor, f"""
+                            INSERT INTO {DB_TABLE_HISTORY_PRICE} (car_id, old_price, new_price) VALUES %s
+                        """, history)
+                done = [url for url, _, _, complete in attempts if complete]
+                retry = [(url, missing, error) for url, missing, error, complete in attempts if not complete]
+                if done:
+                    cursor.execute(f"DELETE FROM {DB_TABLE_NULL_ATTEMPTS} WHERE listing_url = ANY(%s)", (done,))
+                if retry:
+                    execute_values(cursor, f"""
+                        INSERT INTO {DB_TABLE_NULL_ATTEMPTS} (listing_url, attempts, missing, last_error, last_attempt_at)
+                        VALUES %s
+                        ON CONFLICT (listing_url) DO UPDATE
+                        SET attempts = {DB_TABLE_NULL_ATTEMPTS}.attempts + 1,
+                            missing = EXCLUDED.missing,
+                            last_error = EXCLUDED.last_error,
+                            last_attempt_at = EXCLUDED.last_attempt_at
+                    """, retry, template="(%s, 1, %s::text[], %s, NOW())")
+                service.conn.commit()
+                logging.info(f"💾 Batch rescan disimpan: {len(updates)} listing diisi, {len(retry)} dicatat untuk dicoba lagi")
+            except Exception as e:
+                service.conn.rollback()
+                logging.error(f"❌ Error menyimpan batch rescan NULL: {e}")
+            finally:
+                cursor.close()
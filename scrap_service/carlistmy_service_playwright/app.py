@@ -1,44 +1,95 @@
 from flask import Flask, jsonify, request
-from scrap_service.carlistmy_service_playwright.carlistmy_service import CarlistMyService
-import psycopg2
+from scrap_service.common import metrics
+from scrap_service.common.jobs import (
+    JobManager, JobConflict, ALL_KEYS, accepted_response, conflict_response, register_job_routes
+)
+from scrap_service.common.market_stats import register_stats_routes
+from scrap_service.common.proxy_pool import get_proxy_pool
 import os
 
 app = Flask(__name__)
-carlistmy_scraper = CarlistMyService()
+job_manager = JobManager()
+register_job_routes(app, job_manager)
+register_stats_routes(app, job_manager)
 
 DB_TABLE_SCRAP = os.getenv("DB_TABLE_SCRAP", "cars_scrap")
 
+
+def create_scraper():
+    """
+    Bangun CarlistMyService saat dibutuhkan (per job / per request), bukan saat import,
+    supaya app tetap bisa start walau DB mati dan tanpa memuat Playwright/pandas.
+    """
+    from scrap_service.carlistmy_service_playwright.carlistmy_service import CarlistMyService
+    return CarlistMyService()
+
+
 @app.route('/scrape/carlistmy', methods=['POST'])
 def scrape_carlistmy():
     data = request.get_json()
     brand = data.get("brand", None)
     page = data.get("page", 1)
+    # "full" | "incremental"; default dari env CRAWL_MODE
+    mode = data.get("mode")
 
-    carlistmy_scraper.stop_flag = False
-    carlistmy_scraper.scrape_all_brands(start_brand=brand, start_page=page)
+    # Job per brand hanya mengerjakan brand itu (tidak lanjut ke brand berikutnya), jadi aman
+    # berjalan bersamaan dengan brand lain; tanpa brand, job menjelajahi semua brand
+    try:
+        job = job_manager.submit(
+            "scrape_carlistmy",
+            create_scraper,
+            lambda service: service.scrape_all_brands(
+                start_brand=brand, start_page=page, continue_next=not brand, mode=mode
+            ),
+            params={"brand": brand, "page": page, "mode": mode},
+            lock_key=brand.lower() if brand else ALL_KEYS
+        )
+    except JobConflict as e:
+        return conflict_response(e)
 
-    return jsonify({"message": "Scraping CarlistMY selesai"}), 200
+    return accepted_response(job)
 
 @app.route('/stop/carlistmy', methods=['POST'])
 def stop_carlistmy():
-    carlistmy_scraper.stop_scraping()
-    return jsonify({"message": "Scraping CarlistMY dihentikan."}), 200
+    jobs = job_manager.cancel_all("scrape_carlistmy")
+    return jsonify({
+        "message": "Scraping CarlistMY dihentikan.",
+        "cancelled_jobs": [job.id for job in jobs]
+    }), 200
+
+@app.route('/proxy/stats', methods=['GET'])
+def proxy_stats():
+    return jsonify(get_proxy_pool().stats()), 200
 
 @app.route('/export_data', methods=['GET'])
 def export_data():
+    scraper = None
     try:
-        data = carlistmy_scraper.export_data()
+        scraper = create_scraper()
+        data = scraper.export_data()
         return jsonify(data), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    finally:
+        if scraper:
+            scraper.close()
 
 @app.route('/sync_to_cars', methods=['POST'])
 def sync_to_cars():
+    scraper = None
     try:
-        carlistmy_scraper.sync_to_cars()
+        scraper = create_scraper()
+        scraper.sync_to_cars()
         return jsonify({"message": "Sinkronisasi berhasil"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    finally:
+        if scraper:
+            scraper.close()
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return metrics.metrics_response()
 
 if __name__ == '__main__':
     app.run(host="0.0.0.0", port=5002, debug=True)
@@ -3,81 +3,46 @@ import re
 import random
 import time
 import logging
-import pandas as pd
 from datetime import datetime
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from pathlib import Path
-from playwright.sync_api import sync_playwright
-from playwright_stealth import stealth_sync
 
 from .database import get_connection
+from scrap_service.common.proxy_pool import get_proxy_pool, IP_CHECK_URL
+from scrap_service.common.clearance_cache import ClearanceCache, is_challenge_page, wait_for_clearance
+from scrap_service.common import metrics
+from scrap_service.common.logsetup import setup_logging
+from scrap_service.common.watchdog import ResourceWatchdog
+from scrap_service.common.engine import ScrapeEngine, get_adapter, CRAWL_MODE
+from scrap_service.common.engine import take_screenshot as _take_screenshot
 
 load_dotenv()
 
 START_DATE = datetime.now().strftime('%Y%m%d')
 
 # ===== Konfigurasi Env
-DB_TABLE_SCRAP = os.getenv("DB_TABLE_SCRAP", "cars_scrap")
-DB_TABLE_PRIMARY = os.getenv("DB_TABLE_PRIMARY", "cars")
-DB_TABLE_HISTORY_PRICE = os.getenv("DB_TABLE_HISTORY_PRICE", "price_history")
-DB_TABLE_HISTORY_PRICE_COMBINED = os.getenv("DB_TABLE_HISTORY_PRICE_COMBINED", "price_history_combined")
+# Nama tabel (DB_TABLE_SCRAP, DB_TABLE_PRIMARY, DB_TABLE_HISTORY_PRICE*) dibaca oleh adapter site
 INPUT_FILE = os.getenv("INPUT_FILE")
 
+METRICS_SITE = "carlistmy"
+
 USE_PROXY = os.getenv("USE_PROXY", "false").lower() == "true"
 PROXY_SERVER = os.getenv("PROXY_SERVER")
 PROXY_USERNAME = os.getenv("PROXY_USERNAME")
 PROXY_PASSWORD = os.getenv("PROXY_PASSWORD")
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "false").lower() == "true"
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36"
 
 # ===== Konfigurasi Logging
-log_dir = Path(__file__).resolve().parents[2] /  "logs"
-log_dir.mkdir(parents=True, exist_ok=True)
-
-# Nama file log menggunakan tanggal saat *pertama kali program dijalankan*
-log_file = log_dir / f"scrape_carlistmy_{START_DATE}.log"
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
+# logs/scrape_carlistmy_<START_DATE>.log (+ .jsonl), ditulis thread listener
+setup_logging("scrape_carlistmy")
 
 def take_screenshot(page, name: str):
     """
-    Simpan screenshot ke dalam folder "scraping/logs/<YYYYMMDD>_error/"
+    Simpan screenshot ke dalam folder "scraping/logs/<YYYYMMDD>_error_carlistmy/"
     Di mana <YYYYMMDD> adalah tanggal screenshot diambil (bukan START_DATE).
     """
-    try:
-        error_folder_name = datetime.now().strftime('%Y%m%d') + "_error_carlistmy"
-        screenshot_dir = log_dir / error_folder_name
-        screenshot_dir.mkdir(parents=True, exist_ok=True)
-
-        timestamp = datetime.now().strftime('%H%M%S')
-        screenshot_path = screenshot_dir / f"{name}_{timestamp}.png"
-
-        page.screenshot(path=str(screenshot_path))
-        logging.info(f"📸 Screenshot disimpan: {screenshot_path}")
-    except Exception as e:
-        logging.warning(f"❌ Gagal menyimpan screenshot: {e}")
-
-def get_custom_proxy_list():
-    raw = os.getenv("CUSTOM_PROXIES", "")
-    proxies = [p.strip() for p in raw.split(",") if p.strip()]
-    parsed = []
-    for p in proxies:
-        try:
-            ip, port, user, pw = p.split(":")
-            parsed.append({
-                "server": f"{ip}:{port}",
-                "username": user,
-                "password": pw
-            })
-        except ValueError:
-            logging.warning(f"Format proxy tidak valid: {p}")
-    return parsed
+    _take_screenshot(page, name, METRICS_SITE)
+
 
 class CarlistMyService:
     def __init__(self):
@@ -86,13 +51,39 @@ class CarlistMyService:
         self.listing_count = 0
         self.conn = get_connection()
         self.cursor = self.conn.cursor()
-        self.custom_proxies = get_custom_proxy_list()
-        self.proxy_index = 0
+        self.adapter = get_adapter(METRICS_SITE)
+        self.engine = ScrapeEngine(self.adapter, self.conn)
+        self.engine.ensure_schema()
+        self.proxy_pool = get_proxy_pool()
+        self.current_proxy = None
         self.session_id = self.generate_session_id()
+        self.clearance_cache = ClearanceCache("carlistmy", user_agent=USER_AGENT)
+        self.clearance_saved = False
+        self.progress = {}
+        self.watchdog = ResourceWatchdog(METRICS_SITE)
 
     def generate_session_id(self):
         return ''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=8))
 
+    def proxy_session_key(self):
+        """Key session untuk sticky proxy dan cache IP keluar."""
+        proxy_mode = os.getenv("PROXY_MODE", "none").lower()
+        if proxy_mode == "oxylabs":
+            return f"oxylabs:{self.session_id}"
+        if proxy_mode == "custom" and self.proxy_pool:
+            return self.session_id
+        return "direct"
+
+    def clearance_key(self):
+        """Key cache clearance: proxy custom (IP statis), session oxylabs, atau direct."""
+        if self.current_proxy:
+            return f"proxy:{self.current_proxy['server']}"
+        return self.proxy_session_key()
+
+    def save_clearance(self):
+        if not self.clearance_saved:
+            self.clearance_saved = self.clearance_cache.save(self.clearance_key(), self.context)
+
     def build_proxy_config(self):
         proxy_mode = os.getenv("PROXY_MODE", "none").lower()
 
@@ -106,8 +97,9 @@ class CarlistMyService:
             logging.info(f"🌐 Proxy Oxylabs dengan session: {self.session_id}")
             return proxy_config
 
-        elif proxy_mode == "custom" and self.custom_proxies:
-            proxy = random.choice(self.custom_proxies)
+        elif proxy_mode == "custom" and self.proxy_pool:
+            proxy = self.proxy_pool.acquire(self.session_id)
+            self.current_proxy = proxy
             logging.info(f"🌐 Proxy custom digunakan: {proxy['server']}")
             return proxy
 
@@ -116,10 +108,11 @@ class CarlistMyService:
             return None
 
     def init_browser(self):
-        self.playwright = sync_playwright().start()
+        # Import berat (Playwright) ditunda sampai browser benar-benar dibutuhkan
+        from playwright.sync_api import sync_playwright
 
         launch_kwargs = {
-            "headless": False,
+            "headless": BROWSER_HEADLESS,
             "args": [
                 "--disable-blink-features=AutomationControlled",
                 "--no-sandbox",
@@ -131,33 +124,56 @@ class CarlistMyService:
         if proxy_config:
             launch_kwargs["proxy"] = proxy_config
 
-        self.browser = self.playwright.chromium.launch(**launch_kwargs)
+        with self.watchdog.launching():
+            self.playwright = sync_playwright().start()
+            self.browser = self.playwright.chromium.launch(**launch_kwargs)
+        self.open_context()
+        logging.info("✅ Browser Playwright berhasil diinisialisasi dengan stealth.")
+
+    def open_context(self):
+        """Context + page baru di browser yang sama (dipakai juga oleh watchdog untuk daur ulang)."""
+        from playwright_stealth import stealth_sync
+
+        context_kwargs = {}
+        storage_state = self.clearance_cache.load(self.clearance_key())
+        self.clearance_saved = storage_state is not None
+        if storage_state:
+            context_kwargs["storage_state"] = storage_state
+            logging.info("🍪 Context dimulai dengan state clearance tersimpan.")
 
         self.context = self.browser.new_context(
-            user_agent="Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
+            user_agent=USER_AGENT,
             locale="en-US",
             timezone_id="Asia/Kuala_Lumpur",
             geolocation={"longitude": 101.68627540160966, "latitude": 3.1504925396418315},
             permissions=["geolocation"],
             viewport={"width": 1920, "height": 1080},  # Set to full page size
+            **context_kwargs
         )
 
         self.page = self.context.new_page()
         stealth_sync(self.page)
-        logging.info("✅ Browser Playwright berhasil diinisialisasi dengan stealth.")
 
 
     def detect_anti_bot(self):
-        content = self.page.content()
-        if "Checking your browser before accessing" in content or "cf-browser-verification" in content:
+        if self.adapter.is_blocked(self.page):
             take_screenshot(self.page, "cloudflare_block")
             logging.warning("⚠️ Terkena anti-bot Cloudflare. Akan ganti proxy dan retry...")
             return True
         return False
 
-    def retry_with_new_proxy(self):
+    def retry_with_new_proxy(self, banned=False):
         logging.info("🔁 Mengganti session proxy dan reinit browser...")
+        if banned:
+            self.clearance_cache.invalidate(self.clearance_key())
+        if self.current_proxy:
+            self.proxy_pool.report_failure(self.current_proxy, banned=banned)
+        session_key = self.proxy_session_key()
+        if session_key != "direct":
+            self.proxy_pool.release(session_key)
+        self.current_proxy = None
         self.session_id = self.generate_session_id()
+        metrics.inc("scrape_proxy_swaps_total", site=METRICS_SITE)
         self.quit_browser()
         self.init_browser()
         try:
@@ -170,20 +186,34 @@ class CarlistMyService:
             self.browser.close()
         except Exception as e:
             logging.error(e)
-        self.playwright.stop()
+        try:
+            self.playwright.stop()
+        except Exception as e:
+            logging.error(e)
+        self.watchdog.after_quit()
         logging.info("🛑 Browser Playwright ditutup.")
 
     def get_current_ip(self, retries=3):
+        session_key = self.proxy_session_key()
+        cached_ip = self.proxy_pool.get_cached_ip(session_key)
+        if cached_ip:
+            logging.info(f"🌐 IP yang digunakan (cache session): {cached_ip}")
+            return cached_ip
+
         for attempt in range(retries):
             try:
-                self.page.goto("https://ip.oxylabs.io/", timeout=10000)
+                started = time.monotonic()
+                self.page.goto(IP_CHECK_URL, timeout=10000)
                 ip = self.page.inner_text("body").strip()
                 logging.info(f"🌐 IP yang digunakan: {ip}")
+                self.proxy_pool.cache_ip(session_key, ip)
+                if self.current_proxy:
+                    self.proxy_pool.report_success(self.current_proxy, time.monotonic() - started)
                 return ip
             except Exception as e:
                 logging.warning(f"Gagal mengambil IP (percobaan {attempt + 1}/{retries}): {e}")
                 if attempt < retries - 1:
-                    time.sleep(7)
+                    metrics.timed_sleep(7, METRICS_SITE, "backoff")
         raise Exception("Gagal mengambil IP setelah beberapa retry.")
 
     def scrape_detail(self, url):
@@ -192,125 +222,60 @@ class CarlistMyService:
 
         while retry_count < max_retries:
             try:
-                self.page.goto(url, wait_until="networkidle", timeout=60000)
-                time.sleep(7)
-
-                # Cek jika halaman diblokir Cloudflare
-                page_title = self.page.title()
-                if page_title.strip() == "Just a moment...":
-                    logging.warning("🛑 Halaman diblokir Cloudflare. Mengganti proxy dan retry...")
-                    take_screenshot(self.page, "cloudflare_detected")
-                    retry_count += 1
-                    self.retry_with_new_proxy()
-                    continue  # Coba ulang URL yang sama
-                else:
-                    # Lanjutkan parsing HTML
-                    soup = BeautifulSoup(self.page.content(), "html.parser")
-
-                    def extract(selector):
-                        element = soup.select_one(selector)
-                        return element.text.strip() if element else None
-                    
-                    def get_location_parts(soup):
-                        # Ambil semua span child
-                        spans = soup.select("div.c-card__body > div.u-flex.u-align-items-center > div > div > span")
-                        valid_spans = [span.text.strip() for span in spans if span.text.strip()]
-                        if len(valid_spans) >= 2:
-                            return " - ".join(valid_spans[-2:])
-                        elif len(valid_spans) == 1:
-                            return valid_spans[0]
-                        return ""
-
-                    brand = extract("#listing-detail li:nth-child(3) > a > span")
-                    model = extract("#listing-detail li:nth-child(4) > a > span")
-                    variant = extract("#listing-detail li:nth-child(5) > a > span")
-                    informasi_iklan = extract("div:nth-child(1) > span.u-color-muted")
-                    lokasi = get_location_parts(soup)
-
-                    price_string = extract("div.listing__item-price > h3")
-                    year = extract("div.owl-stage div:nth-child(2) span.u-text-bold")
-                    millage = extract("div.owl-stage div:nth-child(3) span.u-text-bold")
-                    transmission = extract("div.owl-stage div:nth-child(6) span.u-text-bold")
-                    seat_capacity = extract("div.owl-stage div:nth-child(7) span.u-text-bold")
-
-                    img_tags = soup.select("#details-gallery img")
-                    gambar = [img.get("src") for img in img_tags if img.get("src")]
-
-                    price = int(re.sub(r"[^\d]", "", price_string)) if price_string else 0
-                    year_int = int(re.search(r"\d{4}", year).group()) if year else 0
-
-                    return {
-                        "listing_url": url,
-                        "brand": brand,
-                        "model": model,
-                        "variant": variant,
-                        "informasi_iklan": informasi_iklan,
-                        "lokasi": lokasi,
-                        "price": price,
-                        "year": year_int,
-                        "millage": millage,
-                        "transmission": transmission,
-                        "seat_capacity": seat_capacity,
-                        "gambar": gambar,
-                    }
+                nav_time = self.engine.fetch(self.page, url, wait_until="networkidle", timeout=60000)
+                metrics.timed_sleep(7, METRICS_SITE, "settle")
+
+                # Cek jika halaman diblokir Cloudflare; beri kesempatan challenge selesai di context ini dulu
+                if is_challenge_page(self.page):
+                    metrics.inc("scrape_antibot_total", site=METRICS_SITE)
+                    logging.warning("🛑 Challenge Cloudflare terdeteksi, menunggu clearance...")
+                    if wait_for_clearance(self.page):
+                        logging.info("✅ Challenge Cloudflare selesai, clearance disimpan.")
+                        self.clearance_saved = False
+                    else:
+                        logging.warning("🛑 Halaman diblokir Cloudflare. Mengganti proxy dan retry...")
+                        take_screenshot(self.page, "cloudflare_detected")
+                        retry_count += 1
+                        metrics.inc("scrape_retries_total", site=METRICS_SITE)
+                        self.retry_with_new_proxy(banned=True)
+                        continue  # Coba ulang URL yang sama
+
+                if self.current_proxy:
+                    self.proxy_pool.report_success(self.current_proxy, nav_time)
+                self.save_clearance()
+
+                # Parse lalu lengkapi field wajib yang kosong sebelum meninggalkan halaman
+                return self.engine.extract(self.page, url)
 
             except Exception as e:
                 logging.error(f"Gagal scraping detail {url}: {e}")
                 take_screenshot(self.page, "scrape_detail_error")
                 retry_count += 1
+                metrics.inc("scrape_retries_total", site=METRICS_SITE)
                 self.retry_with_new_proxy()
 
         logging.error(f"❌ Gagal mengambil data dari {url} setelah {max_retries} percobaan.")
+        metrics.inc("scrape_listings_total", site=METRICS_SITE, result="failed")
         return None
 
     def save_to_db(self, car):
-        try:
-            self.cursor.execute(f"SELECT id, price, version FROM {DB_TABLE_SCRAP} WHERE listing_url = %s", (car["listing_url"],))
-            row = self.cursor.fetchone()
-            now = datetime.now()
-
-            if row:
-                car_id, old_price, version = row
-                if car["price"] != old_price:
-                    self.cursor.execute(f"""
-                        INSERT INTO {DB_TABLE_HISTORY_PRICE} (car_id, old_price, new_price)
-                        VALUES (%s, %s, %s)
-                    """, (car_id, old_price, car["price"]))
-
-                self.cursor.execute(f"""
-                    UPDATE {DB_TABLE_SCRAP}
-                    SET brand=%s, model=%s, variant=%s, informasi_iklan=%s,
-                        lokasi=%s, price=%s, year=%s, millage=%s,
-                        transmission=%s, seat_capacity=%s, gambar=%s,
-                        last_scraped_at=%s, version=%s
-                    WHERE id=%s
-                """, (
-                    car.get("brand"), car.get("model"), car.get("variant"), car.get("informasi_iklan"),
-                    car.get("lokasi"), car.get("price"), car.get("year"), car.get("millage"),
-                    car.get("transmission"), car.get("seat_capacity"), car.get("gambar"),
-                    now, version + 1, car_id
-                ))
-            else:
-                self.cursor.execute(f"""
-                    INSERT INTO {DB_TABLE_SCRAP} (
-                        listing_url, brand, model, variant, informasi_iklan, lokasi,
-                        price, year, millage, transmission, seat_capacity, gambar, version
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    car["listing_url"], car.get("brand"), car.get("model"), car.get("variant"),
-                    car.get("informasi_iklan"), car.get("lokasi"), car.get("price"),
-                    car.get("year"), car.get("millage"), car.get("transmission"),
-                    car.get("seat_capacity"), car.get("gambar"), 1
-                ))
-
-            self.conn.commit()
-            logging.info(f"✅ Data untuk {car['listing_url']} berhasil disimpan/diupdate.")
-        except Exception as e:
-            self.conn.rollback()
-            logging.error(f"❌ Error menyimpan ke database: {e}")
+        return self.engine.save(car)
+
+    def scrape_all_brands(self, start_brand=None, start_page=1, continue_next=True, mode=None):
+        """
+        mode: "full" (semua halaman) atau "incremental" (terbaru dulu, berhenti di halaman yang sudah dikenal).
+        stop_flag tidak direset di sini: service dibuat baru per job, dan /stop yang datang
+        sebelum run mulai harus tetap berlaku.
+        """
+        self.listing_count = 0
+        mode = (mode or CRAWL_MODE).lower()
+        incremental = mode == "incremental"
+        logging.info(f"🧭 Mode crawl: {mode}")
+        self.progress = {"brand": None, "page": None, "pages": 0, "listings_ok": 0, "listings_failed": 0, "mode": mode}
+        run_snapshot = metrics.snapshot()
+        self.engine.load_seen_index()
+        import pandas as pd
 
-    def scrape_all_brands(self, start_brand=None, start_page=1, continue_next=True):
-        self.reset_scraping()
         df = pd.read_csv(INPUT_FILE)
 
         if start_brand:
@@ -319,6 +284,8 @@ class CarlistMyService:
             start_scraping = True
 
         for _, row in df.iterrows():
+            if self.stop_flag:
+                break
             brand = row["brand"]
             base_url = row["url"]
 
@@ -337,6 +304,7 @@ class CarlistMyService:
                 current_page = 1
 
             logging.info(f"🚀 Mulai scraping brand: {brand} dengan start_page={current_page}")
+            self.progress["brand"] = brand
             self.init_browser()
 
             try:
@@ -346,34 +314,46 @@ class CarlistMyService:
 
             page = current_page
             max_page_retries = 3  # Maksimal percobaan untuk setiap halaman
+            # Halaman terakhir dari total hasil di halaman pertama; None = paginasi sampai kosong
+            last_page = None
+            planned = False
             
             while not self.stop_flag:
                 paginated_url = re.sub(r"(page_number=)\d+", lambda m: f"{m.group(1)}{page}", base_url)
+                if incremental:
+                    paginated_url = self.adapter.newest_first(paginated_url)
                 page_retry_count = 0
                 page_loaded = False
 
                 while page_retry_count < max_page_retries and not page_loaded:
                     try:
                         logging.info(f"📄 Scraping halaman {page}: {paginated_url}")
-                        self.page.goto(paginated_url, timeout=60000)
-                        time.sleep(7)  # Tunggu sebentar setelah halaman dimuat
+                        self.engine.fetch(self.page, paginated_url, stage="results_navigation", timeout=60000)
+                        metrics.timed_sleep(7, METRICS_SITE, "settle")  # Tunggu sebentar setelah halaman dimuat
+                        if is_challenge_page(self.page):
+                            if not wait_for_clearance(self.page):
+                                metrics.inc("scrape_antibot_total", site=METRICS_SITE)
+                                self.clearance_cache.invalidate(self.clearance_key())
+                                raise Exception("Challenge Cloudflare tidak selesai")
+                            # Cookie clearance baru, simpan walau context dimulai dari cache
+                            self.clearance_saved = False
+                        self.save_clearance()
                         page_loaded = True
                     except Exception as e:
                         page_retry_count += 1
+                        metrics.inc("scrape_retries_total", site=METRICS_SITE)
                         logging.warning(f"❌ Gagal memuat halaman {paginated_url}: {e}")
                         take_screenshot(self.page, f"page_load_error_{brand}_{page}")
-                        
+
                         if page_retry_count < max_page_retries:
                             logging.info(f"🔄 Mencoba ulang halaman {page} (percobaan ke-{page_retry_count + 1})")
-                            self.quit_browser()
-                            time.sleep(10)  # Tunggu sebentar sebelum reinit
-                            self.init_browser()
-                            try:
-                                self.get_current_ip()
-                            except Exception as e:
-                                logging.warning(f"Gagal get IP: {e}")
+                            metrics.timed_sleep(10, METRICS_SITE, "reinit")  # Tunggu sebentar sebelum reinit
+                            # Session sticky dilepas supaya percobaan berikutnya dapat proxy lain
+                            self.retry_with_new_proxy()
                             continue
                         else:
+                            if self.current_proxy:
+                                self.proxy_pool.report_failure(self.current_proxy)
                             logging.error(f"❌ Gagal memuat halaman {page} setelah {max_page_retries} percobaan")
                             if not continue_next and brand.lower() == start_brand.lower():
                                 self.stop_flag = True
@@ -382,18 +362,18 @@ class CarlistMyService:
                 if not page_loaded:
                     break  # Keluar dari loop halaman jika gagal setelah max retry
 
-                html = self.page.content()
-                soup = BeautifulSoup(html, "html.parser")
-                link_tags = soup.select("a.ellipsize.js-ellipsize-text")
-
-                urls = []
-                for tag in link_tags:
-                    href = tag.get("href")
-                    if href and "carlist.my" in href:
-                        urls.append(href)
-                urls = list(set(urls))
+                metrics.inc("scrape_pages_total", site=METRICS_SITE)
+                self.progress["page"] = page
+                self.progress["pages"] += 1
+                with metrics.stage(METRICS_SITE, "results_parse"):
+                    urls = self.adapter.listing_urls(self.page, paginated_url)
                 logging.info(f"📄 Ditemukan {len(urls)} listing URL di halaman {page}")
 
+                if urls and not planned:
+                    last_page = self.engine.plan_pages(self.page, paginated_url, urls, start_page=page)
+                    planned = True
+                    self.progress["last_page"] = last_page
+
                 if not urls:
                     logging.warning(f"📄 Ditemukan 0 listing URL di halaman {page}")
                     take_screenshot(self.page, f"no_listing_page{page}_{brand}")
@@ -402,8 +382,16 @@ class CarlistMyService:
                         self.stop_flag = True
                     break
 
+                if incremental:
+                    urls = self.engine.new_urls(urls, page)
+                    if not urls:
+                        logging.info(f"🛑 Halaman {page} brand {brand} hanya berisi listing yang sudah dikenal, berhenti.")
+                        if not continue_next and brand.lower() == start_brand.lower():
+                            self.stop_flag = True
+                        break
+
                 logging.info("⏳ Menunggu selama 15-30 detik sebelum melanjutkan...")
-                time.sleep(random.uniform(17, 39))
+                metrics.timed_sleep(random.uniform(17, 39), METRICS_SITE, "results")
 
                 for url in urls:
                     if self.stop_flag:
@@ -412,21 +400,32 @@ class CarlistMyService:
                     detail = self.scrape_detail(url)
                     if detail:
                         self.save_to_db(detail)
+                        metrics.inc("scrape_listings_total", site=METRICS_SITE, result="ok")
+                        self.progress["listings_ok"] += 1
                         self.listing_count += 1
-                        time.sleep(random.uniform(20, 40))
+                        metrics.timed_sleep(random.uniform(20, 40), METRICS_SITE, "listing")
 
                         if self.listing_count >= self.batch_size:
                             self.quit_browser()
-                            time.sleep(5)
+                            metrics.timed_sleep(5, METRICS_SITE, "reinit")
                             self.init_browser()
                             try:
                                 self.get_current_ip()
                             except Exception as e:
                                 logging.warning(f"Gagal get IP: {e}")
                             self.listing_count = 0
+                    else:
+                        self.progress["listings_failed"] += 1
+                    self.watchdog.after_listing(self, label=url)
+
+                if last_page is not None and page >= last_page:
+                    logging.info(f"🏁 Halaman terakhir ({last_page}) brand {brand} selesai, tanpa memuat halaman kosong")
+                    if not continue_next and brand.lower() == start_brand.lower():
+                        self.stop_flag = True
+                    break
 
                 page += 1
-                time.sleep(random.uniform(5, 10))
+                metrics.timed_sleep(random.uniform(5, 10), METRICS_SITE, "page")
 
             self.quit_browser()
             
@@ -434,103 +433,23 @@ class CarlistMyService:
                 logging.info(f"🏁 Berhenti setelah selesai scraping brand {brand}")
                 break
 
+        if self.proxy_pool:
+            self.proxy_pool.log_stats()
+        metrics.log_summary(METRICS_SITE, since=run_snapshot)
         logging.info("✅ Proses scraping selesai.")
 
     def sync_to_cars(self):
         """
-        Sinkronisasi data dari {DB_TABLE_SCRAP} ke {DB_TABLE_PRIMARY}, d
-        an sinkronisasi perubahan harga dari price_history ke price_history_combined.
+        Sinkronisasi data dari tabel scrap ke tabel utama,
+        dan sinkronisasi perubahan harga dari price_history ke price_history_combined.
         """
-        logging.info(f"Memulai sinkronisasi data dari {DB_TABLE_SCRAP} ke {DB_TABLE_PRIMARY}...")
-        try:
-            # Sinkronisasi data dari cars_scrap ke cars (update atau insert data mobil)
-            fetch_query = f"SELECT * FROM {DB_TABLE_SCRAP};"
-            self.cursor.execute(fetch_query)
-            rows = self.cursor.fetchall()
-            col_names = [desc[0] for desc in self.cursor.description]
-            idx_url = col_names.index("listing_url")
-
-            for row in rows:
-                listing_url = row[idx_url]
-                check_query = f"SELECT id FROM {DB_TABLE_PRIMARY} WHERE listing_url = %s"
-                self.cursor.execute(check_query, (listing_url,))
-                result = self.cursor.fetchone()
-
-                if result:
-                    update_query = f"""
-                        UPDATE {DB_TABLE_PRIMARY}
-                        SET brand=%s, model=%s, variant=%s, informasi_iklan=%s,
-                            lokasi=%s, price=%s, year=%s, millage=%s, transmission=%s,
-                            seat_capacity=%s, gambar=%s, last_scraped_at=%s
-                        WHERE listing_url=%s
-                    """
-                    self.cursor.execute(update_query, (
-                        row[col_names.index("brand")],
-                        row[col_names.index("model")],
-                        row[col_names.index("variant")],
-                        row[col_names.index("informasi_iklan")],
-                        row[col_names.index("lokasi")],
-                        row[col_names.index("price")],
-                        row[col_names.index("year")],
-                        row[col_names.index("millage")],
-                        row[col_names.index("transmission")],
-                        row[col_names.index("seat_capacity")],
-                        row[col_names.index("gambar")],
-                        row[col_names.index("last_scraped_at")],
-                        listing_url
-                    ))
-                else:
-                    insert_query = f"""
-                        INSERT INTO {DB_TABLE_PRIMARY}
-                            (listing_url, brand, model, variant, informasi_iklan, lokasi,
-                             price, year, millage, transmission, seat_capacity, gambar, last_scraped_at)
-                        VALUES
-                            (%s, %s, %s, %s, %s, %s,
-                             %s, %s, %s, %s, %s, %s, %s)
-                    """
-                    self.cursor.execute(insert_query, (
-                        listing_url,
-                        row[col_names.index("brand")],
-                        row[col_names.index("model")],
-                        row[col_names.index("variant")],
-                        row[col_names.index("informasi_iklan")],
-                        row[col_names.index("lokasi")],
-                        row[col_names.index("price")],
-                        row[col_names.index("year")],
-                        row[col_names.index("millage")],
-                        row[col_names.index("transmission")],
-                        row[col_names.index("seat_capacity")],
-                        row[col_names.index("gambar")],
-                        row[col_names.index("last_scraped_at")]
-                    ))
-
-            # Sinkronisasi perubahan harga dari price_history ke price_history_combined
-            sync_price_history_query = f"""
-                INSERT INTO {DB_TABLE_HISTORY_PRICE_COMBINED} (car_id, car_scrap_id, old_price, new_price, changed_at)
-                SELECT c.id, cs.id, ph.old_price, ph.new_price, ph.changed_at
-                FROM {DB_TABLE_HISTORY_PRICE} ph
-                JOIN {DB_TABLE_SCRAP} cs ON ph.car_id = cs.id
-                JOIN {DB_TABLE_PRIMARY} c ON cs.listing_url = c.listing_url
-                WHERE ph.car_id IS NOT NULL;
-            """
-            self.cursor.execute(sync_price_history_query)
-
-            self.conn.commit()
-            logging.info(f"Sinkronisasi data dari {DB_TABLE_SCRAP} ke {DB_TABLE_PRIMARY} selesai.")
-            logging.info("Sinkronisasi perubahan harga dari price_history ke price_history_combined selesai.")
-        except Exception as e:
-            self.conn.rollback()
-            logging.error(f"Error saat sinkronisasi data: {e}")
+        return self.engine.sync_to_primary()
+
+    def proxy_stats(self):
+        return self.proxy_pool.stats()
 
     def export_data(self):
-        try:
-            self.cursor.execute(f"SELECT * FROM {DB_TABLE_SCRAP}")
-            rows = self.cursor.fetchall()
-            columns = [desc[0] for desc in self.cursor.description]
-            return [dict(zip(columns, row)) for row in rows]
-        except Exception as e:
-            logging.error(f"❌ Error export data: {e}")
-            return []
+        return self.engine.export_data()
 
     def stop_scraping(self):
         self.stop_flag = True
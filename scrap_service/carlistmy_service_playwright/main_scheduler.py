@@ -2,8 +2,10 @@ import os
 import logging
 from apscheduler.schedulers.blocking import BlockingScheduler
 from scrap_service.carlistmy_service_playwright.carlistmy_service import CarlistMyService
+from scrap_service.common.logsetup import setup_logging
 from dotenv import load_dotenv
 from pathlib import Path
+from datetime import datetime
 
 LOCK_FILE = Path("/tmp/carlistmy_scraping.lock")
 
@@ -20,13 +22,16 @@ def clear_scraper_lock():
         pass
 
 # Setup logging
-logging.basicConfig(
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    level=logging.INFO
-)
+setup_logging("scheduler_carlistmy")
 
 load_dotenv()
 
+# Run harian incremental; sweep penuh hanya di hari ini (0=Senin ... 6=Minggu)
+FULL_SWEEP_WEEKDAY = int(os.getenv("FULL_SWEEP_WEEKDAY", "6"))
+
+def crawl_mode_for(now):
+    return "full" if now.weekday() == FULL_SWEEP_WEEKDAY else "incremental"
+
 # Fungsi scraping untuk setiap cluster
 def scrape_cluster(cluster_path: str, cluster_name: str):
     if is_scraper_running():
@@ -36,11 +41,12 @@ def scrape_cluster(cluster_path: str, cluster_name: str):
     set_scraper_lock()
 
     os.environ["INPUT_FILE"] = cluster_path
-    logging.info(f"▶️ Mulai scraping untuk {cluster_name}")
+    mode = crawl_mode_for(datetime.now())
+    logging.info(f"▶️ Mulai scraping untuk {cluster_name} (mode {mode})")
 
     scraper = CarlistMyService()
     try:
-        scraper.scrape_all_brands()
+        scraper.scrape_all_brands(mode=mode)
     except Exception as e:
         logging.error(f"❌ Gagal scraping {cluster_name}: {e}")
     finally:
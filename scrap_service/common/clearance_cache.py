@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger("clearance_cache")
+
+# ===== Konfigurasi Env
+CLEARANCE_CACHE_DIR = Path(os.getenv(
+    "CLEARANCE_CACHE_DIR",
+    Path(__file__).resolve().parents[2] / "storage" / "clearance"
+))
+# Batas umur state clearance (detik), dipakai juga bila cookie tidak punya expiry.
+CLEARANCE_TTL = int(os.getenv("CLEARANCE_TTL", "1800"))
+# Berapa lama menunggu challenge "Just a moment..." selesai sendiri sebelum ganti proxy.
+CLEARANCE_WAIT = int(os.getenv("CLEARANCE_WAIT", "20"))
+
+CHALLENGE_TITLE = "Just a moment..."
+CLEARANCE_COOKIE = "cf_clearance"
+
+
+def is_challenge_page(page):
+    try:
+        return CHALLENGE_TITLE in page.title()
+    except Exception:
+        return False
+
+
+def wait_for_clearance(page, timeout=CLEARANCE_WAIT):
+    """
+    Tunggu challenge Cloudflare selesai di page yang sama.
+    Return True jika judul halaman sudah bukan "Just a moment..." sebelum timeout.
+    """
+    try:
+        page.wait_for_function(
+            f"() => !document.title.includes({json.dumps(CHALLENGE_TITLE)})",
+            timeout=timeout * 1000
+        )
+        page.wait_for_load_state("domcontentloaded", timeout=timeout * 1000)
+        return True
+    except Exception:
+        return False
+
+
+class ClearanceCache:
+    """
+    Cache storage_state (cookie cf_clearance dkk + localStorage) per proxy/session,
+    supaya context baru di IP keluar yang sama langsung lolos challenge.
+    State disimpan di memori dan di file JSON per key.
+    cf_clearance terikat ke User-Agent, jadi namespace dipisah per `user_agent`
+    (scraper dan tracker dengan UA berbeda tidak saling memakai cookie yang tidak berlaku).
+    """
+
+    def __init__(self, site, cache_dir=None, ttl=CLEARANCE_TTL, user_agent=None):
+        self.site = site
+        self.cache_dir = Path(cache_dir or CLEARANCE_CACHE_DIR) / site
+        if user_agent:
+            self.cache_dir = self.cache_dir / hashlib.sha1(user_agent.encode("utf-8")).hexdigest()[:12]
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._memory = {}
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return self.cache_dir / f"{digest}.json"
+
+    def _read(self, key):
+        entry = self._memory.get(key)
+        if entry is None:
+            path = self._path(key)
+            if not path.exists():
+                return None
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                logger.warning(f"❌ State clearance rusak untuk {key}: {e}")
+                return None
+            self._memory[key] = entry
+        return entry
+
+    def load(self, key):
+        """Ambil storage_state yang masih berlaku untuk key, atau None."""
+        if not key:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._read(key)
+            if not entry:
+                return None
+            if entry.get("expires_at", 0) <= now:
+                self._drop(key)
+                return None
+            state = entry["storage_state"]
+
+        cookies = [
+            c for c in state.get("cookies", [])
+            if c.get("expires", -1) in (-1, None) or c["expires"] > now
+        ]
+        if not any(c["name"] == CLEARANCE_COOKIE for c in cookies):
+            self.invalidate(key)
+            return None
+        return {"cookies": cookies, "origins": state.get("origins", [])}
+
+    def save(self, key, context):
+        """
+        Simpan storage_state context jika berisi cookie cf_clearance.
+        Return True jika tersimpan.
+        """
+        if not key:
+            return False
+        try:
+            state = context.storage_state()
+        except Exception as e:
+            logger.warning(f"❌ Gagal mengambil storage_state: {e}")
+            return False
+
+        clearance = [c for c in state.get("cookies", []) if c.get("name") == CLEARANCE_COOKIE]
+        if not clearance:
+            return False
+
+        now = time.time()
+        expires_at = now + self.ttl
+        cookie_expiry = clearance[0].get("expires", -1)
+        if cookie_expiry and cookie_expiry > 0:
+            expires_at = min(expires_at, cookie_expiry)
+
+        entry = {
+            "key": key,
+            "saved_at": now,
+            "expires_at": expires_at,
+            "storage_state": state,
+        }
+        with self._lock:
+            self._memory[key] = entry
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                path = self._path(key)
+                tmp_path = path.with_suffix(".tmp")
+                tmp_path.write_text(json.dumps(entry), encoding="utf-8")
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"❌ Gagal menulis state clearance: {e}")
+        logger.info(f"🍪 State clearance {self.site} disimpan untuk {key} (berlaku {expires_at - now:.0f} detik)")
+        return True
+
+    def has_fresh(self, key, min_remaining=60):
+        with self._lock:
+            entry = self._read(key)
+        return bool(entry) and entry.get("expires_at", 0) - time.time() > min_remaining
+
+    def invalidate(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def _drop(self, key):
+        self._memory.pop(key, None)
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"❌ Gagal menghapus state clearance: {e}")
@@ -0,0 +1,405 @@
+"""
+Deduplikasi listing lintas situs (carlist.my <-> mudah.my) di tabel primary.
+
+1. Blocking key per listing dari brand, model, variant, year, band harga, band jarak tempuh
+   dan negeri (state) lokasi. Kandidat = listing lain dengan brand/model/variant/year/negeri
+   sama dan band harga/jarak tempuh bersebelahan (supaya harga di tepi band tetap ketemu).
+2. Hanya untuk pasangan kandidat, gambar di-hash (dHash 64-bit; fallback hash isi file jika
+   Pillow tidak terpasang) dan dibandingkan dengan jarak Hamming.
+3. Listing yang cocok digabung ke satu cluster_id (id terkecil di cluster = listing kanonik).
+
+Tracker dan image downloader melewati listing non-kanonik jika DEDUP_SKIP_DUPLICATES=true;
+analytics menghitung mobil unik lewat COUNT(DISTINCT cluster_id).
+
+    python -m scrap_service.common.dedup            # proses listing baru / berubah
+    python -m scrap_service.common.dedup --full     # hitung ulang semua
+"""
+import os
+import re
+import sys
+import json
+import hashlib
+import logging
+import argparse
+from io import BytesIO
+from datetime import datetime
+from urllib.parse import urlparse
+
+from scrap_service.common.normalize import normalize_mileage, normalize_state
+
+logger = logging.getLogger("dedup")
+
+# ===== Konfigurasi Env
+DB_TABLE_PRIMARY = os.getenv("DB_TABLE_PRIMARY", "cars")
+DB_TABLE_DEDUP = os.getenv("DB_TABLE_DEDUP", "listing_dedup")
+DEDUP_PRICE_BAND = int(os.getenv("DEDUP_PRICE_BAND", "2000"))
+DEDUP_MILEAGE_BAND = int(os.getenv("DEDUP_MILEAGE_BAND", "10000"))
+DEDUP_IMAGE_COUNT = int(os.getenv("DEDUP_IMAGE_COUNT", "3"))
+DEDUP_HAMMING_THRESHOLD = int(os.getenv("DEDUP_HAMMING_THRESHOLD", "10"))
+DEDUP_BATCH_SIZE = int(os.getenv("DEDUP_BATCH_SIZE", "500"))
+DEDUP_SKIP_DUPLICATES = os.getenv("DEDUP_SKIP_DUPLICATES", "false").lower() == "true"
+IMAGE_DIR = os.getenv("IMAGE_DIR", "scrap_service/imagedownload_service/storage/images")
+
+HASH_DHASH = "dhash"
+HASH_CONTENT = "content"
+
+
+# ================== Blocking key
+
+def _slug(value):
+    return re.sub(r"[^a-z0-9]+", "", str(value or "").lower())
+
+
+def _number(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    digits = re.sub(r"[^\d]", "", str(value))
+    return int(digits) if digits else None
+
+
+def site_of(listing_url):
+    host = urlparse(listing_url or "").netloc.lower()
+    if "carlist" in host:
+        return "carlistmy"
+    if "mudah" in host:
+        return "mudahmy"
+    return host or None
+
+
+def block_components(car):
+    """Komponen blocking dari dict listing (brand, model, variant, year, price, mileage_km/millage, lokasi)."""
+
+    price = _number(car.get("price"))
+    mileage = car.get("mileage_km")
+    if mileage is None:
+        mileage = normalize_mileage(car.get("millage"))
+    return {
+        "brand_key": _slug(car.get("brand")),
+        "model_key": _slug(car.get("model")),
+        "variant_key": _slug(car.get("variant")),
+        "year_key": _number(car.get("year")),
+        "price_band": price // DEDUP_PRICE_BAND if price else None,
+        "mileage_band": mileage // DEDUP_MILEAGE_BAND if mileage is not None else None,
+        "location_key": normalize_state(car.get("lokasi")),
+    }
+
+
+def blocking_key(components):
+    return "|".join(str(components[k] if components[k] is not None else "") for k in (
+        "brand_key", "model_key", "variant_key", "year_key", "price_band", "mileage_band", "location_key"
+    ))
+
+
+# ================== Hash gambar
+
+def _parse_images(gambar):
+    if not gambar:
+        return []
+    if isinstance(gambar, str):
+        try:
+            gambar = json.loads(gambar)
+        except json.JSONDecodeError:
+            return []
+    return [url for url in gambar if url]
+
+
+def _load_image_bytes(car_id, index, url):
+    """Pakai file hasil image downloader jika ada, kalau tidak unduh langsung."""
+    path = os.path.join(IMAGE_DIR, f"{car_id}_{index + 1}.jpg")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    import requests
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    return response.content
+
+
+def image_hash(data):
+    """(kind, hash 64-bit signed). dHash jika Pillow ada, kalau tidak 8 byte pertama sha1 isi file."""
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+    if Image is not None:
+        image = Image.open(BytesIO(data)).convert("L").resize((9, 8))
+        pixels = list(image.getdata())
+        value = 0
+        for row in range(8):
+            for col in range(8):
+                value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+        kind = HASH_DHASH
+    else:
+        value = int.from_bytes(hashlib.sha1(data).digest()[:8], "big")
+        kind = HASH_CONTENT
+    # Postgres BIGINT bertanda
+    return kind, value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hamming(a, b):
+    return bin((a ^ b) & ((1 << 64) - 1)).count("1")
+
+
+def images_match(hashes_a, hashes_b, threshold=DEDUP_HAMMING_THRESHOLD):
+    """True jika ada pasangan gambar dengan jarak Hamming <= threshold."""
+    return any(hamming(a, b) <= threshold for a in hashes_a for b in hashes_b)
+
+
+# ================== Skema
+
+_ensured = set()
+
+
+def ensure_dedup_table(conn, table=DB_TABLE_DEDUP):
+    if table in _ensured:
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                car_id BIGINT PRIMARY KEY,
+                site TEXT,
+                listing_url TEXT,
+                brand_key TEXT,
+                model_key TEXT,
+                variant_key TEXT,
+                year_key INTEGER,
+                price_band INTEGER,
+                mileage_band INTEGER,
+                location_key TEXT,
+                blocking_key TEXT,
+                hash_kind TEXT,
+                image_hashes BIGINT[],
+                cluster_id BIGINT NOT NULL,
+                updated_at TIMESTAMP NOT NULL
+            )
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_block
+            ON {table} (brand_key, model_key, variant_key, year_key, location_key, price_band)
+        """)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_cluster ON {table} (cluster_id)")
+    conn.commit()
+    _ensured.add(table)
+
+
+def _dedup_ready(cursor, table=DB_TABLE_DEDUP):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+    return cursor.fetchone()[0]
+
+
+# ================== Dipakai tracker / image downloader / analytics
+
+def duplicate_filter_sql(cursor, alias, table=DB_TABLE_DEDUP):
+    """
+    Fragmen SQL "AND ..." yang membuang listing non-kanonik. String kosong jika
+    DEDUP_SKIP_DUPLICATES mati atau tabel dedup belum ada.
+    """
+    if not DEDUP_SKIP_DUPLICATES or not _dedup_ready(cursor, table):
+        return ""
+    return (
+        f" AND NOT EXISTS (SELECT 1 FROM {table} dd "
+        f"WHERE dd.car_id = {alias}.id AND dd.cluster_id <> dd.car_id)"
+    )
+
+
+def propagate_status(conn, car_id, status, sold_at, primary=DB_TABLE_PRIMARY, table=DB_TABLE_DEDUP):
+    """Salin status hasil tracker dari listing kanonik ke anggota cluster yang dilewati."""
+    if not DEDUP_SKIP_DUPLICATES:
+        return 0
+    with conn.cursor() as cursor:
+        if not _dedup_ready(cursor, table):
+            return 0
+        cursor.execute(f"""
+            UPDATE {primary} c SET status = %s, sold_at = %s, last_status_check = %s
+            FROM {table} d
+            WHERE d.car_id = c.id AND d.car_id <> %s
+              AND d.cluster_id = (SELECT cluster_id FROM {table} WHERE car_id = %s)
+        """, (status, sold_at, datetime.now(), car_id, car_id))
+        updated = cursor.rowcount
+    conn.commit()
+    return updated
+
+
+def count_unique(conn, table=DB_TABLE_DEDUP):
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*), COUNT(DISTINCT cluster_id) FROM {table}")
+        listings, unique = cursor.fetchone()
+    return {"listings": listings, "unique_cars": unique, "duplicates": listings - unique}
+
+
+# ================== Service
+
+class DedupService:
+    def __init__(self, conn=None, primary=DB_TABLE_PRIMARY, table=DB_TABLE_DEDUP):
+        if conn is None:
+            from scrap_service.common.database import get_connection
+            conn = get_connection()
+        self.conn = conn
+        self.primary = primary
+        self.table = table
+        self.stop_flag = False
+        self.progress = {}
+        ensure_dedup_table(self.conn, table)
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    def hashes_for(self, car_id, gambar):
+        """Hash gambar listing; disimpan di tabel dedup supaya tidak dihitung ulang."""
+        hashes = []
+        kind = None
+        for index, url in enumerate(_parse_images(gambar)[:DEDUP_IMAGE_COUNT]):
+            try:
+                kind, value = image_hash(_load_image_bytes(car_id, index, url))
+                hashes.append(value)
+            except Exception as e:
+                logger.warning(f"⚠️ Gagal hash gambar ID={car_id} #{index + 1}: {e}")
+        self.progress["hashed"] = self.progress.get("hashed", 0) + 1
+        return kind, hashes
+
+    def _ensure_hashes(self, cursor, car_id):
+        cursor.execute(f"SELECT hash_kind, image_hashes FROM {self.table} WHERE car_id = %s", (car_id,))
+        row = cursor.fetchone()
+        if row and row[1] is not None:
+            return row[0], row[1]
+        cursor.execute(f"SELECT gambar FROM {self.primary} WHERE id = %s", (car_id,))
+        gambar = cursor.fetchone()
+        kind, hashes = self.hashes_for(car_id, gambar[0] if gambar else None)
+        cursor.execute(
+            f"UPDATE {self.table} SET hash_kind = %s, image_hashes = %s WHERE car_id = %s",
+            (kind, hashes, car_id)
+        )
+        return kind, hashes
+
+    def _merge(self, cursor, cluster_a, cluster_b):
+        target = min(cluster_a, cluster_b)
+        cursor.execute(
+            f"UPDATE {self.table} SET cluster_id = %s WHERE cluster_id IN (%s, %s)",
+            (target, cluster_a, cluster_b)
+        )
+        return target
+
+    def process(self, car):
+        """Simpan blocking key satu listing lalu gabungkan dengan kandidat yang gambarnya cocok."""
+        components = block_components(car)
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"""
+                INSERT INTO {self.table} (car_id, site, listing_url, brand_key, model_key, variant_key,
+                    year_key, price_band, mileage_band, location_key, blocking_key, cluster_id, updated_at)
+                VALUES (%(car_id)s, %(site)s, %(listing_url)s, %(brand_key)s, %(model_key)s, %(variant_key)s,
+                    %(year_key)s, %(price_band)s, %(mileage_band)s, %(location_key)s, %(blocking_key)s,
+                    %(car_id)s, %(now)s)
+                ON CONFLICT (car_id) DO UPDATE SET
+                    brand_key = EXCLUDED.brand_key, model_key = EXCLUDED.model_key,
+                    variant_key = EXCLUDED.variant_key, year_key = EXCLUDED.year_key,
+                    price_band = EXCLUDED.price_band, mileage_band = EXCLUDED.mileage_band,
+                    location_key = EXCLUDED.location_key, blocking_key = EXCLUDED.blocking_key,
+                    updated_at = EXCLUDED.updated_at
+                RETURNING cluster_id
+            """, dict(components, car_id=car["id"], site=site_of(car.get("listing_url")),
+                      listing_url=car.get("listing_url"), blocking_key=blocking_key(components),
+                      now=datetime.now()))
+            cluster_id = cursor.fetchone()[0]
+
+            if not components["brand_key"] or not components["model_key"] or components["price_band"] is None:
+                self.conn.commit()
+                return cluster_id
+
+            cursor.execute(f"""
+                SELECT car_id, cluster_id FROM {self.table}
+                WHERE brand_key = %(brand_key)s AND model_key = %(model_key)s
+                  AND variant_key = %(variant_key)s AND year_key IS NOT DISTINCT FROM %(year_key)s
+                  AND location_key = %(location_key)s
+                  AND price_band BETWEEN %(price_band)s - 1 AND %(price_band)s + 1
+                  AND (mileage_band IS NULL OR %(mileage_band)s IS NULL
+                       OR mileage_band BETWEEN %(mileage_band)s - 1 AND %(mileage_band)s + 1)
+                  AND car_id <> %(car_id)s AND cluster_id <> %(cluster_id)s
+            """, dict(components, car_id=car["id"], cluster_id=cluster_id))
+            candidates = cursor.fetchall()
+
+            if candidates:
+                kind, hashes = self._ensure_hashes(cursor, car["id"])
+                for other_id, other_cluster in candidates:
+                    if other_cluster == cluster_id or not hashes:
+                        continue
+                    other_kind, other_hashes = self._ensure_hashes(cursor, other_id)
+                    if other_kind == kind and images_match(hashes, other_hashes or []):
+                        cluster_id = self._merge(cursor, cluster_id, other_cluster)
+                        self.progress["merged"] = self.progress.get("merged", 0) + 1
+                        logger.info(f"🔗 ID={car['id']} dan ID={other_id} digabung ke cluster {cluster_id}")
+            self.conn.commit()
+            return cluster_id
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def run(self, full=False, batch_size=DEDUP_BATCH_SIZE):
+        """Proses listing yang belum ada di tabel dedup atau berubah sejak terakhir diproses."""
+        logger.info(f"🚀 Memulai dedup {self.primary} ({'full' if full else 'inkremental'})")
+        self.progress = {"processed": 0, "merged": 0, "hashed": 0, "current_id": None}
+        if full:
+            # Cluster dibangun ulang dari nol; hash gambar yang tersimpan tetap dipakai
+            with self.conn.cursor() as cursor:
+                cursor.execute(f"UPDATE {self.table} SET cluster_id = car_id")
+            self.conn.commit()
+        last_id = 0
+        while not self.stop_flag:
+            with self.conn.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT c.id, c.listing_url, c.brand, c.model, c.variant, c.year, c.price,
+                           c.mileage_km, c.millage, c.lokasi
+                    FROM {self.primary} c
+                    LEFT JOIN {self.table} d ON d.car_id = c.id
+                    WHERE c.id > %s
+                      AND (%s OR d.car_id IS NULL OR c.last_scraped_at > d.updated_at)
+                    ORDER BY c.id
+                    LIMIT %s
+                """, (last_id, full, batch_size))
+                names = [desc[0] for desc in cursor.description]
+                rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+            if not rows:
+                break
+            for car in rows:
+                if self.stop_flag:
+                    logger.info("🛑 Dedup dihentikan oleh user.")
+                    break
+                self.progress["current_id"] = car["id"]
+                try:
+                    self.process(car)
+                except Exception as e:
+                    logger.error(f"❌ Gagal dedup ID={car['id']}: {e}")
+                self.progress["processed"] += 1
+            last_id = rows[-1]["id"]
+
+        summary = count_unique(self.conn, self.table)
+        logger.info(
+            f"✅ Dedup selesai: {self.progress['processed']} listing diproses, {self.progress['merged']} digabung. "
+            f"{summary['unique_cars']} mobil unik dari {summary['listings']} listing."
+        )
+        return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deduplikasi listing lintas situs")
+    parser.add_argument("--full", action="store_true", help="Proses ulang semua listing")
+    parser.add_argument("--batch-size", type=int, default=DEDUP_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    service = DedupService()
+    try:
+        service.run(full=args.full, batch_size=args.batch_size)
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+Capture diagnostik (screenshot / DOM) di jalur error dengan sampling, batas per menit dan anggaran disk.
+
+Semua take_screenshot() di service lewat capture(). Urutannya:
+    1. kategori diturunkan dari nama ("error_123_try2" -> "error", "cloudflare_block" -> "cloudflare_block")
+    2. sampling + batas per menit per (folder, kategori); yang lewat batas tidak diambil sama sekali
+    3. gambar diambil di thread pemanggil (page Playwright tidak thread-safe) sebagai JPEG viewport
+       berkualitas rendah (default), PNG, atau DOM saja (HTML terkompresi zstd)
+    4. penulisan file + penegakan retensi/ukuran folder logs/<YYYYMMDD>_error_* di thread latar
+
+Saat block storm, capture yang berulang dari kategori yang sama cukup memakan waktu satu
+screenshot per jendela, bukan satu per kegagalan.
+
+    python -m scrap_service.common.diagnostics --usage
+    python -m scrap_service.common.diagnostics --prune
+"""
+import os
+import re
+import sys
+import time
+import queue
+import atexit
+import random
+import shutil
+import logging
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+from collections import defaultdict, deque
+
+from scrap_service.common import metrics
+
+logger = logging.getLogger("diagnostics")
+
+# ===== Konfigurasi Env
+# jpeg | png | dom | off
+DIAG_MODE = os.getenv("DIAG_MODE", "jpeg").lower()
+DIAG_JPEG_QUALITY = int(os.getenv("DIAG_JPEG_QUALITY", "50"))
+DIAG_FULL_PAGE = os.getenv("DIAG_FULL_PAGE", "false").lower() == "true"
+DIAG_SAMPLE_RATE = float(os.getenv("DIAG_SAMPLE_RATE", "1.0"))
+DIAG_MAX_PER_MINUTE = int(os.getenv("DIAG_MAX_PER_MINUTE", "6"))
+# Override per kategori, format "kategori=sampling:maks_per_menit", mis. "cloudflare_block=0.2:2,error=0.5:4"
+DIAG_CATEGORY_RULES = os.getenv("DIAG_CATEGORY_RULES", "")
+DIAG_RETENTION_DAYS = int(os.getenv("DIAG_RETENTION_DAYS", "14"))
+DIAG_MAX_MB = int(os.getenv("DIAG_MAX_MB", "500"))
+DIAG_QUEUE_SIZE = int(os.getenv("DIAG_QUEUE_SIZE", "100"))
+DIAG_CAPTURE_TIMEOUT_MS = int(os.getenv("DIAG_CAPTURE_TIMEOUT_MS", "5000"))
+
+LOG_DIR = Path(__file__).resolve().parents[2] / "logs"
+ERROR_DIR_PATTERN = re.compile(r"^(\d{8})_error")
+CAPTURE_METRIC = "diagnostics_captures_total"
+# Pruning dijalankan lagi setiap sekian file ditulis
+PRUNE_EVERY = 50
+
+
+def parse_rules(raw):
+    """"a=0.5:3,b=1:10" -> {"a": (0.5, 3), "b": (1.0, 10)}; entri rusak dilewati."""
+    rules = {}
+    for item in filter(None, (part.strip() for part in (raw or "").split(","))):
+        try:
+            category, spec = item.split("=", 1)
+            rate, _, cap = spec.partition(":")
+            rules[category.strip()] = (float(rate), int(cap) if cap else DIAG_MAX_PER_MINUTE)
+        except ValueError:
+            logger.warning(f"⚠️ Aturan diagnostik tidak valid diabaikan: {item}")
+    return rules
+
+
+def category_of(name):
+    """Token awal huruf kecil sebelum bagian yang berisi angka / nama brand."""
+    tokens = []
+    for token in str(name).split("_"):
+        if not (token.isalpha() and token.islower()):
+            break
+        tokens.append(token)
+    return "_".join(tokens) or "other"
+
+
+class CapturePolicy:
+    """Sampling + sliding window per (folder, kategori)."""
+
+    def __init__(self, sample_rate=DIAG_SAMPLE_RATE, max_per_minute=DIAG_MAX_PER_MINUTE, rules=None):
+        self.sample_rate = sample_rate
+        self.max_per_minute = max_per_minute
+        self.rules = parse_rules(DIAG_CATEGORY_RULES) if rules is None else rules
+        self.windows = defaultdict(deque)
+        self.lock = threading.Lock()
+
+    def decide(self, folder, category, now=None):
+        """"capture", "sampled_out" atau "rate_limited"."""
+        rate, cap = self.rules.get(category, (self.sample_rate, self.max_per_minute))
+        if rate <= 0 or random.random() >= rate:
+            return "sampled_out"
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            window = self.windows[(folder, category)]
+            while window and now - window[0] >= 60:
+                window.popleft()
+            if len(window) >= cap:
+                return "rate_limited"
+            window.append(now)
+        return "capture"
+
+
+def prune_error_dirs(log_dir=LOG_DIR, retention_days=DIAG_RETENTION_DAYS, max_bytes=DIAG_MAX_MB * 1024 * 1024):
+    """Hapus folder error lebih tua dari retensi, lalu file tertua sampai total di bawah anggaran."""
+    log_dir = Path(log_dir)
+    if not log_dir.exists():
+        return {"dirs": 0, "files": 0, "bytes": 0}
+    cutoff = (datetime.now() - timedelta(days=retention_days)).strftime("%Y%m%d")
+    removed_dirs = 0
+    files = []
+    for folder in log_dir.iterdir():
+        match = ERROR_DIR_PATTERN.match(folder.name)
+        if not folder.is_dir() or not match:
+            continue
+        if match.group(1) < cutoff:
+            shutil.rmtree(folder, ignore_errors=True)
+            removed_dirs += 1
+            continue
+        for path in folder.iterdir():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    removed_files = 0
+    freed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+        freed += size
+        removed_files += 1
+    if removed_dirs or removed_files:
+        logger.info(f"🧹 Diagnostik: {removed_dirs} folder lama dan {removed_files} file ({freed / 1024 / 1024:.1f} MB) dihapus")
+    return {"dirs": removed_dirs, "files": removed_files, "bytes": freed}
+
+
+class DiagnosticsWriter:
+    """Thread latar yang menulis file capture dan menjaga retensi / ukuran folder error."""
+
+    def __init__(self, log_dir=LOG_DIR, retention_days=DIAG_RETENTION_DAYS, max_mb=DIAG_MAX_MB):
+        self.log_dir = Path(log_dir)
+        self.retention_days = retention_days
+        self.max_bytes = max_mb * 1024 * 1024
+        self.queue = queue.Queue(maxsize=DIAG_QUEUE_SIZE)
+        self.written = 0
+        self.thread = threading.Thread(target=self._run, name="diagnostics-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, path, payload, compress=False):
+        try:
+            self.queue.put_nowait((path, payload, compress))
+            return True
+        except queue.Full:
+            return False
+
+    def _run(self):
+        self.prune()
+        while True:
+            path, payload, compress = self.queue.get()
+            try:
+                self._write(path, payload, compress)
+            except Exception as e:
+                logging.warning(f"❌ Gagal menyimpan screenshot: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _write(self, path, payload, compress):
+        if compress:
+            import zstandard
+            payload = zstandard.ZstdCompressor(level=3).compress(payload.encode("utf-8"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(payload)
+        logging.info(f"📸 Screenshot disimpan: {path}")
+        self.written += 1
+        if self.written % PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        return prune_error_dirs(self.log_dir, self.retention_days, self.max_bytes)
+
+    def flush(self, timeout=5):
+        """Tunggu antrian kosong (maks. timeout detik), dipanggil saat proses selesai."""
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+
+_policy = CapturePolicy()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DiagnosticsWriter()
+            atexit.register(_writer.flush)
+        return _writer
+
+
+def _grab(page, mode):
+    """Ambil payload di thread pemanggil: (bytes/str, ekstensi, perlu kompresi)."""
+    selenium = hasattr(page, "get_screenshot_as_png")
+    if mode == "dom":
+        html = page.page_source if selenium else page.content()
+        return html, "html.zst", True
+    if selenium:
+        # Tanpa Pillow, driver Selenium hanya bisa PNG
+        return page.get_screenshot_as_png(), "png", False
+    if mode == "png":
+        return page.screenshot(type="png", full_page=DIAG_FULL_PAGE, timeout=DIAG_CAPTURE_TIMEOUT_MS), "png", False
+    return page.screenshot(
+        type="jpeg", quality=DIAG_JPEG_QUALITY, full_page=DIAG_FULL_PAGE, timeout=DIAG_CAPTURE_TIMEOUT_MS
+    ), "jpg", False
+
+
+def capture(page, name, folder, category=None, mode=None):
+    """
+    Capture diagnostik ke logs/<YYYYMMDD>_error_<folder>/<name>_<HHMMSS>.<ext> sesuai kebijakan.
+    Kembalikan path yang dijadwalkan ditulis, atau None kalau dilewati.
+    """
+    mode = (mode or DIAG_MODE).lower()
+    if mode == "off":
+        return None
+    category = category or category_of(name)
+    decision = _policy.decide(folder, category)
+    if decision != "capture":
+        metrics.inc(CAPTURE_METRIC, site=folder, category=category, result=decision)
+        return None
+
+    started = time.monotonic()
+    try:
+        payload, ext, compress = _grab(page, mode)
+    except Exception as e:
+        metrics.inc(CAPTURE_METRIC, site=folder, category=category, result="failed")
+        logging.warning(f"❌ Gagal menyimpan screenshot: {e}")
+        return None
+    finally:
+        metrics.observe_stage(folder, "diagnostics", time.monotonic() - started)
+
+    now = datetime.now()
+    path = LOG_DIR / f"{now:%Y%m%d}_error_{folder}" / f"{name}_{now:%H%M%S}.{ext}"
+    queued = get_writer().submit(path, payload, compress)
+    metrics.inc(CAPTURE_METRIC, site=folder, category=category, result="saved" if queued else "dropped")
+    return path if queued else None
+
+
+def usage(log_dir=LOG_DIR):
+    """Jumlah file & ukuran per folder error."""
+    rows = []
+    for folder in sorted(Path(log_dir).glob("*_error*")):
+        if folder.is_dir() and ERROR_DIR_PATTERN.match(folder.name):
+            sizes = [p.stat().st_size for p in folder.iterdir() if p.is_file()]
+            rows.append((folder.name, len(sizes), sum(sizes)))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Folder diagnostik error (screenshot / DOM)")
+    parser.add_argument("--usage", action="store_true", help="Cetak jumlah file & ukuran per folder error")
+    parser.add_argument("--prune", action="store_true", help="Terapkan retensi & anggaran ukuran sekarang")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.prune:
+        result = prune_error_dirs()
+        print(f"Dihapus: {result['dirs']} folder, {result['files']} file ({result['bytes'] / 1024 / 1024:.1f} MB)")
+    if args.usage:
+        total = 0
+        for name, count, size in usage():
+            total += size
+            print(f"{name}: {count} file, {size / 1024 / 1024:.1f} MB")
+        print(f"Total: {total / 1024 / 1024:.1f} MB (anggaran {DIAG_MAX_MB} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
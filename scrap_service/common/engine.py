@@ -0,0 +1,523 @@
+"""
+Engine scraping bersama: fetch -> parse -> validate -> persist, dengan adapter per site.
+
+Adapter (scrap_service/sites/<site>.py) hanya mendeklarasikan apa yang khas per site:
+tabel, cara mengambil URL hasil & detail dari halaman, aturan field wajib (FieldRules),
+penanda blokir anti-bot dan aturan deteksi sold. Semua yang lain (timing per stage,
+upsert ke tabel scrap + history harga, sinkronisasi ke tabel utama, screenshot error)
+ada di sini, jadi perbaikan performa cukup dibuat sekali untuk semua service.
+
+    adapter = get_adapter("carlistmy")
+    engine = ScrapeEngine(adapter, conn)
+    engine.fetch(page, url)
+    car = engine.extract(page, url)
+    engine.save(car)
+    engine.sync_to_primary()
+
+Dengan SNAPSHOT_ARCHIVE=true, HTML tiap halaman detail yang di-extract juga disimpan ke arsip
+zstd (lihat common/snapshots.py) supaya perbaikan parser bisa dijalankan ulang tanpa scraping.
+"""
+import os
+import re
+import math
+import time
+import logging
+import importlib
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs, parse_qsl, urlencode, urlunparse
+
+from scrap_service.common import metrics, snapshots, diagnostics, seen_urls
+from scrap_service.common.logsetup import log_context
+from scrap_service.common.normalize import normalize_car, ensure_normalized_columns
+from scrap_service.common.validation import complete_detail, price_to_int
+from scrap_service.common.price_history import ensure_history_partitions, combine_since
+
+logger = logging.getLogger("engine")
+
+# ===== Konfigurasi Env
+DB_TABLE_PRIMARY = os.getenv("DB_TABLE_PRIMARY", "cars")
+DB_TABLE_HISTORY_PRICE_COMBINED = os.getenv("DB_TABLE_HISTORY_PRICE_COMBINED", "price_history_combined")
+# full = jelajahi semua halaman; incremental = hasil diurutkan terbaru, berhenti saat satu halaman
+# hanya berisi listing yang sudah di-scrape dalam INCREMENTAL_RECENT_HOURS terakhir
+CRAWL_MODE = os.getenv("CRAWL_MODE", "full").lower()
+INCREMENTAL_RECENT_HOURS = float(os.getenv("INCREMENTAL_RECENT_HOURS", "72"))
+
+# Nama site -> modul adapter; modul di-import saat pertama kali diminta
+SITE_ADAPTERS = {
+    "carlistmy": "scrap_service.sites.carlistmy",
+    "mudahmy": "scrap_service.sites.mudahmy",
+}
+
+# Kolom listing yang disalin apa adanya dari tabel scrap ke tabel utama
+LISTING_COLUMNS = [
+    "brand", "model", "variant", "informasi_iklan", "lokasi",
+    "price", "year", "millage", "transmission", "seat_capacity", "gambar",
+    "mileage_km", "seats", "transmission_type", "posted_at",
+]
+
+
+def take_screenshot(page, name, folder):
+    """
+    Capture diagnostik ke logs/<YYYYMMDD>_error_<folder>/ lewat common/diagnostics (sampling,
+    batas per menit, JPEG/DOM, tulis di thread latar). Bisa menerima page Playwright maupun driver Selenium.
+    """
+    return diagnostics.capture(page, name, folder)
+
+
+def parse_year(value):
+    match = re.search(r"\d{4}", str(value or ""))
+    return int(match.group()) if match else 0
+
+
+def parse_count(text, pattern=r"(\d[\d,.]*)"):
+    """"12,345 vehicles for sale" -> 12345; None kalau pola tidak ditemukan."""
+    match = re.search(pattern, text or "", re.IGNORECASE)
+    return int(re.sub(r"[^\d]", "", match.group(1))) if match else None
+
+
+class SiteAdapter:
+    """
+    Deklarasi satu site. Subclass mengisi atribut kelas dan mengimplementasikan
+    listing_urls() serta parse_detail(); sisanya punya default yang masuk akal.
+    """
+    name = None
+    # Default nama tabel kalau env DB_TABLE_SCRAP / DB_TABLE_HISTORY_PRICE tidak diisi
+    scrap_table_default = "cars_scrap"
+    history_table_default = "price_history"
+    field_rules = None
+    # True kalau parser bisa jalan dari HTML mentah (parse_html); False = butuh DOM (parse_detail)
+    parses_html = False
+    # Catat history saat harga lama masih kosong (0/NULL)?
+    history_from_unpriced = True
+
+    # Penanda halaman blokir anti-bot
+    blocked_content_markers = ("Checking your browser before accessing", "cf-browser-verification")
+    blocked_title_markers = ()
+    blocked_url_markers = ()
+
+    # Deteksi sold: teks penanda dicari di sold_selector (kalau ada) atau di seluruh konten
+    sold_texts = ("This car has already been sold.",)
+    sold_selector = None
+    active_selector = None
+    # Redirect ke halaman pencarian = listing sudah dihapus: (potongan judul, potongan URL)
+    sold_redirect = None
+    default_status = "active"
+
+    # Jumlah total hasil di halaman hasil pencarian, untuk merencanakan rentang halaman
+    total_count_selector = None
+    total_count_pattern = r"(\d[\d,.]*)"
+    # Query param ukuran halaman di URL hasil (batas atas jumlah listing per halaman)
+    page_size_param = None
+    # Query param untuk mengurutkan hasil dari yang terbaru (mode incremental);
+    # bisa ditimpa env <SITE>_NEWEST_SORT, mis. CARLISTMY_NEWEST_SORT="sort=modification_date_search.desc"
+    newest_sort_params = {}
+
+    def __init__(self):
+        self.scrap_table = os.getenv("DB_TABLE_SCRAP", self.scrap_table_default)
+        self.history_table = os.getenv("DB_TABLE_HISTORY_PRICE", self.history_table_default)
+        self.primary_table = DB_TABLE_PRIMARY
+        self.combined_table = DB_TABLE_HISTORY_PRICE_COMBINED
+        newest_sort = os.getenv(f"{(self.name or '').upper()}_NEWEST_SORT")
+        if newest_sort is not None:
+            self.newest_sort_params = dict(parse_qsl(newest_sort))
+
+    # ================== URL & detail
+
+    def listing_urls(self, page, url):
+        """URL detail unik dari halaman hasil yang sudah dimuat."""
+        raise NotImplementedError
+
+    def parse_detail(self, page, url):
+        """Dict data mobil dari halaman detail yang sudah dimuat."""
+        raise NotImplementedError
+
+    def parse_html(self, html, url):
+        """Dict data mobil dari HTML mentah (hanya kalau parses_html)."""
+        raise NotImplementedError
+
+    def newest_first(self, url):
+        """URL hasil yang sama dengan urutan terbaru (param lain, termasuk nomor halaman, dipertahankan)."""
+        if not self.newest_sort_params:
+            return url
+        parts = urlparse(url)
+        query = {key: values[-1] for key, values in parse_qs(parts.query, keep_blank_values=True).items()}
+        query.update(self.newest_sort_params)
+        return urlunparse(parts._replace(query=urlencode(query)))
+
+    def total_count(self, page):
+        """Total hasil pencarian dari halaman hasil yang sudah dimuat, atau None kalau tidak terbaca."""
+        if not self.total_count_selector:
+            return None
+        try:
+            locator = page.locator(self.total_count_selector)
+            if locator.count() == 0:
+                return None
+            return parse_count(locator.first.inner_text(), self.total_count_pattern)
+        except Exception:
+            return None
+
+    def coerce(self, car):
+        """Price dan year sebagai integer (0 kalau kosong), apa pun format dari parser."""
+        car = dict(car)
+        car["price"] = price_to_int(car.get("price")) or 0
+        car["year"] = parse_year(car.get("year"))
+        return car
+
+    # ================== Blokir & status listing
+
+    def is_blocked(self, page, content=None):
+        title = page.title()
+        if any(marker in title for marker in self.blocked_title_markers):
+            return True
+        if any(marker in page.url for marker in self.blocked_url_markers):
+            return True
+        if self.blocked_content_markers:
+            content = content if content is not None else page.content()
+            return any(marker in content for marker in self.blocked_content_markers)
+        return False
+
+    def is_redirected_sold(self, title, url):
+        if not self.sold_redirect:
+            return False
+        title_part, url_part = self.sold_redirect
+        return title_part in (title or "").lower().strip() and url_part in (url or "").strip()
+
+    def _has_sold_text(self, text):
+        text = (text or "").lower()
+        return any(indicator.lower() in text for indicator in self.sold_texts)
+
+    def page_status(self, page):
+        """Status listing (sold / active / default_status) dari halaman detail yang sudah dimuat."""
+        if self.sold_selector:
+            locator = page.locator(self.sold_selector)
+            if locator.count() > 0 and self._has_sold_text(locator.first.inner_text()):
+                return "sold"
+        if self.active_selector and page.locator(self.active_selector).count() > 0:
+            return "active"
+        if not self.sold_selector and self._has_sold_text(page.content()):
+            return "sold"
+        return self.default_status
+
+
+def get_adapter(name):
+    """Adapter untuk site `name` (carlistmy, mudahmy, ...)."""
+    if name not in SITE_ADAPTERS:
+        raise ValueError(f"Site tidak dikenal: {name} (tersedia: {', '.join(SITE_ADAPTERS)})")
+    return importlib.import_module(SITE_ADAPTERS[name]).ADAPTER
+
+
+_unique_url_index = {}
+
+
+def ensure_unique_url_index(conn, table):
+    """
+    True kalau tabel punya unique index di listing_url (syarat ON CONFLICT (listing_url)).
+    Hanya dicek, tidak dibuat: pembuatan (CONCURRENTLY, dengan cek duplikat) ada di migrasi m0002.
+    Hasil di-cache per tabel per proses karena service dibuat ulang di setiap request.
+    """
+    if table in _unique_url_index:
+        return _unique_url_index[table]
+    cursor = conn.cursor()
+    try:
+        # Unique index apa pun yang persis di (listing_url) memenuhi ON CONFLICT, tidak harus dari m0002
+        cursor.execute("""
+            SELECT 1 FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+            WHERE i.indrelid = to_regclass(%s) AND i.indisunique AND i.indisvalid
+              AND i.indnatts = 1 AND a.attname = 'listing_url' AND i.indpred IS NULL
+        """, (table,))
+        present = cursor.fetchone() is not None
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f"⚠️ Unique index listing_url {table} tidak bisa dicek, save() tanpa ON CONFLICT: {e}")
+        return False
+    finally:
+        cursor.close()
+    if not present:
+        logger.warning(
+            f"⚠️ {table} belum punya unique index listing_url; save() memakai SELECT lalu INSERT biasa. "
+            f"Jalankan migrasi m0002 (python -m scrap_service.migrations.migrate)."
+        )
+    _unique_url_index[table] = present
+    return present
+
+
+class ScrapeEngine:
+    """Pipeline bersama satu site di atas satu koneksi DB."""
+
+    def __init__(self, adapter, conn, log=None):
+        self.adapter = adapter
+        self.site = adapter.name
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.log = log or logging
+        self.archive = snapshots.get_archive(self.site) if snapshots.SNAPSHOT_ARCHIVE else None
+        # Bloom filter URL yang sudah dikenal; diisi load_seen_index() saat job mulai
+        self.seen = None
+        # True setelah ensure_schema() memastikan unique index listing_url -> INSERT ... ON CONFLICT
+        self.url_unique = False
+
+    def ensure_schema(self):
+        self.url_unique = ensure_unique_url_index(self.conn, self.adapter.scrap_table)
+        ensure_normalized_columns(self.conn, self.adapter.scrap_table)
+        ensure_normalized_columns(self.conn, self.adapter.primary_table)
+        ensure_history_partitions(self.conn, self.adapter.history_table)
+        ensure_history_partitions(self.conn, self.adapter.combined_table)
+
+    def load_seen_index(self):
+        """Muat (atau pakai ulang) index URL dari tabel scrap + utama; gagal muat = tanpa index."""
+        if not seen_urls.SEEN_INDEX:
+            return None
+        try:
+            self.seen = seen_urls.get_index(self.conn, [self.adapter.scrap_table, self.adapter.primary_table])
+        except Exception as e:
+            self.conn.rollback()
+            self.seen = None
+            self.log.warning(f"⚠️ [{self.site}] Index URL gagal dimuat, cek per URL ke DB: {e}")
+        return self.seen
+
+    def screenshot(self, page, name, suffix=""):
+        take_screenshot(page, name, self.site + suffix)
+
+    # ================== fetch -> parse -> validate
+
+    def fetch(self, page, url, stage="navigation", **goto_kwargs):
+        """page.goto dengan timing per stage; kembalikan lama navigasi (detik)."""
+        with log_context(site=self.site, url=url):
+            started = time.monotonic()
+            try:
+                page.goto(url, **goto_kwargs)
+            finally:
+                nav_time = time.monotonic() - started
+                metrics.observe_stage(self.site, stage, nav_time)
+        return nav_time
+
+    def extract(self, page, url):
+        """Parse halaman detail lalu lengkapi field wajib yang kosong sebelum halaman ditinggalkan."""
+        with log_context(site=self.site, url=url):
+            with metrics.stage(self.site, "parse"):
+                data = self.adapter.parse_detail(page, url)
+            if self.adapter.field_rules:
+                with metrics.stage(self.site, "validate"):
+                    data, _ = complete_detail(page, data, self.adapter.field_rules)
+            if self.archive:
+                self.archive_page(page, url)
+        return data
+
+    def plan_pages(self, page, url, urls, start_page=1):
+        """
+        Halaman hasil terakhir yang perlu dimuat, dari total hasil di halaman yang sedang terbuka
+        dan jumlah listing di halaman ini. None kalau total tidak terbaca (paginasi sampai kosong).
+        """
+        total = self.adapter.total_count(page)
+        if total is None:
+            self.log.info(f"📊 [{self.site}] Total hasil tidak terbaca, paginasi sampai halaman kosong")
+            return None
+        # Ukuran halaman dari jumlah yang terlihat (dibatasi param URL); perkiraan terlalu kecil
+        # hanya menambah halaman kosong di akhir, bukan melewatkan listing
+        per_page = len(urls)
+        if self.adapter.page_size_param:
+            param = parse_qs(urlparse(url).query).get(self.adapter.page_size_param)
+            if param and param[0].isdigit():
+                per_page = min(per_page, int(param[0])) if per_page else int(param[0])
+        if total == 0 or per_page == 0:
+            last_page = start_page - 1 if total == 0 else start_page
+        else:
+            last_page = max(start_page, math.ceil(total / per_page))
+        self.log.info(
+            f"📊 [{self.site}] Total {total} hasil, {per_page}/halaman -> halaman {start_page}..{last_page} "
+            f"({max(last_page - start_page + 1, 0)} halaman)"
+        )
+        return last_page
+
+    def known_recent(self, urls, hours=INCREMENTAL_RECENT_HOURS):
+        """URL yang sudah ada di tabel scrap dengan last_scraped_at dalam `hours` jam terakhir (satu query)."""
+        if self.seen is not None:
+            # Negatif Bloom filter pasti belum pernah di-scrape; hanya yang positif ditanyakan ke DB
+            _, urls = self.seen.split(urls)
+        if not urls:
+            return set()
+        cutoff = datetime.now() - timedelta(hours=hours)
+        try:
+            with metrics.stage(self.site, "known_check"):
+                self.cursor.execute(f"""
+                    SELECT listing_url FROM {self.adapter.scrap_table}
+                    WHERE listing_url = ANY(%s) AND last_scraped_at >= %s
+                """, (list(urls), cutoff))
+                return {row[0] for row in self.cursor.fetchall()}
+        except Exception as e:
+            # Gagal cek = anggap semua baru; lebih baik scrape ulang daripada berhenti terlalu cepat
+            self.conn.rollback()
+            self.log.warning(f"⚠️ [{self.site}] Gagal cek listing yang sudah dikenal: {e}")
+            return set()
+
+    def new_urls(self, urls, page_no=None):
+        """
+        Mode incremental: buang URL yang baru saja di-scrape. List kosong berarti halaman ini
+        hanya berisi listing yang sudah dikenal -> paginasi brand/model bisa dihentikan.
+        """
+        known = self.known_recent(urls)
+        fresh = [url for url in urls if url not in known]
+        metrics.inc("scrape_incremental_urls_total", value=len(known), site=self.site, result="known")
+        metrics.inc("scrape_incremental_urls_total", value=len(fresh), site=self.site, result="new")
+        self.log.info(
+            f"🆕 [{self.site}] Halaman {page_no or '?'}: {len(fresh)} listing baru, {len(known)} sudah dikenal"
+        )
+        return fresh
+
+    def archive_page(self, page, url):
+        """Simpan HTML halaman (setelah validasi, termasuk elemen yang telat dirender) ke arsip."""
+        try:
+            with metrics.stage(self.site, "archive"):
+                self.archive.add(url, page.content())
+        except Exception as e:
+            self.log.warning(f"⚠️ Gagal menyimpan snapshot {url}: {e}")
+
+    # ================== persist
+
+    def save(self, car):
+        """Upsert satu listing ke tabel scrap; perubahan harga dicatat di tabel history."""
+        adapter = self.adapter
+        started = time.monotonic()
+        try:
+            car = adapter.coerce(car)
+            now = datetime.now()
+            norm = normalize_car(car, now)
+            values = [car.get(col) for col in LISTING_COLUMNS[:11]] + [
+                norm["mileage_km"], norm["seats"], norm["transmission_type"], norm["posted_at"],
+            ]
+
+            row = None
+            # Negatif dari index = pasti listing baru, SELECT dilewati (hanya aman dengan ON CONFLICT)
+            if not self.url_unique or self.seen is None or self.seen.might_contain(car["listing_url"]):
+                row = self._existing_row(car["listing_url"])
+
+            if row is None:
+                placeholders = ", ".join(["%s"] * (len(LISTING_COLUMNS) + 3))
+                on_conflict = "ON CONFLICT (listing_url) DO NOTHING" if self.url_unique else ""
+                self.cursor.execute(f"""
+                    INSERT INTO {adapter.scrap_table} (listing_url, {", ".join(LISTING_COLUMNS)}, last_scraped_at, version)
+                    VALUES ({placeholders})
+                    {on_conflict}
+                """, [car["listing_url"]] + values + [now, 1])
+                if self.url_unique and self.cursor.rowcount == 0:
+                    # Sudah ditulis proses lain sejak index dimuat -> jalur update
+                    row = self._existing_row(car["listing_url"])
+
+            if row:
+                car_id, old_price, version = row
+                assignments = ", ".join(f"{col}=%s" for col in LISTING_COLUMNS)
+                self.cursor.execute(f"""
+                    UPDATE {adapter.scrap_table}
+                    SET {assignments}, last_scraped_at=%s, version=%s
+                    WHERE id=%s
+                """, values + [now, (version or 0) + 1, car_id])
+
+                if car["price"] != old_price and (old_price or adapter.history_from_unpriced):
+                    self.cursor.execute(f"""
+                        INSERT INTO {adapter.history_table} (car_id, old_price, new_price)
+                        VALUES (%s, %s, %s)
+                    """, (car_id, old_price, car["price"]))
+
+            self.conn.commit()
+            if self.seen is not None:
+                self.seen.add(car["listing_url"])
+            self.log.info(f"✅ Data untuk {car['listing_url']} berhasil disimpan/diupdate.")
+            return True
+        except Exception as e:
+            self.conn.rollback()
+            self.log.error(f"❌ Error menyimpan ke database: {e}")
+            return False
+        finally:
+            metrics.observe_stage(self.site, "db", time.monotonic() - started)
+
+    def _existing_row(self, listing_url):
+        self.cursor.execute(
+            f"SELECT id, price, version FROM {self.adapter.scrap_table} WHERE listing_url = %s",
+            (listing_url,)
+        )
+        return self.cursor.fetchone()
+
+    def sync_to_primary(self):
+        """
+        Sinkronisasi tabel scrap ke tabel utama dengan dua statement set-based
+        (UPDATE ... FROM untuk listing yang sudah ada, INSERT ... WHERE NOT EXISTS untuk yang baru),
+        lalu salin history harga baru ke tabel combined.
+        """
+        from scrap_service.common.geocode import geocode_after_run
+        from scrap_service.common.market_stats import refresh_after_run, group_key_sql
+
+        adapter = self.adapter
+        columns = LISTING_COLUMNS + ["last_scraped_at"]
+        self.log.info(f"Memulai sinkronisasi data dari {adapter.scrap_table} ke {adapter.primary_table}...")
+        started = time.monotonic()
+        try:
+            # Hanya baris yang nilainya berubah; grup lama (o) dan baru (c) dikirim ke refresh market stats
+            self.cursor.execute(f"""
+                UPDATE {adapter.primary_table} AS c
+                SET {", ".join(f"{col} = s.{col}" for col in columns)}
+                FROM {adapter.scrap_table} AS s, {adapter.primary_table} AS o
+                WHERE c.listing_url = s.listing_url AND o.id = c.id
+                  AND ({", ".join(f"c.{col}::text" for col in columns)})
+                      IS DISTINCT FROM ({", ".join(f"s.{col}::text" for col in columns)})
+                RETURNING {group_key_sql("c")}, {group_key_sql("o")}
+            """)
+            changed = self.cursor.fetchall()
+            updated = len(changed)
+            groups = {row[:4] for row in changed} | {row[4:] for row in changed}
+
+            self.cursor.execute(f"""
+                INSERT INTO {adapter.primary_table} (listing_url, {", ".join(columns)})
+                SELECT s.listing_url, {", ".join(f"s.{col}" for col in columns)}
+                FROM {adapter.scrap_table} AS s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {adapter.primary_table} c WHERE c.listing_url = s.listing_url
+                )
+                RETURNING {group_key_sql(adapter.primary_table)}
+            """)
+            new_rows = self.cursor.fetchall()
+            inserted = len(new_rows)
+            groups.update(new_rows)
+
+            # Hanya baris sejak changed_at terakhir site ini di combined (dikurangi overlap) yang dibaca, duplikat dilewati
+            since = combine_since(self.cursor, adapter.combined_table, adapter.scrap_table, adapter.primary_table)
+            self.cursor.execute(f"""
+                INSERT INTO {adapter.combined_table} (car_id, car_scrap_id, old_price, new_price, changed_at)
+                SELECT c.id, cs.id, ph.old_price, ph.new_price, ph.changed_at
+                FROM {adapter.history_table} ph
+                JOIN {adapter.scrap_table} cs ON ph.car_id = cs.id
+                JOIN {adapter.primary_table} c ON cs.listing_url = c.listing_url
+                WHERE ph.car_id IS NOT NULL
+                  AND ph.changed_at >= %s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM {adapter.combined_table} pc
+                      WHERE pc.car_scrap_id = cs.id AND pc.changed_at = ph.changed_at
+                  );
+            """, (since,))
+            history = self.cursor.rowcount
+
+            self.conn.commit()
+            self.log.info(
+                f"Sinkronisasi {adapter.scrap_table} -> {adapter.primary_table} selesai: "
+                f"{updated} diupdate, {inserted} baru, {history} perubahan harga ke {adapter.combined_table}."
+            )
+            geocode_after_run(self.conn, adapter.primary_table)
+            refresh_after_run(self.conn, groups=groups)
+            return True
+        except Exception as e:
+            self.conn.rollback()
+            self.log.error(f"Error saat sinkronisasi data: {e}")
+            return False
+        finally:
+            metrics.observe_stage(self.site, "sync", time.monotonic() - started)
+
+    def export_data(self):
+        try:
+            self.cursor.execute(f"SELECT * FROM {self.adapter.scrap_table}")
+            rows = self.cursor.fetchall()
+            columns = [desc[0] for desc in self.cursor.description]
+            return [dict(zip(columns, row)) for row in rows]
+        except Exception as e:
+            self.log.error(f"❌ Error export data: {e}")
+            return []
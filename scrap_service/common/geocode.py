@@ -0,0 +1,401 @@
+"""
+Geocoding offline: teks lokasi listing ("Selangor - Pelabuhan Klang") -> postcode + lat/long
+dari dataset postcode hasil scraping location_service (scraped_details*.csv), tanpa request jaringan.
+
+CSV dibaca sekali ke cache SQLite (dibangun ulang otomatis kalau CSV berubah), lalu dimuat ke
+index in-memory per (negeri, area). Area dicocokkan ke kolom location dan post_office;
+urutan resolve: cocok persis -> fuzzy (difflib) di negeri yang sama -> titik tengah negeri.
+
+Kolom geo_* di tabel cars diisi saat sync_to_cars (hanya baris yang lokasinya berubah)
+dan untuk data lama lewat backfill:
+
+    python -m scrap_service.common.geocode --backfill
+    python -m scrap_service.common.geocode --resolve "Pulau Pinang - Butterworth"
+    python -m scrap_service.common.geocode --rebuild
+"""
+import os
+import re
+import sys
+import csv
+import glob
+import json
+import sqlite3
+import difflib
+import logging
+import argparse
+import threading
+from pathlib import Path
+from functools import lru_cache
+from collections import Counter, defaultdict
+
+from scrap_service.common.normalize import MALAYSIA_STATES, STATE_ALIASES, normalize_state
+
+logger = logging.getLogger("geocode")
+
+# ===== Konfigurasi Env
+DB_TABLE_PRIMARY = os.getenv("DB_TABLE_PRIMARY", "cars")
+GEOCODE_CSV_GLOB = os.getenv(
+    "GEOCODE_CSV_GLOB",
+    str(Path(__file__).resolve().parents[1] / "location_service_playwirght" / "scraped_details*.csv")
+)
+GEOCODE_DB = Path(os.getenv(
+    "GEOCODE_DB",
+    Path(__file__).resolve().parents[2] / "storage" / "geocode" / "geocode.sqlite"
+))
+# Skor minimum difflib (0-1) untuk menerima area yang tidak persis sama
+GEOCODE_FUZZY_CUTOFF = float(os.getenv("GEOCODE_FUZZY_CUTOFF", "0.85"))
+GEOCODE_BATCH_SIZE = int(os.getenv("GEOCODE_BATCH_SIZE", "1000"))
+GEOCODE_AUTO = os.getenv("GEOCODE_AUTO", "true").lower() == "true"
+
+PRECISION_AREA = "area"
+PRECISION_POST_OFFICE = "post_office"
+PRECISION_FUZZY = "fuzzy"
+PRECISION_STATE = "state"
+
+GEO_COLUMNS = ["geo_postcode", "geo_lat", "geo_lon", "geo_precision", "geo_lokasi"]
+CANONICAL_STATES = {normalize_state(state) for state in MALAYSIA_STATES}
+# Bagian lokasi yang seluruhnya nama negeri/alias dibuang; di dalam nama area hanya jadi kandidat
+# cadangan ("Pulau Pinang Butterworth" -> "butterworth"), karena "Johor Bahru" / "Kuala Selangor" adalah area
+STATE_WORDS = re.compile(r"\b(" + "|".join(
+    sorted({*MALAYSIA_STATES, *STATE_ALIASES, "wp", "w p"}, key=len, reverse=True)
+) + r")\b")
+
+_ensured_tables = set()
+_index = None
+_index_lock = threading.Lock()
+
+
+def area_key(value):
+    """Kunci area: huruf kecil, tanda baca jadi spasi ("Bandar Baru-Pontian" -> "bandar baru pontian")."""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(value or "").lower()).split())
+
+
+def split_lokasi(lokasi):
+    """
+    Pisahkan lokasi listing jadi (negeri, [kandidat area]). Negeri None kalau tidak dikenali.
+    "Selangor - Pelabuhan Klang" -> ("selangor", ["pelabuhan klang"])
+    "Butterworth, Pulau Pinang"  -> ("penang", ["butterworth"])
+    "Johor - Johor Bahru"        -> ("johor", ["johor bahru", "bahru"])
+    """
+    text = str(lokasi or "").strip()
+    if not text:
+        return None, []
+    state = normalize_state(text)
+    if state not in CANONICAL_STATES:
+        state = None
+    candidates = []
+    for part in re.split(r"\s*[-,/|]\s*", text):
+        key = area_key(part)
+        if not key or STATE_WORDS.fullmatch(key):
+            continue
+        stripped = " ".join(STATE_WORDS.sub(" ", key).split())
+        for candidate in (key, stripped):
+            if candidate and candidate not in candidates:
+                candidates.append(candidate)
+    return state, candidates
+
+
+# ================== Cache SQLite
+
+def _source_files(pattern=None):
+    return sorted(glob.glob(pattern or GEOCODE_CSV_GLOB))
+
+
+def _signature(files):
+    """Ringkasan path+ukuran+mtime CSV; berubah -> cache SQLite dibangun ulang."""
+    return json.dumps([[path, os.path.getsize(path), int(os.path.getmtime(path))] for path in files])
+
+
+def _read_points(files):
+    """Baris unik (negeri, location, post_office, postcode, lat, lon) dari semua CSV."""
+    seen = set()
+    for path in files:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    lat, lon = float(row["latitude"]), float(row["longitude"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                state = normalize_state(row.get("state"))
+                key = (state, area_key(row.get("location")), area_key(row.get("post_office")),
+                       (row.get("post_code") or "").strip(), lat, lon)
+                if state and key not in seen:
+                    seen.add(key)
+                    yield key
+
+
+def build_cache(db_path=None, pattern=None):
+    """Bangun ulang cache SQLite dari CSV: satu baris per (negeri, area, jenis) dengan centroid dan postcode terbanyak."""
+    db_path = Path(db_path or GEOCODE_DB)
+    files = _source_files(pattern)
+    groups = defaultdict(list)
+    for state, location, post_office, postcode, lat, lon in _read_points(files):
+        if location:
+            groups[(state, location, PRECISION_AREA)].append((postcode, lat, lon))
+        if post_office:
+            groups[(state, post_office, PRECISION_POST_OFFICE)].append((postcode, lat, lon))
+        groups[(state, "", PRECISION_STATE)].append((postcode, lat, lon))
+
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("DROP TABLE IF EXISTS places")
+        conn.execute("""
+            CREATE TABLE places (
+                state TEXT NOT NULL, area TEXT NOT NULL, kind TEXT NOT NULL,
+                postcode TEXT, lat REAL, lon REAL, points INTEGER,
+                PRIMARY KEY (state, area, kind)
+            )
+        """)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        rows = []
+        for (state, area, kind), points in groups.items():
+            postcodes = Counter(p[0] for p in points if p[0])
+            rows.append((
+                state, area, kind,
+                postcodes.most_common(1)[0][0] if postcodes else None,
+                sum(p[1] for p in points) / len(points),
+                sum(p[2] for p in points) / len(points),
+                len(points),
+            ))
+        conn.executemany("INSERT INTO places VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('signature', ?)", (_signature(files),))
+        conn.commit()
+    finally:
+        conn.close()
+    logger.info(f"🗺️ Cache geocode dibangun: {len(rows)} tempat dari {len(files)} CSV -> {db_path}")
+    return len(rows)
+
+
+def _cache_fresh(db_path, files):
+    if not db_path.exists():
+        return False
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+    return bool(row) and row[0] == _signature(files)
+
+
+# ================== Index in-memory
+
+class GeoIndex:
+    """Index (negeri, area) -> tempat, dimuat dari cache SQLite."""
+
+    def __init__(self, rows):
+        self.places = {}
+        self.states = {}
+        self.areas_by_state = defaultdict(list)
+        self.all_areas = defaultdict(list)
+        for state, area, kind, postcode, lat, lon, points in rows:
+            place = {"postcode": postcode, "lat": lat, "lon": lon, "precision": kind, "points": points}
+            if kind == PRECISION_STATE:
+                self.states[state] = place
+                continue
+            # location lebih spesifik dari post_office, jangan ditimpa
+            if (state, area) not in self.places or kind == PRECISION_AREA:
+                if (state, area) not in self.places:
+                    self.areas_by_state[state].append(area)
+                    self.all_areas[area].append(state)
+                self.places[(state, area)] = place
+
+    def __len__(self):
+        return len(self.places)
+
+    def _exact(self, state, area):
+        if state:
+            return self.places.get((state, area))
+        # Negeri tidak disebut: hanya terima kalau nama area unik di seluruh dataset
+        states = self.all_areas.get(area, [])
+        return self.places[(states[0], area)] if len(states) == 1 else None
+
+    def _fuzzy(self, state, area):
+        choices = self.areas_by_state.get(state, []) if state else list(self.all_areas)
+        match = difflib.get_close_matches(area, choices, n=1, cutoff=GEOCODE_FUZZY_CUTOFF)
+        return self._exact(state, match[0]) if match else None
+
+    def resolve(self, lokasi):
+        """Dict postcode/lat/lon/precision untuk teks lokasi, atau None kalau tidak ketemu."""
+        state, candidates = split_lokasi(lokasi)
+        for lookup, precision in ((self._exact, None), (self._fuzzy, PRECISION_FUZZY)):
+            for area in candidates:
+                place = lookup(state, area)
+                if place:
+                    return {
+                        "postcode": place["postcode"], "lat": place["lat"], "lon": place["lon"],
+                        "precision": precision or place["precision"],
+                    }
+        place = self.states.get(state)
+        if place:
+            return {"postcode": None, "lat": place["lat"], "lon": place["lon"], "precision": PRECISION_STATE}
+        return None
+
+
+def load_index(rebuild=False, db_path=None, pattern=None):
+    """Muat index sekali per proses; cache SQLite dibangun ulang bila CSV berubah atau rebuild=True."""
+    global _index
+    with _index_lock:
+        if _index is not None and not rebuild:
+            return _index
+        db_path = Path(db_path or GEOCODE_DB)
+        if rebuild or not _cache_fresh(db_path, _source_files(pattern)):
+            build_cache(db_path, pattern)
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute("SELECT state, area, kind, postcode, lat, lon, points FROM places").fetchall()
+        finally:
+            conn.close()
+        _index = GeoIndex(rows)
+        resolve.cache_clear()
+        logger.info(f"🗺️ Index geocode dimuat: {len(_index)} area, {len(_index.states)} negeri")
+        return _index
+
+
+@lru_cache(maxsize=20000)
+def resolve(lokasi):
+    """Resolve lokasi dengan index global (di-cache per teks lokasi)."""
+    return load_index().resolve(lokasi)
+
+
+# ================== Kolom geo_* di Postgres
+
+def ensure_geo_columns(conn, table=DB_TABLE_PRIMARY):
+    """Tambahkan kolom geo_* + index pending jika belum ada (cek information_schema dulu)."""
+    if table in _ensured_tables:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = %s AND column_name = ANY(%s)
+        """, (table, GEO_COLUMNS))
+        if len(cursor.fetchall()) < len(GEO_COLUMNS):
+            logger.info(f"🧱 Menambahkan kolom geo ke {table}...")
+            cursor.execute(f"""
+                ALTER TABLE {table}
+                    ADD COLUMN IF NOT EXISTS geo_postcode VARCHAR(10),
+                    ADD COLUMN IF NOT EXISTS geo_lat DOUBLE PRECISION,
+                    ADD COLUMN IF NOT EXISTS geo_lon DOUBLE PRECISION,
+                    ADD COLUMN IF NOT EXISTS geo_precision VARCHAR(20),
+                    ADD COLUMN IF NOT EXISTS geo_lokasi TEXT
+            """)
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_geo_postcode ON {table} (geo_postcode)")
+            cursor.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_{table}_geo_pending ON {table} (id)
+                WHERE lokasi IS NOT NULL AND geo_lokasi IS DISTINCT FROM lokasi
+            """)
+        conn.commit()
+        _ensured_tables.add(table)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def geocode_pending(conn, table=DB_TABLE_PRIMARY, batch_size=GEOCODE_BATCH_SIZE, full=False, log=None):
+    """
+    Isi geo_* untuk baris yang lokasinya belum pernah di-resolve (geo_lokasi != lokasi),
+    per batch keyset id, commit per batch. geo_lokasi menyimpan teks yang di-resolve,
+    jadi baris yang tidak ketemu tidak dicoba ulang sampai lokasinya berubah atau full=True.
+    """
+    from psycopg2.extras import execute_values
+
+    log = log or logger
+    ensure_geo_columns(conn, table)
+    load_index()
+
+    pending_sql = "lokasi IS NOT NULL" if full else "lokasi IS NOT NULL AND geo_lokasi IS DISTINCT FROM lokasi"
+    cursor = conn.cursor()
+    last_id = 0
+    scanned = 0
+    resolved = 0
+    try:
+        while True:
+            cursor.execute(f"""
+                SELECT id, lokasi FROM {table}
+                WHERE id > %s AND {pending_sql}
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            values = []
+            for car_id, lokasi in rows:
+                geo = resolve(lokasi) or {}
+                if geo:
+                    resolved += 1
+                values.append((car_id, geo.get("postcode"), geo.get("lat"), geo.get("lon"), geo.get("precision"), lokasi))
+            execute_values(cursor, f"""
+                UPDATE {table} AS t
+                SET geo_postcode = v.geo_postcode,
+                    geo_lat = v.geo_lat,
+                    geo_lon = v.geo_lon,
+                    geo_precision = v.geo_precision,
+                    geo_lokasi = v.geo_lokasi
+                FROM (VALUES %s) AS v (id, geo_postcode, geo_lat, geo_lon, geo_precision, geo_lokasi)
+                WHERE t.id = v.id
+            """, values, template="(%s, %s, %s::double precision, %s::double precision, %s, %s)")
+            conn.commit()
+
+            scanned += len(rows)
+            last_id = rows[-1][0]
+            if full or scanned % (batch_size * 10) == 0:
+                log.info(f"🔁 Geocode {table}: {scanned} baris dicek, {resolved} ketemu (id terakhir {last_id})")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    if scanned:
+        log.info(f"🗺️ Geocode {table} selesai: {resolved}/{scanned} lokasi ketemu.")
+    return {"scanned": scanned, "resolved": resolved}
+
+
+def geocode_after_run(conn, table=DB_TABLE_PRIMARY, log=None):
+    """Geocode baris baru/berubah setelah sync; gagal geocode tidak menggagalkan sync."""
+    if not GEOCODE_AUTO or conn is None:
+        return None
+    try:
+        return geocode_pending(conn, table, log=log)
+    except Exception as e:
+        (log or logger).warning(f"⚠️ Gagal geocode lokasi: {e}")
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Geocoding lokasi listing dari dataset postcode")
+    parser.add_argument("--backfill", action="store_true", help="Isi kolom geo_* di tabel")
+    parser.add_argument("--full", action="store_true", help="Resolve ulang semua baris, bukan hanya yang berubah")
+    parser.add_argument("--table", nargs="+", default=[DB_TABLE_PRIMARY])
+    parser.add_argument("--batch-size", type=int, default=GEOCODE_BATCH_SIZE)
+    parser.add_argument("--rebuild", action="store_true", help="Bangun ulang cache SQLite dari CSV")
+    parser.add_argument("--resolve", nargs="+", metavar="LOKASI", help="Cetak hasil resolve teks lokasi")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_index(rebuild=args.rebuild)
+
+    for lokasi in args.resolve or []:
+        print(f"{lokasi} -> {json.dumps(resolve(lokasi))}")
+
+    if args.backfill:
+        from scrap_service.common.database import get_connection
+
+        conn = get_connection()
+        try:
+            for table in args.table:
+                geocode_pending(conn, table, args.batch_size, full=args.full)
+        finally:
+            conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
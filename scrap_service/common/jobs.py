@@ -0,0 +1,218 @@
+import os
+import uuid
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import jsonify
+
+from scrap_service.common.logsetup import log_context
+
+logger = logging.getLogger("jobs")
+
+# ===== Konfigurasi Env
+# Jumlah job yang boleh berjalan bersamaan per service; sisanya antri.
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "3"))
+# Jumlah job selesai yang tetap disimpan untuk GET /jobs/<id>.
+JOB_HISTORY_LIMIT = int(os.getenv("JOB_HISTORY_LIMIT", "100"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+# lock_key untuk job yang menjelajahi semua brand: bentrok dengan semua job lain dari kind yang sama
+ALL_KEYS = "*"
+
+
+def keys_conflict(a, b):
+    return a == b or ALL_KEYS in (a, b)
+
+
+class JobConflict(Exception):
+    def __init__(self, job):
+        super().__init__(f"Job {job.kind} untuk '{job.lock_key}' masih berjalan ({job.id})")
+        self.job = job
+
+
+class Job:
+    def __init__(self, kind, params=None, lock_key=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params or {}
+        self.lock_key = lock_key
+        self.status = QUEUED
+        self.error = None
+        self.result = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+        self.service = None
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+    def request_cancel(self):
+        self.cancel_requested = True
+        if self.service is not None:
+            self.service.stop_flag = True
+
+    def progress(self):
+        progress = getattr(self.service, "progress", None)
+        return dict(progress) if progress else {}
+
+    def to_dict(self):
+        def fmt(value):
+            return value.isoformat(timespec="seconds") if value else None
+
+        end = self.finished_at or datetime.now()
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "cancel_requested": self.cancel_requested,
+            "progress": self.progress(),
+            "error": self.error,
+            "result": self.result,
+            "created_at": fmt(self.created_at),
+            "started_at": fmt(self.started_at),
+            "finished_at": fmt(self.finished_at),
+            "duration": round((end - self.started_at).total_seconds(), 1) if self.started_at else None,
+        }
+
+
+class JobManager:
+    """
+    Menjalankan job scraping panjang di thread pool supaya request Flask langsung selesai.
+    Setiap job membuat instance service sendiri (lewat factory), jadi beberapa brand bisa
+    jalan bersamaan tanpa berbagi browser / koneksi DB. Pembatalan memakai stop_flag service.
+    """
+
+    def __init__(self, max_workers=JOB_MAX_WORKERS, history_limit=JOB_HISTORY_LIMIT):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self.history_limit = history_limit
+
+    def submit(self, kind, factory, run, params=None, lock_key=None):
+        """
+        Daftarkan job baru. `factory()` membuat instance service, `run(service)` menjalankan job.
+        Raise JobConflict jika job dengan kind dan lock_key yang sama (atau ALL_KEYS) masih aktif.
+        """
+        with self._lock:
+            if lock_key is not None:
+                for job in self._jobs.values():
+                    if job.active and job.kind == kind and job.lock_key is not None \
+                            and keys_conflict(job.lock_key, lock_key):
+                        raise JobConflict(job)
+            job = Job(kind, params, lock_key)
+            self._jobs[job.id] = job
+            self._trim()
+
+        self._executor.submit(self._run, job, factory, run)
+        logger.info(f"📥 Job {job.kind} {job.id} masuk antrian: {job.params}")
+        return job
+
+    def _run(self, job, factory, run):
+        if job.cancel_requested:
+            job.status = CANCELLED
+            job.finished_at = datetime.now()
+            return
+
+        with log_context(job_id=job.id, job_kind=job.kind):
+            self._execute(job, factory, run)
+
+    def _execute(self, job, factory, run):
+        job.status = RUNNING
+        job.started_at = datetime.now()
+        logger.info(f"🚀 Job {job.kind} {job.id} mulai")
+        try:
+            job.service = factory()
+            # Pembatalan yang datang selama factory berjalan dicek di sini; yang datang setelahnya
+            # lewat stop_flag, yang tidak boleh direset oleh run() (service dibuat baru per job).
+            if not job.cancel_requested:
+                job.result = run(job.service)
+            job.status = CANCELLED if job.cancel_requested else DONE
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            logger.exception(f"❌ Job {job.kind} {job.id} gagal: {e}")
+        finally:
+            job.finished_at = datetime.now()
+            close = getattr(job.service, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning(f"⚠️ Gagal menutup service job {job.id}: {e}")
+        logger.info(f"🏁 Job {job.kind} {job.id} selesai dengan status {job.status}")
+
+    def _trim(self):
+        finished = [j for j in self._jobs.values() if not j.active]
+        excess = len(finished) - self.history_limit
+        if excess > 0:
+            for job in sorted(finished, key=lambda j: j.created_at)[:excess]:
+                self._jobs.pop(job.id, None)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, kind=None):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [j for j in sorted(jobs, key=lambda j: j.created_at) if kind is None or j.kind == kind]
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job and job.active:
+            job.request_cancel()
+            logger.info(f"🛑 Pembatalan diminta untuk job {job.kind} {job.id}")
+        return job
+
+    def cancel_all(self, kind=None):
+        jobs = [j for j in self.list(kind) if j.active]
+        for job in jobs:
+            self.cancel(job.id)
+        return jobs
+
+
+def accepted_response(job):
+    """Response 202 untuk job yang baru dimasukkan antrian."""
+    return jsonify({
+        "message": f"Job {job.kind} diterima",
+        "job_id": job.id,
+        "status_url": f"/jobs/{job.id}"
+    }), 202
+
+
+def conflict_response(error):
+    return jsonify({"error": str(error), "job_id": error.job.id}), 409
+
+
+def register_job_routes(app, manager):
+    """Tambahkan endpoint GET /jobs, GET /jobs/<id> dan POST /jobs/<id>/cancel ke app Flask."""
+
+    @app.route('/jobs', methods=['GET'])
+    def list_jobs():
+        return jsonify([job.to_dict() for job in manager.list()]), 200
+
+    @app.route('/jobs/<job_id>', methods=['GET'])
+    def get_job(job_id):
+        job = manager.get(job_id)
+        if not job:
+            return jsonify({"error": f"Job {job_id} tidak ditemukan"}), 404
+        return jsonify(job.to_dict()), 200
+
+    @app.route('/jobs/<job_id>/cancel', methods=['POST'])
+    def cancel_job(job_id):
+        job = manager.cancel(job_id)
+        if not job:
+            return jsonify({"error": f"Job {job_id} tidak ditemukan"}), 404
+        return jsonify(job.to_dict()), 200
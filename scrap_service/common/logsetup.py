@@ -0,0 +1,193 @@
+"""
+Logging bersama berbasis QueueHandler/QueueListener.
+
+Thread scraping hanya memasukkan record ke antrian; satu thread listener yang menulis ke
+console, file teks (format lama) dan file JSON-lines, keduanya dengan rotasi ukuran.
+Setiap event JSON membawa konteks job_id / site / url / stage / duration bila ada,
+sehingga timing bisa diagregasi setelah run:
+
+    from scrap_service.common.logsetup import setup_logging, log_context
+    setup_logging("scrape_carlistmy")
+    with log_context(site="carlistmy", url=url):
+        ...
+
+    python -m scrap_service.common.logsetup --timings logs/scrape_carlistmy_20260101.jsonl
+"""
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import argparse
+import threading
+import contextvars
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+from collections import defaultdict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# ===== Konfigurasi Env
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_JSON = os.getenv("LOG_JSON", "true").lower() == "true"
+LOG_MAX_MB = int(os.getenv("LOG_MAX_MB", "50"))
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "5"))
+
+LOG_DIR = Path(__file__).resolve().parents[2] / "logs"
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# Field terstruktur yang ikut ditulis ke JSON bila ada di record (lewat extra= atau log_context)
+EVENT_FIELDS = ("job_id", "job_kind", "site", "url", "stage", "duration", "python_mb", "browser_mb", "available_mb")
+# Logger khusus event timing dari metrics; hanya ditulis ke file JSON
+TIMINGS_LOGGER = "timings"
+
+_context = contextvars.ContextVar("log_context", default={})
+_listener = None
+_lock = threading.Lock()
+
+
+@contextmanager
+def log_context(**fields):
+    """Tambahkan field konteks ke semua log di blok ini (per thread / per task)."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_context():
+    return dict(_context.get())
+
+
+class ContextFilter(logging.Filter):
+    """Salin konteks aktif ke record di thread pemanggil, sebelum masuk antrian."""
+
+    def filter(self, record):
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class SkipTimings(logging.Filter):
+    def filter(self, record):
+        return record.name != TIMINGS_LOGGER
+
+
+class JsonFormatter(logging.Formatter):
+    """Satu event JSON per baris."""
+
+    def format(self, record):
+        event = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for field in EVENT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                event[field] = value
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+def _rotating(path, formatter):
+    handler = RotatingFileHandler(
+        path, maxBytes=LOG_MAX_MB * 1024 * 1024, backupCount=LOG_BACKUPS, encoding="utf-8", delay=True
+    )
+    handler.setFormatter(formatter)
+    return handler
+
+
+def setup_logging(name, log_dir=LOG_DIR, level=None, stream=None, text_format=TEXT_FORMAT):
+    """
+    Pasang pipeline logging untuk proses ini: logs/<name>_<YYYYMMDD>.log (+ .jsonl).
+    Seperti basicConfig, hanya panggilan pertama yang berlaku; panggilan berikutnya no-op.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        log_dir = Path(log_dir)
+        log_dir.mkdir(parents=True, exist_ok=True)
+        date = datetime.now().strftime("%Y%m%d")
+
+        text_formatter = logging.Formatter(text_format)
+        console = logging.StreamHandler(stream or sys.stderr)
+        console.setFormatter(text_formatter)
+        text_file = _rotating(log_dir / f"{name}_{date}.log", text_formatter)
+        for handler in (console, text_file):
+            handler.addFilter(SkipTimings())
+        handlers = [console, text_file]
+        if LOG_JSON:
+            handlers.append(_rotating(log_dir / f"{name}_{date}.jsonl", JsonFormatter()))
+
+        log_queue = queue.Queue(-1)
+        queue_handler = QueueHandler(log_queue)
+        queue_handler.addFilter(ContextFilter())
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level or LOG_LEVEL)
+
+        timings = logging.getLogger(TIMINGS_LOGGER)
+        timings.propagate = False
+        timings.setLevel(logging.INFO)
+        if LOG_JSON:
+            timings.addHandler(queue_handler)
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown)
+        return _listener
+
+
+def shutdown():
+    """Kosongkan antrian lalu hentikan listener (dipanggil otomatis saat proses selesai)."""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def summarize_timings(paths):
+    """Agregasi event timing dari file JSONL -> {(site, stage): [count, total, max]}."""
+    summary = defaultdict(lambda: [0, 0.0, 0.0])
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event.get("logger") != TIMINGS_LOGGER or "duration" not in event:
+                    continue
+                row = summary[(event.get("site"), event.get("stage"))]
+                row[0] += 1
+                row[1] += event["duration"]
+                row[2] = max(row[2], event["duration"])
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ringkas event timing dari log JSON-lines")
+    parser.add_argument("--timings", nargs="+", required=True, help="File .jsonl yang diringkas")
+    args = parser.parse_args(argv)
+
+    summary = summarize_timings(args.timings)
+    for (site, stage), (count, total, peak) in sorted(summary.items(), key=lambda item: -item[1][1]):
+        print(f"{site}/{stage}: n={count} total={total:.1f}s rata2={total / count:.3f}s maks={peak:.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,383 @@
+"""
+Statistik pasar yang sudah diringkas per (brand, model, variant, year) di tabel market_stats:
+median/p25/p75 harga, jumlah listing aktif/terjual/unik (cluster dedup), days-on-market
+dari sold_at, dan frekuensi penurunan harga dari tabel history combined.
+
+Refresh inkremental: hanya grup yang punya listing dengan last_scraped_at (diisi scraper,
+sync dan tracker) atau perubahan harga sejak refresh terakhir yang dihitung ulang, ditambah
+grup yang diubah sync_to_cars (dikirim langsung lewat `groups`, karena sync menyalin
+last_scraped_at lama dari tabel scrap yang bisa lebih tua dari refresh terakhir).
+Dipanggil setelah sync_to_cars dan setelah tracker selesai; dashboard membaca lewat
+GET /stats/market di app Flask.
+
+    python -m scrap_service.common.market_stats            # refresh inkremental
+    python -m scrap_service.common.market_stats --full     # hitung ulang semua grup
+"""
+import os
+import sys
+import logging
+import argparse
+from datetime import datetime
+
+logger = logging.getLogger("market_stats")
+
+# ===== Konfigurasi Env
+DB_TABLE_PRIMARY = os.getenv("DB_TABLE_PRIMARY", "cars")
+DB_TABLE_HISTORY_PRICE_COMBINED = os.getenv("DB_TABLE_HISTORY_PRICE_COMBINED", "price_history_combined")
+DB_TABLE_MARKET_STATS = os.getenv("DB_TABLE_MARKET_STATS", "market_stats")
+DB_TABLE_DEDUP = os.getenv("DB_TABLE_DEDUP", "listing_dedup")
+MARKET_STATS_AUTO_REFRESH = os.getenv("MARKET_STATS_AUTO_REFRESH", "true").lower() == "true"
+MARKET_STATS_MAX_LIMIT = int(os.getenv("MARKET_STATS_MAX_LIMIT", "500"))
+
+STATE_TABLE = "market_stats_state"
+GROUP_COLUMNS = ["brand", "model", "variant", "year"]
+STAT_COLUMNS = [
+    "listings", "unique_listings", "active_listings", "sold_listings",
+    "median_price", "p25_price", "p75_price", "min_price", "max_price",
+    "median_mileage_km", "median_days_on_market", "avg_days_on_market",
+    "cars_with_drop", "price_drops", "price_increases", "drop_rate", "avg_drop_pct",
+    "refreshed_at",
+]
+
+
+# ================== Skema
+
+_ensured = set()
+
+
+def ensure_market_stats_tables(conn, table=DB_TABLE_MARKET_STATS):
+    if table in _ensured:
+        return
+    with conn.cursor() as cursor:
+        # Kolom grup NOT NULL ('' untuk nilai kosong) supaya bisa jadi primary key
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                brand TEXT NOT NULL,
+                model TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                year TEXT NOT NULL,
+                listings INTEGER NOT NULL,
+                unique_listings INTEGER,
+                active_listings INTEGER NOT NULL,
+                sold_listings INTEGER NOT NULL,
+                median_price NUMERIC,
+                p25_price NUMERIC,
+                p75_price NUMERIC,
+                min_price NUMERIC,
+                max_price NUMERIC,
+                median_mileage_km NUMERIC,
+                median_days_on_market NUMERIC,
+                avg_days_on_market NUMERIC,
+                cars_with_drop INTEGER NOT NULL DEFAULT 0,
+                price_drops INTEGER NOT NULL DEFAULT 0,
+                price_increases INTEGER NOT NULL DEFAULT 0,
+                drop_rate NUMERIC,
+                avg_drop_pct NUMERIC,
+                refreshed_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (brand, model, variant, year)
+            )
+        """)
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS unique_listings INTEGER")
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+                name TEXT PRIMARY KEY,
+                refreshed_at TIMESTAMP NOT NULL
+            )
+        """)
+    conn.commit()
+    _ensured.add(table)
+
+
+def _columns(cursor, table):
+    cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", (table,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _table_exists(cursor, table):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+    return cursor.fetchone()[0]
+
+
+# ================== Refresh
+
+def group_key_sql(alias):
+    """Ekspresi kunci grup (brand, model, variant, year) sebagai text, '' untuk NULL."""
+    return ", ".join(f"COALESCE({alias}.{column}::text, '')" for column in GROUP_COLUMNS)
+
+
+def refresh_market_stats(conn, full=False, primary=DB_TABLE_PRIMARY,
+                         history=DB_TABLE_HISTORY_PRICE_COMBINED, table=DB_TABLE_MARKET_STATS, log=None,
+                         groups=None):
+    """
+    Hitung ulang statistik untuk grup yang berubah sejak refresh terakhir (atau semua grup
+    jika `full`), ditambah `groups` (tuple kunci grup dari group_key_sql) yang pasti berubah.
+    Return jumlah grup yang dihitung ulang.
+    """
+    from psycopg2.extras import execute_values
+
+    log = log or logger
+    ensure_market_stats_tables(conn, table)
+    started = datetime.now()
+    cursor = conn.cursor()
+    try:
+        columns = _columns(cursor, primary)
+        has_history = _table_exists(cursor, history)
+        has_dedup = _table_exists(cursor, DB_TABLE_DEDUP)
+        listed_at = [c for c in ("posted_at", "created_at") if c in columns]
+        listed_sql = f"COALESCE({', '.join(f'c.{c}::timestamp' for c in listed_at)})" if listed_at else "NULL::timestamp"
+        status_sql = "c.status" if "status" in columns else "NULL::text"
+        sold_sql = "c.sold_at::timestamp" if "sold_at" in columns else "NULL::timestamp"
+        mileage_sql = "c.mileage_km" if "mileage_km" in columns else "NULL::integer"
+        # Mobil unik = cluster dedup lintas situs; tanpa tabel dedup setiap listing dihitung unik
+        cluster_sql = "COALESCE(dd.cluster_id, c.id)" if has_dedup else "c.id"
+        dedup_join = f"LEFT JOIN {DB_TABLE_DEDUP} dd ON dd.car_id = c.id" if has_dedup else ""
+
+        cursor.execute(f"SELECT refreshed_at FROM {STATE_TABLE} WHERE name = %s", (table,))
+        row = cursor.fetchone()
+        since = None if full or not row else row[0]
+
+        # Grup yang perlu dihitung ulang, disimpan di temp table supaya dipakai beberapa kali
+        cursor.execute("DROP TABLE IF EXISTS market_stats_dirty")
+        cursor.execute("""
+            CREATE TEMP TABLE market_stats_dirty (
+                brand TEXT, model TEXT, variant TEXT, year TEXT, PRIMARY KEY (brand, model, variant, year)
+            ) ON COMMIT DROP
+        """)
+        if since is None:
+            cursor.execute(f"""
+                INSERT INTO market_stats_dirty SELECT DISTINCT {group_key_sql('c')} FROM {primary} c
+            """)
+            cursor.execute(f"INSERT INTO market_stats_dirty SELECT brand, model, variant, year FROM {table} ON CONFLICT DO NOTHING")
+        else:
+            cursor.execute(f"""
+                INSERT INTO market_stats_dirty
+                SELECT DISTINCT {group_key_sql('c')} FROM {primary} c WHERE c.last_scraped_at >= %s
+            """, (since,))
+            if has_history:
+                cursor.execute(f"""
+                    INSERT INTO market_stats_dirty
+                    SELECT DISTINCT {group_key_sql('c')}
+                    FROM {history} h JOIN {primary} c ON c.id = h.car_id
+                    WHERE h.changed_at >= %s
+                    ON CONFLICT DO NOTHING
+                """, (since,))
+            if groups:
+                execute_values(
+                    cursor,
+                    "INSERT INTO market_stats_dirty VALUES %s ON CONFLICT DO NOTHING",
+                    list(groups),
+                )
+        cursor.execute("SELECT COUNT(*) FROM market_stats_dirty")
+        dirty = cursor.fetchone()[0]
+
+        history_cte = f"""
+            drops AS (
+                SELECT h.car_id,
+                       COUNT(*) FILTER (WHERE h.new_price < h.old_price) AS drops,
+                       COUNT(*) FILTER (WHERE h.new_price > h.old_price) AS increases,
+                       AVG((h.old_price - h.new_price) * 100.0 / NULLIF(h.old_price, 0))
+                           FILTER (WHERE h.new_price < h.old_price) AS drop_pct
+                FROM {history} h
+                JOIN scoped s ON s.id = h.car_id
+                GROUP BY h.car_id
+            )
+        """ if has_history else """
+            drops AS (
+                SELECT NULL::integer AS car_id, 0::bigint AS drops, 0::bigint AS increases, NULL::numeric AS drop_pct
+                WHERE false
+            )
+        """
+
+        if dirty:
+            cursor.execute(f"""
+                WITH scoped AS (
+                    SELECT c.id, c.price,
+                           {mileage_sql} AS mileage_km, {status_sql} AS status,
+                           EXTRACT(EPOCH FROM ({sold_sql} - {listed_sql})) / 86400.0 AS days_on_market,
+                           {cluster_sql} AS cluster_id,
+                           c.brand, c.model, c.variant, c.year
+                    FROM {primary} c
+                    JOIN market_stats_dirty d
+                      ON (d.brand, d.model, d.variant, d.year) = ({group_key_sql('c')})
+                    {dedup_join}
+                ),
+                {history_cte}
+                INSERT INTO {table} ({', '.join(GROUP_COLUMNS + STAT_COLUMNS)})
+                SELECT COALESCE(s.brand::text, ''), COALESCE(s.model::text, ''),
+                       COALESCE(s.variant::text, ''), COALESCE(s.year::text, ''),
+                       COUNT(*),
+                       COUNT(DISTINCT s.cluster_id),
+                       COUNT(*) FILTER (WHERE s.status IS NULL OR s.status <> 'sold'),
+                       COUNT(*) FILTER (WHERE s.status = 'sold'),
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY s.price),
+                       percentile_cont(0.25) WITHIN GROUP (ORDER BY s.price),
+                       percentile_cont(0.75) WITHIN GROUP (ORDER BY s.price),
+                       MIN(s.price), MAX(s.price),
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY s.mileage_km),
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY s.days_on_market)
+                           FILTER (WHERE s.days_on_market >= 0),
+                       AVG(s.days_on_market) FILTER (WHERE s.days_on_market >= 0),
+                       COUNT(*) FILTER (WHERE d.drops > 0),
+                       COALESCE(SUM(d.drops), 0),
+                       COALESCE(SUM(d.increases), 0),
+                       (COUNT(*) FILTER (WHERE d.drops > 0))::numeric / COUNT(*),
+                       AVG(d.drop_pct),
+                       %s
+                FROM scoped s
+                LEFT JOIN drops d ON d.car_id = s.id
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT (brand, model, variant, year) DO UPDATE SET
+                    {', '.join(f'{c} = EXCLUDED.{c}' for c in STAT_COLUMNS)}
+            """, (started,))
+            # Grup yang sudah tidak punya listing (mis. brand dikoreksi) dihapus
+            cursor.execute(f"""
+                DELETE FROM {table} m USING market_stats_dirty d
+                WHERE m.brand = d.brand AND m.model = d.model AND m.variant = d.variant AND m.year = d.year
+                  AND m.refreshed_at < %s
+            """, (started,))
+
+        cursor.execute(f"""
+            INSERT INTO {STATE_TABLE} (name, refreshed_at) VALUES (%s, %s)
+            ON CONFLICT (name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at
+        """, (table, started))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    elapsed = (datetime.now() - started).total_seconds()
+    log.info(f"📈 Market stats {'full' if since is None else 'inkremental'}: {dirty} grup dihitung ulang ({elapsed:.1f} detik)")
+    return dirty
+
+
+def refresh_after_run(conn, log=None, groups=None):
+    """Refresh inkremental setelah sync/tracker; gagal refresh tidak menggagalkan run."""
+    if not MARKET_STATS_AUTO_REFRESH or conn is None:
+        return None
+    try:
+        return refresh_market_stats(conn, log=log, groups=groups)
+    except Exception as e:
+        (log or logger).warning(f"⚠️ Gagal refresh market stats: {e}")
+        return None
+
+
+# ================== Query
+
+def query_market_stats(conn, brand=None, model=None, variant=None, year=None,
+                       limit=100, order="listings", table=DB_TABLE_MARKET_STATS):
+    filters = []
+    params = []
+    for column, value in (("brand", brand), ("model", model), ("variant", variant), ("year", year)):
+        if value is not None:
+            filters.append(f"LOWER({column}) = LOWER(%s)")
+            params.append(str(value))
+    order_sql = {
+        "listings": "listings DESC",
+        "price": "median_price DESC NULLS LAST",
+        "days_on_market": "median_days_on_market ASC NULLS LAST",
+        "drop_rate": "drop_rate DESC NULLS LAST",
+    }.get(order, "listings DESC")
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT {', '.join(GROUP_COLUMNS + STAT_COLUMNS)} FROM {table}
+            {where}
+            ORDER BY {order_sql}
+            LIMIT %s
+        """, params + [min(int(limit), MARKET_STATS_MAX_LIMIT)])
+        names = [desc[0] for desc in cursor.description]
+        rows = cursor.fetchall()
+    results = []
+    for row in rows:
+        item = dict(zip(names, row))
+        for key, value in item.items():
+            if isinstance(value, datetime):
+                item[key] = value.isoformat()
+            elif value is not None and not isinstance(value, (int, str)):
+                item[key] = round(float(value), 2)
+        results.append(item)
+    return results
+
+
+def _default_connection():
+    from scrap_service.common.database import get_connection
+    return get_connection()
+
+
+def register_stats_routes(app, manager=None, connection_factory=None):
+    """
+    Tambahkan GET /stats/market dan POST /stats/market/refresh ke app Flask.
+    Koneksi DB dibuka per request; refresh berjalan sebagai job jika `manager` diisi.
+    """
+    from flask import jsonify, request
+
+    connection_factory = connection_factory or _default_connection
+
+    @app.route('/stats/market', methods=['GET'])
+    def market_stats():
+        conn = None
+        try:
+            conn = connection_factory()
+            rows = query_market_stats(
+                conn,
+                brand=request.args.get("brand"),
+                model=request.args.get("model"),
+                variant=request.args.get("variant"),
+                year=request.args.get("year"),
+                limit=request.args.get("limit", 100, type=int),
+                order=request.args.get("order", "listings"),
+            )
+            return jsonify({"count": len(rows), "results": rows}), 200
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            if conn:
+                conn.close()
+
+    @app.route('/stats/market/refresh', methods=['POST'])
+    def refresh_stats():
+        full = bool((request.get_json(silent=True) or {}).get("full", False))
+
+        def run(conn):
+            return {"groups": refresh_market_stats(conn, full=full)}
+
+        if manager is not None:
+            from scrap_service.common.jobs import JobConflict, accepted_response, conflict_response
+            try:
+                job = manager.submit("refresh_market_stats", connection_factory, run,
+                                     params={"full": full}, lock_key="market_stats")
+            except JobConflict as e:
+                return conflict_response(e)
+            return accepted_response(job)
+
+        conn = None
+        try:
+            conn = connection_factory()
+            return jsonify(run(conn)), 200
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            if conn:
+                conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh tabel market_stats")
+    parser.add_argument("--full", action="store_true", help="Hitung ulang semua grup")
+    args = parser.parse_args(argv)
+
+    from scrap_service.common.database import get_connection
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    conn = get_connection()
+    try:
+        refresh_market_stats(conn, full=args.full)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
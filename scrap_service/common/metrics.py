@@ -0,0 +1,272 @@
+import os
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger("metrics")
+# Event timing per tahap (site/stage/duration) untuk log JSON; handler dipasang oleh logsetup
+timings_log = logging.getLogger("timings")
+timings_log.propagate = False
+
+# ===== Konfigurasi Env
+# Pengali semua jeda lewat timed_sleep; 0 untuk load test terhadap mock marketplace.
+SLEEP_SCALE = float(os.getenv("SLEEP_SCALE", "1"))
+
+# Batas bucket histogram (detik); rentangnya lebar karena sleep anti-bot bisa sampai 10 menit
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120, 300, 600)
+
+STAGE_METRIC = "scrape_stage_seconds"
+
+HELP = {
+    STAGE_METRIC: "Durasi per tahap scraping (navigation, parse, db, sync, sleep, ...)",
+    "scrape_pages_total": "Jumlah halaman hasil pencarian yang dimuat",
+    "scrape_listings_total": "Jumlah listing yang diproses per hasil",
+    "scrape_retries_total": "Jumlah retry navigasi / scraping",
+    "scrape_antibot_total": "Jumlah deteksi anti-bot (Cloudflare, captcha, access denied)",
+    "scrape_proxy_swaps_total": "Jumlah pergantian proxy / session browser",
+    "scrape_incomplete_total": "Field wajib yang kosong setelah parse (repaired = dilengkapi di halaman yang sama)",
+    "diagnostics_captures_total": "Capture diagnostik error per kategori (saved, sampled_out, rate_limited, dropped, failed)",
+    "scrape_incremental_urls_total": "URL halaman hasil pada mode incremental (new = di-scrape, known = dilewati)",
+    "seen_index_lookups_total": "Cek index URL (negative = pasti baru tanpa query DB, positive = dikonfirmasi ke DB)",
+    "watchdog_recycles_total": "Daur ulang context / browser oleh watchdog memori per alasan",
+    "watchdog_orphans_killed_total": "Proses browser yatim / tertinggal yang dihentikan watchdog",
+}
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(label_key, extra=None):
+    items = list(label_key) + (list(extra) if extra else [])
+    if not items:
+        return ""
+    body = ",".join(
+        k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in items
+    )
+    return "{" + body + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Registry counter dan histogram in-process, dirender ke format teks Prometheus."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self._buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self._buckets)
+            histogram.observe(value)
+
+    def snapshot(self):
+        """Salinan nilai saat ini, dipakai untuk menghitung selisih per run."""
+        with self._lock:
+            return {
+                "at": time.monotonic(),
+                "counters": dict(self._counters),
+                "histograms": {k: (h.count, h.sum) for k, h in self._histograms.items()},
+            }
+
+    def quantile(self, name, q, **labels):
+        """Perkiraan kuantil dari bucket histogram (interpolasi linear di dalam bucket)."""
+        with self._lock:
+            histogram = self._histograms.get((name, _label_key(labels)))
+            if histogram is None or not histogram.count:
+                return None
+            counts = list(histogram.counts)
+            count = histogram.count
+
+        rank = q * count
+        cumulative = 0
+        lower = 0.0
+        for bound, bucket_count in zip(self._buckets, counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = bound
+        return self._buckets[-1]
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                ((k, (list(h.counts), h.sum, h.count)) for k, h in self._histograms.items()),
+                key=lambda item: item[0]
+            )
+
+        lines = []
+        seen = set()
+        for (name, label_key), value in counters:
+            if name not in seen:
+                seen.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_format_labels(label_key)} {value}")
+
+        for (name, label_key), (counts, total, count) in histograms:
+            if name not in seen:
+                seen.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(self._buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(label_key, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(label_key, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{_format_labels(label_key)} {total}")
+            lines.append(f"{name}_count{_format_labels(label_key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summarize(self, since=None, site=None):
+        """
+        Ringkasan selisih sejak snapshot `since`: total detik per tahap dan nilai counter.
+        Jika `site` diisi, hanya metric dengan label site tersebut.
+        """
+        now = self.snapshot()
+        base = since or {"at": now["at"], "counters": {}, "histograms": {}}
+
+        def matches(label_key):
+            return site is None or ("site", site) in label_key
+
+        stages = {}
+        for (name, label_key), (count, total) in now["histograms"].items():
+            if name != STAGE_METRIC or not matches(label_key):
+                continue
+            old_count, old_total = base["histograms"].get((name, label_key), (0, 0.0))
+            if count == old_count:
+                continue
+            stage = dict(label_key).get("stage", "-")
+            entry = stages.setdefault(stage, {"count": 0, "seconds": 0.0})
+            entry["count"] += count - old_count
+            entry["seconds"] += total - old_total
+
+        counters = {}
+        for (name, label_key), value in now["counters"].items():
+            if not matches(label_key):
+                continue
+            delta = value - base["counters"].get((name, label_key), 0)
+            if not delta:
+                continue
+            extra = ",".join(f"{k}={v}" for k, v in label_key if k != "site")
+            counters[f"{name}{{{extra}}}" if extra else name] = delta
+
+        return {
+            "elapsed": now["at"] - base["at"] if since else None,
+            "stages": stages,
+            "counters": counters,
+        }
+
+
+registry = MetricsRegistry()
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+@contextmanager
+def timer(name, **labels):
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.monotonic() - started, **labels)
+
+
+@contextmanager
+def stage(site, stage_name):
+    """Context manager untuk mencatat durasi satu tahap, mis. `with stage("carlistmy", "db"):`."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        observe_stage(site, stage_name, time.monotonic() - started)
+
+
+def observe_stage(site, stage_name, seconds):
+    registry.observe(STAGE_METRIC, seconds, site=site, stage=stage_name)
+    if timings_log.handlers:
+        timings_log.info(
+            f"{site}/{stage_name} {seconds:.3f}s",
+            extra={"site": site, "stage": stage_name, "duration": round(seconds, 4)},
+        )
+
+
+def timed_sleep(seconds, site, reason="delay"):
+    """time.sleep yang durasinya ikut tercatat sebagai tahap sleep (diskalakan SLEEP_SCALE)."""
+    seconds = seconds * SLEEP_SCALE
+    if seconds > 0:
+        time.sleep(seconds)
+    observe_stage(site, f"sleep_{reason}", seconds)
+
+
+def snapshot():
+    return registry.snapshot()
+
+
+def render_prometheus():
+    return registry.render()
+
+
+def metrics_response():
+    """Tuple response Flask untuk endpoint /metrics."""
+    return registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+def log_summary(site, since=None, log=None):
+    """Log ringkasan pemakaian waktu per tahap dan counter untuk satu run."""
+    log = log or logger
+    summary = registry.summarize(since=since, site=site)
+    elapsed = summary["elapsed"]
+    tracked = sum(s["seconds"] for s in summary["stages"].values())
+    total = elapsed if elapsed else tracked
+
+    header = f"📊 Ringkasan run {site}"
+    if elapsed:
+        header += f" (durasi {elapsed:.1f} detik)"
+    log.info(header)
+    for name, entry in sorted(summary["stages"].items(), key=lambda item: -item[1]["seconds"]):
+        share = (entry["seconds"] / total * 100) if total else 0
+        average = entry["seconds"] / entry["count"] if entry["count"] else 0
+        log.info(
+            f"   ⏱️ {name}: {entry['count']}x, total {entry['seconds']:.1f} detik "
+            f"({share:.1f}%), rata-rata {average:.2f} detik"
+        )
+    for name, value in sorted(summary["counters"].items()):
+        log.info(f"   🔢 {name}: {value:g}")
+    return summary
@@ -0,0 +1,321 @@
+"""
+Normalisasi field mentah listing menjadi kolom numerik/enum yang bisa diindeks.
+
+    millage          "55 - 60K km" / "75,000 - 79,999 km"   -> mileage_km        INTEGER
+    seat_capacity    "5" / "7 seats"                         -> seats             SMALLINT
+    transmission     "Automatic" / "CVT" / "Manual"          -> transmission_type ENUM ('automatic', 'manual')
+    informasi_iklan  "Posted 3 hours ago" / "Updated 2 days ago" -> posted_at      TIMESTAMP
+
+Kolom mentah tetap disimpan apa adanya; kolom normal diisi saat ingest (save_to_db / sync)
+dan untuk data lama lewat backfill per batch:
+
+    python -m scrap_service.common.normalize --table cars_scrap cars --batch-size 1000
+"""
+import os
+import re
+import sys
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+logger = logging.getLogger("normalize")
+
+# ===== Konfigurasi Env
+NORMALIZE_BATCH_SIZE = int(os.getenv("NORMALIZE_BATCH_SIZE", "1000"))
+
+TRANSMISSION_AUTOMATIC = "automatic"
+TRANSMISSION_MANUAL = "manual"
+
+NORMALIZED_COLUMNS = ["mileage_km", "seats", "transmission_type", "posted_at"]
+
+# Jarak tempuh di atas ini (km) dianggap salah parse
+MAX_MILEAGE_KM = 2_000_000
+MAX_SEATS = 60
+
+MALAYSIA_STATES = [
+    "kuala lumpur", "selangor", "johor", "penang", "pulau pinang", "perak", "kedah", "kelantan",
+    "terengganu", "pahang", "negeri sembilan", "melaka", "malacca", "sabah", "sarawak",
+    "perlis", "putrajaya", "labuan",
+]
+STATE_ALIASES = {"pulau pinang": "penang", "malacca": "melaka", "kl": "kuala lumpur", "wilayah persekutuan": "kuala lumpur"}
+
+AUTOMATIC_HINTS = ("auto", "cvt", "dct", "dsg", "amt", "tiptronic", "steptronic", "e-cvt", "ecvt")
+
+RELATIVE_UNITS = {
+    "second": 1, "sec": 1,
+    "minute": 60, "min": 60,
+    "hour": 3600, "hr": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+    "month": 30 * 86400,
+    "year": 365 * 86400,
+}
+RELATIVE_PATTERN = re.compile(
+    r"(\d+|an?|one)\s*(second|sec|minute|min|hour|hr|day|week|month|year)s?\.?\s+ago"
+)
+CLOCK_PATTERN = re.compile(r"(\d{1,2}):(\d{2})\s*(am|pm)?")
+ABSOLUTE_PATTERNS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}"), ["%Y-%m-%d"]),
+    (re.compile(r"\d{1,2}/\d{1,2}/\d{4}"), ["%d/%m/%Y"]),
+    (re.compile(r"\d{1,2}\s+[a-z]{3,9}\.?\s+\d{4}"), ["%d %b %Y", "%d %B %Y"]),
+    (re.compile(r"[a-z]{3,9}\.?\s+\d{1,2},?\s+\d{4}"), ["%b %d %Y", "%B %d %Y"]),
+]
+
+
+def normalize_mileage(value):
+    """Jarak tempuh dalam km; rentang diambil batas atasnya (sama dengan convert_millage)."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        mileage = int(value)
+    else:
+        text = str(value).lower().replace(",", "").replace(" ", "")
+        # "k" sebagai satuan ribuan, bukan huruf pertama "km"
+        numbers = re.findall(r"(\d+(?:\.\d+)?)(k(?!m))?", text)
+        if not numbers:
+            return None
+        number, suffix = numbers[-1]
+        mileage = float(number)
+        # "55-60Kkm" atau angka kecil tanpa satuan (mis. "60") berarti ribuan km
+        if suffix or mileage < 1000:
+            mileage *= 1000
+        mileage = int(mileage)
+    return mileage if 0 <= mileage <= MAX_MILEAGE_KM else None
+
+
+def normalize_seats(value):
+    if value is None:
+        return None
+    if isinstance(value, int):
+        seats = value
+    else:
+        match = re.search(r"\d+", str(value))
+        if not match:
+            return None
+        seats = int(match.group())
+    return seats if 1 <= seats <= MAX_SEATS else None
+
+
+def normalize_transmission(value):
+    if not value:
+        return None
+    text = str(value).strip().lower()
+    if "manual" in text:
+        return TRANSMISSION_MANUAL
+    if any(hint in text for hint in AUTOMATIC_HINTS):
+        return TRANSMISSION_AUTOMATIC
+    return None
+
+
+def normalize_state(lokasi):
+    """Negeri dari teks lokasi ("Selangor - Petaling Jaya" -> "selangor"), fallback slug lokasi."""
+    text = str(lokasi or "").lower()
+    for state in MALAYSIA_STATES:
+        if state in text:
+            return STATE_ALIASES.get(state, state)
+    for alias, state in STATE_ALIASES.items():
+        if re.search(rf"\b{alias}\b", text):
+            return state
+    return re.sub(r"[^a-z0-9]+", "", text.split("-")[0])
+
+
+def _apply_clock(day, text):
+    match = CLOCK_PATTERN.search(text)
+    if not match:
+        return day
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2)), match.group(3)
+    if meridiem == "pm" and hour < 12:
+        hour += 12
+    elif meridiem == "am" and hour == 12:
+        hour = 0
+    if hour > 23 or minute > 59:
+        return day
+    return day.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+
+def parse_posted_at(text, reference=None):
+    """
+    Waktu absolut dari teks informasi_iklan relatif terhadap `reference` (waktu scraping).
+    Mendukung "3 hours ago", "an hour ago", "just now", "yesterday 10:30 AM", "today",
+    dan tanggal absolut ("12 Mar 2025", "2025-03-12", "12/03/2025").
+    """
+    if not text:
+        return None
+    reference = reference or datetime.now()
+    value = str(text).strip().lower()
+
+    if "just now" in value or "moments ago" in value or "few seconds ago" in value:
+        return reference.replace(microsecond=0)
+
+    match = RELATIVE_PATTERN.search(value)
+    if match:
+        amount = match.group(1)
+        amount = 1 if amount in ("a", "an", "one") else int(amount)
+        return (reference - timedelta(seconds=amount * RELATIVE_UNITS[match.group(2)])).replace(microsecond=0)
+
+    if "yesterday" in value:
+        day = (reference - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return _apply_clock(day, value)
+    if "today" in value:
+        day = reference.replace(hour=0, minute=0, second=0, microsecond=0)
+        return _apply_clock(day, value)
+
+    for pattern, formats in ABSOLUTE_PATTERNS:
+        found = pattern.search(value)
+        if not found:
+            continue
+        candidate = found.group().replace(",", "").replace(".", "")
+        for fmt in formats:
+            try:
+                day = datetime.strptime(candidate, fmt)
+            except ValueError:
+                continue
+            return _apply_clock(day, value[found.end():])
+    return None
+
+
+def normalize_car(car, reference=None):
+    """Dict kolom normal untuk satu listing (kunci sama dengan NORMALIZED_COLUMNS)."""
+    return {
+        "mileage_km": normalize_mileage(car.get("millage")),
+        "seats": normalize_seats(car.get("seat_capacity")),
+        "transmission_type": normalize_transmission(car.get("transmission")),
+        "posted_at": parse_posted_at(car.get("informasi_iklan"), reference),
+    }
+
+
+# ================== Skema
+
+_ensured_tables = set()
+
+
+def ensure_normalized_columns(conn, table):
+    """
+    Tambahkan kolom normal + index ke tabel jika belum ada. Cek information_schema dulu
+    supaya ALTER TABLE (lock eksklusif) hanya jalan sekali, bukan setiap service start.
+    """
+    if table in _ensured_tables:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = %s AND column_name = ANY(%s)
+        """, (table, NORMALIZED_COLUMNS))
+        existing = {row[0] for row in cursor.fetchall()}
+        if len(existing) < len(NORMALIZED_COLUMNS):
+            logger.info(f"🧱 Menambahkan kolom normal ke {table}...")
+            cursor.execute("""
+                DO $$ BEGIN
+                    CREATE TYPE transmission_type AS ENUM ('automatic', 'manual');
+                EXCEPTION WHEN duplicate_object THEN NULL;
+                END $$;
+            """)
+            cursor.execute(f"""
+                ALTER TABLE {table}
+                    ADD COLUMN IF NOT EXISTS mileage_km INTEGER,
+                    ADD COLUMN IF NOT EXISTS seats SMALLINT,
+                    ADD COLUMN IF NOT EXISTS transmission_type transmission_type,
+                    ADD COLUMN IF NOT EXISTS posted_at TIMESTAMP
+            """)
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_mileage_km ON {table} (mileage_km)")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_posted_at ON {table} (posted_at)")
+        conn.commit()
+        _ensured_tables.add(table)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+# ================== Backfill
+
+def backfill_normalized(conn, table, batch_size=NORMALIZE_BATCH_SIZE, log=None):
+    """
+    Isi kolom normal untuk baris lama, per batch berdasarkan id (keyset), commit per batch.
+    Hanya baris yang kolom normalnya masih NULL yang diproses, jadi aman dijalankan ulang.
+    Referensi waktu posted_at: last_scraped_at, fallback created_at.
+    """
+    from psycopg2.extras import execute_values
+
+    log = log or logger
+    ensure_normalized_columns(conn, table)
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = %s AND column_name IN ('last_scraped_at', 'created_at')
+    """, (table,))
+    time_columns = [c for c in ("last_scraped_at", "created_at") if c in {r[0] for r in cursor.fetchall()}]
+    reference_sql = f"COALESCE({', '.join(time_columns)})" if time_columns else "NULL"
+
+    last_id = 0
+    scanned = 0
+    updated = 0
+    while True:
+        cursor.execute(f"""
+            SELECT id, millage, seat_capacity, transmission, informasi_iklan, {reference_sql}
+            FROM {table}
+            WHERE id > %s
+              AND (mileage_km IS NULL OR seats IS NULL OR transmission_type IS NULL OR posted_at IS NULL)
+            ORDER BY id
+            LIMIT %s
+        """, (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        values = []
+        for car_id, millage, seat_capacity, transmission, informasi_iklan, reference in rows:
+            norm = normalize_car({
+                "millage": millage, "seat_capacity": seat_capacity,
+                "transmission": transmission,
+                # Tanpa waktu scraping, teks relatif tidak bisa diubah ke waktu absolut
+                "informasi_iklan": informasi_iklan if reference else None,
+            }, reference)
+            if any(v is not None for v in norm.values()):
+                values.append((car_id, norm["mileage_km"], norm["seats"], norm["transmission_type"], norm["posted_at"]))
+
+        if values:
+            execute_values(cursor, f"""
+                UPDATE {table} AS t
+                SET mileage_km = COALESCE(t.mileage_km, v.mileage_km),
+                    seats = COALESCE(t.seats, v.seats),
+                    transmission_type = COALESCE(t.transmission_type, v.transmission_type),
+                    posted_at = COALESCE(t.posted_at, v.posted_at)
+                FROM (VALUES %s) AS v (id, mileage_km, seats, transmission_type, posted_at)
+                WHERE t.id = v.id
+            """, values, template="(%s, %s::integer, %s::smallint, %s::transmission_type, %s::timestamp)")
+        conn.commit()
+
+        scanned += len(rows)
+        updated += len(values)
+        last_id = rows[-1][0]
+        log.info(f"🔁 Backfill {table}: {scanned} baris dicek, {updated} diupdate (id terakhir {last_id})")
+
+    cursor.close()
+    log.info(f"✅ Backfill {table} selesai: {scanned} baris dicek, {updated} diupdate.")
+    return {"scanned": scanned, "updated": updated}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill kolom normal (mileage_km, seats, transmission_type, posted_at)")
+    parser.add_argument("--table", nargs="+", default=["cars_scrap", "cars"])
+    parser.add_argument("--batch-size", type=int, default=NORMALIZE_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from scrap_service.common.database import get_connection
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    conn = get_connection()
+    try:
+        for table in args.table:
+            backfill_normalized(conn, table, args.batch_size)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+"""
+Tabel history harga yang dipartisi per bulan (RANGE pada changed_at).
+
+Nama tabel tidak berubah (price_history / price_history_scrap / price_history_combined), jadi
+INSERT di save_to_db dan sync_to_cars tetap sama; Postgres mengarahkan baris ke partisi
+bulan yang sesuai. Konversi tabel lama dilakukan migrasi 0007, sisanya di sini:
+
+    ensure_history_partitions()  partisi bulan ini + N bulan ke depan (dipanggil saat service start)
+    apply_retention()            partisi lebih tua dari HISTORY_RETENTION_MONTHS diringkas ke
+                                 {table}_daily (open/min/max/last per mobil per hari) lalu di-drop
+    combine_since()              batas bawah changed_at per sumber untuk sinkronisasi ke tabel combined
+
+    python -m scrap_service.common.price_history --maintain
+"""
+import os
+import re
+import sys
+import logging
+import argparse
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger("price_history")
+
+# ===== Konfigurasi Env
+HISTORY_PARTITION_MONTHS_AHEAD = int(os.getenv("HISTORY_PARTITION_MONTHS_AHEAD", "2"))
+HISTORY_RETENTION_MONTHS = int(os.getenv("HISTORY_RETENTION_MONTHS", "24"))
+# Jendela mundur dari changed_at terakhir di tabel combined, untuk baris history yang commit terlambat
+HISTORY_SYNC_OVERLAP_HOURS = int(os.getenv("HISTORY_SYNC_OVERLAP_HOURS", "24"))
+
+PARTITION_SUFFIX = re.compile(r"_p(\d{4})_(\d{2})$")
+SYNC_EPOCH = datetime(1970, 1, 1)
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def _table_exists(cursor, table):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+    return cursor.fetchone()[0]
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("""
+        SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))
+    """, (table,))
+    return cursor.fetchone()[0]
+
+
+def list_partitions(cursor, table):
+    """List (nama partisi, awal bulan) terurut, tanpa partisi default."""
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    """, (table,))
+    partitions = []
+    for (name,) in cursor.fetchall():
+        match = PARTITION_SUFFIX.search(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+# ================== Partisi
+
+def create_month_partition(cursor, table, month):
+    """
+    Buat partisi satu bulan. Jika partisi default sudah menampung baris bulan tersebut,
+    baris itu dipindah dulu ke tabel baru sebelum di-ATTACH (Postgres menolak partisi baru
+    yang tumpang tindih dengan isi partisi default).
+    """
+    name = partition_name(table, month)
+    if _table_exists(cursor, name):
+        return False
+    start, end = month, add_months(month, 1)
+    default = f"{table}_default"
+    if _table_exists(cursor, default):
+        cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM {default} WHERE changed_at >= %s AND changed_at < %s RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """, (start, end))
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')")
+    else:
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{start}') TO ('{end}')")
+    logger.info(f"🧱 Partisi {name} dibuat ({start} s/d {end})")
+    return True
+
+
+def create_partitions(cursor, table, first_month, months_ahead=HISTORY_PARTITION_MONTHS_AHEAD):
+    """Partisi dari `first_month` sampai bulan ini + months_ahead, plus partisi default."""
+    last_month = add_months(month_start(date.today()), months_ahead)
+    month = month_start(first_month)
+    created = 0
+    # Advisory lock: beberapa service bisa start bersamaan dan membuat partisi yang sama
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (table,))
+    while month <= last_month:
+        created += create_month_partition(cursor, table, month)
+        month = add_months(month, 1)
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+    return created
+
+
+_ensured_months = {}
+
+
+def ensure_history_partitions(conn, table, months_ahead=HISTORY_PARTITION_MONTHS_AHEAD):
+    """
+    Pastikan partisi bulan berjalan dan beberapa bulan ke depan ada. Tidak melakukan apa-apa
+    jika tabel belum dikonversi (migrasi 0007 belum jalan). Dicek sekali per bulan per proses.
+    """
+    current = month_start(date.today())
+    if _ensured_months.get(table) == current:
+        return
+    cursor = conn.cursor()
+    try:
+        if is_partitioned(cursor, table):
+            create_partitions(cursor, table, current, months_ahead)
+        conn.commit()
+        _ensured_months[table] = current
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f"⚠️ Gagal menyiapkan partisi {table}: {e}")
+    finally:
+        cursor.close()
+
+
+def convert_to_partitioned(cursor, table, months_ahead=HISTORY_PARTITION_MONTHS_AHEAD):
+    """
+    Ubah tabel history biasa menjadi tabel partisi dengan nama yang sama. Tabel lama
+    di-rename ke {table}_legacy dan isinya disalin; hapus manual setelah diverifikasi.
+    """
+    if not _table_exists(cursor, table) or is_partitioned(cursor, table):
+        return False
+    legacy = f"{table}_legacy"
+    logger.info(f"🔁 Mengonversi {table} ke tabel partisi bulanan (tabel lama -> {legacy})")
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    cursor.execute(f"ALTER INDEX IF EXISTS idx_{table}_car_changed RENAME TO idx_{legacy}_car_changed")
+    cursor.execute(f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (changed_at)")
+
+    cursor.execute("""
+        SELECT column_name, column_default FROM information_schema.columns
+        WHERE table_name = %s AND column_name IN ('id', 'changed_at')
+    """, (table,))
+    defaults = dict(cursor.fetchall())
+    if "id" in defaults:
+        if defaults["id"]:
+            # Kolom serial: sequence ikut pindah supaya tidak terhapus bersama tabel legacy
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (legacy,))
+            sequence = cursor.fetchone()[0]
+            if sequence:
+                cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+        else:
+            # Kolom identity tidak ikut tersalin oleh LIKE, ganti dengan sequence biasa
+            sequence = f"{table}_part_id_seq"
+            cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {sequence} OWNED BY {table}.id")
+            cursor.execute(f"SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {legacy}), 0) + 1, false)", (sequence,))
+            cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+    if not defaults.get("changed_at"):
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN changed_at SET DEFAULT NOW()")
+
+    cursor.execute(f"SELECT MIN(changed_at) FROM {legacy}")
+    oldest = cursor.fetchone()[0] or date.today()
+    create_partitions(cursor, table, oldest, months_ahead)
+    cursor.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+    logger.info(f"✅ {cursor.rowcount} baris disalin dari {legacy} ke {table}")
+    return True
+
+
+# ================== Retensi / rollup
+
+def ensure_daily_table(cursor, table):
+    cursor.execute("""
+        SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+        WHERE attrelid = to_regclass(%s) AND attname = 'new_price'
+    """, (table,))
+    row = cursor.fetchone()
+    price_type = row[0] if row else "NUMERIC"
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table}_daily (
+            car_id BIGINT NOT NULL,
+            day DATE NOT NULL,
+            open_price {price_type},
+            min_price {price_type},
+            max_price {price_type},
+            last_price {price_type},
+            changes INTEGER NOT NULL,
+            PRIMARY KEY (car_id, day)
+        )
+    """)
+
+
+def rollup_partition(cursor, table, partition):
+    """Ringkas satu partisi ke {table}_daily. Aman diulang (upsert per car_id, day)."""
+    ensure_daily_table(cursor, table)
+    cursor.execute(f"""
+        INSERT INTO {table}_daily (car_id, day, open_price, min_price, max_price, last_price, changes)
+        SELECT car_id, changed_at::date,
+               (ARRAY_AGG(old_price ORDER BY changed_at))[1],
+               MIN(LEAST(old_price, new_price)),
+               MAX(GREATEST(old_price, new_price)),
+               (ARRAY_AGG(new_price ORDER BY changed_at DESC))[1],
+               COUNT(*)
+        FROM {partition}
+        WHERE car_id IS NOT NULL AND changed_at IS NOT NULL
+        GROUP BY car_id, changed_at::date
+        ON CONFLICT (car_id, day) DO UPDATE SET
+            open_price = EXCLUDED.open_price,
+            min_price = EXCLUDED.min_price,
+            max_price = EXCLUDED.max_price,
+            last_price = EXCLUDED.last_price,
+            changes = EXCLUDED.changes
+    """)
+    return cursor.rowcount
+
+
+def apply_retention(conn, table, retention_months=HISTORY_RETENTION_MONTHS, log=None):
+    """Rollup lalu drop partisi yang seluruhnya lebih tua dari retention_months. Commit per partisi."""
+    log = log or logger
+    cutoff = add_months(month_start(date.today()), -retention_months)
+    cursor = conn.cursor()
+    dropped = []
+    try:
+        if not is_partitioned(cursor, table):
+            log.warning(f"⚠️ {table} belum dipartisi, retensi dilewati.")
+            return dropped
+        for name, month in list_partitions(cursor, table):
+            if add_months(month, 1) > cutoff:
+                continue
+            days = rollup_partition(cursor, table, name)
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            cursor.execute(f"DROP TABLE {name}")
+            conn.commit()
+            dropped.append(name)
+            log.info(f"🗄️ {name}: {days} ringkasan harian disimpan ke {table}_daily, partisi di-drop")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return dropped
+
+
+# ================== Sinkronisasi combined
+
+def combine_since(cursor, combined_table, scrap_table, primary_table, overlap_hours=HISTORY_SYNC_OVERLAP_HOURS):
+    """
+    Batas bawah changed_at untuk baris history `scrap_table` yang perlu disalin ke tabel combined.
+    Membatasi scan ke partisi terbaru alih-alih seluruh history setiap sinkronisasi.
+    Tabel combined dipakai bersama semua site, jadi watermark hanya dihitung dari baris milik
+    sumber ini (car_id -> listing_url di tabel utama -> id yang sama di scrap_table); kalau tidak,
+    sync site lain menggeser watermark dan history site ini yang lebih tua tidak pernah tersalin.
+    """
+    cursor.execute(f"""
+        SELECT MAX(pc.changed_at)
+        FROM {combined_table} pc
+        JOIN {primary_table} c ON c.id = pc.car_id
+        JOIN {scrap_table} cs ON cs.listing_url = c.listing_url AND cs.id = pc.car_scrap_id
+    """)
+    latest = cursor.fetchone()[0]
+    if latest is None:
+        return SYNC_EPOCH
+    return latest - timedelta(hours=overlap_hours)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pemeliharaan partisi history harga")
+    parser.add_argument("--table", nargs="+", default=[
+        os.getenv("DB_TABLE_HISTORY_PRICE", "price_history"),
+        os.getenv("DB_TABLE_HISTORY_PRICE_COMBINED", "price_history_combined"),
+    ])
+    parser.add_argument("--maintain", action="store_true", help="Buat partisi ke depan dan jalankan retensi")
+    parser.add_argument("--months-ahead", type=int, default=HISTORY_PARTITION_MONTHS_AHEAD)
+    parser.add_argument("--retention-months", type=int, default=HISTORY_RETENTION_MONTHS)
+    args = parser.parse_args(argv)
+
+    from scrap_service.common.database import get_connection
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    conn = get_connection()
+    try:
+        for table in args.table:
+            with conn.cursor() as cursor:
+                if not is_partitioned(cursor, table):
+                    logger.warning(f"⚠️ {table} belum dipartisi, jalankan migrasi dulu.")
+                    continue
+                partitions = list_partitions(cursor, table)
+            print(f"{table}: {len(partitions)} partisi"
+                  + (f" ({partitions[0][1]:%Y-%m} s/d {partitions[-1][1]:%Y-%m})" if partitions else ""))
+            if args.maintain:
+                ensure_history_partitions(conn, table, args.months_ahead)
+                apply_retention(conn, table, args.retention_months)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+import os
+import random
+import logging
+import threading
+import time
+
+logger = logging.getLogger("proxy_pool")
+
+# ===== Konfigurasi Env
+# Lama karantina awal (detik) untuk proxy yang diblokir / gagal beruntun,
+# digandakan setiap strike berikutnya sampai batas PROXY_QUARANTINE_MAX.
+PROXY_QUARANTINE_BASE = float(os.getenv("PROXY_QUARANTINE_BASE", "120"))
+PROXY_QUARANTINE_MAX = float(os.getenv("PROXY_QUARANTINE_MAX", "3600"))
+# Waktu paruh (detik) peluruhan strike, supaya proxy yang pernah diblokir bisa pulih.
+PROXY_STRIKE_HALF_LIFE = float(os.getenv("PROXY_STRIKE_HALF_LIFE", "1800"))
+# Berapa lama IP keluar yang sudah diverifikasi dianggap masih valid per session.
+PROXY_IP_CACHE_TTL = float(os.getenv("PROXY_IP_CACHE_TTL", "1800"))
+# Endpoint yang mengembalikan IP keluar sebagai teks; bisa diarahkan ke mock marketplace.
+IP_CHECK_URL = os.getenv("IP_CHECK_URL", "https://ip.oxylabs.io/")
+
+FAILURE_STRIKE = 1.0
+BAN_STRIKE = 3.0
+QUARANTINE_STRIKES = 3.0
+LATENCY_REFERENCE = 10.0  # detik; latency segini menurunkan skor jadi setengah
+
+
+def parse_proxy_list(raw, with_scheme=False):
+    """
+    Parse string 'ip:port:user:pass,ip:port:user:pass' menjadi list dict proxy Playwright.
+    """
+    parsed = []
+    for entry in raw.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        parts = entry.split(":")
+        if len(parts) != 4:
+            logger.warning(f"Format proxy tidak valid: {entry}")
+            continue
+        ip, port, user, pw = parts
+        server = f"http://{ip}:{port}" if with_scheme else f"{ip}:{port}"
+        parsed.append({
+            "server": server,
+            "username": user,
+            "password": pw
+        })
+    return parsed
+
+
+def get_custom_proxy_list():
+    return parse_proxy_list(os.getenv("CUSTOM_PROXIES", ""))
+
+
+def proxy_key(proxy):
+    if proxy is None:
+        return None
+    return proxy["server"] if isinstance(proxy, dict) else str(proxy)
+
+
+class ProxyStats:
+    """Statistik kesehatan satu proxy."""
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.successes = 0
+        self.failures = 0
+        self.bans = 0
+        self.latency_ewma = None
+        self.strikes = 0.0
+        self.strikes_at = time.monotonic()
+        self.quarantined_until = 0.0
+        self.last_used = 0.0
+
+    def current_strikes(self, now):
+        elapsed = now - self.strikes_at
+        if self.strikes and elapsed > 0 and PROXY_STRIKE_HALF_LIFE > 0:
+            self.strikes *= 0.5 ** (elapsed / PROXY_STRIKE_HALF_LIFE)
+            if self.strikes < 0.05:
+                self.strikes = 0.0
+        self.strikes_at = now
+        return self.strikes
+
+    def is_quarantined(self, now):
+        return self.quarantined_until > now
+
+    def health(self, now):
+        # Success rate dengan Laplace smoothing agar proxy baru tetap dapat giliran
+        success_rate = (self.successes + 1) / (self.successes + self.failures + 2)
+        latency = self.latency_ewma or 0.0
+        latency_factor = 1.0 / (1.0 + latency / LATENCY_REFERENCE)
+        strike_factor = 1.0 / (1.0 + self.current_strikes(now))
+        return max(success_rate * latency_factor * strike_factor, 0.01)
+
+    def to_dict(self, now):
+        return {
+            "server": self.proxy["server"],
+            "successes": self.successes,
+            "failures": self.failures,
+            "bans": self.bans,
+            "latency_avg": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "strikes": round(self.current_strikes(now), 2),
+            "health": round(self.health(now), 4),
+            "quarantined_for": max(0, round(self.quarantined_until - now)),
+        }
+
+
+class ProxyPool:
+    """
+    Pool proxy bersama dengan skor kesehatan, karantina berpeluruhan,
+    sticky session dan cache IP keluar per session. Thread-safe.
+    """
+
+    def __init__(self, proxies):
+        self._lock = threading.Lock()
+        self._stats = {}
+        for proxy in proxies:
+            self._stats.setdefault(proxy["server"], ProxyStats(proxy))
+        self._sticky = {}
+        self._ip_cache = {}
+
+    def __len__(self):
+        return len(self._stats)
+
+    def __bool__(self):
+        return bool(self._stats)
+
+    def acquire(self, session_key=None, exclude=()):
+        """
+        Ambil proxy untuk session. Session yang sudah punya proxy sehat akan
+        mendapat proxy yang sama (sticky); selain itu dipilih acak berbobot skor kesehatan.
+        """
+        if not self._stats:
+            return None
+
+        excluded = {proxy_key(p) for p in exclude}
+        now = time.monotonic()
+        with self._lock:
+            if session_key is not None:
+                server = self._sticky.get(session_key)
+                stats = self._stats.get(server)
+                if stats and server not in excluded and not stats.is_quarantined(now):
+                    stats.last_used = now
+                    return stats.proxy
+
+            candidates = [
+                s for key, s in self._stats.items()
+                if key not in excluded and not s.is_quarantined(now)
+            ]
+            if not candidates:
+                # Semua proxy sedang dikarantina: pakai yang paling cepat bebas
+                pool = [s for key, s in self._stats.items() if key not in excluded] or list(self._stats.values())
+                chosen = min(pool, key=lambda s: s.quarantined_until)
+                logger.warning(f"⚠️ Semua proxy dikarantina, terpaksa memakai {chosen.proxy['server']}")
+            else:
+                weights = [s.health(now) for s in candidates]
+                chosen = random.choices(candidates, weights=weights, k=1)[0]
+
+            chosen.last_used = now
+            if session_key is not None:
+                if self._sticky.get(session_key) != chosen.proxy["server"]:
+                    self._ip_cache.pop(session_key, None)
+                self._sticky[session_key] = chosen.proxy["server"]
+            return chosen.proxy
+
+    def release(self, session_key):
+        """Lepas sticky proxy dan cache IP milik session."""
+        with self._lock:
+            self._sticky.pop(session_key, None)
+            self._ip_cache.pop(session_key, None)
+
+    def report_success(self, proxy, latency=None):
+        key = proxy_key(proxy)
+        with self._lock:
+            stats = self._stats.get(key)
+            if not stats:
+                return
+            stats.successes += 1
+            if latency is not None:
+                if stats.latency_ewma is None:
+                    stats.latency_ewma = latency
+                else:
+                    stats.latency_ewma = 0.8 * stats.latency_ewma + 0.2 * latency
+
+    def report_failure(self, proxy, banned=False):
+        """
+        Catat kegagalan proxy. Ban (anti-bot / Cloudflare) langsung mengkarantina proxy;
+        kegagalan biasa baru mengkarantina setelah strike menumpuk.
+        """
+        key = proxy_key(proxy)
+        now = time.monotonic()
+        with self._lock:
+            stats = self._stats.get(key)
+            if not stats:
+                return
+            stats.failures += 1
+            strikes = stats.current_strikes(now)
+            strikes += BAN_STRIKE if banned else FAILURE_STRIKE
+            stats.strikes = strikes
+            if banned:
+                stats.bans += 1
+
+            if banned or strikes >= QUARANTINE_STRIKES:
+                duration = min(
+                    PROXY_QUARANTINE_BASE * (2 ** max(0, int(strikes // QUARANTINE_STRIKES) - 1)),
+                    PROXY_QUARANTINE_MAX
+                )
+                stats.quarantined_until = now + duration
+                for session_key in [k for k, v in self._sticky.items() if v == key]:
+                    self._sticky.pop(session_key, None)
+                    self._ip_cache.pop(session_key, None)
+                logger.warning(f"🚫 Proxy {key} dikarantina selama {duration:.0f} detik (strike={strikes:.1f})")
+
+    def cache_ip(self, session_key, ip):
+        with self._lock:
+            self._ip_cache[session_key] = (ip, time.monotonic())
+
+    def get_cached_ip(self, session_key):
+        with self._lock:
+            cached = self._ip_cache.get(session_key)
+            if not cached:
+                return None
+            ip, cached_at = cached
+            if time.monotonic() - cached_at > PROXY_IP_CACHE_TTL:
+                self._ip_cache.pop(session_key, None)
+                return None
+            return ip
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            rows = [s.to_dict(now) for s in self._stats.values()]
+        return sorted(rows, key=lambda r: r["health"], reverse=True)
+
+    def log_stats(self):
+        for row in self.stats():
+            logger.info(
+                f"📊 Proxy {row['server']}: sukses={row['successes']} gagal={row['failures']} "
+                f"ban={row['bans']} latency={row['latency_avg']} health={row['health']} "
+                f"karantina={row['quarantined_for']}s"
+            )
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_proxy_pool():
+    """Pool proxy bersama untuk satu proses, dibangun dari env CUSTOM_PROXIES."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProxyPool(get_custom_proxy_list())
+        return _pool
@@ -0,0 +1,251 @@
+"""
+Index URL listing yang sudah dikenal (Bloom filter di memori) untuk cek "URL baru?" tanpa query per URL.
+
+Dimuat sekali saat job mulai dari tabel scrap + tabel utama lewat server-side cursor, lalu
+diperbarui setiap listing disimpan. Jawaban negatif pasti benar (URL belum pernah ada),
+jadi save() bisa langsung INSERT tanpa SELECT dan mode incremental tidak perlu bertanya ke DB
+untuk URL baru. Jawaban positif bisa salah (~SEEN_INDEX_FP_RATE) dan dikonfirmasi ke DB.
+
+URL dinormalisasi (host huruf kecil, tanpa fragment / param tracking / slash akhir) lalu
+di-hash blake2b 128-bit; k posisi bit diturunkan dengan double hashing. Sekitar 1.8 byte per
+URL pada FP 0.1%, mis. 5 juta URL ~ 9 MB.
+
+    python -m scrap_service.common.seen_urls --site carlistmy --stats
+    python -m scrap_service.common.seen_urls --bench 2000000
+"""
+import os
+import sys
+import math
+import time
+import logging
+import argparse
+import threading
+from hashlib import blake2b
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from scrap_service.common import metrics
+
+logger = logging.getLogger("seen_urls")
+
+# ===== Konfigurasi Env
+SEEN_INDEX = os.getenv("SEEN_INDEX", "true").lower() == "true"
+SEEN_INDEX_FP_RATE = float(os.getenv("SEEN_INDEX_FP_RATE", "0.001"))
+# Kapasitas minimum & faktor ruang tumbuh terhadap jumlah baris saat dimuat
+SEEN_INDEX_MIN_CAPACITY = int(os.getenv("SEEN_INDEX_MIN_CAPACITY", "100000"))
+SEEN_INDEX_GROWTH = float(os.getenv("SEEN_INDEX_GROWTH", "1.5"))
+# Index yang dimuat dipakai ulang oleh job berikutnya di proses yang sama selama sekian menit
+SEEN_INDEX_TTL_MIN = int(os.getenv("SEEN_INDEX_TTL_MIN", "360"))
+SEEN_INDEX_FETCH_SIZE = int(os.getenv("SEEN_INDEX_FETCH_SIZE", "50000"))
+
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "ref")
+LOOKUP_METRIC = "seen_index_lookups_total"
+MASK64 = (1 << 64) - 1
+
+
+def normalize_url(url):
+    """Bentuk kanonik URL listing untuk hashing."""
+    parts = urlsplit((url or "").strip())
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ""))
+
+
+def url_hash(url):
+    """Dua hash 64-bit dari URL ternormalisasi (untuk double hashing)."""
+    digest = blake2b(normalize_url(url).encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    """Bloom filter di atas bytearray; add / contains O(k) dengan k ~ 10."""
+
+    def __init__(self, capacity, fp_rate=SEEN_INDEX_FP_RATE):
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.bits = max(8, int(math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))))
+        self.hashes = max(1, int(round(self.bits / capacity * math.log(2))))
+        self.array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, hashes):
+        h1, h2 = hashes
+        return [((h1 + i * h2) & MASK64) % self.bits for i in range(self.hashes)]
+
+    def add(self, hashes):
+        new = False
+        for position in self._positions(hashes):
+            byte, bit = divmod(position, 8)
+            if not self.array[byte] & (1 << bit):
+                self.array[byte] |= 1 << bit
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, hashes):
+        for position in self._positions(hashes):
+            byte, bit = divmod(position, 8)
+            if not self.array[byte] & (1 << bit):
+                return False
+        return True
+
+    @property
+    def size_bytes(self):
+        return len(self.array)
+
+
+class SeenUrlIndex:
+    """Bloom filter URL yang sudah ada di `tables`, dengan konfirmasi DB untuk jawaban positif."""
+
+    def __init__(self, tables, fp_rate=SEEN_INDEX_FP_RATE):
+        self.tables = list(tables)
+        self.fp_rate = fp_rate
+        self.bloom = BloomFilter(SEEN_INDEX_MIN_CAPACITY, fp_rate)
+        self.lock = threading.Lock()
+        self.loaded_at = None
+
+    def load(self, conn, fetch_size=SEEN_INDEX_FETCH_SIZE):
+        """Isi filter dari semua tabel (server-side cursor, tanpa menampung URL di memori)."""
+        started = time.monotonic()
+        cursor = conn.cursor()
+        total = 0
+        for table in self.tables:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            total += cursor.fetchone()[0]
+        cursor.close()
+        capacity = max(SEEN_INDEX_MIN_CAPACITY, int(total * SEEN_INDEX_GROWTH))
+        bloom = BloomFilter(capacity, self.fp_rate)
+
+        for table in self.tables:
+            with conn.cursor(name=f"seen_urls_{table}") as cursor:
+                cursor.itersize = fetch_size
+                cursor.execute(f"SELECT listing_url FROM {table} WHERE listing_url IS NOT NULL")
+                for (url,) in cursor:
+                    bloom.add(url_hash(url))
+        conn.commit()
+
+        with self.lock:
+            self.bloom = bloom
+            self.loaded_at = time.monotonic()
+        elapsed = time.monotonic() - started
+        metrics.observe_stage("seen_index", "load", elapsed)
+        logger.info(
+            f"🗂️ Index URL dimuat dari {', '.join(self.tables)}: {bloom.count} URL, "
+            f"{bloom.size_bytes / 1024 / 1024:.1f} MB, k={bloom.hashes}, {elapsed:.1f}s"
+        )
+        return self
+
+    def is_stale(self, ttl_min=SEEN_INDEX_TTL_MIN):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > ttl_min * 60
+
+    def add(self, url):
+        hashes = url_hash(url)
+        with self.lock:
+            self.bloom.add(hashes)
+            # Filter yang terlalu penuh menaikkan false positive; muat ulang di job berikutnya
+            if self.bloom.count > self.bloom.capacity:
+                self.loaded_at = None
+
+    def might_contain(self, url):
+        """False = pasti belum pernah ada; True = mungkin ada (konfirmasi ke DB)."""
+        return url_hash(url) in self.bloom
+
+    def split(self, urls):
+        """(pasti_baru, mungkin_ada) dari daftar URL."""
+        fresh, maybe = [], []
+        for url in urls:
+            (maybe if self.might_contain(url) else fresh).append(url)
+        metrics.inc(LOOKUP_METRIC, value=len(fresh), result="negative")
+        metrics.inc(LOOKUP_METRIC, value=len(maybe), result="positive")
+        return fresh, maybe
+
+    def stats(self):
+        bloom = self.bloom
+        return {
+            "urls": bloom.count,
+            "capacity": bloom.capacity,
+            "bytes": bloom.size_bytes,
+            "hashes": bloom.hashes,
+            "fp_rate": bloom.fp_rate,
+        }
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(conn, tables):
+    """Index bersama per kombinasi tabel di proses ini; dimuat ulang kalau sudah lewat TTL."""
+    key = tuple(tables)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = SeenUrlIndex(tables)
+        if index.is_stale():
+            index.load(conn)
+        return index
+
+
+def bench(count, fp_rate=SEEN_INDEX_FP_RATE):
+    """Isi filter dengan URL sintetis lalu ukur memori, waktu dan false positive nyata."""
+    bloom = BloomFilter(count, fp_rate)
+    started = time.monotonic()
+    for i in range(count):
+        bloom.add(url_hash(f"https://www.carlist.my/used-cars/2020-toyota-vios/{i}"))
+    add_time = time.monotonic() - started
+    probes = min(count, 200000)
+    started = time.monotonic()
+    false_positives = sum(
+        url_hash(f"https://www.carlist.my/used-cars/2020-toyota-vios/{count + i}") in bloom for i in range(probes)
+    )
+    probe_time = time.monotonic() - started
+    return {
+        "urls": count,
+        "bytes": bloom.size_bytes,
+        "hashes": bloom.hashes,
+        "add_us": add_time / count * 1e6,
+        "lookup_us": probe_time / probes * 1e6,
+        "fp_observed": false_positives / probes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index URL listing yang sudah dikenal (Bloom filter)")
+    parser.add_argument("--site", choices=["carlistmy", "mudahmy"], help="Muat index dari tabel site ini")
+    parser.add_argument("--stats", action="store_true", help="Cetak ukuran index setelah dimuat")
+    parser.add_argument("--bench", type=int, metavar="N", help="Uji filter dengan N URL sintetis (tanpa DB)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.bench:
+        result = bench(args.bench)
+        print(
+            f"{result['urls']} URL: {result['bytes'] / 1024 / 1024:.1f} MB, k={result['hashes']}, "
+            f"add {result['add_us']:.1f} µs, lookup {result['lookup_us']:.1f} µs, "
+            f"FP nyata {result['fp_observed']:.4%} (target {SEEN_INDEX_FP_RATE:.2%})"
+        )
+    if args.site:
+        from scrap_service.common.engine import get_adapter
+        from scrap_service.carlistmy_service_playwright.database import get_connection
+
+        adapter = get_adapter(args.site)
+        conn = get_connection()
+        try:
+            index = SeenUrlIndex([adapter.scrap_table, adapter.primary_table]).load(conn)
+            if args.stats:
+                stats = index.stats()
+                print(
+                    f"{stats['urls']} URL / kapasitas {stats['capacity']}: {stats['bytes'] / 1024 / 1024:.1f} MB, "
+                    f"k={stats['hashes']}, target FP {stats['fp_rate']:.2%}"
+                )
+        finally:
+            conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
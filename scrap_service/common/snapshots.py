@@ -0,0 +1,386 @@
+"""
+Arsip HTML mentah halaman detail (opsional) untuk parse ulang tanpa request jaringan.
+
+Setiap halaman detail yang berhasil di-extract oleh ScrapeEngine disimpan sebagai satu frame
+zstd di segment file per tanggal, dengan index SQLite per site (listing_url -> segment + offset):
+
+    storage/snapshots/<site>/index.sqlite
+    storage/snapshots/<site>/<YYYYMMDD>/seg-<pid>-<NNNN>.zst
+
+Kalau selector rusak, perbaiki parser lalu jalankan ulang di atas arsip (snapshot terbaru per
+listing). Hasilnya di-bulk-update ke tabel scrap; field yang hasil parse-nya kosong tidak ditimpa.
+Price tidak ikut secara default karena perubahan harga harus lewat history.
+
+    python -m scrap_service.common.snapshots --reparse carlistmy --fields variant transmission
+    python -m scrap_service.common.snapshots --reparse mudahmy --since 20261001 --dry-run
+    python -m scrap_service.common.snapshots --stats carlistmy mudahmy
+    python -m scrap_service.common.snapshots --prune carlistmy
+"""
+import os
+import sys
+import shutil
+import sqlite3
+import logging
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+
+logger = logging.getLogger("snapshots")
+
+# ===== Konfigurasi Env
+SNAPSHOT_ARCHIVE = os.getenv("SNAPSHOT_ARCHIVE", "false").lower() == "true"
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", str(Path(__file__).resolve().parents[2] / "storage" / "snapshots")))
+SNAPSHOT_ZSTD_LEVEL = int(os.getenv("SNAPSHOT_ZSTD_LEVEL", "9"))
+# Segment baru dibuka kalau ukuran segment sekarang melewati batas ini
+SNAPSHOT_SEGMENT_MB = int(os.getenv("SNAPSHOT_SEGMENT_MB", "64"))
+SNAPSHOT_RETENTION_DAYS = int(os.getenv("SNAPSHOT_RETENTION_DAYS", "120"))
+SNAPSHOT_REPARSE_BATCH = int(os.getenv("SNAPSHOT_REPARSE_BATCH", "500"))
+
+# Field yang ditulis ulang saat reparse kalau --fields tidak diisi
+REPARSE_FIELDS = [
+    "brand", "model", "variant", "informasi_iklan", "lokasi",
+    "year", "millage", "transmission", "seat_capacity", "gambar",
+]
+# Kolom normalisasi yang dihitung ulang kalau field sumbernya ikut di-reparse
+NORMALIZED_SOURCES = {
+    "mileage_km": "millage",
+    "seats": "seat_capacity",
+    "transmission_type": "transmission",
+    "posted_at": "informasi_iklan",
+}
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+
+class SnapshotArchive:
+    """Segment zstd per tanggal + index SQLite untuk satu site. Aman dipakai banyak thread."""
+
+    def __init__(self, site, root=SNAPSHOT_DIR, level=SNAPSHOT_ZSTD_LEVEL, segment_mb=SNAPSHOT_SEGMENT_MB):
+        import zstandard
+
+        self.site = site
+        self.root = Path(root) / site
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_mb * 1024 * 1024
+        self.zstd = zstandard
+        # Compressor tidak thread-safe, jadi hanya dipakai di dalam lock
+        self.compressor = zstandard.ZstdCompressor(level=level)
+        self.lock = threading.Lock()
+        self.segment = None
+        self.segment_day = None
+        self.segment_file = None
+
+        self.db = sqlite3.connect(str(self.root / "index.sqlite"), timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY,
+                listing_url TEXT NOT NULL,
+                day TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                raw_size INTEGER NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_url ON snapshots (listing_url, id)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_day ON snapshots (day)")
+        self.db.commit()
+
+    # ================== Tulis
+
+    def _open_segment(self, day):
+        """Segment per proses (pid) supaya beberapa scraper bisa menulis ke site yang sama."""
+        day_dir = self.root / day
+        day_dir.mkdir(parents=True, exist_ok=True)
+        prefix = f"seg-{os.getpid()}-"
+        numbers = [int(p.stem[len(prefix):]) for p in day_dir.glob(f"{prefix}*.zst") if p.stem[len(prefix):].isdigit()]
+        number = max(numbers, default=0)
+        path = day_dir / f"{prefix}{number:04d}.zst"
+        if number == 0 or path.stat().st_size >= self.segment_bytes:
+            path = day_dir / f"{prefix}{number + 1:04d}.zst"
+        self._close_segment()
+        self.segment_file = open(path, "ab")
+        self.segment = path.relative_to(self.root).as_posix()
+        self.segment_day = day
+
+    def _close_segment(self):
+        if self.segment_file:
+            self.segment_file.close()
+        self.segment_file = None
+
+    def add(self, listing_url, html, fetched_at=None):
+        """Simpan satu halaman sebagai frame zstd; kembalikan ukuran terkompresi (byte)."""
+        fetched_at = fetched_at or datetime.now()
+        raw = html.encode("utf-8")
+        day = fetched_at.strftime("%Y%m%d")
+        with self.lock:
+            frame = self.compressor.compress(raw)
+            if (self.segment_day != day or self.segment_file is None
+                    or self.segment_file.tell() >= self.segment_bytes):
+                self._open_segment(day)
+            offset = self.segment_file.seek(0, os.SEEK_END)
+            self.segment_file.write(frame)
+            self.segment_file.flush()
+            self.db.execute("""
+                INSERT INTO snapshots (listing_url, day, fetched_at, segment, offset, length, raw_size)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (listing_url, day, fetched_at.isoformat(timespec="seconds"), self.segment, offset, len(frame), len(raw)))
+            self.db.commit()
+        return len(frame)
+
+    # ================== Baca
+
+    def _reader(self):
+        """Fungsi baca (segment, offset, length) -> HTML dengan handle segment yang di-cache; tutup via .close()."""
+        handles = {}
+        decompressor = self.zstd.ZstdDecompressor()
+
+        def read(segment, offset, length):
+            handle = handles.get(segment)
+            if handle is None:
+                handle = handles[segment] = open(self.root / segment, "rb")
+            handle.seek(offset)
+            return decompressor.decompress(handle.read(length)).decode("utf-8")
+
+        read.close = lambda: [handle.close() for handle in handles.values()]
+        return read
+
+    def get(self, listing_url):
+        """HTML snapshot terbaru untuk listing_url, atau None."""
+        with self.lock:
+            row = self.db.execute("""
+                SELECT segment, offset, length FROM snapshots
+                WHERE listing_url = ? ORDER BY id DESC LIMIT 1
+            """, (listing_url,)).fetchone()
+        if not row:
+            return None
+        read = self._reader()
+        try:
+            return read(*row)
+        finally:
+            read.close()
+
+    def iter_latest(self, since=None):
+        """
+        (listing_url, fetched_at, html) snapshot terbaru per listing, urut segment + offset
+        supaya file dibaca berurutan. `since` = YYYYMMDD (opsional).
+        """
+        with self.lock:
+            rows = self.db.execute("""
+                SELECT listing_url, fetched_at, segment, offset, length FROM snapshots
+                WHERE id IN (SELECT MAX(id) FROM snapshots GROUP BY listing_url)
+                  AND day >= ?
+                ORDER BY segment, offset
+            """, (since or "",)).fetchall()
+        read = self._reader()
+        try:
+            for listing_url, fetched_at, segment, offset, length in rows:
+                try:
+                    html = read(segment, offset, length)
+                except Exception as e:
+                    logger.warning(f"⚠️ Snapshot {listing_url} tidak bisa dibaca ({segment}@{offset}): {e}")
+                    continue
+                yield listing_url, datetime.fromisoformat(fetched_at), html
+        finally:
+            read.close()
+
+    def stats(self):
+        with self.lock:
+            rows = self.db.execute("""
+                SELECT day, COUNT(*), COUNT(DISTINCT listing_url), SUM(length), SUM(raw_size)
+                FROM snapshots GROUP BY day ORDER BY day
+            """).fetchall()
+        return [
+            {"day": day, "snapshots": count, "listings": listings, "bytes": size, "raw_bytes": raw}
+            for day, count, listings, size, raw in rows
+        ]
+
+    def prune(self, retention_days=SNAPSHOT_RETENTION_DAYS):
+        """Hapus folder tanggal (dan baris index-nya) yang lebih tua dari retention_days."""
+        cutoff = (datetime.now() - timedelta(days=retention_days)).strftime("%Y%m%d")
+        removed = []
+        with self.lock:
+            for day_dir in sorted(self.root.iterdir()):
+                if day_dir.is_dir() and day_dir.name.isdigit() and day_dir.name < cutoff:
+                    if day_dir.name == self.segment_day:
+                        self._close_segment()
+                        self.segment_day = None
+                    shutil.rmtree(day_dir, ignore_errors=True)
+                    removed.append(day_dir.name)
+            self.db.execute("DELETE FROM snapshots WHERE day < ?", (cutoff,))
+            self.db.commit()
+        return removed
+
+    def close(self):
+        with self.lock:
+            self._close_segment()
+            self.db.close()
+
+
+def get_archive(site):
+    """Arsip bersama per site dalam satu proses."""
+    with _archives_lock:
+        if site not in _archives:
+            _archives[site] = SnapshotArchive(site)
+        return _archives[site]
+
+
+# ================== Parse ulang
+
+def _parse_html_snapshots(adapter, snapshots):
+    for listing_url, fetched_at, html in snapshots:
+        yield listing_url, fetched_at, adapter.parse_html(html, listing_url)
+
+
+def _parse_page_snapshots(adapter, snapshots):
+    """Adapter yang parse-nya lewat DOM: snapshot disajikan ke Chromium via route, request lain diblok."""
+    from playwright.sync_api import sync_playwright
+
+    current = {}
+
+    def handle(route):
+        if route.request.url == current.get("url"):
+            route.fulfill(status=200, content_type="text/html; charset=utf-8", body=current["html"])
+        else:
+            route.abort()
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            context = browser.new_context()
+            context.route("**/*", handle)
+            page = context.new_page()
+            for listing_url, fetched_at, html in snapshots:
+                current.update(url=listing_url, html=html)
+                page.goto(listing_url, wait_until="domcontentloaded")
+                yield listing_url, fetched_at, adapter.parse_detail(page, listing_url)
+        finally:
+            browser.close()
+
+
+def _column_types(cursor, table, columns):
+    cursor.execute("""
+        SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+        FROM pg_attribute a
+        WHERE a.attrelid = to_regclass(%s) AND a.attname = ANY(%s) AND NOT a.attisdropped
+    """, (table, list(columns)))
+    return dict(cursor.fetchall())
+
+
+def _flush(conn, table, columns, types, values):
+    from psycopg2.extras import execute_values
+
+    template = "(%s, " + ", ".join(f"%s::{types.get(col, 'text')}" for col in columns) + ")"
+    cursor = conn.cursor()
+    try:
+        execute_values(cursor, f"""
+            UPDATE {table} AS t
+            SET {", ".join(f"{col} = COALESCE(v.{col}, t.{col})" for col in columns)}
+            FROM (VALUES %s) AS v (listing_url, {", ".join(columns)})
+            WHERE t.listing_url = v.listing_url
+        """, values, template=template, page_size=len(values))
+        updated = cursor.rowcount
+        conn.commit()
+        return updated
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def reparse(site, conn=None, fields=None, since=None, batch_size=SNAPSHOT_REPARSE_BATCH, dry_run=False, log=None):
+    """
+    Jalankan extractor site di atas snapshot terbaru per listing lalu bulk-update tabel scrap.
+    Kembalikan ringkasan {parsed, failed, updated}.
+    """
+    from scrap_service.common.engine import get_adapter
+    from scrap_service.common.normalize import normalize_car
+    from scrap_service.common.validation import is_missing
+
+    log = log or logger
+    adapter = get_adapter(site)
+    fields = list(fields or REPARSE_FIELDS)
+    columns = fields + [col for col, source in NORMALIZED_SOURCES.items() if source in fields]
+    archive = get_archive(site)
+    snapshots = archive.iter_latest(since)
+    parsed_rows = (_parse_html_snapshots if adapter.parses_html else _parse_page_snapshots)(adapter, snapshots)
+
+    types = _column_types(conn.cursor(), adapter.scrap_table, columns) if conn else {}
+    summary = {"parsed": 0, "failed": 0, "updated": 0}
+    values = []
+    for listing_url, fetched_at, data in parsed_rows:
+        try:
+            car = adapter.coerce(data)
+            car.update(normalize_car(car, fetched_at))
+        except Exception as e:
+            summary["failed"] += 1
+            log.warning(f"⚠️ Parse ulang {listing_url} gagal: {e}")
+            continue
+        summary["parsed"] += 1
+        values.append((listing_url, *[None if is_missing(car.get(col)) else car.get(col) for col in columns]))
+        if dry_run and summary["parsed"] <= 5:
+            log.info(f"🔎 {listing_url}: {dict(zip(columns, values[-1][1:]))}")
+        if len(values) >= batch_size:
+            if not dry_run:
+                summary["updated"] += _flush(conn, adapter.scrap_table, columns, types, values)
+            values = []
+            log.info(f"🔁 Reparse {site}: {summary['parsed']} snapshot diparse, {summary['updated']} baris diupdate")
+    if values and not dry_run:
+        summary["updated"] += _flush(conn, adapter.scrap_table, columns, types, values)
+
+    log.info(
+        f"✅ Reparse {site} selesai ({', '.join(fields)}): {summary['parsed']} snapshot diparse, "
+        f"{summary['failed']} gagal, {summary['updated']} baris {adapter.scrap_table} diupdate"
+        + (" (dry run)" if dry_run else "")
+    )
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arsip snapshot HTML & parse ulang offline")
+    parser.add_argument("--reparse", metavar="SITE", help="Parse ulang snapshot site ini dan update tabel scrap")
+    parser.add_argument("--fields", nargs="+", default=None, help=f"Field yang ditulis ulang (default: {' '.join(REPARSE_FIELDS)})")
+    parser.add_argument("--since", help="Hanya snapshot sejak tanggal ini (YYYYMMDD)")
+    parser.add_argument("--batch-size", type=int, default=SNAPSHOT_REPARSE_BATCH)
+    parser.add_argument("--dry-run", action="store_true", help="Parse saja, tanpa menulis ke DB")
+    parser.add_argument("--sync", action="store_true", help="Setelah reparse, sinkronkan tabel scrap ke tabel utama")
+    parser.add_argument("--stats", nargs="+", metavar="SITE", help="Ringkasan arsip per tanggal")
+    parser.add_argument("--prune", nargs="+", metavar="SITE", help="Hapus snapshot lebih tua dari SNAPSHOT_RETENTION_DAYS")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    for site in args.stats or []:
+        for row in get_archive(site).stats():
+            ratio = row["raw_bytes"] / row["bytes"] if row["bytes"] else 0
+            print(f"{site} {row['day']}: {row['snapshots']} snapshot, {row['listings']} listing, "
+                  f"{row['bytes'] / 1024 / 1024:.1f} MB (rasio {ratio:.1f}x)")
+
+    for site in args.prune or []:
+        removed = get_archive(site).prune()
+        logger.info(f"🧹 {site}: {len(removed)} folder tanggal dihapus")
+
+    if args.reparse:
+        conn = None
+        if not args.dry_run:
+            from scrap_service.common.database import get_connection
+            conn = get_connection()
+        try:
+            reparse(args.reparse, conn, fields=args.fields, since=args.since,
+                    batch_size=args.batch_size, dry_run=args.dry_run)
+            if args.sync and conn:
+                from scrap_service.common.engine import ScrapeEngine, get_adapter
+                ScrapeEngine(get_adapter(args.reparse), conn).sync_to_primary()
+        finally:
+            if conn:
+                conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
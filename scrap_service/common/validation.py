@@ -0,0 +1,148 @@
+"""
+Validasi kelengkapan field detail listing langsung setelah parse, selagi halaman masih terbuka.
+
+Field wajib yang kosong dicoba lagi di DOM yang sama lewat extractor cadangan per site
+(breadcrumb, label spesifikasi, JSON-LD, ...). Kalau masih kosong, tunggu sebentar elemen
+yang biasanya dirender terlambat lalu parse ulang, sebelum pindah ke listing berikutnya.
+Dengan begitu baris tidak lengkap jarang sampai ke DB dan null service tidak perlu memuat ulang halaman.
+"""
+import os
+import re
+import json
+import logging
+
+from scrap_service.common import metrics
+
+logger = logging.getLogger("validation")
+
+# ===== Konfigurasi Env
+# Batas tunggu (ms) per selector untuk elemen yang dirender terlambat
+VALIDATION_WAIT_MS = int(os.getenv("VALIDATION_WAIT_MS", "5000"))
+
+INCOMPLETE_METRIC = "scrape_incomplete_total"
+MISSING_MARKERS = {"", "n/a", "na", "-", "null", "none"}
+
+
+def is_missing(value):
+    """None, string kosong / penanda fallback ("N/A") dan angka 0 dianggap kosong."""
+    if value is None:
+        return True
+    if isinstance(value, (int, float)):
+        return value == 0
+    if isinstance(value, (list, tuple)):
+        return not value
+    return str(value).strip().lower() in MISSING_MARKERS
+
+
+def missing_fields(data, required):
+    return [field for field in required if is_missing(data.get(field))]
+
+
+class FieldRules:
+    """
+    Aturan per site: field wajib, extractor cadangan per field (fungsi page -> nilai),
+    selector yang ditunggu untuk elemen yang telat dirender, dan fungsi parse ulang (page -> dict).
+    """
+
+    def __init__(self, site, required, fallbacks=None, wait_selectors=None, reparse=None):
+        self.site = site
+        self.required = list(required)
+        self.fallbacks = fallbacks or {}
+        self.wait_selectors = wait_selectors or {}
+        self.reparse = reparse
+
+
+def _apply_fallbacks(page, data, fields, rules):
+    for field in fields:
+        for extractor in rules.fallbacks.get(field, []):
+            try:
+                value = extractor(page)
+            except Exception as e:
+                logger.debug(f"Extractor cadangan {field} gagal: {e}")
+                continue
+            if not is_missing(value):
+                data[field] = value
+                break
+
+
+def _wait_late_elements(page, fields, rules, timeout):
+    waited = False
+    for selector in dict.fromkeys(sel for field in fields for sel in rules.wait_selectors.get(field, [])):
+        try:
+            page.wait_for_selector(selector, state="attached", timeout=timeout)
+            waited = True
+        except Exception:
+            continue
+    return waited
+
+
+def complete_detail(page, data, rules, timeout=VALIDATION_WAIT_MS):
+    """
+    Lengkapi field wajib yang kosong di `data` memakai halaman yang sudah dimuat.
+    Kembalikan (data, field yang masih kosong). Hanya field yang kosong yang diubah.
+    """
+    missing = missing_fields(data, rules.required)
+    if not missing:
+        return data, []
+
+    _apply_fallbacks(page, data, missing, rules)
+    still_missing = missing_fields(data, missing)
+
+    if still_missing and _wait_late_elements(page, still_missing, rules, timeout):
+        if rules.reparse:
+            try:
+                fresh = rules.reparse(page)
+                for field in still_missing:
+                    if not is_missing(fresh.get(field)):
+                        data[field] = fresh[field]
+            except Exception as e:
+                logger.debug(f"Parse ulang gagal: {e}")
+        _apply_fallbacks(page, data, missing_fields(data, still_missing), rules)
+        still_missing = missing_fields(data, still_missing)
+
+    for field in missing:
+        result = "missing" if field in still_missing else "repaired"
+        metrics.inc(INCOMPLETE_METRIC, site=rules.site, field=field, result=result)
+    if still_missing:
+        logger.warning(f"⚠️ Field wajib masih kosong untuk {data.get('listing_url')}: {', '.join(still_missing)}")
+    else:
+        logger.info(f"🩹 Field kosong dilengkapi di halaman yang sama: {', '.join(missing)}")
+    return data, still_missing
+
+
+# ================== Extractor cadangan umum
+
+def json_ld_vehicle(page):
+    """Data Car/Vehicle/Product dari <script type="application/ld+json"> (brand, model, variant, price)."""
+    raw_blocks = page.evaluate("""() => Array.from(
+        document.querySelectorAll('script[type="application/ld+json"]')
+    ).map(s => s.textContent)""")
+    for raw in raw_blocks or []:
+        try:
+            payload = json.loads(raw)
+        except (TypeError, ValueError):
+            continue
+        items = payload if isinstance(payload, list) else payload.get("@graph", [payload])
+        for item in items:
+            if not isinstance(item, dict) or item.get("@type") not in ("Car", "Vehicle", "Product"):
+                continue
+            brand = item.get("brand")
+            offers = item.get("offers") or {}
+            if isinstance(offers, list):
+                offers = offers[0] if offers else {}
+            return {
+                "brand": brand.get("name") if isinstance(brand, dict) else brand,
+                "model": item.get("model"),
+                "variant": item.get("vehicleConfiguration"),
+                "price": offers.get("price"),
+            }
+    return {}
+
+
+def json_ld_field(field):
+    return lambda page: json_ld_vehicle(page).get(field)
+
+
+def price_to_int(value):
+    digits = re.sub(r"[^\d]", "", str(value or "").split(".")[0])
+    return int(digits) if digits else None
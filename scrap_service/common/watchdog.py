@@ -0,0 +1,304 @@
+"""
+Watchdog memori untuk scraper / tracker Playwright yang berjalan berjam-jam.
+
+Per listing yang diproses, RSS proses Python dan semua proses anak (driver Playwright +
+Chromium beserta renderer-nya) dicatat ke log. Kalau ambang terlewati, context atau browser
+didaur ulang lewat service.open_context() / quit_browser() + init_browser().
+Proses browser milik service diturunkan dari driver Playwright yang di-spawn launch service itu
+sendiri (beberapa job bisa berjalan di satu proses lewat JobManager); yang masih hidup setelah
+quit_browser (mis. browser.close() gagal) dibunuh, begitu juga Chromium yatim (ppid 1) sisa
+proses yang crash.
+
+    python -m scrap_service.common.watchdog --status
+    python -m scrap_service.common.watchdog --reap
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+
+import psutil
+
+from scrap_service.common import metrics
+
+logger = logging.getLogger("watchdog")
+
+# ===== Konfigurasi Env
+WATCHDOG_ENABLED = os.getenv("WATCHDOG_ENABLED", "true").lower() == "true"
+# Total RSS proses browser (MB) sebelum context didaur ulang
+WATCHDOG_CONTEXT_MB = int(os.getenv("WATCHDOG_CONTEXT_MB", "800"))
+# Total RSS proses browser (MB) sebelum browser di-restart penuh
+WATCHDOG_BROWSER_MB = int(os.getenv("WATCHDOG_BROWSER_MB", "1500"))
+# RSS proses Python (MB) yang dianggap bocor; hanya diperingatkan, tidak bisa didaur ulang
+WATCHDOG_PYTHON_MB = int(os.getenv("WATCHDOG_PYTHON_MB", "1024"))
+# Memori host tersisa (MB) di bawah ini -> restart browser
+WATCHDOG_MIN_AVAILABLE_MB = int(os.getenv("WATCHDOG_MIN_AVAILABLE_MB", "512"))
+WATCHDOG_REAP_ORPHANS = os.getenv("WATCHDOG_REAP_ORPHANS", "true").lower() == "true"
+# Umur minimal (detik) Chromium yatim sebelum dibunuh, agar browser yang baru launch tidak ikut
+WATCHDOG_ORPHAN_MIN_AGE = int(os.getenv("WATCHDOG_ORPHAN_MIN_AGE", "120"))
+
+BROWSER_NAMES = ("chrome", "chromium", "headless_shell")
+# Penanda command line browser yang dijalankan Playwright / chromedriver
+AUTOMATION_MARKERS = ("--remote-debugging-pipe", "--remote-debugging-port", "ms-playwright", "--enable-automation")
+# Penanda command line driver Node Playwright (anak langsung proses Python)
+DRIVER_MARKERS = ("run-driver", "playwright")
+RECYCLE_METRIC = "watchdog_recycles_total"
+ORPHAN_METRIC = "watchdog_orphans_killed_total"
+
+MB = 1024 * 1024
+
+# Launch browser diserialkan per proses: anak langsung baru selama jendela launch pasti milik pemanggil
+_launch_lock = threading.Lock()
+
+
+def _rss(proc):
+    try:
+        return proc.memory_info().rss
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return 0
+
+
+def _alive(proc):
+    try:
+        return proc.is_running() and proc.status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+def _descendants(proc):
+    try:
+        return proc.children(recursive=True)
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return []
+
+
+def _kill_tree(roots, timeout=5):
+    """Terminate proses beserta turunannya, kill yang tidak berhenti; kembalikan jumlah proses."""
+    procs = {}
+    for root in roots:
+        for p in [root] + _descendants(root):
+            procs[p.pid] = p
+    procs = list(procs.values())
+    for p in procs:
+        try:
+            p.terminate()
+        except psutil.NoSuchProcess:
+            pass
+    _, alive = psutil.wait_procs(procs, timeout=timeout)
+    for p in alive:
+        try:
+            p.kill()
+        except psutil.NoSuchProcess:
+            pass
+    return len(procs)
+
+
+def is_playwright_driver(proc):
+    try:
+        cmdline = " ".join(proc.cmdline())
+    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+        return False
+    return any(marker in cmdline for marker in DRIVER_MARKERS)
+
+
+def _children(proc):
+    try:
+        return proc.children()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return []
+
+
+def is_automation_browser(proc):
+    try:
+        name = (proc.name() or "").lower()
+        if not any(marker in name for marker in BROWSER_NAMES):
+            return False
+        cmdline = " ".join(proc.cmdline())
+    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+        return False
+    # Proses renderer/zygote punya --type=...; yang dicari proses utama browser
+    return "--type=" not in cmdline and any(marker in cmdline for marker in AUTOMATION_MARKERS)
+
+
+def find_orphans(min_age=WATCHDOG_ORPHAN_MIN_AGE):
+    """Proses utama Chromium otomasi milik user ini yang induknya sudah mati (diadopsi init)."""
+    now = time.time()
+    user = psutil.Process().username()
+    orphans = []
+    for proc in psutil.process_iter(["ppid", "create_time", "username"]):
+        info = proc.info
+        if info["ppid"] != 1 or info["username"] != user:
+            continue
+        if now - (info["create_time"] or now) < min_age:
+            continue
+        if is_automation_browser(proc):
+            orphans.append(proc)
+    return orphans
+
+
+def reap_orphans(min_age=WATCHDOG_ORPHAN_MIN_AGE):
+    """Bunuh Chromium yatim sisa run yang crash; kembalikan jumlah proses yang dihentikan."""
+    killed = 0
+    for proc in find_orphans(min_age):
+        rss = _rss(proc)
+        killed += _kill_tree([proc])
+        logger.warning(f"🧟 Chromium yatim pid={proc.pid} ({rss / MB:.0f} MB) dihentikan")
+    if killed:
+        metrics.inc(ORPHAN_METRIC, value=killed)
+    return killed
+
+
+class ResourceWatchdog:
+    """Pantau memori proses sendiri + browser milik satu service dan putuskan kapan didaur ulang."""
+
+    def __init__(self, site, context_mb=WATCHDOG_CONTEXT_MB, browser_mb=WATCHDOG_BROWSER_MB,
+                 python_mb=WATCHDOG_PYTHON_MB, min_available_mb=WATCHDOG_MIN_AVAILABLE_MB,
+                 enabled=WATCHDOG_ENABLED):
+        self.site = site
+        self.context_mb = context_mb
+        self.browser_mb = browser_mb
+        self.python_mb = python_mb
+        self.min_available_mb = min_available_mb
+        self.enabled = enabled
+        self.process = psutil.Process()
+        # pid -> psutil.Process driver Playwright yang di-spawn launch service ini;
+        # proses browser selalu diturunkan dari sini, bukan dari semua anak proses Python
+        self.owned = {}
+        self.listings = 0
+        self.last_action = None
+        self.python_warned = False
+        if enabled and WATCHDOG_REAP_ORPHANS:
+            reap_orphans()
+
+    @contextmanager
+    def launching(self):
+        """
+        Bungkus start Playwright + launch browser untuk mencatat driver milik service.
+        Dikunci per proses, jadi anak langsung baru yang berupa driver Playwright hanya
+        bisa berasal dari sync_playwright().start() pemanggil, bukan dari job lain.
+        """
+        with _launch_lock:
+            before = {p.pid for p in _children(self.process)}
+            try:
+                yield
+            finally:
+                for proc in _children(self.process):
+                    if proc.pid not in before and is_playwright_driver(proc):
+                        self.owned[proc.pid] = proc
+
+    def browser_processes(self):
+        """Driver milik service + seluruh turunannya saat ini (browser, renderer yang lahir setelah launch)."""
+        procs = {}
+        for proc in list(self.owned.values()):
+            if _alive(proc):
+                procs[proc.pid] = proc
+                for child in _descendants(proc):
+                    procs[child.pid] = child
+        return list(procs.values())
+
+    def sample(self):
+        """{"python_mb", "browser_mb", "procs", "available_mb"}"""
+        browser = self.browser_processes()
+        return {
+            "python_mb": round(_rss(self.process) / MB, 1),
+            "browser_mb": round(sum(_rss(p) for p in browser) / MB, 1),
+            "procs": len(browser),
+            "available_mb": round(psutil.virtual_memory().available / MB, 1),
+        }
+
+    def decide(self, usage):
+        """None, "context" atau "browser" beserta alasannya."""
+        if usage["available_mb"] < self.min_available_mb:
+            return "browser", "host_low_memory"
+        if usage["browser_mb"] >= self.browser_mb:
+            return "browser", "browser_rss"
+        if usage["browser_mb"] >= self.context_mb:
+            # Context baru saja didaur ulang tapi memori tetap tinggi -> restart browser
+            if self.last_action == "context":
+                return "browser", "context_recycle_ineffective"
+            return "context", "browser_rss"
+        return None, None
+
+    def check(self, label=None):
+        """Catat memori setelah satu listing diproses; kembalikan aksi daur ulang (atau None)."""
+        if not self.enabled:
+            return None
+        self.listings += 1
+        usage = self.sample()
+        logger.info(
+            f"🧠 [{self.site}] listing #{self.listings}{f' {label}' if label else ''}: "
+            f"python={usage['python_mb']:.0f}MB browser={usage['browser_mb']:.0f}MB "
+            f"({usage['procs']} proses) host tersedia={usage['available_mb']:.0f}MB",
+            extra={"site": self.site, **usage},
+        )
+        if usage["python_mb"] >= self.python_mb and not self.python_warned:
+            self.python_warned = True
+            logger.warning(f"⚠️ [{self.site}] RSS Python {usage['python_mb']:.0f}MB melewati {self.python_mb}MB")
+        action, reason = self.decide(usage)
+        self.last_action = action
+        if action:
+            logger.warning(
+                f"♻️ [{self.site}] Daur ulang {action} ({reason}): browser={usage['browser_mb']:.0f}MB "
+                f"host tersedia={usage['available_mb']:.0f}MB"
+            )
+            metrics.inc(RECYCLE_METRIC, site=self.site, action=action, reason=reason)
+        return action
+
+    def recycle(self, service, action):
+        """Daur ulang context (service.open_context) atau browser (quit_browser + init_browser)."""
+        if action == "context" and hasattr(service, "open_context"):
+            try:
+                service.context.close()
+            except Exception as e:
+                logger.warning(f"⚠️ Gagal menutup context lama: {e}")
+            service.open_context()
+            return
+        service.quit_browser()
+        service.init_browser()
+
+    def after_listing(self, service, label=None):
+        """check() + recycle() dalam satu panggilan dari loop listing."""
+        action = self.check(label)
+        if action:
+            self.recycle(service, action)
+        return action
+
+    def after_quit(self):
+        """Dipanggil setelah quit_browser: hentikan pohon proses driver milik service yang masih tertinggal."""
+        leftovers = [p for p in self.owned.values() if _alive(p)]
+        self.owned = {}
+        killed = _kill_tree(leftovers) if leftovers else 0
+        if killed:
+            logger.warning(f"🧟 [{self.site}] {killed} proses browser tertinggal setelah quit dihentikan")
+            metrics.inc(ORPHAN_METRIC, value=killed, site=self.site)
+        if self.enabled and WATCHDOG_REAP_ORPHANS:
+            reap_orphans()
+        return killed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watchdog memori browser scraper")
+    parser.add_argument("--status", action="store_true", help="Cetak memori host dan Chromium otomasi yang berjalan")
+    parser.add_argument("--reap", action="store_true", help="Hentikan Chromium yatim sekarang")
+    parser.add_argument("--min-age", type=int, default=WATCHDOG_ORPHAN_MIN_AGE, help="Umur minimal proses yatim (detik)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.status:
+        memory = psutil.virtual_memory()
+        print(f"Host: tersedia {memory.available / MB:.0f} MB dari {memory.total / MB:.0f} MB")
+        for proc in psutil.process_iter(["ppid"]):
+            if is_automation_browser(proc):
+                tree = [proc] + _descendants(proc)
+                orphan = " (yatim)" if proc.info["ppid"] == 1 else ""
+                print(f"pid={proc.pid}{orphan}: {len(tree)} proses, {sum(_rss(p) for p in tree) / MB:.0f} MB")
+    if args.reap:
+        print(f"Dihentikan: {reap_orphans(args.min_age)} proses")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,80 @@
-from flask import Flask, jsonify
-from scrap_service.imagedownload_service.imagedownload_service import ImageDownloadService
+from flask import Flask, jsonify, request
+from scrap_service.common.jobs import JobManager, JobConflict, accepted_response, conflict_response, register_job_routes
 
 app = Flask(__name__)
-image_service = ImageDownloadService()
+job_manager = JobManager(max_workers=1)
+register_job_routes(app, job_manager)
+
+
+def create_image_service():
+    """Import dan bangun service saat job dijalankan, supaya koneksi DB tidak dibuka saat app start."""
+    from scrap_service.imagedownload_service.imagedownload_service import ImageDownloadService
+    return ImageDownloadService()
+
 
 @app.route('/download/images', methods=['POST'])
 def download_images():
     """
     Endpoint untuk mendownload semua gambar dari database `cars`, berurutan dari ID terkecil ke terbesar.
+    Proses berjalan di background; status bisa dicek lewat GET /jobs/<id>.
+    """
+    try:
+        job = job_manager.submit(
+            "download_images",
+            create_image_service,
+            lambda service: service.run(),
+            lock_key="all"
+        )
+    except JobConflict as e:
+        return conflict_response(e)
+    return accepted_response(job)
+
+@app.route('/dedup/run', methods=['POST'])
+def run_dedup():
+    """
+    Jalankan deduplikasi listing lintas situs (blocking key + hash gambar) di background.
+    Body opsional: {"full": true} untuk membangun ulang semua cluster.
     """
-    image_service.run()
-    return jsonify({"message": "Proses download semua gambar dimulai"}), 200
+    full = bool((request.get_json(silent=True) or {}).get("full", False))
+
+    def create_dedup_service():
+        from scrap_service.common.dedup import DedupService
+        return DedupService()
+
+    try:
+        job = job_manager.submit(
+            "dedup",
+            create_dedup_service,
+            lambda service: service.run(full=full),
+            params={"full": full},
+            lock_key="all"
+        )
+    except JobConflict as e:
+        return conflict_response(e)
+    return accepted_response(job)
+
+@app.route('/dedup/stats', methods=['GET'])
+def dedup_stats():
+    from scrap_service.common.database import get_connection
+    from scrap_service.common.dedup import count_unique
+
+    conn = None
+    try:
+        conn = get_connection()
+        return jsonify(count_unique(conn)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
+
+@app.route('/stop/download/images', methods=['POST'])
+def stop_download_images():
+    jobs = job_manager.cancel_all("download_images")
+    return jsonify({
+        "message": "Download gambar dihentikan.",
+        "cancelled_jobs": [job.id for job in jobs]
+    }), 200
 
 if __name__ == '__main__':
     app.run(host="0.0.0.0", port=5003, debug=True)
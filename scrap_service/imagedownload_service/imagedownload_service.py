@@ -3,6 +3,7 @@ import json
 import logging
 import requests
 from .database import get_database_connection
+from scrap_service.common.dedup import duplicate_filter_sql
 
 # Konfigurasi logging agar log tampil di terminal
 logging.basicConfig(
@@ -18,6 +19,8 @@ os.makedirs(SAVE_DIR, exist_ok=True)
 class ImageDownloadService:
     def __init__(self):
         self.conn = get_database_connection()
+        self.stop_flag = False
+        self.progress = {}
 
     def download_image(self, url, listing_id, index):
         """Fungsi untuk mendownload gambar dari URL."""
@@ -30,10 +33,13 @@ class ImageDownloadService:
                     for chunk in response.iter_content(1024):
                         file.write(chunk)
                 logging.info(f"✅ Gambar berhasil diunduh: {filename}")
+                self.progress["images_ok"] += 1
+                return
             else:
                 logging.warning(f"⚠️ Gagal mengunduh {url} - Status: {response.status_code}")
         except Exception as e:
             logging.error(f"❌ Error saat mengunduh {url}: {e}")
+        self.progress["images_failed"] += 1
 
     def run(self):
         """Mengambil semua gambar dari tabel `cars` secara berurutan berdasarkan ID."""
@@ -42,11 +48,19 @@ class ImageDownloadService:
         cursor = self.conn.cursor()
         
         # Mengambil data dari tabel `cars` secara berurutan berdasarkan ID
-        query = "SELECT id, gambar FROM cars ORDER BY id ASC"
+        # (listing duplikat lintas situs dilewati, gambarnya sama dengan listing kanonik)
+        query = f"SELECT id, gambar FROM cars WHERE true{duplicate_filter_sql(cursor, 'cars')} ORDER BY id ASC"
         cursor.execute(query)
+        rows = cursor.fetchall()
+        self.progress = {"total": len(rows), "listings": 0, "current_id": None, "images_ok": 0, "images_failed": 0}
 
-        for row in cursor.fetchall():
+        for row in rows:
+            if self.stop_flag:
+                logging.info("🛑 Download gambar dihentikan oleh user.")
+                break
             listing_id, images_str = row
+            self.progress["current_id"] = listing_id
+            self.progress["listings"] += 1
 
             # Menyesuaikan jika data dalam kolom `gambar` sudah dalam format list atau masih string JSON
             if isinstance(images_str, str):
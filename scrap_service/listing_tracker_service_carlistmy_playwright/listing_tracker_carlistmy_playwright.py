@@ -4,66 +4,33 @@ import random
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright, TimeoutError
-from playwright_stealth import stealth_sync
-from pathlib import Path
 import sys
 
 from scrap_service.listing_tracker_service_carlistmy_playwright.database import get_database_connection
+from scrap_service.common.proxy_pool import get_proxy_pool
+from scrap_service.common.clearance_cache import ClearanceCache, is_challenge_page, wait_for_clearance
+from scrap_service.common import metrics
+from scrap_service.common.market_stats import refresh_after_run
+from scrap_service.common.dedup import duplicate_filter_sql, propagate_status
+from scrap_service.common.engine import get_adapter
+from scrap_service.common.engine import take_screenshot as _take_screenshot
+from scrap_service.common.logsetup import setup_logging
+from scrap_service.common.watchdog import ResourceWatchdog
 
 load_dotenv()
 
-START_DATE = datetime.now().strftime('%Y%m%d')
-
-base_dir = Path(__file__).resolve().parents[2]
-log_dir = base_dir / "logs"
-log_dir.mkdir(parents=True, exist_ok=True)
-
-log_file = log_dir / f"tracker_carlistmy_{START_DATE}.log"
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
+setup_logging("tracker_carlistmy")
 logger = logging.getLogger("carlistmy_tracker")
 
 
 def take_screenshot(page, name: str):
-    try:
-        error_folder_name = datetime.now().strftime('%Y%m%d') + "_error_carlistmy_tracker"
-        screenshot_dir = log_dir / error_folder_name
-        screenshot_dir.mkdir(parents=True, exist_ok=True)
-
-        timestamp = datetime.now().strftime('%H%M%S')
-        screenshot_path = screenshot_dir / f"{name}_{timestamp}.png"
-        page.screenshot(path=str(screenshot_path))
-        logger.info(f"📸 Screenshot disimpan: {screenshot_path}")
-    except Exception as e:
-        logger.warning(f"❌ Gagal menyimpan screenshot: {e}")
+    _take_screenshot(page, name, "carlistmy_tracker")
 
 
 DB_TABLE_PRIMARY = os.getenv("DB_TABLE_PRIMARY", "cars")
-
-
-def get_custom_proxy_list():
-    raw = os.getenv("CUSTOM_PROXIES", "")
-    proxies = [p.strip() for p in raw.split(",") if p.strip()]
-    parsed = []
-    for p in proxies:
-        try:
-            ip, port, user, pw = p.split(":")
-            parsed.append({
-                "server": f"{ip}:{port}",
-                "username": user,
-                "password": pw
-            })
-        except ValueError:
-            continue
-    return parsed
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "false").lower() == "true"
+METRICS_SITE = "carlistmy_tracker"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
 
 
 def should_use_proxy():
@@ -78,15 +45,33 @@ def should_use_proxy():
 class ListingTrackerCarlistmyPlaywright:
     def __init__(self, listings_per_batch=15):
         self.listings_per_batch = listings_per_batch
-        self.sold_selector = "h2"
-        self.sold_text_indicator = "This car has already been sold."
-        self.active_selector = "h1"
-        self.custom_proxies = get_custom_proxy_list()
+        # Aturan sold (selector + teks penanda) dideklarasikan di adapter site
+        self.adapter = get_adapter("carlistmy")
+        self.proxy_pool = get_proxy_pool()
+        self.current_proxy = None
         self.session_id = self.generate_session_id()
+        # cf_clearance terikat ke UA; scraper memakai UA lain, jadi namespace cache dipisah per UA
+        self.clearance_cache = ClearanceCache("carlistmy", user_agent=USER_AGENT)
+        self.clearance_saved = False
+        self.stop_flag = False
+        self.progress = {}
+        self.watchdog = ResourceWatchdog(METRICS_SITE)
 
     def generate_session_id(self):
         return ''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=8))
 
+    def clearance_key(self):
+        if self.current_proxy:
+            return f"proxy:{self.current_proxy['server']}"
+        proxy_mode = os.getenv("PROXY_MODE", "none").lower()
+        if proxy_mode == "oxylabs":
+            return f"oxylabs:{self.session_id}"
+        return "direct"
+
+    def save_clearance(self):
+        if not self.clearance_saved:
+            self.clearance_saved = self.clearance_cache.save(self.clearance_key(), self.context)
+
     def build_proxy_config(self):
         proxy_mode = os.getenv("PROXY_MODE", "none").lower()
 
@@ -98,18 +83,20 @@ class ListingTrackerCarlistmyPlaywright:
                 "password": os.getenv("PROXY_PASSWORD")
             }
 
-        elif proxy_mode == "custom" and self.custom_proxies:
-            proxy = random.choice(self.custom_proxies)
+        elif proxy_mode == "custom" and self.proxy_pool:
+            proxy = self.proxy_pool.acquire(self.session_id)
+            self.current_proxy = proxy
             return proxy
 
         else:
             return None
 
     def init_browser(self):
-        self.playwright = sync_playwright().start()
+        # Import berat (Playwright) ditunda sampai browser benar-benar dibutuhkan
+        from playwright.sync_api import sync_playwright
 
         launch_kwargs = {
-            "headless": False,
+            "headless": BROWSER_HEADLESS,
             "args": ["--disable-blink-features=AutomationControlled", "--no-sandbox"]
         }
 
@@ -120,20 +107,35 @@ class ListingTrackerCarlistmyPlaywright:
         else:
             logging.info("⚡ Browser dijalankan tanpa proxy")
 
-        self.browser = self.playwright.chromium.launch(**launch_kwargs)
+        with self.watchdog.launching():
+            self.playwright = sync_playwright().start()
+            self.browser = self.playwright.chromium.launch(**launch_kwargs)
+        self.open_context()
+        logging.info("✅ Browser Playwright berhasil diinisialisasi.")
+
+    def open_context(self):
+        """Context + page baru di browser yang sama (dipakai juga oleh watchdog untuk daur ulang)."""
+        from playwright_stealth import stealth_sync
+
+        context_kwargs = {}
+        storage_state = self.clearance_cache.load(self.clearance_key())
+        self.clearance_saved = storage_state is not None
+        if storage_state:
+            context_kwargs["storage_state"] = storage_state
+            logger.info("🍪 Context dimulai dengan state clearance tersimpan.")
 
         self.context = self.browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
+            user_agent=USER_AGENT,
             viewport={"width": 1366, "height": 768},
             locale="en-US",
             timezone_id="Asia/Kuala_Lumpur",
             geolocation={"longitude": 101.68627540160966, "latitude": 3.1504925396418315},
-            permissions=["geolocation"]
+            permissions=["geolocation"],
+            **context_kwargs
         )
 
         self.page = self.context.new_page()
         stealth_sync(self.page)
-        logging.info("✅ Browser Playwright berhasil diinisialisasi.")
 
     def detect_anti_bot(self):
         try:
@@ -148,14 +150,21 @@ class ListingTrackerCarlistmyPlaywright:
         except Exception as e:
             logging.warning(f"❌ Gagal cek anti-bot: {e}")
 
-    def retry_with_new_proxy(self):
+    def retry_with_new_proxy(self, failed=False, banned=False):
+        if banned:
+            self.clearance_cache.invalidate(self.clearance_key())
         self.quit_browser()
-        time.sleep(random.uniform(5, 8))
+        if self.current_proxy and (failed or banned):
+            self.proxy_pool.report_failure(self.current_proxy, banned=banned)
+        self.proxy_pool.release(self.session_id)
+        self.current_proxy = None
+        metrics.inc("scrape_proxy_swaps_total", site=METRICS_SITE)
+        metrics.timed_sleep(random.uniform(5, 8), METRICS_SITE, "proxy_swap")
         self.session_id = self.generate_session_id()
         self.init_browser()
         logger.info(f"🔁 Reinit browser dengan session ID baru: {self.session_id}")
         # Tidak ada lagi self.check_current_ip()
-        time.sleep(random.uniform(3, 5))
+        metrics.timed_sleep(random.uniform(3, 5), METRICS_SITE, "proxy_swap")
 
     def quit_browser(self):
         try:
@@ -166,15 +175,26 @@ class ListingTrackerCarlistmyPlaywright:
             self.playwright.stop()
         except Exception:
             pass
+        self.watchdog.after_quit()
         logger.info("🛑 Browser Playwright ditutup.")
 
+    def stop_tracking(self):
+        self.stop_flag = True
+        logger.info("🛑 Permintaan berhenti tracking diterima.")
+
     def random_delay(self, min_d=30, max_d=60):
         """Random delay between actions with default 30-60 seconds"""
         delay = random.uniform(min_d, max_d)
         logger.info(f"⏳ Jeda selama {delay:.2f} detik...")
-        time.sleep(delay)
+        metrics.timed_sleep(delay, METRICS_SITE, "delay")
 
     def update_car_status(self, car_id, status, sold_at=None):
+        metrics.inc("scrape_listings_total", site=METRICS_SITE, result=status)
+        self.progress[status] = self.progress.get(status, 0) + 1
+        with metrics.stage(METRICS_SITE, "db"):
+            self._update_car_status(car_id, status, sold_at)
+
+    def _update_car_status(self, car_id, status, sold_at=None):
         conn = get_database_connection()
         if not conn:
             logger.error("Tidak bisa update status, koneksi database gagal.")
@@ -191,6 +211,7 @@ class ListingTrackerCarlistmyPlaywright:
                 WHERE id = %s
             """, (status, sold_at, now, now, car_id))
             conn.commit()
+            propagate_status(conn, car_id, status, sold_at)
             logger.info(f"> ID={car_id} => Status diupdate ke '{status}', waktu cek status diset ke {now}")
         except Exception as e:
             logger.error(f"❌ Gagal update_car_status ID={car_id}: {e}")
@@ -198,19 +219,34 @@ class ListingTrackerCarlistmyPlaywright:
             cursor.close()
             conn.close()
 
+    def refresh_market_stats(self):
+        """Refresh inkremental market_stats untuk listing yang statusnya baru dicek."""
+        conn = get_database_connection()
+        if not conn:
+            return
+        try:
+            refresh_after_run(conn, log=logger)
+        finally:
+            conn.close()
+
     def detect_cloudflare_block(self):
         try:
-            title = self.page.title()
-            if "Just a moment..." in title:
+            if not is_challenge_page(self.page):
+                return False
+            if not wait_for_clearance(self.page):
+                metrics.inc("scrape_antibot_total", site=METRICS_SITE, kind="cloudflare")
                 take_screenshot(self.page, "cloudflare_block")
                 logger.warning("⚠️ Terblokir Cloudflare, reinit browser & ganti proxy.")
                 return True
+            # Cookie clearance baru: simpan ulang walau context dimulai dari state tersimpan
+            self.clearance_saved = False
+            self.save_clearance()
             return False
         except Exception as e:
             logger.warning(f"❌ Gagal cek title: {e}")
             return False
 
-    def track_listings(self, start_id=1, status_filter="all"):
+    def fetch_listings(self, start_id=1, status_filter="all"):
         if status_filter not in ["all", "active", "unknown"]:
             logger.warning(f"⚠️ Status filter tidak valid: {status_filter}, fallback ke 'all'")
             status_filter = "all"
@@ -218,34 +254,54 @@ class ListingTrackerCarlistmyPlaywright:
         conn = get_database_connection()
         if not conn:
             logger.error("❌ Gagal koneksi database.")
-            return
+            return None
 
         cursor = conn.cursor()
+        # Listing duplikat lintas situs dilewati, statusnya disalin dari listing kanonik
+        skip_duplicates = duplicate_filter_sql(cursor, DB_TABLE_PRIMARY)
         if status_filter == "all":
             cursor.execute(f"""
                 SELECT id, listing_url, status
                 FROM {DB_TABLE_PRIMARY}
-                WHERE id >= %s
+                WHERE id >= %s{skip_duplicates}
                 ORDER BY id
             """, (start_id,))
         else:
             cursor.execute(f"""
                 SELECT id, listing_url, status
                 FROM {DB_TABLE_PRIMARY}
-                WHERE status = %s AND id >= %s
+                WHERE status = %s AND id >= %s{skip_duplicates}
                 ORDER BY id
             """, (status_filter, start_id))
         listings = cursor.fetchall()
         cursor.close()
         conn.close()
+        return listings
+
+    def track_listings(self, start_id=1, status_filter="all", listings=None):
+        """
+        Cek status listing dari DB. `listings` (list of (id, listing_url, status)) bisa diisi
+        langsung untuk melewati query DB, mis. saat load test terhadap mock marketplace.
+        """
+        from_db = listings is None
+        if listings is None:
+            listings = self.fetch_listings(start_id, status_filter)
+            if listings is None:
+                return
 
         logger.info(f"📄 Total data: {len(listings)} | Reinit setiap {self.listings_per_batch} listing")
 
+        self.progress = {"total": len(listings), "checked": 0, "current_id": None}
+        run_snapshot = metrics.snapshot()
         self.init_browser()
-        time.sleep(random.uniform(4, 6))
+        metrics.timed_sleep(random.uniform(4, 6), METRICS_SITE, "startup")
 
         for index, (car_id, url, current_status) in enumerate(listings, start=1):
+            if self.stop_flag:
+                logger.info("🛑 Tracking dihentikan oleh user.")
+                break
             logger.info(f"🔍 Memeriksa ID={car_id} ({index}/{len(listings)})")
+            self.progress["current_id"] = car_id
 
             max_retries = 3
             retry_count = 0
@@ -253,42 +309,51 @@ class ListingTrackerCarlistmyPlaywright:
 
             while retry_count < max_retries:
                 try:
+                    started = time.monotonic()
                     self.page.goto(url, wait_until="networkidle", timeout=90000)
-                    time.sleep(7)
+                    nav_time = time.monotonic() - started
+                    metrics.observe_stage(METRICS_SITE, "navigation", nav_time)
+                    metrics.timed_sleep(7, METRICS_SITE, "page_settle")
 
                     if self.detect_cloudflare_block():
                         logger.warning(f"⚠️ Cloudflare terdeteksi di ID={car_id}, ganti proxy...")
                         raise Exception("Cloudflare detected")
 
-                    self.page.evaluate("window.scrollTo(0, 1000)")
-                    time.sleep(random.uniform(5, 8))
+                    if self.current_proxy:
+                        self.proxy_pool.report_success(self.current_proxy, nav_time)
+                    self.save_clearance()
 
-                    sold_count = self.page.locator(self.sold_selector).count()
-                    if sold_count > 0:
-                        sold_text = self.page.locator(self.sold_selector).first.inner_text().strip()
-                        if self.sold_text_indicator in sold_text:
-                            self.update_car_status(car_id, "sold", datetime.now())
-                            success = True
-                            break
+                    self.page.evaluate("window.scrollTo(0, 1000)")
+                    metrics.timed_sleep(random.uniform(5, 8), METRICS_SITE, "scroll")
 
-                    self.update_car_status(car_id, "active")
+                    with metrics.stage(METRICS_SITE, "parse"):
+                        status = self.adapter.page_status(self.page)
+                    self.update_car_status(car_id, status, datetime.now() if status == "sold" else None)
                     success = True
                     break
 
                 except Exception as e:
                     retry_count += 1
+                    metrics.inc("scrape_retries_total", site=METRICS_SITE)
                     logger.error(f"❌ Gagal ID={car_id} (percobaan ke-{retry_count}): {e}")
                     take_screenshot(self.page, f"error_{car_id}_try{retry_count}")
-                    self.retry_with_new_proxy()
+                    self.retry_with_new_proxy(failed=True, banned="Cloudflare" in str(e))
                     continue
 
             if not success:
                 logger.warning(f"⚠️ ID={car_id} gagal total setelah {max_retries} percobaan. Tandai UNKNOWN.")
                 self.update_car_status(car_id, "unknown")
+            self.progress["checked"] = index
+            self.watchdog.after_listing(self, label=f"ID={car_id}")
 
             if index % self.listings_per_batch == 0 and index < len(listings):
                 logger.info("🔄 Reinit browser & proxy setelah batch.")
                 self.retry_with_new_proxy()
 
         self.quit_browser()
+        if self.proxy_pool:
+            self.proxy_pool.log_stats()
+        metrics.log_summary(METRICS_SITE, since=run_snapshot, log=logger)
+        if from_db:
+            self.refresh_market_stats()
         logger.info("✅ Selesai semua listing.")
\ No newline at end of file
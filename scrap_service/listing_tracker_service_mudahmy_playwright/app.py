@@ -1,8 +1,19 @@
 from flask import Flask, jsonify, request
-from scrap_service.listing_tracker_service_mudahmy_playwright.listing_tracker_mudahmy_playwright import ListingTrackerMudahmyPlaywright
+from scrap_service.common import metrics
+from scrap_service.common.jobs import JobManager, JobConflict, accepted_response, conflict_response, register_job_routes
+from scrap_service.common.market_stats import register_stats_routes
 
 app = Flask(__name__)
-tracker = ListingTrackerMudahmy()
+job_manager = JobManager()
+register_job_routes(app, job_manager)
+register_stats_routes(app, job_manager)
+
+
+def create_tracker():
+    """Import dan bangun tracker saat job dijalankan, bukan saat app start."""
+    from scrap_service.listing_tracker_service_mudahmy_playwright.listing_tracker_mudahmy_playwright import ListingTrackerMudahmyPlaywright
+    return ListingTrackerMudahmyPlaywright()
+
 
 @app.route('/track/listings/mudahmy', methods=['POST'])
 def track_listings():
@@ -11,8 +22,30 @@ def track_listings():
     """
     data = request.get_json()
     start_id = data.get("id", 1)
-    tracker.track_listings(start_id=start_id)
-    return jsonify({"message": f"Proses tracking iklan dimulai dari ID {start_id}"}), 200
+    status_filter = data.get("status", "all")
+    try:
+        job = job_manager.submit(
+            "track_mudahmy",
+            create_tracker,
+            lambda tracker: tracker.track_listings(start_id=start_id, status_filter=status_filter),
+            params={"id": start_id, "status": status_filter},
+            lock_key=status_filter
+        )
+    except JobConflict as e:
+        return conflict_response(e)
+    return accepted_response(job)
+
+@app.route('/stop/track/mudahmy', methods=['POST'])
+def stop_tracking():
+    jobs = job_manager.cancel_all("track_mudahmy")
+    return jsonify({
+        "message": "Tracking MudahMY dihentikan.",
+        "cancelled_jobs": [job.id for job in jobs]
+    }), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return metrics.metrics_response()
 
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=5005, debug=True)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=5005, debug=True)
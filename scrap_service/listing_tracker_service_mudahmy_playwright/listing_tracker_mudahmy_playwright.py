@@ -5,67 +5,32 @@ import logging
 import sys
 from datetime import datetime
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright, TimeoutError
-from playwright_stealth import stealth_sync
-from pathlib import Path
-from camoufox import Camoufox
 
 from scrap_service.listing_tracker_service_mudahmy_playwright.database import get_database_connection
+from scrap_service.common.proxy_pool import get_proxy_pool, IP_CHECK_URL
+from scrap_service.common import metrics
+from scrap_service.common.market_stats import refresh_after_run
+from scrap_service.common.dedup import duplicate_filter_sql, propagate_status
+from scrap_service.common.engine import get_adapter
+from scrap_service.common.engine import take_screenshot as _take_screenshot
+from scrap_service.common.logsetup import setup_logging
+from scrap_service.common.watchdog import ResourceWatchdog
 
 load_dotenv()
 
-START_DATE = datetime.now().strftime('%Y%m%d')
-
-base_dir = Path(__file__).resolve().parents[2]
-log_dir = base_dir / "logs"
-log_dir.mkdir(parents=True, exist_ok=True)
-
-log_file = log_dir / f"tracker_mudahmy_{START_DATE}.log"
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+setup_logging("tracker_mudahmy", stream=sys.stdout)
 logger = logging.getLogger("tracker")
 
 
 def take_screenshot(page, name: str):
-    try:
-        error_folder_name = datetime.now().strftime('%Y%m%d') + "_error_mudahmy_tracker"
-        screenshot_dir = log_dir / error_folder_name
-        screenshot_dir.mkdir(parents=True, exist_ok=True)
-
-        timestamp = datetime.now().strftime('%H%M%S')
-        screenshot_path = screenshot_dir / f"{name}_{timestamp}.png"
-
-        page.screenshot(path=str(screenshot_path))
-        logger.info(f"📸 Screenshot disimpan: {screenshot_path}")
-    except Exception as e:
-        logger.warning(f"❌ Gagal menyimpan screenshot: {e}")
+    _take_screenshot(page, name, "mudahmy_tracker")
 
 
 DB_TABLE_PRIMARY = os.getenv("DB_TABLE_PRIMARY", "cars")
-
-
-def get_custom_proxy_list():
-    raw = os.getenv("CUSTOM_PROXIES", "")
-    proxies = [p.strip() for p in raw.split(",") if p.strip()]
-    parsed = []
-    for p in proxies:
-        try:
-            ip, port, user, pw = p.split(":")
-            parsed.append({
-                "server": f"{ip}:{port}",
-                "username": user,
-                "password": pw
-            })
-        except ValueError:
-            continue
-    return parsed
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "false").lower() == "true"
+# Halaman ringan untuk cek browser hidup sebelum tiap batch
+BROWSER_TEST_URL = os.getenv("BROWSER_TEST_URL", "https://example.com")
+METRICS_SITE = "mudahmy_tracker"
 
 
 def should_use_proxy():
@@ -81,11 +46,14 @@ class ListingTrackerMudahmyPlaywright:
     def __init__(self, batch_size=5):
         self.batch_size = batch_size
         self.redirect_url = "https://www.mudah.my/malaysia/cars-for-sale"
-        self.active_selector = "#ad_view_ad_highlights h1"
-        self.sold_text_indicator = "This car has already been sold."
-        self.custom_proxies = get_custom_proxy_list()
-        self.proxy_index = 0
+        # Aturan sold (redirect, selector aktif, teks penanda) dideklarasikan di adapter site
+        self.adapter = get_adapter("mudahmy")
+        self.proxy_pool = get_proxy_pool()
+        self.current_proxy = None
         self.session_id = self.generate_session_id()
+        self.stop_flag = False
+        self.progress = {}
+        self.watchdog = ResourceWatchdog(METRICS_SITE)
 
     def generate_session_id(self):
         return ''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=8))
@@ -101,18 +69,20 @@ class ListingTrackerMudahmyPlaywright:
                 "password": os.getenv("PROXY_PASSWORD")
             }
 
-        elif proxy_mode == "custom" and self.custom_proxies:
-            proxy = random.choice(self.custom_proxies)
+        elif proxy_mode == "custom" and self.proxy_pool:
+            proxy = self.proxy_pool.acquire(self.session_id)
+            self.current_proxy = proxy
             return proxy
 
         else:
             return None
 
     def init_browser(self):
-        self.playwright = sync_playwright().start()
+        # Import berat (Playwright) ditunda sampai browser benar-benar dibutuhkan
+        from playwright.sync_api import sync_playwright
 
         launch_kwargs = {
-            "headless": False,
+            "headless": BROWSER_HEADLESS,
             "args": [
                 "--disable-blink-features=AutomationControlled",
                 "--no-sandbox",
@@ -128,7 +98,15 @@ class ListingTrackerMudahmyPlaywright:
         else:
             logging.info("⚡ Browser tanpa proxy")
 
-        self.browser = self.playwright.chromium.launch(**launch_kwargs)
+        with self.watchdog.launching():
+            self.playwright = sync_playwright().start()
+            self.browser = self.playwright.chromium.launch(**launch_kwargs)
+        self.open_context()
+        logging.info("✅ Browser Playwright berhasil diinisialisasi.")
+
+    def open_context(self):
+        """Context + page baru di browser yang sama (dipakai juga oleh watchdog untuk daur ulang)."""
+        from playwright_stealth import stealth_sync
 
         self.context = self.browser.new_context(
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
@@ -139,12 +117,10 @@ class ListingTrackerMudahmyPlaywright:
         self.page = self.context.new_page()
         stealth_sync(self.page)
 
-        logging.info("✅ Browser Playwright berhasil diinisialisasi.")
-
     def detect_anti_bot(self):
         try:
-            content = self.page.content()
-            if "Checking your browser before accessing" in content or "cf-browser-verification" in content or "Server Error" in content:
+            if self.adapter.is_blocked(self.page):
+                metrics.inc("scrape_antibot_total", site=METRICS_SITE, kind="cloudflare")
                 take_screenshot(self.page, "cloudflare_block")
                 logging.warning("⚠️ Terkena proteksi anti-bot. Akan ganti proxy dan retry...")
                 return True
@@ -153,14 +129,33 @@ class ListingTrackerMudahmyPlaywright:
             logging.warning(f"❌ Gagal mendeteksi anti-bot: {e}")
             return False
 
+    def proxy_session_key(self):
+        proxy_mode = os.getenv("PROXY_MODE", "none").lower()
+        if proxy_mode == "oxylabs":
+            return f"oxylabs:{self.session_id}"
+        if proxy_mode == "custom" and self.proxy_pool:
+            return self.session_id
+        return "direct"
+
+    def rotate_proxy_session(self, failed=False):
+        if self.current_proxy and failed:
+            self.proxy_pool.report_failure(self.current_proxy)
+        session_key = self.proxy_session_key()
+        if session_key != "direct":
+            self.proxy_pool.release(session_key)
+        self.current_proxy = None
+        self.session_id = self.generate_session_id()
+        metrics.inc("scrape_proxy_swaps_total", site=METRICS_SITE)
+
     def retry_with_new_proxy(self):
         try:
+            metrics.inc("scrape_retries_total", site=METRICS_SITE)
             self.quit_browser()
-            time.sleep(5)
-            self.session_id = self.generate_session_id()
+            metrics.timed_sleep(5, METRICS_SITE, "proxy_swap")
+            self.rotate_proxy_session(failed=True)
             self.init_browser()
 
-            self.page.goto("https://example.com", timeout=10000)
+            self.page.goto(BROWSER_TEST_URL, timeout=10000)
             if self.page.url == "about:blank":
                 raise Exception("Browser masih stuck di about:blank")
 
@@ -171,16 +166,23 @@ class ListingTrackerMudahmyPlaywright:
             raise
 
     def get_current_ip(self, retries=3):
+        session_key = self.proxy_session_key()
+        cached_ip = self.proxy_pool.get_cached_ip(session_key)
+        if cached_ip:
+            logging.info(f"🌐 IP yang digunakan (cache session): {cached_ip}")
+            return cached_ip
+
         for attempt in range(retries):
             try:
-                self.page.goto("https://ip.oxylabs.io/", timeout=10000)
+                self.page.goto(IP_CHECK_URL, timeout=10000)
                 ip = self.page.inner_text("body").strip()
                 logging.info(f"🌐 IP yang digunakan: {ip}")
+                self.proxy_pool.cache_ip(session_key, ip)
                 return ip
             except Exception as e:
                 logging.warning(f"Gagal mengambil IP (percobaan {attempt + 1}/{retries}): {e}")
                 if attempt < retries - 1:
-                    time.sleep(7)
+                    metrics.timed_sleep(7, METRICS_SITE, "ip_check")
         raise Exception("Gagal mengambil IP setelah beberapa retry.")
 
     def quit_browser(self):
@@ -192,25 +194,28 @@ class ListingTrackerMudahmyPlaywright:
             self.playwright.stop()
         except Exception:
             pass
+        self.watchdog.after_quit()
         logger.info("🛑 Browser Playwright ditutup.")
 
+    def stop_tracking(self):
+        self.stop_flag = True
+        logger.info("🛑 Permintaan berhenti tracking diterima.")
+
     def random_delay(self, min_d=11, max_d=33):
         delay = random.uniform(min_d, max_d)
         logger.info(f"⏱️ Delay acak antar listing: {delay:.2f} detik")
-        sys.stdout.flush()  # pastikan log langsung keluar
-        time.sleep(delay)
+        metrics.timed_sleep(delay, METRICS_SITE, "delay")
 
     def is_redirected(self, title, url):
-        title = title.lower().strip()
-        url = url.strip()
-        if (
-                "cars for sale in malaysia" in title and
-                "/cars-for-sale" in url
-        ):
-            return True
-        return False
+        return self.adapter.is_redirected_sold(title, url)
 
     def update_car_status(self, car_id, status, sold_at=None):
+        metrics.inc("scrape_listings_total", site=METRICS_SITE, result=status)
+        self.progress[status] = self.progress.get(status, 0) + 1
+        with metrics.stage(METRICS_SITE, "db"):
+            self._update_car_status(car_id, status, sold_at)
+
+    def _update_car_status(self, car_id, status, sold_at=None):
         conn = get_database_connection()
         if not conn:
             logger.error("Tidak bisa update status, koneksi database gagal.")
@@ -224,6 +229,7 @@ class ListingTrackerMudahmyPlaywright:
                 WHERE id = %s
             """, (status, sold_at, datetime.now(), datetime.now(), car_id))
             conn.commit()
+            propagate_status(conn, car_id, status, sold_at)
             logger.info(f"> ID={car_id} => Status diupdate ke '{status}', last_status_check diperbarui.")
         except Exception as e:
             logger.error(f"❌ Error update_car_status untuk ID={car_id}: {e}")
@@ -231,11 +237,21 @@ class ListingTrackerMudahmyPlaywright:
             cursor.close()
             conn.close()
 
-    def track_listings(self, start_id=1, status_filter='all'):
+    def refresh_market_stats(self):
+        """Refresh inkremental market_stats untuk listing yang statusnya baru dicek."""
         conn = get_database_connection()
         if not conn:
-            logger.error("Koneksi database gagal, tidak bisa memulai tracking.")
             return
+        try:
+            refresh_after_run(conn, log=logger)
+        finally:
+            conn.close()
+
+    def fetch_listings(self, start_id=1, status_filter='all'):
+        conn = get_database_connection()
+        if not conn:
+            logger.error("Koneksi database gagal, tidak bisa memulai tracking.")
+            return None
 
         status_condition = {
             'all': "status IN ('active', 'unknown')",
@@ -244,40 +260,70 @@ class ListingTrackerMudahmyPlaywright:
         }.get(status_filter.lower(), "status IN ('active', 'unknown')")
 
         cursor = conn.cursor()
+        # Listing duplikat lintas situs dilewati, statusnya disalin dari listing kanonik
+        skip_duplicates = duplicate_filter_sql(cursor, DB_TABLE_PRIMARY)
         cursor.execute(f"""
             SELECT id, listing_url, status
             FROM {DB_TABLE_PRIMARY}
-            WHERE {status_condition} AND id >= %s
+            WHERE {status_condition} AND id >= %s{skip_duplicates}
             ORDER BY id
         """, (start_id,))
         listings = cursor.fetchall()
         cursor.close()
         conn.close()
+        return listings
+
+    def track_listings(self, start_id=1, status_filter='all', listings=None):
+        """
+        Cek status listing dari DB. `listings` (list of (id, listing_url, status)) bisa diisi
+        langsung untuk melewati query DB, mis. saat load test terhadap mock marketplace.
+        """
+        from playwright.sync_api import TimeoutError
+
+        from_db = listings is None
+        if listings is None:
+            listings = self.fetch_listings(start_id, status_filter)
+            if listings is None:
+                return
 
         logger.info(f"📄 Total data: {len(listings)} (Filter: {status_filter})")
 
         url_count = 0
+        self.progress = {"total": len(listings), "checked": 0, "current_id": None}
+        run_snapshot = metrics.snapshot()
 
         for i in range(0, len(listings), self.batch_size):
+            if self.stop_flag:
+                logger.info("🛑 Tracking dihentikan oleh user.")
+                break
             batch = listings[i:i + self.batch_size]
             self.init_browser()
 
             try:
-                self.page.goto("https://example.com", timeout=10000)
+                self.page.goto(BROWSER_TEST_URL, timeout=10000)
                 logger.info(f"Test page title: {self.page.title()}")
             except Exception as e:
                 logger.error(f"Browser test failed: {e}")
                 self.quit_browser()
+                self.rotate_proxy_session(failed=True)
                 continue
 
             self.get_current_ip()
 
             for car_id, url, current_status in batch:
+                if self.stop_flag:
+                    break
                 logger.info(f"🔍 Memeriksa ID={car_id} - {url}")
+                self.progress["current_id"] = car_id
                 redirected_sold = False
 
                 try:
+                    started = time.monotonic()
                     self.page.goto(url, wait_until="networkidle", timeout=30000)
+                    nav_time = time.monotonic() - started
+                    metrics.observe_stage(METRICS_SITE, "navigation", nav_time)
+                    if self.current_proxy:
+                        self.proxy_pool.report_success(self.current_proxy, nav_time)
 
                     if self.page.url == "about:blank":
                         logger.error("Halaman stuck di about:blank")
@@ -299,17 +345,13 @@ class ListingTrackerMudahmyPlaywright:
 
                     # Hanya lanjut cek h1 dan konten jika belum redirect
                     if not redirected_sold:
-                        if self.page.locator(self.active_selector).count() > 0:
+                        status = self.adapter.page_status(self.page)
+                        if status == "active":
                             logger.info(f"> ID={car_id} => Aktif (H1 ditemukan)")
-                            self.update_car_status(car_id, "active")
-                        else:
-                            content = self.page.content().lower()
-                            if self.sold_text_indicator.lower() in content:
-                                self.update_car_status(car_id, "sold", datetime.now())
-                            else:
-                                self.update_car_status(car_id, "unknown")
+                        self.update_car_status(car_id, status, datetime.now() if status == "sold" else None)
 
                 except TimeoutError:
+                    metrics.observe_stage(METRICS_SITE, "navigation", time.monotonic() - started)
                     logger.warning(f"⚠️ Timeout saat memeriksa ID={car_id}. Coba cek redirect secara manual...")
                     try:
                         current_url = self.page.evaluate("() => window.location.href")
@@ -334,6 +376,8 @@ class ListingTrackerMudahmyPlaywright:
                 except Exception as e:
                     logger.error(f"❌ Gagal memeriksa ID={car_id}: {e}")
                     take_screenshot(self.page, f"error_{car_id}")
+                    if self.current_proxy:
+                        self.proxy_pool.report_failure(self.current_proxy)
                     self.update_car_status(car_id, "unknown")
 
                 # ✅ Delay selalu dijalankan
@@ -343,16 +387,24 @@ class ListingTrackerMudahmyPlaywright:
                 if url_count % random.randint(5, 9) == 0:
                     pause_duration = random.uniform(20, 60)
                     logger.info(f"⏸️ Mini pause {pause_duration:.2f} detik untuk menghindari deteksi bot...")
-                    time.sleep(pause_duration)
+                    metrics.timed_sleep(pause_duration, METRICS_SITE, "mini_pause")
 
                 url_count += 1
+                self.progress["checked"] = url_count
+                self.watchdog.after_listing(self, label=f"ID={car_id}")
 
                 # ✅ Long break tiap 25 URL
                 if url_count % 25 == 0:
                     break_time = random.uniform(606, 1122)
                     logger.info(f"💤 Sudah memeriksa {url_count} URL. Istirahat selama {break_time / 60:.2f} menit...")
-                    time.sleep(break_time)
+                    metrics.timed_sleep(break_time, METRICS_SITE, "long_break")
 
             self.quit_browser()
+            self.rotate_proxy_session()
 
+        if self.proxy_pool:
+            self.proxy_pool.log_stats()
+        metrics.log_summary(METRICS_SITE, since=run_snapshot, log=logger)
+        if from_db:
+            self.refresh_market_stats()
         logger.info("✅ Proses tracking selesai.")
@@ -0,0 +1,508 @@
+"""
+Crawler postcode.my yang bisa dilanjutkan (resumable) dan jalan paralel di pool proxy.
+
+Dua jenis task disimpan di work list SQLite (storage/postcode/worklist.sqlite):
+
+    location  halaman daftar /location/<negeri>/<area>/?page=N -> link detail + halaman berikutnya
+    detail    halaman detail postcode -> baris di scraped_details.csv (dibaca common.geocode)
+
+Setiap worker punya browser + proxy sendiri (sticky per worker) dan mengambil task dari work list.
+Task yang gagal otomatis dicoba ulang sampai POSTCODE_MAX_ATTEMPTS; hasil detail ditulis ke CSV
+per batch dan baru ditandai selesai setelah di-flush, jadi run yang terputus cukup dijalankan ulang.
+
+    python -m scrap_service.location_service_playwirght.postcode_crawler --seed      # impor CSV lama
+    python -m scrap_service.location_service_playwirght.postcode_crawler --workers 4
+    python -m scrap_service.location_service_playwirght.postcode_crawler --status
+    python -m scrap_service.location_service_playwirght.postcode_crawler --retry-failed
+"""
+import os
+import csv
+import sys
+import glob
+import time
+import random
+import sqlite3
+import logging
+import argparse
+import threading
+from pathlib import Path
+from urllib.parse import urljoin, urlparse, parse_qs
+
+from scrap_service.common import metrics, logsetup
+from scrap_service.common.proxy_pool import ProxyPool, parse_proxy_list
+
+logger = logging.getLogger("postcode_crawler")
+
+BASE_DIR = Path(__file__).resolve().parent
+BASE_URL = "https://postcode.my"
+
+# ===== Konfigurasi Env
+POSTCODE_WORKLIST_DB = Path(os.getenv(
+    "POSTCODE_WORKLIST_DB",
+    Path(__file__).resolve().parents[2] / "storage" / "postcode" / "worklist.sqlite"
+))
+POSTCODE_OUTPUT_CSV = Path(os.getenv("POSTCODE_OUTPUT_CSV", BASE_DIR / "scraped_details.csv"))
+POSTCODE_WORKERS = int(os.getenv("POSTCODE_WORKERS", "4"))
+POSTCODE_MAX_ATTEMPTS = int(os.getenv("POSTCODE_MAX_ATTEMPTS", "3"))
+POSTCODE_FLUSH_SIZE = int(os.getenv("POSTCODE_FLUSH_SIZE", "25"))
+# Browser (dan proxy) diganti setelah sekian task berhasil
+POSTCODE_BROWSER_RECYCLE = int(os.getenv("POSTCODE_BROWSER_RECYCLE", "10"))
+POSTCODE_DELAY_MIN = float(os.getenv("POSTCODE_DELAY_MIN", "15"))
+POSTCODE_DELAY_MAX = float(os.getenv("POSTCODE_DELAY_MAX", "30"))
+POSTCODE_HEADLESS = os.getenv("POSTCODE_HEADLESS", "false").lower() == "true"
+POSTCODE_PROXIES = os.getenv("POSTCODE_PROXIES") or os.getenv("CUSTOM_PROXIES", "")
+
+METRICS_SITE = "postcode"
+
+KIND_LOCATION = "location"
+KIND_DETAIL = "detail"
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_EMPTY = "empty"
+STATUS_FAILED = "failed"
+
+DETAIL_HEADER = ["url", "scrap_url", "location", "post_office", "state", "post_code", "latitude", "longitude"]
+
+
+def canonical_url(url):
+    """URL absolut; ?page=1 disamakan dengan halaman tanpa query supaya tidak di-crawl dua kali."""
+    url = urljoin(BASE_URL + "/", (url or "").strip())
+    parsed = urlparse(url)
+    if parse_qs(parsed.query).get("page") == ["1"]:
+        url = parsed._replace(query="").geturl()
+    return url
+
+
+# ================== Ekstraksi halaman
+
+def handle_consent_popup(page):
+    try:
+        consent_selector = "button:has-text('Consent')"
+        if page.query_selector(consent_selector):
+            page.click(consent_selector)
+            logger.info("✅ Consent popup diklik")
+            time.sleep(2)
+    except Exception:
+        pass
+
+
+def scrape_links_from_page(page):
+    links = []
+    for row in page.query_selector_all("#t2 tbody tr:not(:first-child)"):
+        a = row.query_selector("td:nth-child(1) a")
+        if a:
+            href = a.get_attribute("href")
+            if href and href.strip() and href != "#":
+                links.append(href)
+    return links
+
+
+def get_next_page_url(page):
+    for a in page.query_selector_all("ul.pagination li a"):
+        if a.inner_text().strip() in (">", "›", "Next", "»"):
+            href = a.get_attribute("href")
+            if href and href.strip():
+                return href
+    return None
+
+
+def extract_detail(page):
+    """Ambil location, post office, state, postcode, latitude, longitude dari halaman yang sudah dimuat."""
+    tables = page.query_selector_all("#t2")
+    if not tables:
+        return None
+    if len(tables) < 2:
+        latitude = ""
+        longitude = ""
+    else:
+        lat_table = tables[1]
+        latitude_el = lat_table.query_selector("tbody > tr:nth-child(2) > td:nth-child(2)")
+        latitude = latitude_el.inner_text().strip() if latitude_el else ""
+        longitude_el = lat_table.query_selector("tbody > tr:nth-child(3) > td:nth-child(2)")
+        longitude = longitude_el.inner_text().strip() if longitude_el else ""
+
+    loc_table = tables[0]
+    location = loc_table.query_selector("tbody > tr:nth-child(2) > td:nth-child(2)").inner_text().strip()
+    post_office = loc_table.query_selector("tbody > tr:nth-child(3) > td:nth-child(2)").inner_text().strip()
+    state = loc_table.query_selector("tbody > tr:nth-child(4) > td:nth-child(2)").inner_text().strip()
+    post_code = loc_table.query_selector("tbody > tr:nth-child(5) > td:nth-child(2)").inner_text().strip()
+
+    return location, post_office, state, post_code, latitude, longitude
+
+
+# ================== Work list
+
+class WorkList:
+    """Antrian task persisten di SQLite; dipakai bersama oleh semua worker (thread-safe)."""
+
+    def __init__(self, path=POSTCODE_WORKLIST_DB, max_attempts=POSTCODE_MAX_ATTEMPTS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                parent_url TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_claim ON tasks (status, kind, attempts)")
+        # Task "running" dari run sebelumnya yang terputus dikembalikan ke antrian
+        self.conn.execute("UPDATE tasks SET status = 'pending' WHERE status = 'running'")
+        self.conn.commit()
+
+    def add(self, kind, urls, parent_url=None):
+        """Tambah task baru; url yang sudah ada (apa pun statusnya) diabaikan."""
+        rows = [(canonical_url(url), kind, parent_url, time.time()) for url in urls if url]
+        with self._lock:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tasks (url, kind, parent_url, updated_at) VALUES (?, ?, ?, ?)", rows
+            )
+            self.conn.commit()
+            return self.conn.total_changes - before
+
+    def claim(self, kinds=(KIND_LOCATION, KIND_DETAIL)):
+        """Ambil satu task pending (location lebih dulu karena menghasilkan task detail)."""
+        placeholders = ", ".join("?" for _ in kinds)
+        with self._lock:
+            row = self.conn.execute(f"""
+                SELECT url, kind, parent_url, attempts FROM tasks
+                WHERE status = 'pending' AND kind IN ({placeholders})
+                ORDER BY kind = 'detail', attempts, rowid
+                LIMIT 1
+            """, tuple(kinds)).fetchone()
+            if not row:
+                return None
+            self.conn.execute(
+                "UPDATE tasks SET status = 'running', updated_at = ? WHERE url = ?", (time.time(), row[0])
+            )
+            self.conn.commit()
+            return {"url": row[0], "kind": row[1], "parent_url": row[2], "attempts": row[3]}
+
+    def mark(self, urls, status):
+        with self._lock:
+            self.conn.executemany(
+                "UPDATE tasks SET status = ?, last_error = NULL, updated_at = ? WHERE url = ?",
+                [(status, time.time(), url) for url in urls]
+            )
+            self.conn.commit()
+
+    def record_failure(self, url, error):
+        """Catat gagal; task kembali ke antrian sampai max_attempts, setelah itu berstatus failed."""
+        with self._lock:
+            self.conn.execute("""
+                UPDATE tasks SET attempts = attempts + 1, last_error = ?, updated_at = ?,
+                    status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END
+                WHERE url = ?
+            """, (str(error)[:500], time.time(), self.max_attempts, url))
+            self.conn.commit()
+
+    def retry_failed(self, kinds=(KIND_LOCATION, KIND_DETAIL)):
+        placeholders = ", ".join("?" for _ in kinds)
+        with self._lock:
+            cursor = self.conn.execute(
+                f"UPDATE tasks SET status = 'pending', attempts = 0 WHERE status = 'failed' AND kind IN ({placeholders})",
+                tuple(kinds)
+            )
+            self.conn.commit()
+            return cursor.rowcount
+
+    def counts(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT kind, status, COUNT(*) FROM tasks GROUP BY kind, status").fetchall()
+        result = {}
+        for kind, status, count in rows:
+            result.setdefault(kind, {})[status] = count
+        return result
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def _csv_rows(pattern):
+    for path in sorted(glob.glob(str(BASE_DIR / pattern))):
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+
+
+def seed(worklist, output_csv=POSTCODE_OUTPUT_CSV):
+    """
+    Impor CSV lama ke work list: postalcode.csv -> task location, scraped_links_location*.csv
+    (termasuk file _partN/_gagal) -> task detail, scraped_details*.csv -> detail selesai.
+    Halaman location yang sudah muncul di file link ditandai selesai.
+    """
+    locations = worklist.add(KIND_LOCATION, [row.get("url") for row in _csv_rows("postalcode.csv")])
+
+    crawled_pages = set()
+    details = 0
+    links_by_parent = {}
+    for row in _csv_rows("scraped_links_location*.csv"):
+        if row.get("url") and row.get("scrap_url"):
+            parent = canonical_url(row["url"])
+            crawled_pages.add(parent)
+            links_by_parent.setdefault(parent, []).append(row["scrap_url"])
+    for parent, links in links_by_parent.items():
+        details += worklist.add(KIND_DETAIL, links, parent_url=parent)
+    worklist.add(KIND_LOCATION, crawled_pages)
+    worklist.mark(crawled_pages, STATUS_DONE)
+
+    scraped = {canonical_url(row["scrap_url"]) for row in _csv_rows("scraped_details*.csv") if row.get("scrap_url")}
+    scraped |= {canonical_url(row["scrap_url"]) for row in _read_existing(output_csv)}
+    worklist.mark(scraped, STATUS_DONE)
+
+    logger.info(
+        f"🌱 Seed work list: {locations} location baru, {details} detail baru, "
+        f"{len(crawled_pages)} halaman location & {len(scraped)} detail sudah selesai"
+    )
+    return {"locations": locations, "details": details, "done": len(scraped) + len(crawled_pages)}
+
+
+def _read_existing(path):
+    if not Path(path).exists():
+        return []
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row for row in csv.DictReader(f) if row.get("scrap_url")]
+
+
+# ================== Output CSV (buffered)
+
+class DetailWriter:
+    """Tampung baris detail dan tulis ke CSV per batch; task ditandai done setelah baris tersimpan."""
+
+    def __init__(self, worklist, path=POSTCODE_OUTPUT_CSV, flush_size=POSTCODE_FLUSH_SIZE):
+        self.worklist = worklist
+        self.path = Path(path)
+        self.flush_size = max(1, flush_size)
+        self._lock = threading.Lock()
+        self._buffer = []
+        self.written = 0
+
+    def add(self, row):
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.flush_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        new_file = not self.path.exists()
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(DETAIL_HEADER)
+            writer.writerows(self._buffer)
+        self.worklist.mark([row[1] for row in self._buffer], STATUS_DONE)
+        self.written += len(self._buffer)
+        logger.info(f"💾 {len(self._buffer)} baris detail ditulis ke {self.path.name} (total {self.written})")
+        self._buffer = []
+
+
+# ================== Crawler
+
+class PostcodeCrawler:
+    def __init__(self, worklist, workers=POSTCODE_WORKERS, proxies=None, output_csv=POSTCODE_OUTPUT_CSV):
+        self.worklist = worklist
+        self.workers = max(1, workers)
+        self.pool = ProxyPool(parse_proxy_list(POSTCODE_PROXIES, with_scheme=True) if proxies is None else proxies)
+        self.writer = DetailWriter(worklist, output_csv)
+        self.stop_flag = False
+        self._active = 0
+        self._active_lock = threading.Lock()
+        self.stats = {"location": 0, "detail": 0, "empty": 0, "failed": 0}
+
+    def stop(self):
+        self.stop_flag = True
+
+    def _count(self, key):
+        with self._active_lock:
+            self.stats[key] += 1
+
+    def _open_browser(self, playwright, session_key, exclude=()):
+        proxy = self.pool.acquire(session_key=session_key, exclude=exclude) if self.pool else None
+        launch_kwargs = {"headless": POSTCODE_HEADLESS}
+        if proxy:
+            launch_kwargs["proxy"] = proxy
+        browser = playwright.chromium.launch(**launch_kwargs)
+        page = browser.new_page()
+        logger.info(f"🌐 [{session_key}] browser baru dengan proxy {proxy['server'] if proxy else 'NO PROXY'}")
+        return browser, page, proxy
+
+    def _crawl_location(self, page, task):
+        page.goto(task["url"], timeout=60000)
+        handle_consent_popup(page)
+        page.wait_for_selector("#t2", timeout=30000)
+        links = [canonical_url(link) for link in scrape_links_from_page(page)]
+        added = self.worklist.add(KIND_DETAIL, links, parent_url=task["url"])
+        next_href = get_next_page_url(page)
+        if next_href:
+            self.worklist.add(KIND_LOCATION, [next_href], parent_url=task["url"])
+        self.worklist.mark([task["url"]], STATUS_DONE)
+        self._count("location")
+        logger.info(f"📄 {task['url']}: {len(links)} link ({added} baru){' + halaman berikutnya' if next_href else ''}")
+
+    def _crawl_detail(self, page, task):
+        page.goto(task["url"], timeout=60000)
+        page.wait_for_selector("#t2", timeout=15000)
+        handle_consent_popup(page)
+        values = extract_detail(page)
+        if values and values[0]:
+            self.writer.add([task["parent_url"] or "", task["url"], *values])
+            self._count("detail")
+        else:
+            logger.warning(f"⚠️ Data tidak ditemukan di {task['url']}")
+            self.worklist.mark([task["url"]], STATUS_EMPTY)
+            self._count("empty")
+
+    def _next_task(self, kinds):
+        """
+        Ambil task dan hitung worker sebagai aktif dalam satu lock; selama worker lain masih jalan
+        (bisa menambah task baru), tunggu sebentar. Claim dan cek "antrian kosong + tidak ada yang
+        aktif" harus atomik, kalau tidak worker lain bisa berhenti di antara claim dan increment.
+        """
+        while not self.stop_flag:
+            with self._active_lock:
+                task = self.worklist.claim(kinds)
+                if task:
+                    self._active += 1
+                    return task
+                if self._active == 0:
+                    return None
+            time.sleep(1)
+        return None
+
+    def _worker(self, index, kinds):
+        from playwright.sync_api import sync_playwright
+
+        session_key = f"postcode-{index}"
+        handlers = {KIND_LOCATION: self._crawl_location, KIND_DETAIL: self._crawl_detail}
+        browser = page = proxy = None
+        failed_proxy = None
+        used = 0
+        with sync_playwright() as p:
+            try:
+                while True:
+                    task = self._next_task(kinds)
+                    if not task:
+                        break
+                    started = time.monotonic()
+                    try:
+                        if page is None or used >= POSTCODE_BROWSER_RECYCLE:
+                            if browser:
+                                browser.close()
+                            # Setelah gagal, percobaan berikutnya pakai proxy lain
+                            browser, page, proxy = self._open_browser(p, session_key, exclude=[failed_proxy] if failed_proxy else ())
+                            failed_proxy = None
+                            used = 0
+                        handlers[task["kind"]](page, task)
+                        if proxy:
+                            self.pool.report_success(proxy, time.monotonic() - started)
+                        used += 1
+                    except Exception as e:
+                        logger.warning(f"⚠️ [{session_key}] gagal {task['url']} (percobaan {task['attempts'] + 1}): {e}")
+                        self.worklist.record_failure(task["url"], e)
+                        self._count("failed")
+                        metrics.inc("scrape_retries_total", site=METRICS_SITE)
+                        if proxy:
+                            self.pool.report_failure(proxy)
+                            failed_proxy = proxy
+                        if browser:
+                            try:
+                                browser.close()
+                            except Exception:
+                                pass
+                        browser = page = proxy = None
+                    finally:
+                        metrics.observe_stage(METRICS_SITE, task["kind"], time.monotonic() - started)
+                        with self._active_lock:
+                            self._active -= 1
+                    metrics.timed_sleep(random.uniform(POSTCODE_DELAY_MIN, POSTCODE_DELAY_MAX), METRICS_SITE)
+            finally:
+                if browser:
+                    browser.close()
+
+    def run(self, kinds=(KIND_LOCATION, KIND_DETAIL)):
+        run_snapshot = metrics.snapshot()
+        started = time.monotonic()
+        logger.info(f"🚀 Crawl postcode: {self.workers} worker, {len(self.pool)} proxy, antrian {self.worklist.counts()}")
+        threads = [
+            threading.Thread(target=self._worker, args=(i, kinds), name=f"postcode-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            logger.warning("🛑 Dihentikan, menunggu worker selesai task yang sedang jalan...")
+            self.stop()
+            for thread in threads:
+                thread.join()
+        finally:
+            self.writer.flush()
+
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"🎉 Crawl selesai dalam {elapsed:.1f} detik: {self.stats['location']} halaman location, "
+            f"{self.stats['detail']} detail, {self.stats['empty']} kosong, {self.stats['failed']} gagal"
+        )
+        logger.info(f"📋 Status work list: {self.worklist.counts()}")
+        self.pool.log_stats()
+        metrics.log_summary(METRICS_SITE, since=run_snapshot, log=logger)
+        return self.stats
+
+
+def setup_logging():
+    # Dipanggil dari main() supaya import modul ini (mis. oleh benchmark) tidak membuat file log
+    logsetup.setup_logging(
+        "postcode_crawler", stream=sys.stdout,
+        text_format="%(asctime)s - %(levelname)s - %(threadName)s - %(message)s",
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawler postcode.my yang resumable dan paralel")
+    parser.add_argument("--seed", action="store_true", help="Impor CSV lama (postalcode, link, detail) ke work list")
+    parser.add_argument("--status", action="store_true", help="Cetak jumlah task per status lalu keluar")
+    parser.add_argument("--retry-failed", action="store_true", help="Kembalikan task failed ke antrian")
+    parser.add_argument("--kind", choices=[KIND_LOCATION, KIND_DETAIL], nargs="+",
+                        default=[KIND_LOCATION, KIND_DETAIL], help="Jenis task yang dikerjakan")
+    parser.add_argument("--workers", type=int, default=POSTCODE_WORKERS)
+    parser.add_argument("--output", default=str(POSTCODE_OUTPUT_CSV))
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    worklist = WorkList()
+    try:
+        if args.seed:
+            seed(worklist, args.output)
+        if args.retry_failed:
+            logger.info(f"🔁 {worklist.retry_failed(args.kind)} task failed dikembalikan ke antrian")
+        if args.status:
+            for kind, statuses in sorted(worklist.counts().items()):
+                print(f"{kind:<9} " + "  ".join(f"{status}={count}" for status, count in sorted(statuses.items())))
+            return 0
+        PostcodeCrawler(worklist, workers=args.workers, output_csv=args.output).run(kinds=args.kind)
+    finally:
+        worklist.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Cek EXPLAIN bahwa query panas memakai index dari migrasi.
+
+Secara default seqscan dimatikan (SET LOCAL enable_seqscan = off) supaya tabel kecil di
+database dev tetap menunjukkan apakah index *bisa* dipakai. Dengan --strict planner dibiarkan
+memilih sendiri, berguna di database produksi untuk melihat rencana yang sebenarnya.
+
+    python -m scrap_service.migrations.explain_check
+    python -m scrap_service.migrations.explain_check --strict --only tracker_status
+"""
+import sys
+import json
+import logging
+import argparse
+
+from scrap_service.migrations.migrate import table_names, table_exists
+
+logger = logging.getLogger("migrations")
+
+
+def hot_queries(tables):
+    """List (nama, key tabel, sql, params, index yang diharapkan)."""
+    scrap, primary = tables["scrap"], tables["primary"]
+    history, combined = tables["history"], tables["history_combined"]
+    return [
+        ("save_to_db_lookup", "scrap",
+         f"SELECT id, price, version FROM {scrap} WHERE listing_url = %s",
+         ("https://example.invalid/listing",), [f"uq_{scrap}_listing_url"]),
+        ("sync_lookup_primary", "primary",
+         f"SELECT id FROM {primary} WHERE listing_url = %s",
+         ("https://example.invalid/listing",), [f"uq_{primary}_listing_url"]),
+        ("tracker_status", "primary",
+         f"SELECT id, listing_url, status FROM {primary} WHERE status IN ('active', 'unknown') AND id >= %s ORDER BY id",
+         (1,), [f"idx_{primary}_tracker_status"]),
+        ("tracker_status_single", "primary",
+         f"SELECT id, listing_url, status FROM {primary} WHERE status = %s AND id >= %s ORDER BY id",
+         ("active", 1), [f"idx_{primary}_tracker_status"]),
+        ("null_rescan", "scrap",
+         f"SELECT listing_url FROM {scrap} WHERE brand IS NULL OR model IS NULL OR variant IS NULL OR price IS NULL",
+         (), [f"idx_{scrap}_null_fields"]),
+        ("authorized_location", "primary",
+         f"SELECT id, listing_url, lokasi FROM {primary} WHERE lokasi LIKE %s",
+         ("%Authorized%",), [f"idx_{primary}_lokasi_trgm"]),
+        ("history_by_car", "history",
+         f"SELECT old_price, new_price, changed_at FROM {history} WHERE car_id = %s ORDER BY changed_at",
+         (1,), [f"idx_{history}_car_changed"]),
+        ("history_combined_by_car", "history_combined",
+         f"SELECT old_price, new_price, changed_at FROM {combined} WHERE car_id = %s ORDER BY changed_at",
+         (1,), [f"idx_{combined}_car_changed"]),
+        ("market_stats_dirty", "primary",
+         f"SELECT DISTINCT brand, model, variant, year FROM {primary} WHERE last_scraped_at >= %s",
+         ("2025-01-01",), [f"idx_{primary}_last_scraped_at"]),
+        ("combine_dedup", "history_combined",
+         f"SELECT 1 FROM {combined} WHERE car_scrap_id = %s AND changed_at = %s",
+         (1, "2025-01-01"), [f"idx_{combined}_scrap_changed"]),
+        ("geocode_pending", "primary",
+         f"SELECT id, lokasi FROM {primary} WHERE id > %s AND lokasi IS NOT NULL AND geo_lokasi IS DISTINCT FROM lokasi ORDER BY id LIMIT 1000",
+         (0,), [f"idx_{primary}_geo_pending"]),
+    ]
+
+
+def _plan_indexes(node, found=None):
+    """Kumpulkan semua "Index Name" dan node type dari plan JSON (rekursif)."""
+    found = found if found is not None else {"indexes": set(), "nodes": []}
+    found["nodes"].append(node.get("Node Type"))
+    if "Index Name" in node:
+        found["indexes"].add(node["Index Name"])
+    for child in node.get("Plans", []):
+        _plan_indexes(child, found)
+    return found
+
+
+def _with_partition_indexes(conn, names):
+    """Index di tabel partisi muncul di plan dengan nama index per partisi, ikutkan nama-nama itu."""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class p ON p.oid = i.inhparent
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE p.relname = ANY(%s)
+        """, (list(names),))
+        children = [row[0] for row in cursor.fetchall()]
+    conn.rollback()
+    return list(names) + children
+
+
+def explain(conn, sql, params, strict=False):
+    with conn.cursor() as cursor:
+        try:
+            if not strict:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        finally:
+            conn.rollback()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return _plan_indexes(plan[0]["Plan"])
+
+
+def run_checks(conn, strict=False, only=None):
+    tables = table_names()
+    results = []
+    for name, key, sql, params, expected in hot_queries(tables):
+        if only and name not in only:
+            continue
+        with conn.cursor() as cursor:
+            exists = table_exists(cursor, tables[key])
+        conn.rollback()
+        if not exists:
+            results.append({"name": name, "status": "skip", "detail": f"tabel {tables[key]} tidak ada"})
+            continue
+        try:
+            found = explain(conn, sql, params, strict)
+        except Exception as e:
+            results.append({"name": name, "status": "error", "detail": str(e).strip().splitlines()[0]})
+            continue
+        used = [index for index in _with_partition_indexes(conn, expected) if index in found["indexes"]]
+        results.append({
+            "name": name,
+            "status": "ok" if used else "fail",
+            "detail": ", ".join(sorted(found["indexes"])) or " > ".join(n for n in found["nodes"] if n),
+            "expected": expected,
+        })
+    return results
+
+
+def main(argv=None):
+    from scrap_service.common.database import get_connection
+
+    parser = argparse.ArgumentParser(description="Cek EXPLAIN query panas terhadap index migrasi")
+    parser.add_argument("--strict", action="store_true", help="Jangan matikan seqscan, pakai rencana planner apa adanya")
+    parser.add_argument("--only", nargs="+", help="Nama query yang dicek")
+    parser.add_argument("--json", action="store_true", help="Cetak hasil dalam JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    conn = get_connection()
+    try:
+        results = run_checks(conn, strict=args.strict, only=args.only)
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        marks = {"ok": "✅", "fail": "❌", "skip": "⏭️", "error": "⚠️"}
+        for row in results:
+            print(f"{marks[row['status']]} {row['name']:<26} {row['detail']}")
+    return 1 if any(row["status"] in ("fail", "error") for row in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Migrasi skema berversi untuk tabel scrap / primary / history.
+
+Setiap migrasi adalah modul di migrations/versions bernama mNNNN_<nama>.py dengan:
+    TRANSACTIONAL = True/False   # False untuk CREATE INDEX CONCURRENTLY
+    def upgrade(cursor, tables): ...
+
+Nama tabel diambil dari env yang sama dengan service (DB_TABLE_SCRAP, DB_TABLE_PRIMARY,
+DB_TABLE_HISTORY_PRICE, DB_TABLE_HISTORY_PRICE_COMBINED), jadi satu set migrasi
+dipakai untuk DB carlist maupun mudah. Versi yang sudah jalan dicatat di schema_migrations.
+
+    python -m scrap_service.migrations.migrate            # jalankan yang belum
+    python -m scrap_service.migrations.migrate --status   # daftar versi dan statusnya
+    python -m scrap_service.migrations.migrate --target 3 # sampai versi 3
+"""
+import os
+import re
+import sys
+import logging
+import argparse
+import importlib
+from pathlib import Path
+
+logger = logging.getLogger("migrations")
+
+VERSIONS_DIR = Path(__file__).resolve().parent / "versions"
+VERSIONS_PACKAGE = "scrap_service.migrations.versions"
+MIGRATION_FILE = re.compile(r"^m(\d{4})_(\w+)\.py$")
+MIGRATIONS_TABLE = "schema_migrations"
+
+
+def table_names():
+    return {
+        "scrap": os.getenv("DB_TABLE_SCRAP", "cars_scrap"),
+        "primary": os.getenv("DB_TABLE_PRIMARY", "cars"),
+        "history": os.getenv("DB_TABLE_HISTORY_PRICE", "price_history"),
+        "history_combined": os.getenv("DB_TABLE_HISTORY_PRICE_COMBINED", "price_history_combined"),
+    }
+
+
+def discover():
+    """List (version, name, module) terurut berdasarkan versi."""
+    migrations = []
+    for path in sorted(VERSIONS_DIR.glob("m*.py")):
+        match = MIGRATION_FILE.match(path.name)
+        if not match:
+            continue
+        module = importlib.import_module(f"{VERSIONS_PACKAGE}.{path.stem}")
+        migrations.append((int(match.group(1)), match.group(2), module))
+    versions = [v for v, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Nomor versi migrasi duplikat: {versions}")
+    return migrations
+
+
+# ================== Helper untuk modul migrasi
+
+def table_exists(cursor, table):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+    return cursor.fetchone()[0]
+
+
+def existing_tables(cursor, tables, *keys):
+    """Nama tabel untuk key yang diminta, tabel yang belum ada dilewati dengan warning."""
+    found = []
+    for key in keys:
+        table = tables[key]
+        if table_exists(cursor, table):
+            found.append(table)
+        else:
+            logger.warning(f"⚠️ Tabel {table} ({key}) tidak ada, dilewati.")
+    return found
+
+
+def create_index(cursor, name, table, definition, unique=False, where=None, concurrently=True):
+    """
+    CREATE INDEX idempotent. Index yang gagal dibuat secara CONCURRENTLY meninggalkan sisa
+    INVALID yang membuat IF NOT EXISTS melompatinya, jadi sisa seperti itu di-drop dulu.
+    """
+    cursor.execute("""
+        SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = %s
+    """, (name,))
+    row = cursor.fetchone()
+    if row and not row[0]:
+        logger.warning(f"🧹 Index {name} tidak valid (build sebelumnya gagal), dibuat ulang.")
+        cursor.execute(f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {name}")
+    elif row:
+        return
+
+    sql = (
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX {'CONCURRENTLY ' if concurrently else ''}"
+        f"IF NOT EXISTS {name} ON {table} {definition}"
+    )
+    if where:
+        sql += f" WHERE {where}"
+    logger.info(f"🧱 {sql}")
+    cursor.execute(sql)
+
+
+# ================== Runner
+
+def ensure_migrations_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+        """)
+    conn.commit()
+
+
+def applied_versions(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT version FROM {MIGRATIONS_TABLE}")
+        return {row[0] for row in cursor.fetchall()}
+
+
+def apply(conn, version, name, module, tables):
+    transactional = getattr(module, "TRANSACTIONAL", True)
+    logger.info(f"🚀 Migrasi {version:04d}_{name} ({'transaksi' if transactional else 'tanpa transaksi'})")
+    conn.autocommit = not transactional
+    try:
+        with conn.cursor() as cursor:
+            module.upgrade(cursor, tables)
+            cursor.execute(
+                f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES (%s, %s)",
+                (version, name)
+            )
+        if transactional:
+            conn.commit()
+    except Exception:
+        if transactional:
+            conn.rollback()
+        raise
+    finally:
+        conn.autocommit = False
+    logger.info(f"✅ Migrasi {version:04d}_{name} selesai")
+
+
+def migrate(conn, target=None, dry_run=False):
+    """Jalankan migrasi yang belum diterapkan (sampai `target` jika diisi). Return versi yang dijalankan."""
+    ensure_migrations_table(conn)
+    done = applied_versions(conn)
+    tables = table_names()
+    pending = [
+        (version, name, module) for version, name, module in discover()
+        if version not in done and (target is None or version <= target)
+    ]
+    if not pending:
+        logger.info("✅ Skema sudah terbaru.")
+        return []
+
+    for version, name, module in pending:
+        if dry_run:
+            logger.info(f"📝 Akan dijalankan: {version:04d}_{name} - {(module.__doc__ or '').strip().splitlines()[0]}")
+            continue
+        apply(conn, version, name, module, tables)
+    return [version for version, _, _ in pending]
+
+
+def status(conn):
+    ensure_migrations_table(conn)
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT version, applied_at FROM {MIGRATIONS_TABLE}")
+        applied = dict(cursor.fetchall())
+    rows = []
+    for version, name, module in discover():
+        rows.append({
+            "version": version,
+            "name": name,
+            "applied_at": applied.get(version),
+            "description": (module.__doc__ or "").strip().splitlines()[0] if module.__doc__ else "",
+        })
+    return rows
+
+
+def main(argv=None):
+    from scrap_service.common.database import get_connection
+
+    parser = argparse.ArgumentParser(description="Migrasi skema berversi")
+    parser.add_argument("--status", action="store_true", help="Tampilkan status migrasi")
+    parser.add_argument("--target", type=int, help="Jalankan sampai versi ini saja")
+    parser.add_argument("--dry-run", action="store_true", help="Tampilkan migrasi yang akan dijalankan")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    conn = get_connection()
+    try:
+        if args.status:
+            for row in status(conn):
+                mark = "✅" if row["applied_at"] else "⏳"
+                applied = row["applied_at"].strftime("%Y-%m-%d %H:%M") if row["applied_at"] else "belum"
+                print(f"{mark} {row['version']:04d}_{row['name']:<32} {applied:<17} {row['description']}")
+            return 0
+        migrate(conn, target=args.target, dry_run=args.dry_run)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+"""Kolom normal mileage_km, seats, transmission_type, posted_at (sama dengan normalize.ensure_normalized_columns)."""
+from scrap_service.migrations.migrate import existing_tables
+
+TRANSACTIONAL = True
+
+
+def upgrade(cursor, tables):
+    cursor.execute("""
+        DO $$ BEGIN
+            CREATE TYPE transmission_type AS ENUM ('automatic', 'manual');
+        EXCEPTION WHEN duplicate_object THEN NULL;
+        END $$;
+    """)
+    for table in existing_tables(cursor, tables, "scrap", "primary"):
+        cursor.execute(f"""
+            ALTER TABLE {table}
+                ADD COLUMN IF NOT EXISTS mileage_km INTEGER,
+                ADD COLUMN IF NOT EXISTS seats SMALLINT,
+                ADD COLUMN IF NOT EXISTS transmission_type transmission_type,
+                ADD COLUMN IF NOT EXISTS posted_at TIMESTAMP
+        """)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_mileage_km ON {table} (mileage_km)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_posted_at ON {table} (posted_at)")
@@ -0,0 +1,22 @@
+"""Unique index listing_url di tabel scrap dan primary (lookup save_to_db, join sync_to_cars, tracker)."""
+from scrap_service.migrations.migrate import existing_tables, create_index
+
+TRANSACTIONAL = False
+
+
+def upgrade(cursor, tables):
+    for table in existing_tables(cursor, tables, "scrap", "primary"):
+        cursor.execute(f"""
+            SELECT listing_url, COUNT(*) FROM {table}
+            WHERE listing_url IS NOT NULL
+            GROUP BY listing_url HAVING COUNT(*) > 1
+            LIMIT 5
+        """)
+        duplicates = cursor.fetchall()
+        if duplicates:
+            sample = ", ".join(f"{url} ({count}x)" for url, count in duplicates)
+            raise RuntimeError(
+                f"{table} masih punya listing_url duplikat, contoh: {sample}. "
+                f"Hapus duplikat dulu (sisakan id terbesar) lalu jalankan ulang migrasi."
+            )
+        create_index(cursor, f"uq_{table}_listing_url", table, "(listing_url)", unique=True)
@@ -0,0 +1,12 @@
+"""Partial index id untuk listing active/unknown yang dicek tracker (status IN (...) AND id >= ?)."""
+from scrap_service.migrations.migrate import existing_tables, create_index
+
+TRANSACTIONAL = False
+
+
+def upgrade(cursor, tables):
+    for table in existing_tables(cursor, tables, "primary"):
+        create_index(
+            cursor, f"idx_{table}_tracker_status", table, "(id)",
+            where="status IN ('active', 'unknown')"
+        )
@@ -0,0 +1,12 @@
+"""Partial index listing yang field utamanya masih NULL (rescan null service)."""
+from scrap_service.migrations.migrate import existing_tables, create_index
+
+TRANSACTIONAL = False
+
+
+def upgrade(cursor, tables):
+    for table in existing_tables(cursor, tables, "scrap"):
+        create_index(
+            cursor, f"idx_{table}_null_fields", table, "(listing_url)",
+            where="brand IS NULL OR model IS NULL OR variant IS NULL OR price IS NULL"
+        )
@@ -0,0 +1,10 @@
+"""Index trigram lokasi untuk pencarian LIKE '%...%' (UpdateLocationService)."""
+from scrap_service.migrations.migrate import existing_tables, create_index
+
+TRANSACTIONAL = False
+
+
+def upgrade(cursor, tables):
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table in existing_tables(cursor, tables, "primary"):
+        create_index(cursor, f"idx_{table}_lokasi_trgm", table, "USING gin (lokasi gin_trgm_ops)")
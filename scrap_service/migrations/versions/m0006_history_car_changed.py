@@ -0,0 +1,9 @@
+"""Index (car_id, changed_at) di tabel history harga."""
+from scrap_service.migrations.migrate import existing_tables, create_index
+
+TRANSACTIONAL = False
+
+
+def upgrade(cursor, tables):
+    for table in existing_tables(cursor, tables, "history", "history_combined"):
+        create_index(cursor, f"idx_{table}_car_changed", table, "(car_id, changed_at)")
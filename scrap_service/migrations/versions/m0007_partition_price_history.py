@@ -0,0 +1,17 @@
+"""Tabel history harga dipartisi per bulan pada changed_at (tabel lama disimpan sebagai {table}_legacy)."""
+from scrap_service.migrations.migrate import existing_tables
+from scrap_service.common.price_history import convert_to_partitioned
+
+TRANSACTIONAL = True
+
+
+def upgrade(cursor, tables):
+    for table in existing_tables(cursor, tables, "history", "history_combined"):
+        convert_to_partitioned(cursor, table)
+        # Index di tabel induk otomatis dibuat di setiap partisi (tidak bisa CONCURRENTLY)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_car_changed ON {table} (car_id, changed_at)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_changed_at ON {table} (changed_at)")
+
+    for table in existing_tables(cursor, tables, "history_combined"):
+        # Cek NOT EXISTS saat sinkronisasi history ke tabel combined
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_scrap_changed ON {table} (car_scrap_id, changed_at)")
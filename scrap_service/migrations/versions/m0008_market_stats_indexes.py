@@ -0,0 +1,15 @@
+"""Index untuk refresh market_stats: last_scraped_at dan kunci grup (brand, model, variant, year)."""
+from scrap_service.migrations.migrate import existing_tables, create_index
+
+TRANSACTIONAL = False
+
+
+def upgrade(cursor, tables):
+    for table in existing_tables(cursor, tables, "primary"):
+        create_index(cursor, f"idx_{table}_last_scraped_at", table, "(last_scraped_at)")
+        # Ekspresi harus sama persis dengan market_stats.group_key_sql supaya bisa dipakai planner
+        create_index(
+            cursor, f"idx_{table}_market_group", table,
+            "((COALESCE(brand::text, '')), (COALESCE(model::text, '')), "
+            "(COALESCE(variant::text, '')), (COALESCE(year::text, '')))"
+        )
@@ -0,0 +1,21 @@
+"""Kolom geo_* hasil geocoding lokasi (sama dengan geocode.ensure_geo_columns) + index pending."""
+from scrap_service.migrations.migrate import existing_tables, create_index
+
+TRANSACTIONAL = False
+
+
+def upgrade(cursor, tables):
+    for table in existing_tables(cursor, tables, "primary"):
+        cursor.execute(f"""
+            ALTER TABLE {table}
+                ADD COLUMN IF NOT EXISTS geo_postcode VARCHAR(10),
+                ADD COLUMN IF NOT EXISTS geo_lat DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS geo_lon DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS geo_precision VARCHAR(20),
+                ADD COLUMN IF NOT EXISTS geo_lokasi TEXT
+        """)
+        create_index(cursor, f"idx_{table}_geo_postcode", table, "(geo_postcode)")
+        create_index(
+            cursor, f"idx_{table}_geo_pending", table, "(id)",
+            where="lokasi IS NOT NULL AND geo_lokasi IS DISTINCT FROM lokasi"
+        )
@@ -1,36 +1,72 @@
 # mudahmy_service_playwright/app.py
 
 from flask import Flask, jsonify, request
-from scrap_service.mudahmy_service_playwright.mudahmy_service import MudahMyService
 from scrap_service.mudahmy_service_playwright.database import get_connection
+from scrap_service.common import metrics
+from scrap_service.common.jobs import (
+    JobManager, JobConflict, ALL_KEYS, accepted_response, conflict_response, register_job_routes
+)
+from scrap_service.common.market_stats import register_stats_routes
+from scrap_service.common.proxy_pool import get_proxy_pool
 import os
 import psycopg2
 
 app = Flask(__name__)
 
-# Inisialisasi instance service
-mudahmy_scraper = MudahMyService()
+job_manager = JobManager()
+register_job_routes(app, job_manager)
+register_stats_routes(app, job_manager)
 
 DB_TABLE_SCRAP = os.getenv("DB_TABLE_SCRAP", "url")
 
+
+def create_scraper():
+    """
+    Bangun MudahMyService saat dibutuhkan (per job / per request), bukan saat import,
+    supaya app tetap bisa start walau DB mati dan tanpa memuat Playwright/pandas.
+    """
+    from scrap_service.mudahmy_service_playwright.mudahmy_service import MudahMyService
+    return MudahMyService()
+
+
 @app.route('/scrape/mudahmy', methods=['POST'])
 def scrape_mudahmy():
     data = request.get_json()
     brand = data.get("brand", None)
     model = data.get("model", None)
     page = data.get("page", 1)  
+    # "full" | "incremental"; default dari env CRAWL_MODE
+    mode = data.get("mode")
 
-    mudahmy_scraper.stop_flag = False
-
-    # Panggil fungsi scraping dengan filter brand, model, dan halaman
-    mudahmy_scraper.scrape_all_brands(brand=brand, model=model, start_page=page)
+    # Job brand+model hanya mengerjakan baris itu, jadi boleh berjalan bersamaan dengan baris lain;
+    # tanpa filter, job menjelajahi seluruh CSV dan bentrok dengan semua job mudah lain
+    single = bool(brand and model)
+    try:
+        job = job_manager.submit(
+            "scrape_mudahmy",
+            create_scraper,
+            lambda service: service.scrape_all_brands(
+                brand=brand, model=model, start_page=page, mode=mode, continue_next=not single
+            ),
+            params={"brand": brand, "model": model, "page": page, "mode": mode},
+            lock_key=f"{brand}/{model}".lower() if single else ALL_KEYS
+        )
+    except JobConflict as e:
+        return conflict_response(e)
 
-    return jsonify({"message": "Scraping mudahMY selesai"}), 200
+    return accepted_response(job)
 
 @app.route('/stop/mudahmy', methods=['POST'])
 def stop_mudahmy():
-    mudahmy_scraper.stop_scraping()
-    return jsonify({"message": "Scraping mudahMY dihentikan."}), 200
+    jobs = job_manager.cancel_all("scrape_mudahmy")
+    return jsonify({
+        "message": "Scraping mudahMY dihentikan.",
+        "cancelled_jobs": [job.id for job in jobs]
+    }), 200
+
+@app.route('/proxy/stats', methods=['GET'])
+def proxy_stats():
+    return jsonify(get_proxy_pool().stats()), 200
 
 def fetch_latest_data():
     conn = psycopg2.connect(
@@ -57,11 +93,20 @@ def export_data():
 
 @app.route('/sync_to_cars', methods=['POST'])
 def sync_to_cars():
+    scraper = None
     try:
-        mudahmy_scraper.sync_to_cars()
+        scraper = create_scraper()
+        scraper.sync_to_cars()
         return jsonify({"message": "Sinkronisasi data dari scrap ke primary berhasil."}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    finally:
+        if scraper:
+            scraper.close()
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return metrics.metrics_response()
 
 if __name__ == '__main__':
     app.run(host="0.0.0.0", port=5001, debug=True)
\ No newline at end of file
@@ -2,15 +2,15 @@ import os
 import time
 import random
 import logging
-import re
-import pandas as pd
 from datetime import datetime
-from urllib.parse import urljoin
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright
-from playwright_stealth import stealth_sync
 from .database import get_connection
-from pathlib import Path
+from scrap_service.common.proxy_pool import get_proxy_pool, IP_CHECK_URL
+from scrap_service.common import metrics
+from scrap_service.common.logsetup import setup_logging
+from scrap_service.common.watchdog import ResourceWatchdog
+from scrap_service.common.engine import ScrapeEngine, get_adapter, CRAWL_MODE
+from scrap_service.common.engine import take_screenshot as _take_screenshot
 
 load_dotenv()
 
@@ -19,44 +19,20 @@ START_DATE = datetime.now().strftime('%Y%m%d')
 
 
 # ================== Konfigurasi ENV
-DB_TABLE_SCRAP = os.getenv("DB_TABLE_SCRAP", "url")
-DB_TABLE_PRIMARY = os.getenv("DB_TABLE_PRIMARY", "cars")
-DB_TABLE_HISTORY_PRICE = os.getenv("DB_TABLE_HISTORY_PRICE", "price_history_scrap")
-DB_TABLE_HISTORY_PRICE_COMBINED = os.getenv("DB_TABLE_HISTORY_PRICE_COMBINED", "price_history_combined")
+# Nama tabel (DB_TABLE_SCRAP, DB_TABLE_PRIMARY, DB_TABLE_HISTORY_PRICE*) dibaca oleh adapter site
 INPUT_FILE = os.getenv("INPUT_FILE", "mudahmy_service_playwright/storage/inputfiles/mudahMY_scraplist.csv")
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "false").lower() == "true"
 
+METRICS_SITE = "mudahmy"
 
-# ================== Konfigurasi PATH Logging
-base_dir = Path(__file__).resolve().parents[2]   # <--- 2 level di atas file ini
-log_dir = base_dir / "logs"
-log_dir.mkdir(parents=True, exist_ok=True)
-
-log_file = log_dir / f"scrape_mudahmy_{START_DATE}.log"
 
 # ================== Setup Logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
+# logs/scrape_mudahmy_<START_DATE>.log (+ .jsonl), ditulis thread listener
+setup_logging("scrape_mudahmy")
 
 def take_screenshot(page, name):
-    try:
-        # Folder error sesuai TANGGAL sekarang (bisa beda dari START_DATE)
-        error_folder_name = datetime.now().strftime('%Y%m%d') + "_error_mudahmy"
-        screenshot_dir = log_dir / error_folder_name
-        screenshot_dir.mkdir(parents=True, exist_ok=True)
-
-        timestamp = datetime.now().strftime('%H%M%S')
-        screenshot_path = screenshot_dir / f"{name}_{timestamp}.png"
-
-        page.screenshot(path=str(screenshot_path))
-        logging.info(f"📸 Screenshot disimpan: {screenshot_path}")
-    except Exception as e:
-        logging.warning(f"❌ Gagal menyimpan screenshot: {e}")
+    # Folder error sesuai TANGGAL sekarang (bisa beda dari START_DATE)
+    _take_screenshot(page, name, METRICS_SITE)
 
 
 def should_use_proxy():
@@ -68,22 +44,6 @@ def should_use_proxy():
     )
 
 
-def get_custom_proxy_list():
-    raw = os.getenv("CUSTOM_PROXIES", "")
-    proxies = [p.strip() for p in raw.split(",") if p.strip()]
-    parsed = []
-    for p in proxies:
-        try:
-            ip, port, user, pw = p.split(":")
-            parsed.append({
-                "server": f"{ip}:{port}",
-                "username": user,
-                "password": pw
-            })
-        except ValueError:
-            continue
-    return parsed
-
 class MudahMyService:
     def __init__(self):
         self.stop_flag = False
@@ -92,14 +52,51 @@ class MudahMyService:
 
         self.conn = get_connection()
         self.cursor = self.conn.cursor()
+        self.adapter = get_adapter(METRICS_SITE)
+        self.engine = ScrapeEngine(self.adapter, self.conn)
+        self.engine.ensure_schema()
+
+        self.proxy_pool = get_proxy_pool()
+        self.current_proxy = None
+        self.session_id = self.generate_session_id()
+        self.progress = {}
+        self.watchdog = ResourceWatchdog(METRICS_SITE)
 
-        self.custom_proxies = get_custom_proxy_list()
-        self.proxy_index = 0
+    def generate_session_id(self):
+        return ''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=8))
+
+    def proxy_session_key(self):
+        """
+        Key session untuk cache IP keluar. Mode oxylabs di sini tidak memakai sessid
+        (IP berotasi per request), jadi IP-nya tidak di-cache.
+        """
+        proxy_mode = os.getenv("PROXY_MODE", "none").lower()
+        if proxy_mode == "oxylabs":
+            return None
+        if proxy_mode == "custom" and self.proxy_pool:
+            return self.session_id
+        return "direct"
+
+    def rotate_proxy_session(self):
+        """Lepas proxy session sekarang supaya init_browser berikutnya memilih proxy baru."""
+        metrics.inc("scrape_proxy_swaps_total", site=METRICS_SITE)
+        self.proxy_pool.release(self.session_id)
+        self.current_proxy = None
+        self.session_id = self.generate_session_id()
+
+    def report_proxy_failure(self, error):
+        banned = any(s in str(error) for s in ("Akses ditolak", "CAPTCHA", "Blocked"))
+        if banned:
+            metrics.inc("scrape_antibot_total", site=METRICS_SITE)
+        if self.current_proxy:
+            self.proxy_pool.report_failure(self.current_proxy, banned=banned)
 
     def init_browser(self):
-        self.playwright = sync_playwright().start()
+        # Import berat (Playwright) ditunda sampai browser benar-benar dibutuhkan
+        from playwright.sync_api import sync_playwright
+
         launch_kwargs = {
-            "headless": False,
+            "headless": BROWSER_HEADLESS,
             "args": [
                 "--disable-blink-features=AutomationControlled",
                 "--no-sandbox",
@@ -115,14 +112,24 @@ class MudahMyService:
                 "password": os.getenv("PROXY_PASSWORD")
             }
             logging.info("🌐 Proxy aktif (Oxylabs digunakan)")
-        elif proxy_mode == "custom" and self.custom_proxies:
-            proxy = random.choice(self.custom_proxies)
+        elif proxy_mode == "custom" and self.proxy_pool:
+            proxy = self.proxy_pool.acquire(self.session_id)
+            self.current_proxy = proxy
             launch_kwargs["proxy"] = proxy
-            logging.info(f"🌐 Proxy custom digunakan (random): {proxy['server']}")
+            logging.info(f"🌐 Proxy custom digunakan (berbobot health): {proxy['server']}")
         else:
             logging.info("⚡ Menjalankan browser tanpa proxy")
 
-        self.browser = self.playwright.chromium.launch(**launch_kwargs)
+        with self.watchdog.launching():
+            self.playwright = sync_playwright().start()
+            self.browser = self.playwright.chromium.launch(**launch_kwargs)
+        self.open_context()
+        logging.info("✅ Browser Playwright berhasil diinisialisasi.")
+
+    def open_context(self):
+        """Context + page baru di browser yang sama (dipakai juga oleh watchdog untuk daur ulang)."""
+        from playwright_stealth import stealth_sync
+
         self.context = self.browser.new_context(
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             viewport={"width": 1920, "height": 1080},  # Set to full page size
@@ -131,24 +138,36 @@ class MudahMyService:
         )
         self.page = self.context.new_page()
         stealth_sync(self.page)
-        logging.info("✅ Browser Playwright berhasil diinisialisasi.")
 
     def quit_browser(self):
         try:
             self.browser.close()
         except Exception as e:
             logging.error(e)
-        self.playwright.stop()
+        try:
+            self.playwright.stop()
+        except Exception as e:
+            logging.error(e)
+        self.watchdog.after_quit()
         logging.info("🛑 Browser Playwright ditutup.")
 
     def get_current_ip(self, page, retries=3):
-        """Contoh memanggil ip.oxylabs.io untuk cek IP."""
+        """Contoh memanggil ip.oxylabs.io untuk cek IP. IP yang sudah diverifikasi di-cache per session."""
+        session_key = self.proxy_session_key()
+        if session_key is not None:
+            cached_ip = self.proxy_pool.get_cached_ip(session_key)
+            if cached_ip:
+                logging.info(f"IP Saat Ini (cache session): {cached_ip}")
+                return
+
         for attempt in range(1, retries + 1):
             try:
-                page.goto('https://ip.oxylabs.io/', timeout=10000)
+                page.goto(IP_CHECK_URL, timeout=10000)
                 ip_text = page.inner_text('body')
                 ip = ip_text.strip()
                 logging.info(f"IP Saat Ini: {ip}")
+                if session_key is not None:
+                    self.proxy_pool.cache_ip(session_key, ip)
                 return
             except Exception as e:
                 logging.warning(f"Attempt {attempt} gagal mendapatkan IP: {e}")
@@ -157,7 +176,7 @@ class MudahMyService:
                 if attempt == retries:
                     logging.error("Gagal mendapatkan IP setelah beberapa percoaan")
                 else:
-                    time.sleep(7)
+                    metrics.timed_sleep(7, METRICS_SITE, "backoff")
 
     def scrape_page(self, page, url):
         """
@@ -168,8 +187,8 @@ class MudahMyService:
             self.get_current_ip(page)
             delay = random.uniform(5, 10)
             logging.info(f"Menuju {url} (delay {delay:.1f}s)")
-            time.sleep(delay)
-            page.goto(url, timeout=60000)
+            metrics.timed_sleep(delay, METRICS_SITE, "results")
+            nav_time = self.engine.fetch(page, url, stage="results_navigation", timeout=60000)
 
             # Contoh deteksi blocked
             if page.locator("text='Access Denied'").is_visible(timeout=3000):
@@ -179,48 +198,24 @@ class MudahMyService:
                 raise Exception("Deteksi CAPTCHA")
 
             page.wait_for_load_state('networkidle', timeout=15000)
+            metrics.inc("scrape_pages_total", site=METRICS_SITE)
+            parse_started = time.monotonic()
 
-            # Coba beberapa selector
-            selectors = [
-                ('css', 'div.flex.flex-col.flex-1.gap-2.self-center div.flex.flex-col a'),
-                ('xpath', '//a[contains(@href,"mudah.my") and contains(@class,"sc-jwKygS")]'),
-                ('xpath', '//div[contains(@class,"listing-item")]//a[contains(@href,"mudah.my")]')
-            ]
-
-            listings = []
-            for strategy, selector in selectors:
-                try:
-                    if strategy == 'css':
-                        elements = page.query_selector_all(selector)
-                    else:
-                        elements = page.query_selector_all(f'{strategy}={selector}')
-                    if elements:
-                        listings = elements
-                        break
-                except Exception as e:
-                    logging.warning(f"Selector {selector} gagal: {e}")
-                    continue
-
-            if not listings:
+            urls = self.adapter.listing_urls(page, url)
+            if not urls:
                 take_screenshot(page, "no_listings_found")
                 logging.warning("Tidak menemukan listing dengan semua selector")
                 return []
 
-            urls = []
-            for element in listings:
-                href = element.get_attribute('href')
-                if href:
-                    if href.startswith('/'):
-                        href = urljoin(url, href)
-                    if 'mudah.my' in href:
-                        urls.append(href)
-
-            total_listing = len(list(set(urls)))
-            logging.info(f"📄 Ditemukan {total_listing} listing URLs di halaman {url}.")
-            return list(set(urls))
+            metrics.observe_stage(METRICS_SITE, "results_parse", time.monotonic() - parse_started)
+            logging.info(f"📄 Ditemukan {len(urls)} listing URLs di halaman {url}.")
+            if self.current_proxy:
+                self.proxy_pool.report_success(self.current_proxy, nav_time)
+            return urls
 
         except Exception as e:
             logging.error(f"Error saat scraping halaman: {e}")
+            self.report_proxy_failure(e)
             take_screenshot(page, f"error_scrape_page")
             return []
 
@@ -231,100 +226,41 @@ class MudahMyService:
         while attempt < max_retries:
             try:
                 logging.info(f"Navigating to detail page: {url} (Attempt {attempt+1})")
-                page.goto(url, wait_until="networkidle", timeout=120000)
+                nav_time = self.engine.fetch(page, url, wait_until="networkidle", timeout=120000)
 
-                if "Access Denied" in page.title() or "block" in page.url:
+                if self.adapter.is_blocked(page):
                     raise Exception("Blocked by anti-bot protection")
 
-                def safe_extract(selectors, selector_type="css", fallback="N/A"):
-                    for selector in selectors:
-                        try:
-                            if selector_type == "css":
-                                if page.locator(selector).count() > 0:
-                                    return page.locator(selector).first.inner_text().strip()
-                            elif selector_type == "xpath":
-                                xp = f"xpath={selector}"
-                                if page.locator(xp).count() > 0:
-                                    return page.locator(xp).first.inner_text().strip()
-                        except Exception as e:
-                            logging.warning(f"Selector failed: {selector} - {e}")
-                    return fallback
-
-                data = {}
-                data["listing_url"] = url
-                data["brand"] = safe_extract([
-                    "#ad_view_car_specifications div:nth-child(1) > div:nth-child(3)",
-                    "div:has-text('Brand') + div",
-                    "//div[contains(text(),'Brand')]/following-sibling::div"
-                ])
-                data["model"] = safe_extract([
-                    "#ad_view_car_specifications div:nth-child(2) > div:nth-child(3)",
-                    "div:has-text('Model') + div",
-                    "//div[contains(text(),'Model')]/following-sibling::div"
-                ])
-                data["variant"] = safe_extract([
-                    "#ad_view_car_specifications div:nth-child(4) > div:nth-child(3)",
-                    "div:has-text('Variant') + div",
-                    "//span[contains(text(),'Variant')]/following-sibling::span"
-                ])
-                data["informasi_iklan"] = safe_extract([
-                    "#ad_view_ad_highlights > div > div > div:nth-child(1) > div > div > div",
-                    "div.ad-highlight:first-child",
-                    "//div[contains(@class,'ad-highlight')][1]"
-                ])
-                data["lokasi"] = safe_extract([
-                    "#ad_view_ad_highlights > div > div > div.flex.flex-wrap.lg\\:flex-nowrap.gap-3\\.5 > div:nth-child(4) > div",
-                    "div:has-text('Location') + div",
-                    "//div[contains(text(),'Location')]/following-sibling::div"
-                ])
-                data["price"] = safe_extract([
-                    "div.flex.gap-1.md\\:items-end > div"
-                ])
-                data["year"] = safe_extract([
-                    "#ad_view_car_specifications div:nth-child(3) > div:nth-child(3)",
-                    "div:has-text('Year') + div",
-                    "//div[contains(text(),'Year')]/following-sibling::div"
-                ])
-                data["millage"] = safe_extract([
-                    "#ad_view_ad_highlights > div > div > div.flex.flex-wrap.lg\\:flex-nowrap.gap-3\\.5 > div:nth-child(3) > div",
-                    "div:has-text('Mileage') + div",
-                    "//div[contains(text(),'Mileage')]"
-                ])
-                data["transmission"] = safe_extract([
-                    "#ad_view_ad_highlights > div > div > div.flex.flex-wrap.lg\\:flex-nowrap.gap-3\\.5 > div:nth-child(2) > div",
-                    "div:has-text('Transmission') + div",
-                    "//div[contains(text(),'Transmission')]"
-                ])
-                data["seat_capacity"] = safe_extract([
-                    "#ad_view_car_specifications > div > div > div > div > div > div:nth-child(2) > div:nth-child(3) > div:nth-child(3)",
-                    "div:has-text('Seat Capacity') + div",
-                    "//div[contains(text(),'Seat') and contains(text(),'Capacity')]"
-                ])
-                images = page.evaluate("""() => {
-                    const gallery = document.getElementById('ad_view_gallery');
-                    if (!gallery) return [];
-                    return Array.from(gallery.querySelectorAll('img')).map(img => img.src);
-                }""")
-                data["gambar"] = images
-                data["scraped_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                if self.current_proxy:
+                    self.proxy_pool.report_success(self.current_proxy, nav_time)
 
+                # Parse lalu lengkapi field wajib yang kosong sebelum meninggalkan halaman
+                data = self.engine.extract(page, url)
+                data["scraped_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 return data
 
             except Exception as e:
                 logging.error(f"Scraping detail failed: {e}")
                 take_screenshot(page, f"error_scrape_detail")
+                self.report_proxy_failure(e)
                 attempt += 1
                 if attempt < max_retries:
                     logging.warning(f"Mencoba ulang detail scraping untuk {url} (Attempt {attempt+1})...")
-                    time.sleep(random.uniform(15, 20))
+                    metrics.inc("scrape_retries_total", site=METRICS_SITE)
+                    metrics.timed_sleep(random.uniform(15, 20), METRICS_SITE, "backoff")
                 else:
                     logging.warning(f"Gagal mengambil detail untuk URL: {url}")
                     return None
 
-    def scrape_listings_for_brand(self, base_url, brand_name, model_name, start_page=1):
+    def scrape_listings_for_brand(self, base_url, brand_name, model_name, start_page=1, incremental=False):
         total_scraped = 0
         current_page = start_page
+        self.progress["brand"] = brand_name
+        self.progress["model"] = model_name
         self.init_browser()
+        # Halaman terakhir dari total hasil di halaman pertama; None = paginasi sampai kosong
+        last_page = None
+        planned = False
         try:
             while True:
                 if self.stop_flag:
@@ -332,13 +268,28 @@ class MudahMyService:
                     break
 
                 current_url = f"{base_url}?o={current_page}"
+                if incremental:
+                    current_url = self.adapter.newest_first(current_url)
                 logging.info(f"Scraping halaman {current_page}: {current_url}")
                 listing_urls = self.scrape_page(self.page, current_url)
+                self.progress["page"] = current_page
+                self.progress["pages"] += 1
 
                 if not listing_urls:
                     logging.info("Tidak ada listing URL ditemukan, pindah ke brand/model berikutnya.")
                     break
 
+                if not planned:
+                    last_page = self.engine.plan_pages(self.page, current_url, listing_urls, start_page=current_page)
+                    planned = True
+                    self.progress["last_page"] = last_page
+
+                if incremental:
+                    listing_urls = self.engine.new_urls(listing_urls, current_page)
+                    if not listing_urls:
+                        logging.info(f"🛑 Halaman {current_page} {brand_name} {model_name} hanya berisi listing yang sudah dikenal, berhenti.")
+                        break
+
                 for url in listing_urls:
                     if self.stop_flag:
                         break
@@ -355,38 +306,63 @@ class MudahMyService:
                                 if attempt == max_db_retries:
                                     logging.error(f"❌ Gagal simpan data setelah {max_db_retries} percobaan: {url}")
                                 else:
-                                    time.sleep(20)
+                                    metrics.timed_sleep(20, METRICS_SITE, "backoff")
                         total_scraped += 1
+                        metrics.inc("scrape_listings_total", site=METRICS_SITE, result="ok")
+                        self.progress["listings_ok"] += 1
                     else:
                         logging.warning(f"Gagal mengambil detail untuk URL: {url}")
+                        metrics.inc("scrape_listings_total", site=METRICS_SITE, result="failed")
+                        self.progress["listings_failed"] += 1
+                    self.watchdog.after_listing(self, label=url)
 
                     delay = random.uniform(15, 35)
                     logging.info(f"Menunggu {delay:.1f} detik sebelum listing berikutnya...")
-                    time.sleep(delay)
+                    metrics.timed_sleep(delay, METRICS_SITE, "listing")
+
+                # Halaman terakhir: tidak perlu reinit + jeda 5-10 menit hanya untuk memuat halaman kosong
+                if last_page is not None and current_page >= last_page:
+                    logging.info(f"🏁 Halaman terakhir ({last_page}) {brand_name} {model_name} selesai.")
+                    break
 
                 # Re-init browser sebelum halaman berikutnya
                 self.quit_browser()
-                time.sleep(3)
+                self.rotate_proxy_session()
+                metrics.timed_sleep(3, METRICS_SITE, "reinit")
                 self.init_browser()
 
                 current_page += 1
                 delay = random.uniform(300, 600)  # 5-10 menit
                 logging.info(f"Menunggu {delay:.1f} detik sebelum halaman berikutnya...")
-                time.sleep(delay)
+                metrics.timed_sleep(delay, METRICS_SITE, "page")
 
             logging.info(f"Selesai scraping {brand_name} {model_name}. Total data: {total_scraped}")
         finally:
             self.quit_browser()
         return total_scraped, False
 
-    def scrape_all_brands(self, brand=None, model=None, start_page=1):
+    def scrape_all_brands(self, brand=None, model=None, start_page=1, mode=None, continue_next=True):
         """
         Baca CSV:
           - Jika brand dan model diberikan, mulai scraping dari baris yang cocok,
-            lalu lanjut ke seluruh baris berikutnya.
+            lalu lanjut ke seluruh baris berikutnya (continue_next=False: hanya baris yang cocok).
           - Jika tidak diberikan, scraping semua brand+model (dari baris pertama).
+        mode: "full" (semua halaman) atau "incremental" (terbaru dulu, berhenti di halaman yang sudah dikenal).
+        stop_flag tidak direset di sini: service dibuat baru per job, dan /stop yang datang
+        sebelum run mulai harus tetap berlaku.
         """
-        self.reset_scraping()
+        self.listing_count = 0
+        mode = (mode or CRAWL_MODE).lower()
+        incremental = mode == "incremental"
+        logging.info(f"🧭 Mode crawl: {mode}")
+        self.progress = {
+            "brand": None, "model": None, "page": None,
+            "pages": 0, "listings_ok": 0, "listings_failed": 0, "mode": mode
+        }
+        run_snapshot = metrics.snapshot()
+        self.engine.load_seen_index()
+        import pandas as pd
+
         df = pd.read_csv(INPUT_FILE)
 
         if brand and model:
@@ -402,7 +378,10 @@ class MudahMyService:
             start_index = matching_rows.index[0]
             logging.info(f"Mulai scraping dari baris {start_index} untuk brand={brand}, model={model} (start_page={start_page}).")
 
-            for i in range(start_index, len(df)):
+            indexes = range(start_index, len(df)) if continue_next else list(matching_rows.index)
+            for i in indexes:
+                if self.stop_flag:
+                    break
                 row = df.iloc[i]
                 brand_name = row['brand']
                 model_name = row['model']
@@ -414,20 +393,29 @@ class MudahMyService:
                     current_page = 1
 
                 logging.info(f"Mulai scraping brand: {brand_name}, model: {model_name}, start_page={current_page}")
-                total_scraped, _ = self.scrape_listings_for_brand(base_url, brand_name, model_name, current_page)
+                total_scraped, _ = self.scrape_listings_for_brand(
+                    base_url, brand_name, model_name, current_page, incremental=incremental
+                )
                 logging.info(f"Selesai scraping {brand_name} {model_name}. Total data: {total_scraped}")
         else:
             logging.info("Mulai scraping dari baris pertama (tidak ada filter brand/model).")
             df = df.reset_index(drop=True)
             for i, row in df.iterrows():
+                if self.stop_flag:
+                    break
                 brand_name = row['brand']
                 model_name = row['model']
                 base_url = row['url']
 
                 logging.info(f"Mulai scraping brand: {brand_name}, model: {model_name}, start_page=1")
-                total_scraped, _ = self.scrape_listings_for_brand(base_url, brand_name, model_name, 1)
+                total_scraped, _ = self.scrape_listings_for_brand(
+                    base_url, brand_name, model_name, 1, incremental=incremental
+                )
                 logging.info(f"Selesai scraping {brand_name} {model_name}. Total data: {total_scraped}")
 
+        if self.proxy_pool:
+            self.proxy_pool.log_stats()
+        metrics.log_summary(METRICS_SITE, since=run_snapshot)
         logging.info("Proses scraping selesai untuk filter brand/model.")
 
     def stop_scraping(self):
@@ -443,199 +431,22 @@ class MudahMyService:
         """
         Simpan atau update data mobil ke database.
         """
-        try:
-            self.cursor.execute(
-                f"SELECT id, price, version FROM {DB_TABLE_SCRAP} WHERE listing_url = %s",
-                (car_data["listing_url"],)
-            )
-            row = self.cursor.fetchone()
-
-            # Normalisasi price -> integer
-            price_int = 0
-            if car_data.get("price"):
-                match_price = re.sub(r"[^\d]", "", car_data["price"])  # buang non-digit
-                price_int = int(match_price) if match_price else 0
-
-            # Normalisasi year -> integer
-            year_int = 0
-            if car_data.get("year"):
-                match_year = re.search(r"(\d{4})", car_data["year"])
-                if match_year:
-                    year_int = int(match_year.group(1))
-
-            if row:
-                car_id, old_price, current_version = row
-                old_price = old_price if old_price else 0
-                current_version = current_version if current_version else 0
-                new_price = price_int
-
-                update_query = f"""
-                    UPDATE {DB_TABLE_SCRAP}
-                    SET brand=%s, model=%s, variant=%s,
-                        informasi_iklan=%s, lokasi=%s,
-                        price=%s, year=%s, millage=%s,
-                        transmission=%s, seat_capacity=%s,
-                        gambar=%s, last_scraped_at=%s,
-                        version=%s
-                    WHERE id=%s
-                """
-
-                new_version = current_version + 1
-                self.cursor.execute(update_query, (
-                    car_data.get("brand"),
-                    car_data.get("model"),
-                    car_data.get("variant"),
-                    car_data.get("informasi_iklan"),
-                    car_data.get("lokasi"),
-                    new_price,
-                    year_int,
-                    car_data.get("millage"),
-                    car_data.get("transmission"),
-                    car_data.get("seat_capacity"),
-                    car_data.get("gambar"),
-                    datetime.now(),
-                    new_version,
-                    car_id
-                ))
-
-                # Jika harga berubah, catat di history
-                if new_price != old_price and old_price != 0:
-                    insert_history = f"""
-                        INSERT INTO {DB_TABLE_HISTORY_PRICE} (car_id, old_price, new_price)
-                        VALUES (%s, %s, %s)
-                    """
-                    self.cursor.execute(insert_history, (car_id, old_price, new_price))
-
-            else:
-                insert_query = f"""
-                    INSERT INTO {DB_TABLE_SCRAP}
-                        (listing_url, brand, model, variant, informasi_iklan, lokasi,
-                         price, year, millage, transmission, seat_capacity, gambar, version)
-                    VALUES
-                        (%s, %s, %s, %s, %s, %s,
-                         %s, %s, %s, %s, %s, %s, %s)
-                """
-                self.cursor.execute(insert_query, (
-                    car_data["listing_url"],
-                    car_data.get("brand"),
-                    car_data.get("model"),
-                    car_data.get("variant"),
-                    car_data.get("informasi_iklan"),
-                    car_data.get("lokasi"),
-                    price_int,
-                    year_int,
-                    car_data.get("millage"),
-                    car_data.get("transmission"),
-                    car_data.get("seat_capacity"),
-                    car_data.get("gambar"),
-                    1
-                ))
-
-            self.conn.commit()
-            logging.info(f"✅ Data untuk listing_url={car_data['listing_url']} berhasil disimpan/diupdate.")
-        except Exception as e:
-            self.conn.rollback()
-            logging.error(f"❌ Error menyimpan atau memperbarui data ke database: {e}")
+        return self.engine.save(car_data)
 
     def sync_to_cars(self):
         """
-        Sinkronisasi data dari {DB_TABLE_SCRAP} ke {DB_TABLE_PRIMARY}, dan sinkronisasi data perubahan harga dari price_history_scrap ke price_history_combined.
+        Sinkronisasi data dari tabel scrap ke tabel utama, dan sinkronisasi data perubahan harga dari price_history_scrap ke price_history_combined.
         """
-        logging.info(f"Memulai sinkronisasi data dari {DB_TABLE_SCRAP} ke {DB_TABLE_PRIMARY}...")
-        try:
-            fetch_query = f"SELECT * FROM {DB_TABLE_SCRAP};"
-            self.cursor.execute(fetch_query)
-            rows = self.cursor.fetchall()
-            col_names = [desc[0] for desc in self.cursor.description]
-            idx_url = col_names.index("listing_url")
-
-            for row in rows:
-                listing_url = row[idx_url]
-                check_query = f"SELECT id FROM {DB_TABLE_PRIMARY} WHERE listing_url = %s"
-                self.cursor.execute(check_query, (listing_url,))
-                result = self.cursor.fetchone()
-
-                if result:
-                    update_query = f"""
-                        UPDATE {DB_TABLE_PRIMARY}
-                        SET brand=%s, model=%s, variant=%s, informasi_iklan=%s,
-                            lokasi=%s, price=%s, year=%s, millage=%s, transmission=%s,
-                            seat_capacity=%s, gambar=%s, last_scraped_at=%s
-                        WHERE listing_url=%s
-                    """
-                    self.cursor.execute(update_query, (
-                        row[col_names.index("brand")],
-                        row[col_names.index("model")],
-                        row[col_names.index("variant")],
-                        row[col_names.index("informasi_iklan")],
-                        row[col_names.index("lokasi")],
-                        row[col_names.index("price")],
-                        row[col_names.index("year")],
-                        row[col_names.index("millage")],
-                        row[col_names.index("transmission")],
-                        row[col_names.index("seat_capacity")],
-                        row[col_names.index("gambar")],
-                        row[col_names.index("last_scraped_at")],
-                        listing_url
-                    ))
-                else:
-                    insert_query = f"""
-                        INSERT INTO {DB_TABLE_PRIMARY}
-                            (listing_url, brand, model, variant, informasi_iklan, lokasi,
-                             price, year, millage, transmission, seat_capacity, gambar, last_scraped_at)
-                        VALUES
-                            (%s, %s, %s, %s, %s, %s,
-                             %s, %s, %s, %s, %s, %s, %s)
-                    """
-                    self.cursor.execute(insert_query, (
-                        listing_url,
-                        row[col_names.index("brand")],
-                        row[col_names.index("model")],
-                        row[col_names.index("variant")],
-                        row[col_names.index("informasi_iklan")],
-                        row[col_names.index("lokasi")],
-                        row[col_names.index("price")],
-                        row[col_names.index("year")],
-                        row[col_names.index("millage")],
-                        row[col_names.index("transmission")],
-                        row[col_names.index("seat_capacity")],
-                        row[col_names.index("gambar")],
-                        row[col_names.index("last_scraped_at")]
-                    ))
-
-            # Sinkronisasi perubahan harga dari price_history_scrap ke price_history_combined
-            sync_price_history_query = f"""
-                INSERT INTO {DB_TABLE_HISTORY_PRICE_COMBINED} (car_id, car_scrap_id, old_price, new_price, changed_at)
-                SELECT c.id, cs.id, phs.old_price, phs.new_price, phs.changed_at
-                FROM {DB_TABLE_HISTORY_PRICE} phs
-                JOIN {DB_TABLE_SCRAP} cs ON phs.car_id = cs.id
-                JOIN {DB_TABLE_PRIMARY} c ON cs.listing_url = c.listing_url
-                WHERE phs.car_id IS NOT NULL;
-            """
-            self.cursor.execute(sync_price_history_query)
-
-            # Commit perubahan ke database
-            self.conn.commit()
-            logging.info(f"Sinkronisasi data dari {DB_TABLE_SCRAP} ke {DB_TABLE_PRIMARY} selesai.")
-            logging.info("Sinkronisasi perubahan harga dari price_history_scrap ke price_history_combined selesai.")
-        except Exception as e:
-            self.conn.rollback()
-            logging.error(f"Error saat sinkronisasi data: {e}")
+        return self.engine.sync_to_primary()
+
+    def proxy_stats(self):
+        return self.proxy_pool.stats()
 
     def export_data(self):
         """
         Mengambil data dari DB_TABLE_SCRAP dalam bentuk list of dict
         """
-        try:
-            query = f"SELECT * FROM {DB_TABLE_SCRAP};"
-            self.cursor.execute(query)
-            rows = self.cursor.fetchall()
-            columns = [desc[0] for desc in self.cursor.description]
-            data = [dict(zip(columns, row)) for row in rows]
-            return data
-        except Exception as e:
-            logging.error(f"Error export data: {e}")
-            return []
+        return self.engine.export_data()
 
     def close(self):
         """Tutup browser dan koneksi database."""
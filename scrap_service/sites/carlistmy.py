@@ -0,0 +1,151 @@
+"""Adapter carlist.my: parser hasil & detail, field wajib, penanda blokir dan sold."""
+import re
+
+from scrap_service.common.engine import SiteAdapter
+from scrap_service.common.validation import FieldRules, json_ld_field, price_to_int
+
+SITE = "carlistmy"
+
+
+def parse_detail_html(html, url):
+    """Parse HTML halaman detail carlist.my menjadi dict data mobil."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+
+    def extract(selector):
+        element = soup.select_one(selector)
+        return element.text.strip() if element else None
+
+    def get_location_parts(soup):
+        # Ambil semua span child
+        spans = soup.select("div.c-card__body > div.u-flex.u-align-items-center > div > div > span")
+        valid_spans = [span.text.strip() for span in spans if span.text.strip()]
+        if len(valid_spans) >= 2:
+            return " - ".join(valid_spans[-2:])
+        elif len(valid_spans) == 1:
+            return valid_spans[0]
+        return ""
+
+    brand = extract("#listing-detail li:nth-child(3) > a > span")
+    model = extract("#listing-detail li:nth-child(4) > a > span")
+    variant = extract("#listing-detail li:nth-child(5) > a > span")
+    informasi_iklan = extract("div:nth-child(1) > span.u-color-muted")
+    lokasi = get_location_parts(soup)
+
+    price_string = extract("div.listing__item-price > h3")
+    year = extract("div.owl-stage div:nth-child(2) span.u-text-bold")
+    millage = extract("div.owl-stage div:nth-child(3) span.u-text-bold")
+    transmission = extract("div.owl-stage div:nth-child(6) span.u-text-bold")
+    seat_capacity = extract("div.owl-stage div:nth-child(7) span.u-text-bold")
+
+    img_tags = soup.select("#details-gallery img")
+    gambar = [img.get("src") for img in img_tags if img.get("src")]
+
+    price = int(re.sub(r"[^\d]", "", price_string)) if price_string else 0
+    year_int = int(re.search(r"\d{4}", year).group()) if year else 0
+
+    return {
+        "listing_url": url,
+        "brand": brand,
+        "model": model,
+        "variant": variant,
+        "informasi_iklan": informasi_iklan,
+        "lokasi": lokasi,
+        "price": price,
+        "year": year_int,
+        "millage": millage,
+        "transmission": transmission,
+        "seat_capacity": seat_capacity,
+        "gambar": gambar,
+    }
+
+
+def parse_listing_urls(html):
+    """Ambil URL detail unik dari HTML halaman hasil pencarian carlist.my."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    urls = []
+    for tag in soup.select("a.ellipsize.js-ellipsize-text"):
+        href = tag.get("href")
+        if href and "carlist.my" in href:
+            urls.append(href)
+    return list(set(urls))
+
+
+BREADCRUMB_SKIP = {"home", "used cars", "new cars", "recond cars", "cars for sale"}
+
+
+def _breadcrumb_parts(page):
+    """Teks breadcrumb tanpa Home / Used Cars -> [brand, model, variant]."""
+    texts = page.eval_on_selector_all(
+        "ul.c-breadcrumb li, .js-part-breadcrumb li",
+        "els => els.map(e => e.textContent.trim())"
+    )
+    return [t for t in dict.fromkeys(texts) if t and t.lower() not in BREADCRUMB_SKIP]
+
+
+def _breadcrumb_field(index):
+    def extract(page):
+        parts = _breadcrumb_parts(page)
+        return parts[index] if len(parts) > index else None
+    return extract
+
+
+def _price_fallback(page):
+    for selector, attribute in (("[itemprop='price']", "content"), ("div.listing__item-price", None)):
+        locator = page.locator(selector)
+        if locator.count() > 0:
+            raw = locator.first.get_attribute(attribute) if attribute else locator.first.inner_text()
+            price = price_to_int(raw)
+            if price:
+                return price
+    return price_to_int(json_ld_field("price")(page))
+
+
+CARLIST_FIELD_RULES = FieldRules(
+    SITE,
+    required=["brand", "model", "variant", "price"],
+    fallbacks={
+        "brand": [_breadcrumb_field(0), json_ld_field("brand")],
+        "model": [_breadcrumb_field(1), json_ld_field("model")],
+        "variant": [_breadcrumb_field(2), json_ld_field("variant")],
+        "price": [_price_fallback],
+    },
+    wait_selectors={
+        "brand": ["#listing-detail li:nth-child(3) > a > span"],
+        "model": ["#listing-detail li:nth-child(4) > a > span"],
+        "variant": ["#listing-detail li:nth-child(5) > a > span"],
+        "price": ["div.listing__item-price > h3"],
+    },
+    reparse=lambda page: parse_detail_html(page.content(), page.url),
+)
+
+
+class CarlistMyAdapter(SiteAdapter):
+    name = SITE
+    scrap_table_default = "cars_scrap"
+    history_table_default = "price_history"
+    field_rules = CARLIST_FIELD_RULES
+    parses_html = True
+
+    # Halaman listing yang sudah terjual menampilkan teks penanda di <h2> pertama
+    sold_selector = "h2"
+    default_status = "active"
+
+    # "1,234 vehicles for sale" di judul halaman hasil; URL hasil membawa page_size=25
+    total_count_selector = "#classified-listings-result > div.masthead.push--bottom > div > h1"
+    total_count_pattern = r"([\d,]+)\s+vehicles"
+    page_size_param = "page_size"
+    newest_sort_params = {"sort": "modification_date_search.desc"}
+
+    def listing_urls(self, page, url):
+        return parse_listing_urls(page.content())
+
+    def parse_detail(self, page, url):
+        return parse_detail_html(page.content(), url)
+
+    def parse_html(self, html, url):
+        return parse_detail_html(html, url)
+
+
+ADAPTER = CarlistMyAdapter()
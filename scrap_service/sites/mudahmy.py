@@ -0,0 +1,205 @@
+"""Adapter mudah.my: parser hasil & detail (cascade selector), field wajib, penanda blokir dan sold."""
+import logging
+from urllib.parse import urljoin
+
+from scrap_service.common.engine import SiteAdapter
+from scrap_service.common.validation import FieldRules, json_ld_field, price_to_int
+
+SITE = "mudahmy"
+
+
+def extract_listing_urls(page, url):
+    """
+    Ambil URL detail unik dari halaman hasil mudah.my yang sudah dimuat,
+    mencoba beberapa selector secara berurutan.
+    """
+    selectors = [
+        ('css', 'div.flex.flex-col.flex-1.gap-2.self-center div.flex.flex-col a'),
+        ('xpath', '//a[contains(@href,"mudah.my") and contains(@class,"sc-jwKygS")]'),
+        ('xpath', '//div[contains(@class,"listing-item")]//a[contains(@href,"mudah.my")]')
+    ]
+
+    listings = []
+    for strategy, selector in selectors:
+        try:
+            if strategy == 'css':
+                elements = page.query_selector_all(selector)
+            else:
+                elements = page.query_selector_all(f'{strategy}={selector}')
+            if elements:
+                listings = elements
+                break
+        except Exception as e:
+            logging.warning(f"Selector {selector} gagal: {e}")
+            continue
+
+    urls = []
+    for element in listings:
+        href = element.get_attribute('href')
+        if href:
+            if href.startswith('/'):
+                href = urljoin(url, href)
+            if 'mudah.my' in href:
+                urls.append(href)
+
+    return list(set(urls))
+
+
+def extract_listing_detail(page, url):
+    """Ekstrak field detail dari halaman listing mudah.my yang sudah dimuat (cascade selector)."""
+
+    def safe_extract(selectors, selector_type="css", fallback="N/A"):
+        for selector in selectors:
+            try:
+                if selector_type == "css":
+                    if page.locator(selector).count() > 0:
+                        return page.locator(selector).first.inner_text().strip()
+                elif selector_type == "xpath":
+                    xp = f"xpath={selector}"
+                    if page.locator(xp).count() > 0:
+                        return page.locator(xp).first.inner_text().strip()
+            except Exception as e:
+                logging.warning(f"Selector failed: {selector} - {e}")
+        return fallback
+
+    data = {}
+    data["listing_url"] = url
+    data["brand"] = safe_extract([
+        "#ad_view_car_specifications div:nth-child(1) > div:nth-child(3)",
+        "div:has-text('Brand') + div",
+        "//div[contains(text(),'Brand')]/following-sibling::div"
+    ])
+    data["model"] = safe_extract([
+        "#ad_view_car_specifications div:nth-child(2) > div:nth-child(3)",
+        "div:has-text('Model') + div",
+        "//div[contains(text(),'Model')]/following-sibling::div"
+    ])
+    data["variant"] = safe_extract([
+        "#ad_view_car_specifications div:nth-child(4) > div:nth-child(3)",
+        "div:has-text('Variant') + div",
+        "//span[contains(text(),'Variant')]/following-sibling::span"
+    ])
+    data["informasi_iklan"] = safe_extract([
+        "#ad_view_ad_highlights > div > div > div:nth-child(1) > div > div > div",
+        "div.ad-highlight:first-child",
+        "//div[contains(@class,'ad-highlight')][1]"
+    ])
+    data["lokasi"] = safe_extract([
+        "#ad_view_ad_highlights > div > div > div.flex.flex-wrap.lg\\:flex-nowrap.gap-3\\.5 > div:nth-child(4) > div",
+        "div:has-text('Location') + div",
+        "//div[contains(text(),'Location')]/following-sibling::div"
+    ])
+    data["price"] = safe_extract([
+        "div.flex.gap-1.md\\:items-end > div"
+    ])
+    data["year"] = safe_extract([
+        "#ad_view_car_specifications div:nth-child(3) > div:nth-child(3)",
+        "div:has-text('Year') + div",
+        "//div[contains(text(),'Year')]/following-sibling::div"
+    ])
+    data["millage"] = safe_extract([
+        "#ad_view_ad_highlights > div > div > div.flex.flex-wrap.lg\\:flex-nowrap.gap-3\\.5 > div:nth-child(3) > div",
+        "div:has-text('Mileage') + div",
+        "//div[contains(text(),'Mileage')]"
+    ])
+    data["transmission"] = safe_extract([
+        "#ad_view_ad_highlights > div > div > div.flex.flex-wrap.lg\\:flex-nowrap.gap-3\\.5 > div:nth-child(2) > div",
+        "div:has-text('Transmission') + div",
+        "//div[contains(text(),'Transmission')]"
+    ])
+    data["seat_capacity"] = safe_extract([
+        "#ad_view_car_specifications > div > div > div > div > div > div:nth-child(2) > div:nth-child(3) > div:nth-child(3)",
+        "div:has-text('Seat Capacity') + div",
+        "//div[contains(text(),'Seat') and contains(text(),'Capacity')]"
+    ])
+    images = page.evaluate("""() => {
+        const gallery = document.getElementById('ad_view_gallery');
+        if (!gallery) return [];
+        return Array.from(gallery.querySelectorAll('img')).map(img => img.src);
+    }""")
+    data["gambar"] = images
+    return data
+
+
+def _spec_value(label):
+    """Nilai tepat di sebelah label spesifikasi yang teksnya persis sama ("Brand" -> "Perodua")."""
+    def extract(page):
+        return page.evaluate("""(label) => {
+            const root = document.getElementById('ad_view_car_specifications') || document.body;
+            for (const el of root.querySelectorAll('div, span, dt, th, td')) {
+                if (el.children.length === 0 && el.textContent.trim() === label) {
+                    const next = el.nextElementSibling;
+                    if (next && next.textContent.trim()) return next.textContent.trim();
+                }
+            }
+            return null;
+        }""", label)
+    return extract
+
+
+def _price_text(page):
+    """Elemen daun pertama yang isinya hanya harga ("RM 45,800"), bukan cicilan bulanan."""
+    return page.evaluate("""() => {
+        for (const el of document.querySelectorAll('div, span, p, h2, h3')) {
+            const text = el.textContent.trim();
+            if (el.children.length === 0 && /^RM\\s?[\\d,]+$/.test(text)) return text;
+        }
+        return null;
+    }""")
+
+
+def _json_ld_price(page):
+    price = price_to_int(json_ld_field("price")(page))
+    return f"RM {price}" if price else None
+
+
+MUDAH_FIELD_RULES = FieldRules(
+    SITE,
+    required=["brand", "model", "variant", "price"],
+    fallbacks={
+        "brand": [_spec_value("Brand"), json_ld_field("brand")],
+        "model": [_spec_value("Model"), json_ld_field("model")],
+        "variant": [_spec_value("Variant"), json_ld_field("variant")],
+        "price": [_price_text, _json_ld_price],
+    },
+    wait_selectors={
+        "brand": ["#ad_view_car_specifications"],
+        "model": ["#ad_view_car_specifications"],
+        "variant": ["#ad_view_car_specifications"],
+        "price": ["div.flex.gap-1.md\\:items-end > div"],
+    },
+    reparse=lambda page: extract_listing_detail(page, page.url),
+)
+
+
+class MudahMyAdapter(SiteAdapter):
+    name = SITE
+    scrap_table_default = "url"
+    history_table_default = "price_history_scrap"
+    field_rules = MUDAH_FIELD_RULES
+    # Harga pertama kali terisi bukan perubahan harga
+    history_from_unpriced = False
+
+    blocked_content_markers = ("Checking your browser before accessing", "cf-browser-verification", "Server Error")
+    blocked_title_markers = ("Access Denied",)
+    blocked_url_markers = ("block",)
+
+    # Listing yang dihapus di-redirect ke halaman pencarian; listing aktif punya judul di highlight
+    sold_redirect = ("cars for sale in malaysia", "/cars-for-sale")
+    active_selector = "#ad_view_ad_highlights h1"
+    default_status = "unknown"
+
+    # Ringkasan hasil "1 - 40 of 12,345 results"; ukuran halaman diambil dari jumlah listing terlihat
+    total_count_selector = "text=/[\\d,]+\\s+(results|ads)\\b/i"
+    total_count_pattern = r"([\d,]+)\s+(?:results|ads)\b"
+    # Hasil pencarian mudah.my sudah terurut terbaru secara default; MUDAHMY_NEWEST_SORT untuk override
+    newest_sort_params = {}
+
+    def listing_urls(self, page, url):
+        return extract_listing_urls(page, url)
+
+    def parse_detail(self, page, url):
+        return extract_listing_detail(page, url)
+
+
+ADAPTER = MudahMyAdapter()
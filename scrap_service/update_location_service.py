@@ -1,77 +1,167 @@
+import time
+import asyncio
 import logging
 import os
-from datetime import datetime
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright
+from scrap_service.common import metrics
+from scrap_service.common.geocode import geocode_after_run
+from scrap_service.common.logsetup import setup_logging
 from scrap_service.listing_tracker_service_carlistmy_playwright.database import get_database_connection
 
 load_dotenv()
 
+# ===== Konfigurasi Env
+DB_TABLE_PRIMARY = os.getenv("DB_TABLE_PRIMARY", "cars")
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "true").lower() == "true"
+# Jumlah page yang jalan bersamaan di satu browser
+UPDATE_LOCATION_PAGES = int(os.getenv("UPDATE_LOCATION_PAGES", "4"))
+# Update lokasi ditulis ke DB per sekian listing (satu UPDATE ... FROM VALUES)
+UPDATE_LOCATION_FLUSH_SIZE = int(os.getenv("UPDATE_LOCATION_FLUSH_SIZE", "50"))
+UPDATE_LOCATION_TIMEOUT = int(os.getenv("UPDATE_LOCATION_TIMEOUT", "60000"))
+LOCATION_SELECTOR = os.getenv("LOCATION_SELECTOR", "div.location")
+# Gambar/font/media tidak dibutuhkan untuk membaca teks lokasi
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+
+METRICS_SITE = "update_location"
+
 # Konfigurasi logging
-START_DATE = datetime.now().strftime('%Y%m%d')
-log_dir = os.path.join(os.path.dirname(__file__), "..", "..", "logs")
-os.makedirs(log_dir, exist_ok=True)
-log_file = os.path.join(log_dir, f"update_location_{START_DATE}.log")
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
+setup_logging("update_location")
 logger = logging.getLogger("update_location_service")
 
 class UpdateLocationService:
-    def __init__(self):
+    def __init__(self, pages=UPDATE_LOCATION_PAGES, flush_size=UPDATE_LOCATION_FLUSH_SIZE):
         self.conn = get_database_connection()
         if not self.conn:
             logger.error("❌ Gagal koneksi ke database.")
             raise Exception("Database connection failed")
         self.cursor = self.conn.cursor()
+        self.pages = max(1, pages)
+        self.flush_size = max(1, flush_size)
+        self.pending_updates = []
+        self.stats = {"updated": 0}
+        self._flush_lock = None
+        self.stop_flag = False
 
-    def fetch_location_data(self, listing_url):
-        """Mengambil data lokasi dari halaman listing."""
+    # ================== Browser (satu browser, banyak page)
+
+    async def _block_heavy_resources(self, route):
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _fetch_on_page(self, page, listing_url):
+        """Ambil teks lokasi memakai page yang sudah terbuka (tanpa launch browser baru)."""
+        started = time.monotonic()
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context()
-                page = context.new_page()
-                page.goto(listing_url, timeout=60000)
-
-                # Contoh: Ambil data lokasi dari elemen tertentu
-                location_selector = "div.location"
-                location = page.locator(location_selector).inner_text().strip()
-
-                browser.close()
-                return location
+            await page.goto(listing_url, timeout=UPDATE_LOCATION_TIMEOUT)
+            location = (await page.locator(LOCATION_SELECTOR).first.inner_text()).strip()
+            return location or None
         except Exception as e:
             logger.error(f"❌ Gagal mengambil data lokasi dari {listing_url}: {e}")
             return None
+        finally:
+            metrics.observe_stage(METRICS_SITE, "navigation", time.monotonic() - started)
 
-    def update_location_in_db(self, listing_url, location):
-        """Memperbarui data lokasi di database berdasarkan listing_url."""
+    async def _page_worker(self, context, queue, on_result):
+        page = await context.new_page()
         try:
-            now = datetime.now()
-            self.cursor.execute(f"""
-                UPDATE {os.getenv('DB_TABLE_PRIMARY', 'cars')}
-                SET location = %s, last_updated_at = %s
-                WHERE listing_url = %s
-            """, (location, now, listing_url))
+            while not self.stop_flag:
+                try:
+                    listing = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                location = await self._fetch_on_page(page, listing[1])
+                # on_result sinkron tanpa I/O dan jalan di event loop yang sama, jadi tidak perlu lock
+                on_result(listing, location)
+                if len(self.pending_updates) >= self.flush_size:
+                    await self._flush_async()
+        finally:
+            await page.close()
+
+    async def _flush_async(self):
+        """
+        Tulis pending update di thread executor: page lain tetap navigasi selama query DB berjalan.
+        Satu flush sekaligus (koneksi/cursor dipakai bersama), page lain yang penuh menunggu di lock.
+        """
+        async with self._flush_lock:
+            updates, self.pending_updates = self.pending_updates, []
+            if updates:
+                self.stats["updated"] += await asyncio.to_thread(self.update_locations_bulk, updates)
+
+    async def _run_pages(self, listings, on_result):
+        from playwright.async_api import async_playwright
+
+        self._flush_lock = asyncio.Lock()
+        queue = asyncio.Queue()
+        for listing in listings:
+            queue.put_nowait(listing)
+
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=BROWSER_HEADLESS)
+            try:
+                context = await browser.new_context()
+                await context.route("**/*", self._block_heavy_resources)
+                workers = min(self.pages, len(listings))
+                logger.info(f"🚀 Browser dijalankan sekali dengan {workers} page paralel untuk {len(listings)} listing.")
+                await asyncio.gather(*(self._page_worker(context, queue, on_result) for _ in range(workers)))
+            finally:
+                await browser.close()
+
+    def run_pipeline(self, listings, on_result):
+        """Jalankan listing (id, url, lokasi saat ini) lewat pool page; on_result(listing, lokasi) per hasil."""
+        if listings:
+            asyncio.run(self._run_pages(listings, on_result))
+
+    def fetch_location_data(self, listing_url):
+        """Mengambil data lokasi dari satu halaman listing."""
+        results = {}
+        self.run_pipeline([(None, listing_url, None)], lambda listing, location: results.update({listing[1]: location}))
+        return results.get(listing_url)
+
+    # ================== Database
+
+    def update_locations_bulk(self, updates):
+        """Memperbarui lokasi banyak listing sekaligus; updates berisi (listing_url, lokasi)."""
+        from psycopg2.extras import execute_values
+
+        if not updates:
+            return 0
+        started = time.monotonic()
+        try:
+            execute_values(self.cursor, f"""
+                UPDATE {DB_TABLE_PRIMARY} AS t
+                SET lokasi = v.lokasi
+                FROM (VALUES %s) AS v (listing_url, lokasi)
+                WHERE t.listing_url = v.listing_url
+            """, updates)
+            updated = self.cursor.rowcount
             self.conn.commit()
-            logger.info(f"✅ Lokasi untuk {listing_url} berhasil diperbarui ke '{location}'")
+            logger.info(f"✅ {updated} lokasi diperbarui ({len(updates)} listing di-flush).")
+            return updated
         except Exception as e:
             self.conn.rollback()
-            logger.error(f"❌ Gagal memperbarui lokasi untuk {listing_url}: {e}")
+            logger.error(f"❌ Gagal memperbarui {len(updates)} lokasi: {e}")
+            return 0
+        finally:
+            metrics.observe_stage(METRICS_SITE, "db", time.monotonic() - started)
+
+    def update_location_in_db(self, listing_url, location):
+        """Memperbarui data lokasi di database berdasarkan listing_url."""
+        return self.update_locations_bulk([(listing_url, location)])
+
+    def flush_updates(self):
+        updates, self.pending_updates = self.pending_updates, []
+        return self.update_locations_bulk(updates)
 
     def fetch_listings_with_authorized_location(self):
         """Mengambil daftar listing dengan lokasi yang mengandung 'Authorized'."""
         try:
             self.cursor.execute(f"""
                 SELECT id, listing_url, lokasi
-                FROM {os.getenv('DB_TABLE_PRIMARY', 'dashboard_carscarlistmy')}
+                FROM {DB_TABLE_PRIMARY}
                 WHERE lokasi LIKE %s
+                ORDER BY id
             """, ('%Authorized%',))
             rows = self.cursor.fetchall()
             logger.info(f"✅ Ditemukan {len(rows)} listing dengan lokasi 'Authorized'.")
@@ -80,22 +170,62 @@ class UpdateLocationService:
             logger.error(f"❌ Gagal mengambil listing dengan lokasi 'Authorized': {e}")
             return []
 
+    # ================== Pipeline
+
+    def _process(self, listings):
+        """Ambil lokasi semua listing dengan satu browser, flush update per flush_size, lalu laporkan throughput."""
+        run_snapshot = metrics.snapshot()
+        started = time.monotonic()
+        stats = {"processed": 0, "found": 0, "changed": 0, "failed": 0, "updated": 0}
+        # "updated" ditambah oleh _flush_async (di event loop) dan flush akhir di bawah
+        self.stats = stats
+
+        def on_result(listing, location):
+            listing_id, listing_url, current_location = listing
+            stats["processed"] += 1
+            if not location:
+                stats["failed"] += 1
+                metrics.inc("scrape_listings_total", site=METRICS_SITE, result="failed")
+                return
+            stats["found"] += 1
+            metrics.inc("scrape_listings_total", site=METRICS_SITE, result="ok")
+            if location != current_location:
+                stats["changed"] += 1
+                self.pending_updates.append((listing_url, location))
+            if stats["processed"] % 50 == 0:
+                self._log_throughput(stats, started)
+
+        try:
+            self.run_pipeline(listings, on_result)
+        finally:
+            stats["updated"] += self.flush_updates()
+
+        self._log_throughput(stats, started, final=True)
+        metrics.log_summary(METRICS_SITE, since=run_snapshot, log=logger)
+        if stats["updated"]:
+            geocode_after_run(self.conn, DB_TABLE_PRIMARY, log=logger)
+        return stats
+
+    def _log_throughput(self, stats, started, final=False):
+        elapsed = time.monotonic() - started
+        rate = stats["processed"] / elapsed if elapsed else 0
+        per_listing = elapsed / stats["processed"] if stats["processed"] else 0
+        logger.info(
+            f"{'🏁 Selesai' if final else '📈 Progres'}: {stats['processed']} listing dalam {elapsed:.1f} detik "
+            f"({rate:.2f} listing/detik, {per_listing:.2f} detik/listing) | lokasi ditemukan {stats['found']}, "
+            f"berubah {stats['changed']}, diupdate {stats['updated']}, gagal {stats['failed']}"
+        )
+
     def process_listings(self, listing_urls):
         """Proses daftar listing untuk memperbarui lokasi."""
-        for listing_url in listing_urls:
-            logger.info(f"🔍 Memproses {listing_url}...")
-            location = self.fetch_location_data(listing_url)
-            if location:
-                self.update_location_in_db(listing_url, location)
+        return self._process([(None, listing_url, None) for listing_url in listing_urls])
 
     def process_authorized_listings(self):
         """Proses semua listing dengan lokasi 'Authorized' untuk diperbarui."""
-        listings = self.fetch_listings_with_authorized_location()
-        for listing_id, listing_url, current_location in listings:
-            logger.info(f"🔍 Memproses ID={listing_id}, URL={listing_url}, Lokasi Saat Ini='{current_location}'...")
-            location = self.fetch_location_data(listing_url)
-            if location:
-                self.update_location_in_db(listing_url, location)
+        return self._process(self.fetch_listings_with_authorized_location())
+
+    def stop(self):
+        self.stop_flag = True
 
     def close(self):
         """Menutup koneksi database."""
@@ -106,14 +236,8 @@ class UpdateLocationService:
             logger.error(f"❌ Gagal menutup koneksi database: {e}")
 
 if __name__ == "__main__":
-    # Contoh penggunaan
     service = UpdateLocationService()
     try:
-        # Daftar URL listing yang ingin diproses
-        listing_urls = [
-            "https://example.com/listing/1",
-            "https://example.com/listing/2",
-        ]
-        service.process_listings(listing_urls)
+        service.process_authorized_listings()
     finally:
         service.close()